@@ -14,6 +14,19 @@ API Endpoints:
     POST /api/tools/calendar - Calendar operations
     POST /api/tools/database - Database queries
     GET  /api/memory/stats  - Memory statistics
+    GET  /api/scheduler/stats - LLM queue depth and wait times
+    GET  /api/llm/stats     - Per-model TTFT, prefill/decode speed and load time percentiles
+    GET  /api/models/residency - Loaded models, demand and the predicted resident set
+    GET  /api/router/decisions - Recent cost-based routing decisions with their inputs
+    GET  /api/cache/stats   - Response cache hit ratio and entries
+    GET  /api/prompt/stats  - Prompt packing (num_ctx, trimmed sections) and session prefill reuse
+    GET  /api/ratelimit/stats - Rate limit budget, route costs, tracked keys and rejections
+    GET  /api/voice/stats   - Whisper pool instances, queue depth and transcription latency
+    GET  /api/workers       - Worker role (owner / follower) and forwarded call counts
+    GET  /api/sessions/stats - Server-side chat sessions (send session_id, not the history)
+    DELETE /api/sessions/{id} - Forget a chat session
+    DELETE /api/cache       - Invalidate cached answers
+    GET  /metrics           - Prometheus metrics
     WS   /ws/chat          - WebSocket streaming
 
 Install:
@@ -30,11 +43,11 @@ from contextlib import asynccontextmanager
 import asyncio
 from pathlib import Path
 import sys
-from collections import defaultdict
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
 import os
 import re
+import threading
 import time
 import uuid
 
@@ -42,9 +55,33 @@ import uuid
 sys.path.insert(0, str(Path(__file__).parent))
 
 # Import Zero components
-from streaming_llm import StreamingMultiModelLLM
+from streaming_llm import StreamingMultiModelLLM, GenerationCancelled, close_http_clients, get_async_client
 from router_context_aware import ContextAwareRouter
 from multi_model_executor import MultiModelExecutor
+from zero_agent.core.llm_scheduler import LLMScheduler, Priority, SchedulerRejected
+from zero_agent.core.background_writer import BackgroundWriter
+from zero_agent.core.model_residency import ModelResidency
+from zero_agent.core.workers import WorkerCoordinator, configured_workers
+from zero_agent.core.intent_engine import IntentEngine, CHAT_INTENTS
+from zero_agent.models.learned_router import LearnedRouter, OutcomeLog
+from zero_agent.core.context_providers import ContextProvider, gather_context
+from zero_agent.core.response_cache import ResponseCache, classify_query, context_hash
+from zero_agent.core.session_store import SessionStore
+from zero_agent.core.whisper_pool import WhisperPool
+from zero_agent.core.audio_io import AudioDecoder, AudioDecodeError, AudioTooLarge
+from zero_agent.core.prompt_packer import (
+    PromptPacker, PromptSection, stable_history, PRIORITY_SYSTEM, PRIORITY_QUESTION, PRIORITY_ACTION,
+    PRIORITY_SEARCH, PRIORITY_HISTORY, PRIORITY_REASONING, PRIORITY_RAG, PRIORITY_ECHO
+)
+from zero_agent.api.rate_limit import RateLimiter, RateLimitMiddleware, InMemoryBackend, SQLiteBackend
+from zero_agent.api.sse import PROTOCOL_V1, PROTOCOL_HEADER, negotiate_protocol, make_encoder, watch_disconnect
+from zero_agent.api.metrics import (
+    REGISTRY, LLM_QUEUE_DEPTH, LLM_ACTIVE, LLM_MODEL_RESIDENT, CHAT_STAGE_DURATION, BACKGROUND_QUEUE_DEPTH,
+    BACKGROUND_DROPPED, RESPONSE_CACHE_LOOKUPS, RESPONSE_CACHE_SAVED_SECONDS, RESPONSE_CACHE_ENTRIES,
+    RESPONSE_CACHE_HIT_RATIO, STT_QUEUE_DEPTH, STT_ACTIVE, MetricsMiddleware,
+    stage_timer, observe_llm_stats, observe_queue_wait, observe_context_result, observe_packed_prompt,
+    observe_prefill, observe_llm_call, observe_route_decision, observe_transcription
+)
 
 # Import tools
 try:
@@ -109,50 +146,20 @@ try:
 except:
     CODE_EXECUTOR_AVAILABLE = False
 
-# Rate Limiting (as per llm_internet_integration_guide.md)
-class SimpleRateLimiter:
-    """
-    Simple in-memory rate limiter
-    Recommended: 10 requests/minute per IP (from guide)
-    """
-    def __init__(self, max_requests: int = 10, window_seconds: int = 60):
-        self.max_requests = max_requests
-        self.window_seconds = window_seconds
-        self.requests = defaultdict(list)
-    
-    def is_allowed(self, client_ip: str) -> bool:
-        """Check if request from this IP is allowed"""
-        now = datetime.now()
-        cutoff = now - timedelta(seconds=self.window_seconds)
-        
-        # Remove old requests
-        self.requests[client_ip] = [
-            req_time for req_time in self.requests[client_ip]
-            if req_time > cutoff
-        ]
-        
-        # Check if under limit
-        if len(self.requests[client_ip]) < self.max_requests:
-            self.requests[client_ip].append(now)
-            return True
-        
-        return False
-    
-    def get_remaining(self, client_ip: str) -> int:
-        """Get remaining requests for this IP"""
-        now = datetime.now()
-        cutoff = now - timedelta(seconds=self.window_seconds)
-        
-        # Count recent requests
-        recent = [
-            req_time for req_time in self.requests[client_ip]
-            if req_time > cutoff
-        ]
-        
-        return max(0, self.max_requests - len(recent))
-
-# Initialize rate limiter
-rate_limiter = SimpleRateLimiter(max_requests=10, window_seconds=60)
+# Multi-worker mode (ZERO_WORKERS > 1): one elected owner process holds Chroma,
+# the response cache, computer control and the bookkeeping writes; the other
+# workers forward calls to it
+coordinator = WorkerCoordinator(workers=configured_workers())
+
+# Rate Limiting (as per llm_internet_integration_guide.md: 10 chat requests/minute per IP)
+# Budget is in cost units - a chat costs 12 of the 120/min, stats reads 1, health checks 0.
+# With several workers the counters live in one SQLite file all of them share
+# (ZERO_RATE_LIMIT_DB overrides its path); a single process keeps them in memory.
+rate_limit_db = os.environ.get("ZERO_RATE_LIMIT_DB") or (
+    coordinator.state_dir / "ratelimit.db" if coordinator.multi else None
+)
+rate_limiter = RateLimiter(limit=120, window_seconds=60,
+                           backend=SQLiteBackend(rate_limit_db) if rate_limit_db else InMemoryBackend())
 
 # Import Agent Orchestrator
 try:
@@ -182,6 +189,8 @@ class ChatRequest(BaseModel):
     use_memory: bool = True
     stream: bool = False
     conversation_history: Optional[List[Dict[str, str]]] = None  # NEW: For context management
+    session_id: Optional[str] = None  # server-side session (or X-Session-ID) - history optional then
+    latency_slo: Optional[float] = None  # seconds - auto-routing degrades to faster models to meet it
 
 
 class ChatResponse(BaseModel):
@@ -190,6 +199,7 @@ class ChatResponse(BaseModel):
     tokens: Optional[int] = None
     duration: Optional[float] = None
     options: Optional[List[Dict[str, str]]] = None  # STAGE 3: Options for user choice
+    cached: Optional[bool] = None  # True when served from the response cache
 
 
 class EmailRequest(BaseModel):
@@ -261,33 +271,36 @@ async def lifespan(app: FastAPI):
     Replaces deprecated @app.on_event("startup") and @app.on_event("shutdown")
     """
     # Startup
+    global response_cache, session_store, bookkeeping_sink
     try:
+        # Owner election first: it decides where Chroma / the response cache live
+        role = coordinator.elect()
+        if coordinator.multi:
+            print(f"[API] Worker {os.getpid()} role: {role} ({coordinator.workers} workers)")
         zero.initialize()
+        if zero.scheduler:
+            # Sync callers (orchestrator, worker threads) queue on this loop from the start
+            zero.scheduler.attach(asyncio.get_running_loop())
+        bookkeeping_sink = coordinator.share("bookkeeping", BookkeepingSink)
+        await bookkeeping_writer.start()
+        response_cache = coordinator.share("response_cache", _build_response_cache)
+        session_store = coordinator.share("sessions", _build_session_store)
+        await coordinator.start(REGISTRY.render)
         # Initialize Computer Control Agent
         if COMPUTER_CONTROL_AVAILABLE:
             initialize_computer_control()
             print("[API] Computer Control Agent initialized")
         
-        # Preload LLM Model (eliminate cold start!)
-        print("[API] Preloading LLM model...")
-        try:
-            import requests
-            # Warm up the model with a simple request
-            response = requests.post(
-                "http://localhost:11434/api/generate",
-                json={
-                    "model": "qwen2.5:3b",
-                    "prompt": "test",
-                    "stream": False
-                },
-                timeout=30
-            )
-            if response.status_code == 200:
-                print("[API] OK LLM model preloaded successfully! (No more cold start)")
-            else:
-                print(f"[API] WARNING LLM preload responded with code {response.status_code}")
-        except Exception as preload_error:
-            print(f"[API] WARNING LLM preload failed (will load on first request): {preload_error}")
+        # Keep the models traffic needs loaded (first poll preloads the default model).
+        # Only the owner preloads; the other workers just poll /api/ps for routing.
+        zero.residency.preload_enabled = coordinator.is_owner
+        coordinator.add_listener(lambda role: setattr(zero.residency, "preload_enabled", role == "owner"))
+        await zero.residency.start()
+        print("[API] OK Model residency started (polls /api/ps, preloads predicted models)")
+        
+        # Load Whisper in the background - the first voice request should not pay for it
+        if whisper_pool and whisper_pool.preload_count:
+            asyncio.create_task(_preload_whisper())
         
     except Exception as e:
         print(f"[API] ERROR Initialization failed: {e}")
@@ -297,6 +310,21 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     print("\n[API] Shutting down...")
+    if zero.residency:
+        await zero.residency.stop()
+    await bookkeeping_writer.stop()
+    await coordinator.stop()
+    if whisper_pool:
+        whisper_pool.shutdown()
+    await close_http_clients()
+
+async def _preload_whisper():
+    try:
+        loaded = await whisper_pool.apreload()
+        print(f"[API] OK Whisper pool preloaded ({loaded}x {whisper_pool.model_size}, "
+              f"{whisper_pool.cpu_threads} threads each)")
+    except Exception as e:
+        print(f"[API] WARNING Whisper preload failed (loads on first request): {e}")
 
 app = FastAPI(
     title="Zero Agent API",
@@ -305,6 +333,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Per-IP, per-route-cost rate limits (innermost, so 429s still get CORS headers)
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -314,6 +345,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Prometheus request counters / latency histograms (see /metrics)
+app.add_middleware(MetricsMiddleware)
+
 
 # ============================================================================
 # Global State
@@ -324,6 +358,8 @@ class ZeroAgent:
     
     def __init__(self):
         self.llm = None
+        self.scheduler = None
+        self.residency = None
         self.router = None
         self.executor = None
         self.memory = None
@@ -347,8 +383,29 @@ class ZeroAgent:
             raise ConnectionError("Cannot connect to Ollama!")
         print("[API] OK LLM connected")
         
+        # Per-model admission control (max_concurrent / batch_size from models.yaml)
+        self.scheduler = LLMScheduler.from_config()
+        self.llm.scheduler = self.scheduler
+        self.scheduler.add_wait_listener(observe_queue_wait)
+        self.llm.telemetry.add_listener(observe_llm_call)
+        print("[API] OK LLM scheduler ready")
+        
+        # Model residency: demand tracking, per-model keep_alive, preloading
+        self.residency = ModelResidency.from_config(self.llm)
+        self.llm.residency = self.residency
+        
         # Initialize Router
-        self.router = ContextAwareRouter(self.llm)
+        self.router = ContextAwareRouter(self.llm, intents=intent_engine)
+        self.router.residency = self.residency  # close calls go to loaded models
+        # Cost-based routing: check the quality choice against queue depth,
+        # p95 latency and residency; degrade (expert -> fast) to meet the SLO
+        self.router.scheduler = self.scheduler
+        self.router.cost_routing = True
+        self.router.add_listener(observe_route_decision)
+        # Learned router (python -m zero_agent.models.learned_router train) - heuristics otherwise
+        self.router.learned = LearnedRouter.load_if_available()
+        if self.router.learned:
+            print(f"[API] OK Learned router loaded ({', '.join(self.router.learned.labels)})")
         print("[API] OK Router ready")
         
         # Initialize Executor
@@ -371,8 +428,12 @@ class ZeroAgent:
         # Initialize RAG System (Embedded ChromaDB - Phase 3)
         try:
             from zero_agent.rag.memory import RAGMemorySystem
-            self.rag = RAGMemorySystem()
-            print("[API] OK RAG System ready (Embedded ChromaDB)")
+            # Chroma is single-process: followers forward every RAG call to the owner
+            self.rag = coordinator.share("rag", RAGMemorySystem)
+            if coordinator.is_owner:
+                print("[API] OK RAG System ready (Embedded ChromaDB)")
+            else:
+                print("[API] OK RAG System ready (forwarded to the owner worker)")
             
             # Use RAG system as preferences manager
             self.preferences_manager = self.rag
@@ -452,6 +513,165 @@ except Exception as e:
     dialogue_tracker = None
     quality_metrics = None
 
+
+def _write_bookkeeping_batch(batch: List[Dict[str, Any]]):
+    """
+    Flush post-response bookkeeping for a batch of chat turns (runs in a worker thread)
+    
+    Each item: user_message, response, model, timestamp, duration, has_search_results
+    """
+    # Remember conversation (Phase 3)
+    if zero.memory:
+        for item in batch:
+            try:
+                zero.memory.remember(
+                    user_message=item["user_message"],
+                    assistant_message=item["response"],
+                    model_used=item["model"]
+                )
+            except Exception as mem_err:
+                print(f"[Memory] Failed to remember: {mem_err}")
+    
+    # Store in RAG for long-term memory (Phase 3) - one Chroma add per batch
+    if zero.rag:
+        try:
+            zero.rag.store_conversations([
+                {
+                    "task": item["user_message"],
+                    "response": item["response"],
+                    "metadata": {"model": item["model"], "timestamp": item["timestamp"]}
+                }
+                for item in batch
+            ])
+        except Exception as rag_err:
+            print(f"[RAG] Failed to store: {rag_err}")
+    
+    # Learn from these interactions (Phase 3: Learning System) - one save per batch
+    if zero.learner:
+        try:
+            zero.learner.learn_from_actions([
+                zero.UserAction(
+                    timestamp=datetime.fromtimestamp(item["timestamp"]),
+                    action_type="chat",
+                    target="llm_response",
+                    parameters={"model": item["model"], "message_length": len(item["user_message"])},
+                    success=True,  # Assume success if we got a response
+                    context={"response_length": len(item["response"])},
+                    duration=item["duration"]
+                )
+                for item in batch
+            ])
+        except Exception as learn_err:
+            print(f"[LEARN] Failed to learn: {learn_err}")
+    
+    # STAGE 2 IMPROVEMENT: Evaluate response quality
+    qualities = {}
+    if quality_metrics:
+        for i, item in enumerate(batch):
+            try:
+                evaluation_context = {
+                    "user_message": item["user_message"],
+                    "model_used": item["model"],
+                    "has_search_results": item["has_search_results"],
+                }
+                quality_score = quality_metrics.evaluate_response(item["response"], evaluation_context)
+                qualities[i] = (quality_score['coherence_score'] + quality_score['relevance_score']) / 2
+                print(f"[QualityMetrics] Response quality: coherence={quality_score['coherence_score']:.2f}, "
+                      f"relevance={quality_score['relevance_score']:.2f}, "
+                      f"length={quality_score['length_words']} words")
+            except Exception as e:
+                print(f"[QualityMetrics] Error evaluating response: {e}")
+    
+    # Routing outcomes - training data for the learned router
+    try:
+        routing_outcomes.append([
+            {
+                "message": item["user_message"],
+                "model": item["model"],
+                "latency": round(item["duration"], 3),
+                "quality": qualities.get(i),
+                "routed": item.get("routed", False),
+                "cached": item.get("cached", False),
+                "timestamp": item["timestamp"],
+            }
+            for i, item in enumerate(batch)
+        ])
+    except Exception as e:
+        print(f"[Routing] Failed to log outcomes: {e}")
+
+
+# (message, model, latency, quality) per answered chat - learned router training data
+routing_outcomes = OutcomeLog()
+
+
+class BookkeepingSink:
+    """
+    Writes bookkeeping batches - one writer at a time
+    
+    Memory, the learner's behavior file and the routing outcome log are plain
+    files, so with several workers only the owner writes them: followers get
+    a proxy from coordinator.share("bookkeeping") and forward their batches.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()  # the owner serves each follower on its own thread
+    
+    def write(self, batch: List[Dict[str, Any]]):
+        with self._lock:
+            _write_bookkeeping_batch(batch)
+
+
+# Set in lifespan to the shared instance
+bookkeeping_sink = BookkeepingSink()
+
+# Batched background writer for post-response bookkeeping (started in lifespan)
+bookkeeping_writer = BackgroundWriter(
+    flush_fn=lambda batch: bookkeeping_sink.write(batch),
+    max_queue=1000,
+    batch_size=16,
+    flush_interval=2.0,
+    name="bookkeeping-writer"
+)
+
+# Deadline (seconds) for the concurrent pre-LLM context providers of one chat request
+CONTEXT_DEADLINE = 8.0
+
+# Cache of /api/chat answers - replaced in lifespan by the shared instance
+# (semantic matching is opt-in: ZERO_SEMANTIC_CACHE=1 with RAG up. The Chroma
+# default embedder is English-only MiniLM and most traffic is Hebrew.)
+response_cache = ResponseCache(max_entries=512)
+
+
+# Server-side conversation sessions (turns, context block, rolling summary);
+# ZERO_SESSION_DB persists them in SQLite. Set in lifespan to the shared instance.
+session_store: Optional[SessionStore] = None
+
+
+def _build_session_store() -> SessionStore:
+    return SessionStore(db_path=os.environ.get("ZERO_SESSION_DB") or None)
+
+
+def _build_response_cache() -> ResponseCache:
+    """The response cache of the owner worker (or the single process)"""
+    cache = ResponseCache(max_entries=512)
+    if zero.rag and os.environ.get("ZERO_SEMANTIC_CACHE", "").lower() in ("1", "true", "yes"):
+        cache.embed_fn = zero.rag.embed
+    return cache
+
+# Warm Whisper instances for /api/voice/transcribe (whisper block of models.yaml)
+whisper_pool = WhisperPool.from_config() if WHISPER_AVAILABLE else None
+if whisper_pool:
+    whisper_pool.add_listener(observe_transcription)
+# Uploads are decoded in memory into reusable sample buffers (no temp files)
+audio_decoder = AudioDecoder() if WHISPER_AVAILABLE else None
+
+# Token budgets per model (context_window from models.yaml) and num_ctx sizing
+prompt_packer = PromptPacker.from_config()
+
+# Every keyword list of the chat handler and the router, compiled once into
+# one automaton - a message is normalized and scanned once per request
+intent_engine = IntentEngine({**CHAT_INTENTS, **ContextAwareRouter.intent_table()})
+
 # Regular expressions for Hebrew enforcement
 LATIN_PATTERN = re.compile(r"[A-Za-z]")
 CODE_BLOCK_PATTERN = re.compile(r"```")
@@ -579,6 +799,199 @@ async def health_check():
     return {"status": "healthy", "initialized": zero.initialized}
 
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint (monitoring/prometheus.yml)"""
+    from fastapi.responses import Response
+    if coordinator.multi:
+        # Every worker's counters, not just the one that got the scrape
+        content = await asyncio.to_thread(lambda: REGISTRY.render_merged(coordinator.peer_metrics()))
+    else:
+        content = await asyncio.to_thread(REGISTRY.render)
+    return Response(content=content, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def _collect_scheduler_gauges():
+    """
+    Refresh scheduler / background writer gauges right before each scrape
+    
+    Runs in a worker thread (see /metrics and WorkerCoordinator.start), so it
+    reads thread-safe snapshots only and never calls the owner.
+    """
+    writer_stats = bookkeeping_writer.get_stats()
+    BACKGROUND_QUEUE_DEPTH.set(writer_stats["depth"], writer=bookkeeping_writer.name)
+    BACKGROUND_DROPPED.set(writer_stats["dropped"], writer=bookkeeping_writer.name)
+    if coordinator.is_owner:
+        # The cache lives in the owner; followers would pay an IPC round trip per gauge
+        RESPONSE_CACHE_ENTRIES.set(len(response_cache))
+        RESPONSE_CACHE_HIT_RATIO.set(response_cache.hit_ratio())
+    if whisper_pool:
+        STT_QUEUE_DEPTH.set(whisper_pool.queued)
+        STT_ACTIVE.set(whisper_pool.active)
+    if zero.residency:
+        for model_name in zero.residency.get_stats()["keep_alive"]:
+            LLM_MODEL_RESIDENT.set(1 if zero.residency.is_loaded(model_name) else 0, model=model_name)
+    if not zero.scheduler:
+        return
+    for model_name, model_stats in zero.scheduler.lane_snapshot().items():
+        LLM_QUEUE_DEPTH.set(model_stats["queued"], model=model_name)
+        LLM_ACTIVE.set(model_stats["active"], model=model_name)
+
+
+REGISTRY.add_collector(_collect_scheduler_gauges)
+
+
+@app.get("/api/scheduler/stats")
+async def get_scheduler_stats():
+    """
+    LLM scheduler state per model
+    
+    Returns:
+        Active slots, queue depth (per priority), admitted/rejected counts,
+        queue wait time (p50/p95/max seconds) and single-flight coalescing counts
+    """
+    if not zero.scheduler:
+        raise HTTPException(status_code=503, detail="Scheduler not initialized")
+    return {"models": zero.scheduler.get_stats(), "coalescing": zero.llm.get_flight_stats()}
+
+
+@app.get("/api/llm/stats")
+async def get_llm_stats(model: Optional[str] = None):
+    """
+    Per-model LLM performance from Ollama's own timings
+    
+    Returns:
+        Calls per model type and, per Ollama model, rolling p50/p90/p95/p99
+        of TTFT, prefill and decode tokens/s, load time and total time, plus
+        cold-load, error and token counts. `?model=mixtral:8x7b` limits it
+        to one model.
+    """
+    if not zero.llm:
+        raise HTTPException(status_code=503, detail="LLM not initialized")
+    stats = zero.llm.get_stats()
+    if model:
+        stats["models"] = {model: stats["models"].get(model, {})}
+    return stats
+
+
+@app.get("/api/models/residency")
+async def get_model_residency():
+    """
+    Model residency state
+    
+    Returns:
+        Loaded models (from the last /api/ps poll), decayed demand per model,
+        the predicted resident set, keep_alive per model, preload counts and
+        how often the router switched a close call to a loaded model
+    """
+    if not zero.residency:
+        raise HTTPException(status_code=503, detail="Model residency not initialized")
+    return {**zero.residency.get_stats(), "router_swaps": zero.router.resident_swaps}
+
+
+@app.get("/api/router/decisions")
+async def get_router_decisions(limit: int = 50):
+    """
+    Recent routing decisions, newest first
+    
+    Returns:
+        Per decision: preferred (quality) model, chosen model, reason
+        (quality / resident / degraded / overloaded), the latency SLO and
+        per-model estimates (queue wait, p95 service time, cold load)
+    """
+    if not zero.router:
+        raise HTTPException(status_code=503, detail="Router not initialized")
+    decisions = list(zero.router.decisions)[-limit:]
+    return {"decisions": [d.to_dict() for d in reversed(decisions)]}
+
+
+@app.get("/api/workers")
+async def get_worker_stats():
+    """
+    This worker's role in multi-worker mode
+    
+    Returns:
+        pid, role (single / owner / follower), worker count, objects shared
+        through the owner, forwarded / served call counts and how many other
+        workers published metrics recently
+    """
+    return coordinator.get_stats()
+
+
+@app.get("/api/voice/stats")
+async def get_voice_stats():
+    """
+    Whisper pool state
+    
+    Returns:
+        Loaded / idle instances, queue depth, wait and transcription time
+        percentiles and the real-time factor (audio seconds per busy second),
+        plus the audio decoder's counters and pooled buffers
+    """
+    if not whisper_pool:
+        raise HTTPException(status_code=501, detail="Whisper not available - install faster-whisper")
+    return {**whisper_pool.get_stats(), "decoder": audio_decoder.get_stats()}
+
+
+@app.get("/api/sessions/stats")
+async def get_session_stats():
+    """Server-side chat sessions: count, stored messages, hits / misses, evictions"""
+    return await asyncio.to_thread(session_store.get_stats)
+
+
+@app.delete("/api/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """Forget a conversation (the next message starts a new session)"""
+    return {"deleted": await asyncio.to_thread(session_store.delete, session_id)}
+
+
+@app.get("/api/ratelimit/stats")
+async def get_ratelimit_stats():
+    """Rate limiter budget, per-route costs, tracked client keys and allowed/rejected counts"""
+    return rate_limiter.get_stats()
+
+
+@app.get("/api/background/stats")
+async def get_background_stats():
+    """Background bookkeeping queue: depth, dropped items, flushed batches"""
+    return bookkeeping_writer.get_stats()
+
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """Response cache: entries, hit ratio, saved generation seconds, TTLs"""
+    return response_cache.get_stats()
+
+
+@app.get("/api/prompt/stats")
+async def get_prompt_stats():
+    """
+    Prompt packer and session mode
+    
+    Returns:
+        Current num_ctx per model, token calibration, trimmed sections, and
+        under "sessions" the pinned sessions with prefill tokens evaluated
+        vs. reused from Ollama's prompt cache
+    """
+    stats = prompt_packer.get_stats()
+    if zero.llm:
+        stats["sessions"] = zero.llm.get_session_stats()
+    return stats
+
+
+@app.delete("/api/cache")
+async def invalidate_cache(model: Optional[str] = None, contains: Optional[str] = None,
+                           query_class: Optional[str] = None):
+    """
+    Invalidate cached answers
+    
+    Filters combine; no filters clears the whole cache.
+    Example: DELETE /api/cache?contains=spy&query_class=search
+    """
+    removed = response_cache.invalidate(model=model, contains=contains, query_class=query_class)
+    return {"removed": removed, "entries": len(response_cache)}
+
+
 @app.get("/api/conversation/stats")
 async def get_conversation_stats():
     """
@@ -775,7 +1188,8 @@ async def direct_agent_execution(request: ChatRequest):
     
     try:
         print(f"[API/DIRECT] Executing goal: {request.message}")
-        result = zero.agent_orchestrator.execute_goal(request.message, max_iterations=10)
+        # Orchestrator is sync - run it off the event loop (its LLM calls queue as background work)
+        result = await asyncio.to_thread(zero.agent_orchestrator.execute_goal, request.message, max_iterations=10)
         
         return ChatResponse(
             response=f"Agent Orchestrator Result:\n\nSuccess: {result.success}\n\nOutput: {result.output}\n\nDuration: {result.duration if hasattr(result, 'duration') else 'N/A'}s",
@@ -796,640 +1210,540 @@ async def direct_agent_execution(request: ChatRequest):
 # Chat Endpoints
 # ============================================================================
 
-@app.post("/api/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest, http_request: Request):
+class PreparedChat:
     """
-    Chat with Zero Agent (with Rate Limiting)
+    Result of the shared chat pipeline (prepare_chat)
     
-    Example:
-        POST /api/chat
-        {
-            "message": "What's the weather?",
-            "model": "fast",
-            "use_memory": true
-        }
+    Either `reply` is set (a stage answered directly - search, memory,
+    computer control) or `prompt` + `model` are ready for generation.
     """
-    # Fix encoding for Hebrew/Unicode
-    import sys
-    if hasattr(sys.stdout, 'reconfigure'):
-        sys.stdout.reconfigure(encoding='utf-8', errors='replace')
-    if hasattr(sys.stderr, 'reconfigure'):
-        sys.stderr.reconfigure(encoding='utf-8', errors='replace')
     
-    if not zero.initialized:
-        raise HTTPException(status_code=503, detail="Agent not initialized")
+    def __init__(self, prompt: str = "", model: Optional[str] = None,
+                 reply: Optional["ChatResponse"] = None, search_triggered: bool = False,
+                 cache_context: str = "", cacheable: bool = False,
+                 options: Optional[Dict[str, Any]] = None, prompt_tokens: int = 0,
+                 messages: Optional[List[Dict[str, str]]] = None, routed: bool = False):
+        self.prompt = prompt
+        self.model = model
+        self.reply = reply
+        self.search_triggered = search_triggered
+        self.cache_context = cache_context  # context hash for the response cache key
+        self.cacheable = cacheable  # False when the answer depends on memory or actions
+        self.options = options  # Ollama option overrides from the prompt packer (num_ctx)
+        self.prompt_tokens = prompt_tokens  # packer's estimate (calibrated against Ollama)
+        self.messages = messages  # set for multi-turn chats -> prefix-stable session mode
+        self.routed = routed  # model picked by the router (not forced / session-pinned)
+
+
+async def prepare_chat(request: ChatRequest, start_time: float,
+                       session_id: Optional[str] = None) -> PreparedChat:
+    """
+    Chat pipeline up to generation, shared by /api/chat and /api/chat/stream
     
-    # Rate limiting check (10 requests/minute as per guide)
-    client_ip = http_request.client.host
-    if not rate_limiter.is_allowed(client_ip):
-        remaining = rate_limiter.get_remaining(client_ip)
-        raise HTTPException(
-            status_code=429,
-            detail=f"Rate limit exceeded. Try again later. ({remaining} requests remaining)"
-        )
+    Runs context gathering (search, memory, RAG, routing), direct-answer
+    stages and prompt building. Multi-turn chats (conversation_history plus a
+    client-sent session id) get chat messages with a stable prefix instead of
+    a single prompt - see StreamingMultiModelLLM.achat_session. Without a
+    session id the chat stays stateless (one prompt, no pinned model).
     
-    import time
-    start_time = time.time()
+    With request.session_id the history comes from the session store when
+    the client sends only the new message; a client that still sends
+    conversation_history resets the stored session to it.
+    """
+    stored_session = None
+    if request.session_id:
+        # The store may be SQLite-backed - keep its I/O off the event loop
+        if request.conversation_history:
+            await asyncio.to_thread(session_store.replace, request.session_id,
+                                    prior_turns(request.conversation_history, request.message))
+        else:
+            stored_session = await asyncio.to_thread(session_store.get, request.session_id)
+            if stored_session:
+                request.conversation_history = stored_session.messages()
     
-    try:
-        
-        # Check if user wants to search the web
-        search_triggered = False
-        search_results = ""
-        action_result = None
-        
-        # Detect search requests - expanded keywords
-        search_keywords = [
-            'חפש ברשת', 'חפש', 'חיפוש', 'חיפוש על', 
-            'search', 'google', 'search for', 'look up', 'find information',
-            'מה המחיר', 'מחיר של', 'מחיר מניית', 'price of', 'price', 'stock price',
-            'spy', 'qqq', 'aapl', 'tsla', 'msft', 'amzn', 'googl',  # Popular stocks
-            'מה חדש', 'מה השעה', 'מה התאריך', 'what time', 'what date',
-            'איך לבנות', 'how to build', 'tutorial',
-            'latest', 'current', 'recent', 'news', 'today', 'update',
-            'weather', 'temperature', 'forecast',
-            'who is', 'what is the latest', 'tell me about recent'
-        ]
-        
-        if any(keyword in request.message.lower() for keyword in search_keywords):
-            try:
-                print(f"[API] Search keyword detected in: {request.message}")
-            except:
-                print(f"[API] Search keyword detected in message")
-            if WEBSEARCH_AVAILABLE:
-                search_triggered = True
-                print(f"[API] Triggering Enhanced WebSearch...")
-                # Extract search query (everything after "search for" or similar)
-                search_query = request.message
-                for trigger in ['חפש ברשת', 'חפש', 'חיפוש על', 'search for', 'google']:
-                    if trigger in request.message.lower():
-                        search_query = request.message.lower().split(trigger, 1)[1].strip()
-                        break
-                
-                # Use Enhanced WebSearch if available (with timeout protection)
-                import signal
-                
-                def timeout_handler(signum, frame):
-                    raise TimeoutError("Search timeout exceeded")
+    # Check if user wants to search the web
+    search_triggered = False
+    search_results = ""
+    action_result = None
+    
+    # Keyword intents (search, recall, RAG, actions, memory commands, routing)
+    # matched in one pass over the normalized message
+    with stage_timer("keyword_detection"):
+        intents = intent_engine.analyze(request.message)
+        search_requested = intents.has("search")
+        # Memory questions (recall of personal facts / long-term RAG)
+        is_recall_query = intents.has("recall")
+        needs_rag = intents.has("rag")
+    
+    # Direct answers (computer control, remember / memory commands) come first -
+    # they return before any search, recall or routing work is started.
+    # Check for Computer Control commands FIRST
+    # Keyboard shortcuts (contains + for combinations)
+    is_hotkey = '+' in request.message and intents.has("hotkey_modifier")
+    
+    is_computer_control = intents.starts_with("computer_control") or is_hotkey
+    
+    if is_computer_control and COMPUTER_CONTROL_AVAILABLE and computer_control_agent:
+        try:
+            print(f"[API] Computer Control command detected: {request.message}")
+            result = await asyncio.to_thread(computer_control_agent.process_command, request.message)
+            
+            if result.get("success"):
+                # Return the action result as the response
+                return PreparedChat(reply=ChatResponse(
+                    response=f"✅ {result.get('result', 'פעולה בוצעה בהצלחה')}",
+                    model_used=request.model or "computer-control",
+                    tokens=0,
+                    duration=time.time() - start_time
+                ))
+            else:
+                error_msg = result.get('error', 'פעולה נכשלה')
+                return PreparedChat(reply=ChatResponse(
+                    response=f"❌ {error_msg}",
+                    model_used=request.model or "computer-control",
+                    tokens=0,
+                    duration=time.time() - start_time
+                ))
+        except Exception as e:
+            print(f"[API] Computer Control error: {e}")
+            # Continue to normal chat if Computer Control fails
+    
+    # STEP 1.2: Check for memory/remember commands BEFORE processing
+    # Detect "Remember:" or "זכור:" patterns
+    is_remember_command = intents.within("remember", 30)
+    
+    # Extract fact to remember
+    if is_remember_command and zero.rag:
+        try:
+            # Extract the fact from the message
+            fact_text = request.message
+            for kw in CHAT_INTENTS["remember"]:
+                if kw in fact_text.lower():
+                    fact_text = fact_text.lower().split(kw, 1)[1].strip()
+                    break
+            
+            # Try to extract key:value pattern
+            if ':' in fact_text or 'הוא' in fact_text or 'היא' in fact_text or 'is' in fact_text.lower():
+                # Extract key and value
+                if ':' in fact_text:
+                    parts = fact_text.split(':', 1)
+                    key = parts[0].strip()
+                    value = parts[1].strip()
+                elif 'הוא' in fact_text or 'היא' in fact_text:
+                    parts = fact_text.split('הוא' if 'הוא' in fact_text else 'היא', 1)
+                    key = parts[0].strip()
+                    value = parts[1].strip()
+                else:
+                    # Generic extraction
+                    key = "fact"
+                    value = fact_text
                 
-                try:
-                    from tool_websearch_improved import EnhancedWebSearchTool
-                    search_tool = EnhancedWebSearchTool()
-                    
-                    # Set 10-second timeout for search (as per guide recommendation)
-                    try:
-                        # Use prefer_ai=True for Perplexity when available
-                        search_result = search_tool.smart_search(search_query, prefer_ai=True)
-                        result_type = search_result.get("type", "unknown")
-                        
-                        print(f"[WebSearch] DEBUG - search_result type: {result_type}")
-                        
-                        # For Perplexity AI answers - return directly without LLM processing!
-                        if result_type == "ai_answer":
-                            # Much shorter format for concise answers (max 400 chars)
-                            formatted_result = search_tool.format_results(search_result, max_length=400)
-                            
-                            print(f"[WebSearch] Perplexity AI answer ({len(formatted_result)} chars) - returning directly")
-                            
-                            # Return Perplexity answer directly - no LLM processing needed!
-                            return ChatResponse(
-                                response=formatted_result.strip(),  # Remove extra whitespace
-                                model_used="perplexity-ai",
-                                duration=time.time() - start_time
-                            )
-                        
-                        # For other search types (web, stock) - format and continue to LLM
-                        formatted_result = search_tool.format_results(search_result)
-                        search_results = f"\n\nחיפוש עדכני ברשת:\n{formatted_result}\n"
-                        
-                        # Log success (avoid Unicode errors by not printing content)
-                        if result_type == "stock":
-                            symbol = search_result.get("symbol", "?")
-                            price = search_result.get("price", "?")
-                            print(f"[WebSearch] SUCCESS - Stock data for {symbol}: ${price}")
-                        else:
-                            num_results = len(search_result.get("results", []))
-                            print(f"[WebSearch] SUCCESS - Got {num_results} web results ({len(formatted_result)} chars)")
-                    except TimeoutError:
-                        print(f"[WebSearch] TIMEOUT - Search took too long (>10s)")
-                        search_triggered = False
-                        search_results = ""
-                        
-                except Exception as e:
-                    print(f"[WebSearch] ERROR in Enhanced: {e}")
-                    # Graceful degradation - continue without search results
-                    search_triggered = False
-                    search_results = ""
-                    print(f"[WebSearch] Graceful degradation - continuing without search")
-        
-        # Check for Computer Control commands FIRST
-        computer_control_keywords = [
-            # Open commands
-            'פתח ', 'תפתח ', 'הפעל ', 'תפעיל ', 'הרץ ', 'תריץ ',
-            'open ', 'launch ', 'start ', 'run ',
-            # Click commands
-            'לחץ ', 'תלחץ ', 'לחיצה ',
-            'click ', 'press ',
-            # Type commands
-            'הקלד ', 'תקליד ',
-            'type ', 'enter ',
-            # Scroll commands
-            'גלול ', 'תגלול ',
-            'scroll ',
-            # Screenshot commands
-            'צלם מסך', 'תצלם מסך', 'צילום מסך',
-            'screenshot', 'take screenshot', 'capture screen',
-            # Image generation commands
-            'צור תמונה', 'תצור תמונה', 'צייר', 'תצייר', 'הפק תמונה',
-            'generate image', 'create image', 'draw', 'make image',
-            # Video generation commands
-            'צור סרטון', 'תצור סרטון', 'הפק סרטון', 'צור וידאו',
-            'generate video', 'create video', 'make video', 'render video',
-            # TTS commands
-            'הקרא בקול', 'תקרא בקול', 'דבר', 'תדבר', 'הגה', 'תהגה',
-            'speak', 'say', 'read out', 'read aloud', 'voice',
-            # Hotkey commands (check for + in message for keyboard shortcuts)
-        ]
-        
-        # Check for keyboard shortcuts (contains + for combinations)
-        is_hotkey = '+' in request.message and any(k in request.message.lower() for k in ['ctrl', 'alt', 'shift', 'win', 'קונטרול', 'אלט', 'שיפט'])
-        
-        is_computer_control = any(request.message.lower().startswith(keyword) for keyword in computer_control_keywords) or is_hotkey
-        
-        if is_computer_control and COMPUTER_CONTROL_AVAILABLE and computer_control_agent:
-            try:
-                print(f"[API] Computer Control command detected: {request.message}")
-                result = computer_control_agent.process_command(request.message)
+                # Store in RAG memory
+                await asyncio.to_thread(zero.rag.store_personal_fact, key, value)
+                print(f"[Memory] Stored personal fact: {key} = {value}")
                 
-                if result.get("success"):
-                    # Return the action result as the response
-                    return ChatResponse(
-                        response=f"✅ {result.get('result', 'פעולה בוצעה בהצלחה')}",
-                        model_used=request.model or "computer-control",
-                        tokens=0,
-                        duration=time.time() - start_time
-                    )
-                else:
-                    error_msg = result.get('error', 'פעולה נכשלה')
-                    return ChatResponse(
-                        response=f"❌ {error_msg}",
-                        model_used=request.model or "computer-control",
-                        tokens=0,
-                        duration=time.time() - start_time
-                    )
-            except Exception as e:
-                print(f"[API] Computer Control error: {e}")
-                # Continue to normal chat if Computer Control fails
-        
-        # Check if this is a complex task that requires Agent Orchestrator
-        complex_task_keywords = [
-            'צור פרויקט', 'create project', 'צור אפליקציה', 'create app',
-            'צור תיקייה', 'create folder', 'עשה תיקייה', 'צר תיקיה', 'תיצור תיקייה',
-            'צור קובץ', 'create file', 'עשה קובץ',
-            'רשום הודעה', 'write message',
-            'הרץ פקודה', 'run command'
-        ]
-        
-        # Safely print message (avoid encoding errors)
-        try:
-            print(f"[API] Checking message: {request.message}")
-        except:
-            print(f"[API] Checking message: [Hebrew text - {len(request.message)} chars]")
-        print(f"[API] Agent Orchestrator available: {zero.agent_orchestrator is not None}")
+                # Return confirmation
+                return PreparedChat(reply=ChatResponse(
+                    response=f"✅ זוכר: {key} = {value}",
+                    model_used="memory_store",
+                    duration=time.time() - start_time
+                ))
+        except Exception as e:
+            print(f"[Memory] Error storing fact: {e}")
+    
+    # Check for Memory Commands (Phase 3: Step 4.2)
+    is_memory_command = intents.has("memory_command")
+    
+    # Handle "what do you remember" commands
+    if is_memory_command and intents.has("memory_query"):
+        response = "אני זוכר:\n\n"
+        stats_loaded = False
         
-        # Check if we should use Agent Orchestrator for complex tasks
-        use_orchestrator = False
-        orchestrator_result = None
+        # Check RAG memory statistics
+        if zero.preferences_manager:
+            try:
+                stats = zero.preferences_manager.get_stats()
+                stats_loaded = True
+                response += f"• {stats.get('conversations', 0)} שיחות קודמות\n"
+                response += f"• {stats.get('preferences', 0)} העדפות שמורות\n"
+                response += f"• {stats.get('personal_facts', 0)} עובדות אישיות\n"
+                response += f"• {stats.get('knowledge', 0)} עובדות נוספות\n"
+            except:
+                pass
         
-        if zero.agent_orchestrator and any(keyword in request.message.lower() for keyword in complex_task_keywords):
+        # Fallback to old memory system if available
+        if not stats_loaded and zero.memory:
             try:
-                # Use Agent Orchestrator for complex tasks
-                print(f"[API] Using Agent Orchestrator for: {request.message}")
-                use_orchestrator = True
-                orchestrator_result = zero.agent_orchestrator.execute_goal(request.message, max_iterations=5)
+                prefs = zero.memory.short_term.get_all_preferences()
+                mem_stats = zero.memory.short_term.get_statistics()
                 
-                if orchestrator_result.success:
-                    # Create a simplified response based on orchestrator result
-                    action_result = f"✅ Task completed: {orchestrator_result.output}"
-                else:
-                    action_result = f"⚠️ Task completed with issues: {orchestrator_result.error}"
-            except Exception as e:
-                action_result = f"❌ Error in orchestrator: {str(e)}"
-        
-        # Check for simple action requests - expanded support (if not using orchestrator)
-        action_keywords = [
-            'צור תיקייה', 'create folder', 'עשה תיקייה', 'צר תיקיה', 'תיצור תיקייה',
-            'פתח דפדפן', 'open browser', 'open chrome', 'פתח כרום',
-            'צור קובץ', 'create file', 'עשה קובץ',
-            'רשום הודעה', 'write message',
-            'הרץ פקודה', 'run command'
-        ]
-        
-        if not use_orchestrator and any(keyword in request.message.lower() for keyword in action_keywords):
-            if zero.code_executor:
-                try:
-                    from pathlib import Path
-                    import subprocess
-                    import os
-                    
-                    # Create folder action
-                    if any(kw in request.message.lower() for kw in ['צור תיקייה', 'create folder', 'עשה תיקייה']):
-                        # Extract folder name
-                        words = request.message.split()
-                        folder_name = None
-                        for i, word in enumerate(words):
-                            if 'תיקייה' in word or 'folder' in word.lower():
-                                folder_name = ' '.join(words[i+1:]) if i+1 < len(words) else 'new_folder'
-                                break
-                        
-                        # Support for C: drive
-                        if 'c:' in request.message.lower() or 'כונן c' in request.message.lower():
-                            folder_name = 'new_folder' if not folder_name else folder_name
-                            new_dir = Path("C:/") / folder_name
-                        else:
-                            folder_name = folder_name if folder_name else 'new_folder'
-                            workspace = Path("workspace")
-                            new_dir = workspace / folder_name
-                        
-                        new_dir.mkdir(parents=True, exist_ok=True)
-                        action_result = f"✅ Created directory: {new_dir}"
-                    
-                    # Open browser action
-                    elif any(kw in request.message.lower() for kw in ['פתח דפדפן', 'open browser', 'open chrome', 'פתח כרום']):
-                        # Extract URL if provided
-                        url = None
-                        if 'http' in request.message.lower():
-                            import re
-                            urls = re.findall(r'https?://[^\s]+', request.message)
-                            url = urls[0] if urls else None
-                        
-                        if url:
-                            subprocess.Popen(['start', url], shell=True)
-                            action_result = f"✅ Opened browser with URL: {url}"
-                        else:
-                            subprocess.Popen(['start', 'chrome'], shell=True)
-                            action_result = "✅ Opened browser"
-                    
-                    # Create file action
-                    elif any(kw in request.message.lower() for kw in ['צור קובץ', 'create file', 'עשה קובץ']):
-                        # Extract filename
-                        words = request.message.split()
-                        filename = 'new_file.txt'
-                        for i, word in enumerate(words):
-                            if 'קובץ' in word or 'file' in word.lower():
-                                filename = ' '.join(words[i+1:]) if i+1 < len(words) else 'new_file.txt'
-                                break
-                        
-                        # Support for C: drive
-                        if 'c:' in request.message.lower():
-                            file_path = Path("C:/") / filename
-                        else:
-                            file_path = Path("workspace") / filename
-                        
-                        file_path.touch()
-                        action_result = f"✅ Created file: {file_path}"
-                    
-                except Exception as e:
-                    action_result = f"❌ Error: {str(e)}"
+                if prefs:
+                    response += "העדפות שלך:\n"
+                    for key, val in prefs.items():
+                        response += f"  • {key}: {val}\n"
+                
+                response += f"\nדיברנו ביחד {mem_stats['conversations_24h']} פעמים היום\n"
+                response += f"סה\"כ {mem_stats['total_conversations']} שיחות בזיכרון\n"
+            except:
+                pass
         
-        # STAGE 2 IMPROVEMENT: Use DialogueStateTracker for context
-        context = ""
-        if dialogue_tracker:
+        return PreparedChat(reply=ChatResponse(
+            response=response,
+            model_used="memory_command",
+            duration=time.time() - start_time
+        ))
+    
+    # Context providers - web search, memory recall, RAG and routing are
+    # independent, so they run concurrently under one deadline instead of
+    # one after another. Providers that miss the deadline are dropped.
+    providers = []
+    search_tool = None
+    if search_requested:
+        try:
+            print(f"[API] Search keyword detected in: {request.message}")
+        except:
+            print(f"[API] Search keyword detected in message")
+        if WEBSEARCH_AVAILABLE:
+            print(f"[API] Triggering Enhanced WebSearch...")
+            # Extract search query (everything after "search for" or similar)
+            search_query = request.message
+            for trigger in ['חפש ברשת', 'חפש', 'חיפוש על', 'search for', 'google']:
+                if trigger in request.message.lower():
+                    search_query = request.message.lower().split(trigger, 1)[1].strip()
+                    break
+            
             try:
-                # Build context from dialogue tracker
-                dialogue_context = dialogue_tracker.get_context(max_turns=3)
-                if dialogue_context:
-                    context = dialogue_context
-                    print(f"[DialogueState] Got context from tracker: {len(context)} chars")
+                from tool_websearch_improved import EnhancedWebSearchTool
+                search_tool = EnhancedWebSearchTool()
+                # Use prefer_ai=True for Perplexity when available
+                providers.append(ContextProvider(
+                    "web_search", lambda: search_tool.smart_search(search_query, prefer_ai=True)
+                ))
             except Exception as e:
-                print(f"[DialogueState] Error getting context: {e}")
-        
-        # Build context from conversation history (Phase 2) - fallback
-        if not context:
-            if request.conversation_history:
-                # Format last 10 messages for context
-                context_msgs = []
-                for msg in request.conversation_history[-10:]:  # Last 10 only
-                    role = "משתמש" if msg.get('role') == 'user' else "Zero"
-                    content = msg.get('content', '')
-                    context_msgs.append(f"{role}: {content}")
-                context = "\n".join(context_msgs)
-                print(f"[Context] Got {len(request.conversation_history)} messages in history")
-                print(f"[Context] Context built: {len(context)} chars")
-            else:
-                print(f"[Context] No conversation_history provided")
-            
-            # Fallback to old memory system if no conversation history provided
-            if not context and request.use_memory and zero.memory:
-                context = zero.memory.build_context(
-                    current_task=request.message,
-                    max_length=2000
-                )
-                print(f"[Context] Using old memory system: {len(context)} chars")
-        
-        # STEP 1.2: Check for memory/remember commands BEFORE processing
-        # Detect "Remember:" or "זכור:" patterns
-        remember_keywords = [
-            'remember:', 'remember that', 'remember this', 'remember to',
-            'זכור:', 'תזכור:', 'תזכור ש', 'זכור ש', 'תזכור את'
-        ]
-        is_remember_command = any(request.message.lower().startswith(kw) or 
-                                  kw in request.message.lower()[:30] for kw in remember_keywords)
-        
-        # Extract fact to remember
-        if is_remember_command and zero.rag:
+                print(f"[WebSearch] ERROR in Enhanced: {e}")
+    
+    if zero.rag and request.use_memory:
+        if is_recall_query:
+            providers.append(ContextProvider(
+                "personal_facts", lambda: zero.rag.recall_personal_fact(request.message, n_results=3),
+                stage="rag_recall"
+            ))
+        if needs_rag:
+            providers.append(ContextProvider(
+                "rag", lambda: zero.rag.retrieve(request.message, n_results=3),
+                stage="rag_recall"
+            ))
+    
+    # Multi-turn chat: earlier turns become chat messages (prefix-stable session
+    # mode) and follow-up turns stay on the model the session is pinned to
+    history_messages = []
+    if session_id and request.use_memory and request.conversation_history:
+        history_messages = stable_history(prior_turns(request.conversation_history, request.message))
+    pinned_model = zero.llm.session_model(session_id) if history_messages else None
+    
+    if not request.model and not pinned_model:
+        providers.append(ContextProvider(
+            "routing", lambda: zero.router.route_with_reasoning(request.message, request.latency_slo, intents)
+        ))
+    
+    with stage_timer("context_gather"):
+        gathered = await gather_context(providers, deadline=CONTEXT_DEADLINE, on_result=observe_context_result)
+    
+    search_outcome = gathered.get("web_search")
+    if search_outcome is not None:
+        if not search_outcome.ok:
+            print(f"[WebSearch] {search_outcome.status.upper()} - {search_outcome.error}")
+            # Graceful degradation - continue without search results
+            print(f"[WebSearch] Graceful degradation - continuing without search")
+        else:
             try:
-                # Extract the fact from the message
-                fact_text = request.message
-                for kw in remember_keywords:
-                    if kw in fact_text.lower():
-                        fact_text = fact_text.lower().split(kw, 1)[1].strip()
-                        break
+                search_result = search_outcome.value
+                search_triggered = True
+                result_type = search_result.get("type", "unknown")
                 
-                # Try to extract key:value pattern
-                if ':' in fact_text or 'הוא' in fact_text or 'היא' in fact_text or 'is' in fact_text.lower():
-                    # Extract key and value
-                    if ':' in fact_text:
-                        parts = fact_text.split(':', 1)
-                        key = parts[0].strip()
-                        value = parts[1].strip()
-                    elif 'הוא' in fact_text or 'היא' in fact_text:
-                        parts = fact_text.split('הוא' if 'הוא' in fact_text else 'היא', 1)
-                        key = parts[0].strip()
-                        value = parts[1].strip()
-                    else:
-                        # Generic extraction
-                        key = "fact"
-                        value = fact_text
+                print(f"[WebSearch] DEBUG - search_result type: {result_type}")
+                
+                # For Perplexity AI answers - return directly without LLM processing!
+                if result_type == "ai_answer":
+                    # Much shorter format for concise answers (max 400 chars)
+                    formatted_result = search_tool.format_results(search_result, max_length=400)
                     
-                    # Store in RAG memory
-                    zero.rag.store_personal_fact(key, value)
-                    print(f"[Memory] Stored personal fact: {key} = {value}")
+                    print(f"[WebSearch] Perplexity AI answer ({len(formatted_result)} chars) - returning directly")
                     
-                    # Return confirmation
-                    return ChatResponse(
-                        response=f"✅ זוכר: {key} = {value}",
-                        model_used="memory_store",
+                    # Return Perplexity answer directly - no LLM processing needed!
+                    return PreparedChat(reply=ChatResponse(
+                        response=formatted_result.strip(),  # Remove extra whitespace
+                        model_used="perplexity-ai",
                         duration=time.time() - start_time
-                    )
-            except Exception as e:
-                print(f"[Memory] Error storing fact: {e}")
-        
-        # STEP 1.3: Check for memory recall BEFORE processing LLM
-        # Detect questions about memory ("What did I say?", "What is...")
-        recall_keywords = [
-            'מה שמו', 'מה השם', 'what is the name', 'what was', 'what did',
-            'מה אמרתי', 'מה דיברנו', 'מה זוכר', 'מה יודע',
-            'recall', 'remember what', 'what is'
-        ]
-        is_recall_query = any(kw in request.message.lower() for kw in recall_keywords)
-        
-        # If it's a recall query, search RAG memory FIRST
-        if is_recall_query and zero.rag and request.use_memory:
-            try:
-                # Search personal facts
-                recalled_facts = zero.rag.recall_personal_fact(request.message, n_results=3)
+                    ))
                 
-                # Also check conversation history for context
-                if request.conversation_history:
-                    # Look for specific patterns in history
-                    for msg in reversed(request.conversation_history[-10:]):
-                        content = msg.get('content', '').lower()
-                        # Check for "Remember:" patterns in history
-                        if any(kw in content for kw in ['remember:', 'זכור:', 'test supervisor', 'alex']):
-                            # Extract fact from history
-                            for kw in ['remember:', 'זכור:']:
-                                if kw in content:
-                                    fact_part = content.split(kw, 1)[1].strip() if len(content.split(kw)) > 1 else ""
-                                    if fact_part:
-                                        recalled_facts.append({
-                                            "document": fact_part,
-                                            "metadata": {"source": "conversation_history"},
-                                            "distance": 0
-                                        })
-                                    break
+                # For other search types (web, stock) - format and continue to LLM
+                formatted_result = search_tool.format_results(search_result)
+                search_results = f"\n\nחיפוש עדכני ברשת:\n{formatted_result}\n"
                 
-                if recalled_facts:
-                    # Format recalled facts
-                    memory_response = "זיכרון:\n\n"
-                    for i, fact in enumerate(recalled_facts[:3], 1):
-                        doc = fact.get('document', '')
-                        memory_response += f"{i}. {doc}\n"
-                    
-                    # Add to context for LLM processing
-                    context = (context + "\n\n" + memory_response) if context else memory_response
-                    print(f"[Memory] Added {len(recalled_facts)} recalled facts to context")
+                # Log success (avoid Unicode errors by not printing content)
+                if result_type == "stock":
+                    symbol = search_result.get("symbol", "?")
+                    price = search_result.get("price", "?")
+                    print(f"[WebSearch] SUCCESS - Stock data for {symbol}: ${price}")
+                else:
+                    num_results = len(search_result.get("results", []))
+                    print(f"[WebSearch] SUCCESS - Got {num_results} web results ({len(formatted_result)} chars)")
             except Exception as e:
-                print(f"[Memory] Error recalling facts: {e}")
-        
-        # Check for Memory Commands (Phase 3: Step 4.2)
-        memory_command_keywords = [
-            'מה אתה זוכר', 'מה אתה יודע עליי', 'מה למדת', 'מה יודע',
-            'what do you remember', 'what do you know about me',
-            'שכח', 'תשכח', 'forget',
-            'רשום', 'זכור', 'תזכור', 'remember this', 'save this'
-        ]
-        
-        is_memory_command = any(kw in request.message.lower() for kw in memory_command_keywords)
-        
-        # Handle "what do you remember" commands
-        if is_memory_command and any(kw in request.message.lower() for kw in ['מה אתה זוכר', 'מה אתה יודע', 'מה למדת', 'what do you remember', 'what do you know']):
-            response = "אני זוכר:\n\n"
-            stats_loaded = False
-            
-            # Check RAG memory statistics
-            if zero.preferences_manager:
-                try:
-                    stats = zero.preferences_manager.get_stats()
-                    stats_loaded = True
-                    response += f"• {stats.get('conversations', 0)} שיחות קודמות\n"
-                    response += f"• {stats.get('preferences', 0)} העדפות שמורות\n"
-                    response += f"• {stats.get('personal_facts', 0)} עובדות אישיות\n"
-                    response += f"• {stats.get('knowledge', 0)} עובדות נוספות\n"
-                except:
-                    pass
-            
-            # Fallback to old memory system if available
-            if not stats_loaded and zero.memory:
-                try:
-                    prefs = zero.memory.short_term.get_all_preferences()
-                    mem_stats = zero.memory.short_term.get_statistics()
-                    
-                    if prefs:
-                        response += "העדפות שלך:\n"
-                        for key, val in prefs.items():
-                            response += f"  • {key}: {val}\n"
-                    
-                    response += f"\nדיברנו ביחד {mem_stats['conversations_24h']} פעמים היום\n"
-                    response += f"סה\"כ {mem_stats['total_conversations']} שיחות בזיכרון\n"
-                except:
-                    pass
-            
-            return ChatResponse(
-                response=response,
-                model_used="memory_command",
-                duration=time.time() - start_time
-            )
-        
-        # Add RAG context for complex questions (Phase 3)
-        rag_context = ""
-        if zero.rag and request.use_memory:
-            # Determine if question needs long-term memory
-            complex_keywords = ['זוכר', 'אמרתי', 'דיברנו', 'לפני', 'אתמול', 'שבוע',
-                              'remember', 'said', 'talked', 'before', 'yesterday', 'ago',
-                              'מה אתה יודע', 'מה למדנו', 'what do you know']
-            
-            needs_rag = any(kw in request.message.lower() for kw in complex_keywords)
-            
-            if needs_rag:
-                try:
-                    rag_results = zero.rag.retrieve(request.message, n_results=3)
-                    if rag_results:
-                        rag_context = "\n\n## זיכרון ארוך טווח:\n"
-                        for i, result in enumerate(rag_results[:2], 1):  # Top 2 only
-                            doc = result.get('document', '')[:150]  # First 150 chars
-                            rag_context += f"{i}. {doc}...\n"
-                        print(f"[RAG] Added {len(rag_results)} results to context")
-                except Exception as rag_err:
-                    print(f"[RAG] Failed to retrieve: {rag_err}")
-        
-        # Always use enhanced system prompts for HIGH-QUALITY responses
-        preferences = ""
+                print(f"[WebSearch] ERROR formatting results: {e}")
+                search_triggered = False
+                search_results = ""
+    
+    # Safely print message (avoid encoding errors)
+    try:
+        print(f"[API] Checking message: {request.message}")
+    except:
+        print(f"[API] Checking message: [Hebrew text - {len(request.message)} chars]")
+    print(f"[API] Agent Orchestrator available: {zero.agent_orchestrator is not None}")
+    
+    # Check if we should use Agent Orchestrator for complex tasks
+    use_orchestrator = False
+    orchestrator_result = None
+    
+    # Check if this is a complex task that requires Agent Orchestrator
+    if zero.agent_orchestrator and intents.has("complex_task"):
         try:
-            from enhanced_system_prompt import get_system_prompt
+            # Use Agent Orchestrator for complex tasks
+            print(f"[API] Using Agent Orchestrator for: {request.message}")
+            use_orchestrator = True
+            orchestrator_result = await asyncio.to_thread(
+                zero.agent_orchestrator.execute_goal, request.message, max_iterations=5
+            )
             
-            # Check if user has specific preference
-            if request.use_memory and zero.memory:
-                try:
-                    prefs = zero.memory.short_term.get_all_preferences()
-                    response_mode = prefs.get('response_mode', 'detailed')
-                    preferences = get_system_prompt(detailed=(response_mode == 'detailed'))
-                except:
-                    # Default to DETAILED mode for high-quality responses
-                    preferences = get_system_prompt(detailed=True)
+            if orchestrator_result.success:
+                # Create a simplified response based on orchestrator result
+                action_result = f"✅ Task completed: {orchestrator_result.output}"
             else:
-                # Default to DETAILED mode for high-quality responses
-                preferences = get_system_prompt(detailed=True)
+                action_result = f"⚠️ Task completed with issues: {orchestrator_result.error}"
         except Exception as e:
-            print(f"[API] Warning: Could not load enhanced_system_prompt: {e}")
-            # Fallback to simple, clean prompt
-            preferences = """You are Zero Agent - a helpful AI assistant powered by Mixtral 8x7B.
-
-Be direct, accurate, and clear. Match the user's language. No unnecessary preambles."""
-        
-        # Build prompt with modular architecture (from llm-concise-guide.md)
-        # Structure: Role + Constraints + Format + Task (for better instruction following)
-        prompt = ""
-        
-        # 1. Role and constraints (from preferences) - at the start for clarity
-        if preferences:
-            prompt += f"{preferences}\n\n"
-        
-        # 2. Context (conversation history) - if exists
-        if context and request.use_memory:
-            prompt += f"## הקשר מהשיחה הקודמת:\n{context}\n\n"
-        
-        # 2.5 RAG long-term memory context (Phase 3)
-        if rag_context:
-            prompt += rag_context + "\n"
-        
-        # 3. Additional info (search results, actions)
-        extra_info = ""
-        if search_triggered and search_results:
-            extra_info += f"\nמידע נוסף מהרשת:\n{search_results}\n"
-            print(f"[Prompt] Adding search_results to prompt ({len(search_results)} chars)")
-        if action_result:
-            extra_info += f"\nפעולה שבוצעה: {action_result}\n"
-        
-        if extra_info:
-            prompt += extra_info + "\n"
-            print(f"[Prompt] Total extra_info added: {len(extra_info)} chars")
-        
-        # 4. User message - Mixtral requires [INST] tags!
-        # Wrap everything in Mixtral's prompt template: <s>[INST] ... [/INST]
-        user_message = request.message
-        
-        # STAGE 1 IMPROVEMENT: Add echo-back (active listening reflection)
-        echo_back_text = ""
+            action_result = f"❌ Error in orchestrator: {str(e)}"
+    
+    # Check for simple action requests - expanded support (if not using orchestrator)
+    if not use_orchestrator and intents.has("action"):
+        if zero.code_executor:
+            try:
+                from pathlib import Path
+                import subprocess
+                import os
+                
+                # Create folder action
+                if intents.has("action_create_folder"):
+                    # Extract folder name
+                    words = request.message.split()
+                    folder_name = None
+                    for i, word in enumerate(words):
+                        if 'תיקייה' in word or 'folder' in word.lower():
+                            folder_name = ' '.join(words[i+1:]) if i+1 < len(words) else 'new_folder'
+                            break
+                    
+                    # Support for C: drive
+                    if 'c:' in request.message.lower() or 'כונן c' in request.message.lower():
+                        folder_name = 'new_folder' if not folder_name else folder_name
+                        new_dir = Path("C:/") / folder_name
+                    else:
+                        folder_name = folder_name if folder_name else 'new_folder'
+                        workspace = Path("workspace")
+                        new_dir = workspace / folder_name
+                    
+                    new_dir.mkdir(parents=True, exist_ok=True)
+                    action_result = f"✅ Created directory: {new_dir}"
+                
+                # Open browser action
+                elif intents.has("action_open_browser"):
+                    # Extract URL if provided
+                    url = None
+                    if 'http' in request.message.lower():
+                        import re
+                        urls = re.findall(r'https?://[^\s]+', request.message)
+                        url = urls[0] if urls else None
+                    
+                    if url:
+                        subprocess.Popen(['start', url], shell=True)
+                        action_result = f"✅ Opened browser with URL: {url}"
+                    else:
+                        subprocess.Popen(['start', 'chrome'], shell=True)
+                        action_result = "✅ Opened browser"
+                
+                # Create file action
+                elif intents.has("action_create_file"):
+                    # Extract filename
+                    words = request.message.split()
+                    filename = 'new_file.txt'
+                    for i, word in enumerate(words):
+                        if 'קובץ' in word or 'file' in word.lower():
+                            filename = ' '.join(words[i+1:]) if i+1 < len(words) else 'new_file.txt'
+                            break
+                    
+                    # Support for C: drive
+                    if 'c:' in request.message.lower():
+                        file_path = Path("C:/") / filename
+                    else:
+                        file_path = Path("workspace") / filename
+                    
+                    file_path.touch()
+                    action_result = f"✅ Created file: {file_path}"
+                
+            except Exception as e:
+                action_result = f"❌ Error: {str(e)}"
+    
+    # STAGE 2 IMPROVEMENT: Use DialogueStateTracker for context
+    context = ""
+    # What session-mode chat messages do not already carry (they hold the turns themselves)
+    session_context = ""
+    if dialogue_tracker:
         try:
-            from zero_agent.core.response_controller import ResponseController
-            response_controller = ResponseController()
-            if response_controller.should_add_echo_back(user_message):
-                echo_back_text = response_controller.create_echo_back(user_message)
-                if echo_back_text:
-                    prompt += f"\n## שיקוף הקשבה:\n{echo_back_text}\n\n"
-                    print(f"[Echo-Back] Added: {echo_back_text[:50]}...")
+            # Build context from dialogue tracker
+            dialogue_context = dialogue_tracker.get_context(max_turns=3)
+            if dialogue_context:
+                context = session_context = dialogue_context
+                print(f"[DialogueState] Got context from tracker: {len(context)} chars")
         except Exception as e:
-            print(f"[Echo-Back] Error adding echo-back: {e}")
-        
-        # STAGE 3 IMPROVEMENT: Add Chain-of-Thought or ReAct for complex questions
-        cot_reasoning = None
-        react_result = None
+            print(f"[DialogueState] Error getting context: {e}")
+    
+    # Turns folded into the session summary are in no chat message either
+    session_summary = ""
+    if stored_session is not None and stored_session.summary:
+        session_summary = f"סיכום השיחה הקודמת:\n{stored_session.summary}"
+        session_context = f"{session_summary}\n\n{session_context}" if session_context else session_summary
+    
+    # Build context from conversation history (Phase 2) - fallback
+    if not context:
+        if stored_session is not None:
+            # Kept formatted by the session store - no per-request re-formatting
+            context = stored_session.context_block
+            if session_summary:
+                context = f"{session_summary}\n\n{context}"
+            print(f"[Context] Session {request.session_id}: {len(stored_session.turns)} stored messages")
+        elif request.conversation_history:
+            # Format last 10 messages for context
+            context_msgs = []
+            for msg in request.conversation_history[-10:]:  # Last 10 only
+                role = "משתמש" if msg.get('role') == 'user' else "Zero"
+                content = msg.get('content', '')
+                context_msgs.append(f"{role}: {content}")
+            context = "\n".join(context_msgs)
+            print(f"[Context] Got {len(request.conversation_history)} messages in history")
+            print(f"[Context] Context built: {len(context)} chars")
+        else:
+            print(f"[Context] No conversation_history provided")
         
+        # Fallback to old memory system if no conversation history provided
+        if not context and request.use_memory and zero.memory:
+            context = zero.memory.build_context(
+                current_task=request.message,
+                max_length=2000
+            )
+            print(f"[Context] Using old memory system: {len(context)} chars")
+    
+    # STEP 1.3: Add recalled memory BEFORE processing LLM
+    # (fetched by the personal_facts provider for "What did I say?" style questions)
+    facts_outcome = gathered.get("personal_facts")
+    
+    if facts_outcome is not None:
         try:
-            from zero_agent.core.cot_reasoning import ChainOfThoughtReasoning
-            from zero_agent.core.react_framework import ReActAgent
-            
-            cot_reasoner = ChainOfThoughtReasoning()
-            react_agent = ReActAgent()
+            if not facts_outcome.ok:
+                raise RuntimeError(facts_outcome.error)
+            recalled_facts = list(facts_outcome.value or [])
             
-            # החלטה: CoT או ReAct?
-            use_react = react_agent.should_use_react(user_message)
-            use_cot = cot_reasoner.should_use_cot(user_message) and not use_react
-            
-            if use_react:
-                # Use ReAct Framework
-                available_tools = []
-                if WEBSEARCH_AVAILABLE:
-                    available_tools.append('web_search')
-                if zero.rag:
-                    available_tools.append('rag')
-                
-                react_result = react_agent.solve(user_message, available_tools=available_tools)
-                react_text = react_agent.format_for_prompt(react_result)
-                prompt += f"\n{react_text}\n\n"
-                print(f"[ReAct] Applied ReAct framework for task")
+            # Also check conversation history for context
+            if request.conversation_history:
+                # Look for specific patterns in history
+                for msg in reversed(request.conversation_history[-10:]):
+                    content = msg.get('content', '').lower()
+                    # Check for "Remember:" patterns in history
+                    if any(kw in content for kw in ['remember:', 'זכור:', 'test supervisor', 'alex']):
+                        # Extract fact from history
+                        for kw in ['remember:', 'זכור:']:
+                            if kw in content:
+                                fact_part = content.split(kw, 1)[1].strip() if len(content.split(kw)) > 1 else ""
+                                if fact_part:
+                                    recalled_facts.append({
+                                        "document": fact_part,
+                                        "metadata": {"source": "conversation_history"},
+                                        "distance": 0
+                                    })
+                                break
             
-            elif use_cot:
-                # Use Chain-of-Thought
-                cot_reasoning = cot_reasoner.reason(user_message, context=context if context else None)
-                cot_text = cot_reasoner.format_for_prompt(cot_reasoning)
-                prompt += f"\n{cot_text}\n\n"
-                print(f"[CoT] Applied Chain-of-Thought reasoning")
+            if recalled_facts:
+                # Format recalled facts
+                memory_response = "זיכרון:\n\n"
+                for i, fact in enumerate(recalled_facts[:3], 1):
+                    doc = fact.get('document', '')
+                    memory_response += f"{i}. {doc}\n"
                 
+                # Add to context for LLM processing
+                context = (context + "\n\n" + memory_response) if context else memory_response
+                session_context = (session_context + "\n\n" + memory_response) if session_context else memory_response
+                print(f"[Memory] Added {len(recalled_facts)} recalled facts to context")
         except Exception as e:
-            print(f"[STAGE 3] Error applying CoT/ReAct: {e}")
-        
-        # Prepare the final prompt with Mixtral template
-        instruction_content = prompt + f"\nשאלה: {user_message}\nתשובה:"
-        prompt = f"<s>[INST] {instruction_content} [/INST]"
-        
-        # DEBUG: Print first and last 500 chars of prompt
-        print(f"[Prompt Debug] First 500 chars:\n{prompt[:500]}\n")
-        print(f"[Prompt Debug] Last 500 chars:\n{prompt[-500:]}\n")
+            print(f"[Memory] Error recalling facts: {e}")
+    
+    # Add RAG context for complex questions (Phase 3) - fetched by the rag provider
+    rag_context = ""
+    rag_outcome = gathered.get("rag")
+    if rag_outcome is not None:
+        if rag_outcome.ok:
+            rag_results = rag_outcome.value
+            if rag_results:
+                rag_context = "\n\n## זיכרון ארוך טווח:\n"
+                for i, result in enumerate(rag_results[:2], 1):  # Top 2 only
+                    doc = result.get('document', '')[:150]  # First 150 chars
+                    rag_context += f"{i}. {doc}...\n"
+                print(f"[RAG] Added {len(rag_results)} results to context")
+        else:
+            print(f"[RAG] Failed to retrieve: {rag_outcome.error}")
+    
+    # Always use enhanced system prompts for HIGH-QUALITY responses
+    preferences = ""
+    try:
+        from enhanced_system_prompt import get_system_prompt
         
-        # Get routing decision
-        if request.model:
-            # Forced model
-            model = request.model
-            response = zero.llm.generate(prompt, model=model)
+        # Check if user has specific preference
+        if request.use_memory and zero.memory:
+            try:
+                prefs = zero.memory.short_term.get_all_preferences()
+                response_mode = prefs.get('response_mode', 'detailed')
+                preferences = get_system_prompt(detailed=(response_mode == 'detailed'))
+            except:
+                # Default to DETAILED mode for high-quality responses
+                preferences = get_system_prompt(detailed=True)
         else:
-            # Auto-route
-            routing = zero.router.route_with_reasoning(request.message)
-            model = routing['model']
+            # Default to DETAILED mode for high-quality responses
+            preferences = get_system_prompt(detailed=True)
+    except Exception as e:
+        print(f"[API] Warning: Could not load enhanced_system_prompt: {e}")
+        # Fallback to simple, clean prompt
+        preferences = """You are Zero Agent - a helpful AI assistant powered by Mixtral 8x7B.
+
+Be direct, accurate, and clear. Match the user's language. No unnecessary preambles."""
+    
+    # Get routing decision first - the prompt budget depends on the model
+    if request.model:
+        # Forced model
+        model = request.model
+    elif pinned_model:
+        # Follow-up turn - switching model would throw the session's cached prefix away
+        model = pinned_model
+        print(f"[Session] Turn stays on pinned model {model}")
+    else:
+        # Auto-route (decided by the routing provider; default model if it was dropped)
+        routing_outcome = gathered.get("routing")
+        routing = routing_outcome.value if routing_outcome and routing_outcome.ok else {"model": "expert"}
+        model = routing['model']
+        
+        # For DeepSeek-R1 (smart model), enhance with Chain-of-Thought
+        if model == "smart":
+            # Check if it's a complex reasoning task
+            is_complex = intents.has("cot_complex")
             
-            # For DeepSeek-R1 (smart model), enhance with Chain-of-Thought
-            if model == "smart":
-                # Check if it's a complex reasoning task
-                complex_keywords = ['למה', 'איך', 'בצע', 'פתור', 'תכנן', 'מיישם', 
-                                    'why', 'how', 'solve', 'implement', 'plan',
-                                    'analyz', 'explain', 'compare', 'evalu']
-                
-                is_complex = any(keyword in request.message.lower() for keyword in complex_keywords)
-                
-                if is_complex:
-                    # Add CoT instruction to prompt for R1
-                    cot_instruction = """
+            if is_complex:
+                # Add CoT instruction to prompt for R1
+                cot_instruction = """
 
 שים לב: אתה DeepSeek-R1 עם יכולות Chain-of-Thought משופרות.
 לשאלות מורכבות - חשוב שלב אחר שלב אך ענה תמציתי:
@@ -1438,25 +1752,214 @@ Be direct, accurate, and clear. Match the user's language. No unnecessary preamb
 3. תמצת למשפט אחד
 
 חזור לתשובה תמציתית:"""
-                    
-                    # Insert CoT after preferences but before context
-                    prompt = prompt.replace("---\n\nכל תשובה:", cot_instruction + "\n\n---\n\nכל תשובה:")
-                
-                # For R1, add stop sequences to remove thinking tokens
-                response = zero.llm.generate(prompt, model=model)
                 
-                # Post-process to remove thinking tags if present
-                if "<think>" in response or "</think>" in response:
-                    import re
-                    response = re.sub(r'<think>.*?</think>', '', response, flags=re.DOTALL)
-                    
-            else:
-                response = zero.llm.generate(prompt, model=model)
+                # Insert CoT after preferences but before context
+                preferences = preferences.replace("---\n\nכל תשובה:", cot_instruction + "\n\n---\n\nכל תשובה:")
+    
+    # Build prompt with modular architecture (from llm-concise-guide.md)
+    # Structure: Role + Constraints + Format + Task (for better instruction following)
+    # Each part is a section; the prompt packer fits them into the model's
+    # token budget by priority and picks num_ctx.
+    sections = []
+    
+    # 1. Role and constraints (from preferences) - at the start for clarity
+    if preferences:
+        sections.append(PromptSection("system", preferences, PRIORITY_SYSTEM, footer="\n\n", required=True))
+    
+    # 2. Context (conversation history) - if exists. In session mode the turns are
+    # chat messages already; dialogue state and recalled facts go in the last user message
+    history_context = session_context if history_messages else context
+    if history_context and request.use_memory:
+        sections.append(PromptSection("history", history_context, PRIORITY_HISTORY,
+                                      header="## הקשר מהשיחה הקודמת:\n", footer="\n\n", strategy="recent"))
+    
+    # 2.5 RAG long-term memory context (Phase 3)
+    if rag_context:
+        sections.append(PromptSection("rag", rag_context, PRIORITY_RAG, footer="\n"))
+    
+    # 3. Additional info (search results, actions)
+    if search_triggered and search_results:
+        sections.append(PromptSection("search", search_results, PRIORITY_SEARCH,
+                                      header="\nמידע נוסף מהרשת:\n", footer="\n"))
+        print(f"[Prompt] Adding search_results to prompt ({len(search_results)} chars)")
+    if action_result:
+        sections.append(PromptSection("action", action_result, PRIORITY_ACTION,
+                                      header="\nפעולה שבוצעה: ", footer="\n\n", strategy="none"))
+    
+    # 4. User message - Mixtral requires [INST] tags!
+    # Wrap everything in Mixtral's prompt template: <s>[INST] ... [/INST]
+    user_message = request.message
+    
+    # STAGE 1 IMPROVEMENT: Add echo-back (active listening reflection)
+    echo_back_text = ""
+    try:
+        from zero_agent.core.response_controller import ResponseController
+        response_controller = ResponseController()
+        if response_controller.should_add_echo_back(user_message):
+            echo_back_text = response_controller.create_echo_back(user_message)
+            if echo_back_text:
+                sections.append(PromptSection("echo_back", echo_back_text, PRIORITY_ECHO,
+                                              header="\n## שיקוף הקשבה:\n", footer="\n\n", strategy="none"))
+                print(f"[Echo-Back] Added: {echo_back_text[:50]}...")
+    except Exception as e:
+        print(f"[Echo-Back] Error adding echo-back: {e}")
+    
+    # STAGE 3 IMPROVEMENT: Add Chain-of-Thought or ReAct for complex questions
+    cot_reasoning = None
+    react_result = None
+    
+    try:
+        from zero_agent.core.cot_reasoning import ChainOfThoughtReasoning
+        from zero_agent.core.react_framework import ReActAgent
         
-        # Enforce Hebrew-only output when אפשרי
-        response = enforce_hebrew_output(response, model)
+        cot_reasoner = ChainOfThoughtReasoning()
+        react_agent = ReActAgent()
         
-        # STAGE 1 IMPROVEMENT: Optimize response length using ResponseController
+        # החלטה: CoT או ReAct?
+        use_react = react_agent.should_use_react(user_message)
+        use_cot = cot_reasoner.should_use_cot(user_message) and not use_react
+        
+        if use_react:
+            # Use ReAct Framework
+            available_tools = []
+            if WEBSEARCH_AVAILABLE:
+                available_tools.append('web_search')
+            if zero.rag:
+                available_tools.append('rag')
+            
+            react_result = react_agent.solve(user_message, available_tools=available_tools)
+            react_text = react_agent.format_for_prompt(react_result)
+            sections.append(PromptSection("reasoning", react_text, PRIORITY_REASONING,
+                                          header="\n", footer="\n\n", strategy="none"))
+            print(f"[ReAct] Applied ReAct framework for task")
+        
+        elif use_cot:
+            # Use Chain-of-Thought
+            cot_reasoning = cot_reasoner.reason(user_message, context=context if context else None)
+            cot_text = cot_reasoner.format_for_prompt(cot_reasoning)
+            sections.append(PromptSection("reasoning", cot_text, PRIORITY_REASONING,
+                                          header="\n", footer="\n\n", strategy="none"))
+            print(f"[CoT] Applied Chain-of-Thought reasoning")
+            
+    except Exception as e:
+        print(f"[STAGE 3] Error applying CoT/ReAct: {e}")
+    
+    sections.append(PromptSection("question", user_message, PRIORITY_QUESTION,
+                                  header="\nשאלה: ", footer="" if history_messages else "\nתשובה:",
+                                  required=True))
+    
+    # Fit everything into the model's budget and size num_ctx to the prompt
+    with stage_timer("prompt_packing"):
+        if history_messages:
+            # System prompt and earlier turns unchanged, per-turn context in the last user message
+            packed = prompt_packer.pack_messages(
+                preferences, history_messages, [s for s in sections if s.name != "system"],
+                zero.llm.model_name(model)
+            )
+        else:
+            packed = prompt_packer.pack(sections, zero.llm.model_name(model))
+    observe_packed_prompt(packed)
+    print(f"[Prompt] {packed.tokens} tokens (budget {packed.budget}) -> num_ctx {packed.num_ctx}"
+          + (f", truncated {packed.truncated}" if packed.truncated else "")
+          + (f", dropped {packed.dropped}" if packed.dropped else ""))
+    
+    # Prepare the final prompt with Mixtral template (session mode: Ollama applies the chat template)
+    prompt = packed.text if packed.messages else f"<s>[INST] {packed.text} [/INST]"
+    
+    # DEBUG: Print first and last 500 chars of prompt
+    print(f"[Prompt Debug] First 500 chars:\n{prompt[:500]}\n")
+    print(f"[Prompt Debug] Last 500 chars:\n{prompt[-500:]}\n")
+    
+
+    # Answers built on personal memory or actions are never cached; search-backed
+    # answers are (search results stay out of the key - the search TTL is short)
+    cacheable = not (rag_context or action_result or facts_outcome is not None)
+    cache_context = context_hash(context if request.use_memory else "", preferences)
+    
+    return PreparedChat(prompt=prompt, model=model, search_triggered=bool(search_triggered),
+                        cache_context=cache_context, cacheable=cacheable,
+                        options=packed.options, prompt_tokens=packed.tokens, messages=packed.messages,
+                        routed=not request.model and not pinned_model)
+
+
+async def record_session_turn(request: ChatRequest, response: str):
+    """Append the exchange to the request's server-side session (off the event loop - SQLite / owner IPC)"""
+    if not request.session_id or not response:
+        return
+    try:
+        await asyncio.to_thread(session_store.append, request.session_id, request.message, response)
+    except Exception as e:
+        print(f"[Session] Failed to record turn: {e}")
+
+
+def prior_turns(history: List[Dict[str, str]], message: str) -> List[Dict[str, str]]:
+    """Conversation history without the current message (some UIs send it as the last entry)"""
+    if history and history[-1].get("role") == "user" and \
+            (history[-1].get("content") or "").strip() == message.strip():
+        return history[:-1]
+    return history
+
+
+async def generate_chat(prepared: PreparedChat, model: str, session_id: str,
+                        stats: Dict[str, Any]) -> str:
+    """LLM call for a prepared chat (session mode when it has messages)"""
+    if prepared.messages:
+        return await zero.llm.achat_session(
+            session_id, prepared.messages, model=model, prompt_tokens=prepared.prompt_tokens,
+            priority=Priority.INTERACTIVE, stats=stats, options=prepared.options
+        )
+    return await zero.llm.agenerate(prepared.prompt, model=model, priority=Priority.INTERACTIVE,
+                                    session_id=session_id, stats=stats, options=prepared.options)
+
+
+def stream_chat(prepared: PreparedChat, model: str, session_id: str, stats: Dict[str, Any],
+                request_id: str):
+    """Token stream for a prepared chat (session mode when it has messages)"""
+    if prepared.messages:
+        return zero.llm.astream_session(
+            session_id, prepared.messages, model=model, prompt_tokens=prepared.prompt_tokens,
+            priority=Priority.INTERACTIVE, stats=stats, request_id=request_id, options=prepared.options
+        )
+    return zero.llm.astream(prepared.prompt, model=model, priority=Priority.INTERACTIVE,
+                            session_id=session_id, stats=stats, request_id=request_id,
+                            options=prepared.options)
+
+
+def observe_generation(prepared: PreparedChat, model: str, stats: Dict[str, Any]):
+    """Stage metrics, token calibration and prefill reuse for one LLM call"""
+    observe_llm_stats(stats, model)
+    model_name = zero.llm.model_name(model)
+    if prepared.messages:
+        # A cached prefix lowers prompt_eval_count - no calibration from session turns
+        observe_prefill(stats, model_name)
+        if stats.get("prefill_reused") is not None:
+            print(f"[Session] Turn {stats.get('session_turn')}: {stats.get('prompt_eval_count')} tokens "
+                  f"evaluated, ~{stats['prefill_reused']} reused from the prompt cache")
+    else:
+        prompt_packer.observe(model_name, prepared.prompt_tokens, stats.get("prompt_eval_count"))
+
+
+async def finalize_chat(request: ChatRequest, prepared: PreparedChat, response: str, start_time: float,
+                  dialogue_session_id: Optional[str] = None, optimize: bool = True, cached: bool = False):
+    """
+    Post-generation half of the chat pipeline
+    
+    Args:
+        optimize: Apply ResponseController length optimization (off for
+                  streaming - the text has already been sent)
+        cached: The response came from the response cache (its latency says
+                nothing about the model)
+    
+    Returns:
+        (response, response_options, duration)
+    """
+    model = prepared.model
+    
+    # Enforce Hebrew-only output when אפשרי
+    response = enforce_hebrew_output(response, model)
+    
+    # STAGE 1 IMPROVEMENT: Optimize response length using ResponseController
+    if optimize:
         try:
             from zero_agent.core.response_controller import ResponseController
             response_controller = ResponseController()
@@ -1480,93 +1983,195 @@ Be direct, accurate, and clear. Match the user's language. No unnecessary preamb
             print(f"[ResponseController] Optimized response: mode={response_mode}, type={question_type}")
         except Exception as e:
             print(f"[ResponseController] Error optimizing response: {e}")
-        
-        # STAGE 2 IMPROVEMENT: Update Dialogue State Tracker
-        if dialogue_tracker:
-            try:
-                # Get session ID from request if available (or generate one)
-                session_id = getattr(request, 'session_id', None) or http_request.headers.get('X-Session-ID', None)
-                dialogue_tracker.update(
-                    user_message=request.message,
-                    assistant_response=response,
-                    session_id=session_id
-                )
-                print(f"[DialogueState] Updated tracker: turn {len(dialogue_tracker.conversation_history)}")
-            except Exception as e:
-                print(f"[DialogueState] Error updating tracker: {e}")
-        
-        # STAGE 2 IMPROVEMENT: Evaluate response quality
-        quality_score = None
-        if quality_metrics:
-            try:
-                evaluation_context = {
-                    "user_message": request.message,
-                    "model_used": model,
-                    "has_search_results": bool(search_triggered),
-                }
-                quality_score = quality_metrics.evaluate_response(response, evaluation_context)
-                print(f"[QualityMetrics] Response quality: coherence={quality_score['coherence_score']:.2f}, "
-                      f"relevance={quality_score['relevance_score']:.2f}, "
-                      f"length={quality_score['length_words']} words")
-            except Exception as e:
-                print(f"[QualityMetrics] Error evaluating response: {e}")
-        
-        # STAGE 3 IMPROVEMENT: Generate response options (buttons/choices)
-        response_options = None
+    
+    await record_session_turn(request, response)
+    
+    # STAGE 2 IMPROVEMENT: Update Dialogue State Tracker
+    if dialogue_tracker:
         try:
-            from zero_agent.core.response_options import ResponseOptionsGenerator
-            options_generator = ResponseOptionsGenerator()
-            response_options = options_generator.generate_options(response, request.message)
-            if response_options:
-                print(f"[ResponseOptions] Generated {len(response_options)} options")
-        except Exception as e:
-            print(f"[ResponseOptions] Error generating options: {e}")
-        
-        # Remember conversation (Phase 3)
-        if zero.memory:
-            zero.memory.remember(
+            dialogue_tracker.update(
                 user_message=request.message,
-                assistant_message=response,
-                model_used=model
+                assistant_response=response,
+                session_id=dialogue_session_id
+            )
+            print(f"[DialogueState] Updated tracker: turn {len(dialogue_tracker.conversation_history)}")
+        except Exception as e:
+            print(f"[DialogueState] Error updating tracker: {e}")
+    
+    # STAGE 3 IMPROVEMENT: Generate response options (buttons/choices)
+    response_options = None
+    try:
+        from zero_agent.core.response_options import ResponseOptionsGenerator
+        options_generator = ResponseOptionsGenerator()
+        response_options = options_generator.generate_options(response, request.message)
+        if response_options:
+            print(f"[ResponseOptions] Generated {len(response_options)} options")
+    except Exception as e:
+        print(f"[ResponseOptions] Error generating options: {e}")
+    
+    duration = time.time() - start_time
+    
+    # Memory, RAG, learning and quality scoring don't change the reply -
+    # hand them to the batched background writer (Phase 3 bookkeeping)
+    bookkeeping_writer.submit({
+        "user_message": request.message,
+        "response": response,
+        "model": model,
+        "timestamp": time.time(),
+        "duration": duration,
+        "has_search_results": prepared.search_triggered,
+        "routed": prepared.routed,
+        "cached": cached,
+    })
+    
+    return response, response_options, duration
+
+
+def strip_think_tags(text: str) -> str:
+    """Remove DeepSeek-R1 <think>...</think> blocks"""
+    if "<think>" in text or "</think>" in text:
+        text = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL)
+    return text
+
+
+class ThinkTagFilter:
+    """Streaming counterpart of strip_think_tags (tags may be split across chunks)"""
+    OPEN = "<think>"
+    CLOSE = "</think>"
+    
+    def __init__(self):
+        self.buffer = ""
+        self.inside = False
+    
+    def feed(self, chunk: str) -> str:
+        """Add a chunk, return the text that is safe to send"""
+        self.buffer += chunk
+        out = []
+        while True:
+            tag = self.CLOSE if self.inside else self.OPEN
+            pos = self.buffer.find(tag)
+            if pos == -1:
+                # Hold back a possible partial tag at the end
+                keep = 0
+                for k in range(min(len(tag) - 1, len(self.buffer)), 0, -1):
+                    if tag.startswith(self.buffer[-k:]):
+                        keep = k
+                        break
+                if not self.inside:
+                    out.append(self.buffer[:len(self.buffer) - keep])
+                self.buffer = self.buffer[len(self.buffer) - keep:]
+                return "".join(out)
+            if not self.inside:
+                out.append(self.buffer[:pos])
+            self.buffer = self.buffer[pos + len(tag):]
+            self.inside = not self.inside
+    
+    def flush(self) -> str:
+        """Text held back at the end of the stream"""
+        rest = "" if self.inside else self.buffer
+        self.buffer = ""
+        return rest
+
+
+@app.post("/api/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest, http_request: Request):
+    """
+    Chat with Zero Agent (with Rate Limiting)
+    
+    Example:
+        POST /api/chat
+        {
+            "message": "What's the weather?",
+            "model": "fast",
+            "use_memory": true
+        }
+    """
+    # Fix encoding for Hebrew/Unicode
+    import sys
+    if hasattr(sys.stdout, 'reconfigure'):
+        sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+    if hasattr(sys.stderr, 'reconfigure'):
+        sys.stderr.reconfigure(encoding='utf-8', errors='replace')
+    
+    if not zero.initialized:
+        raise HTTPException(status_code=503, detail="Agent not initialized")
+    
+    # Rate limits are enforced by RateLimitMiddleware (chat costs 12 of 120 units/minute)
+    client_ip = http_request.client.host
+    
+    import time
+    start_time = time.time()
+    
+    # Scheduler fairness is per session; fall back to the client IP. Session
+    # mode (stored / pinned history) only for an explicit session id.
+    request.session_id = request.session_id or http_request.headers.get('X-Session-ID')
+    session_id = request.session_id or client_ip
+    
+    try:
+        prepared = await prepare_chat(request, start_time, request.session_id)
+        if prepared.reply is not None:
+            await record_session_turn(request, prepared.reply.response)
+            return prepared.reply
+        
+        model = prepared.model
+        
+        # Response cache in front of the LLM (exact, then semantic match)
+        cache_lookup = None
+        if prepared.cacheable:
+            cache_lookup = await asyncio.to_thread(
+                response_cache.lookup, request.message, model, prepared.cache_context
             )
+            RESPONSE_CACHE_LOOKUPS.inc(result=cache_lookup.kind)
+        else:
+            RESPONSE_CACHE_LOOKUPS.inc(result="bypass")
         
-        # Store in RAG for long-term memory (Phase 3)
-        if zero.rag:
-            try:
-                zero.rag.store_conversation(
-                    task=request.message,
-                    response=response,
-                    metadata={"model": model, "timestamp": time.time()}
+        if cache_lookup and cache_lookup.hit:
+            response = cache_lookup.entry.response
+            RESPONSE_CACHE_SAVED_SECONDS.inc(cache_lookup.entry.generation_seconds)
+            print(f"[Cache] {cache_lookup.kind} hit (similarity {cache_lookup.similarity:.2f}) - "
+                  f"saved {cache_lookup.entry.generation_seconds:.1f}s of {model}")
+        else:
+            llm_stats = {}
+            generation_start = time.time()
+            response = await generate_chat(prepared, model, session_id, llm_stats)
+            
+            # For R1, post-process to remove thinking tags if present
+            if model == "smart":
+                response = strip_think_tags(response)
+            
+            observe_generation(prepared, model, llm_stats)
+            
+            if prepared.cacheable:
+                await asyncio.to_thread(
+                    response_cache.store, request.message, model, prepared.cache_context, response,
+                    generation_seconds=time.time() - generation_start,
+                    query_class=classify_query(request.message, prepared.search_triggered),
+                    embedding=cache_lookup.embedding if cache_lookup else None
                 )
-            except Exception as rag_err:
-                print(f"[RAG] Failed to store: {rag_err}")
         
-        duration = time.time() - start_time
+        post_processing_start = time.time()
         
-        # Learn from this interaction (Phase 3: Learning System)
-        if zero.learner:
-            try:
-                from datetime import datetime
-                action = zero.UserAction(
-                    timestamp=datetime.now(),
-                    action_type="chat",
-                    target="llm_response",
-                    parameters={"model": model, "message_length": len(request.message)},
-                    success=True,  # Assume success if we got here
-                    context={"response_length": len(response)},
-                    duration=duration
-                )
-                zero.learner.learn_from_action(action)
-            except Exception as learn_err:
-                print(f"[LEARN] Failed to learn: {learn_err}")
+        response, response_options, duration = await finalize_chat(
+            request, prepared, response, start_time,
+            dialogue_session_id=http_request.headers.get('X-Session-ID'),
+            cached=bool(cache_lookup and cache_lookup.hit)
+        )
+        CHAT_STAGE_DURATION.observe(time.time() - post_processing_start, stage="post_processing")
         
         return ChatResponse(
             response=response,
             model_used=model,
             duration=duration,
-            options=response_options  # STAGE 3: Add options for UI buttons
+            options=response_options,  # STAGE 3: Add options for UI buttons
+            cached=True if cache_lookup and cache_lookup.hit else None
         )
         
+    except SchedulerRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1801,7 +2406,7 @@ async def project_review(request: ProjectReviewRequest):
         
         # Use Zero to analyze
         if zero.initialized:
-            analysis = zero.llm.generate(analysis_prompt, model="smart")
+            analysis = await zero.llm.agenerate(analysis_prompt, model="smart", priority=Priority.BACKGROUND)
         else:
             analysis = "Zero Agent not initialized. Cannot perform analysis."
         
@@ -1903,6 +2508,22 @@ async def execute_action(request: ExecuteCodeRequest):
 # Voice Transcription Endpoint
 # ============================================================================
 
+async def download_audio(url: str, max_bytes: int, client=None) -> bytes:
+    """Fetch an audio URL, streamed - HTTP 413 as soon as it passes `max_bytes`"""
+    too_large = HTTPException(status_code=413, detail=f"Audio download exceeds {max_bytes // 1024} KB")
+    async with (client or get_async_client()).stream("GET", url, follow_redirects=True) as response:
+        response.raise_for_status()
+        if int(response.headers.get("content-length") or 0) > max_bytes:
+            raise too_large
+        chunks, size = [], 0
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            if size > max_bytes:
+                raise too_large
+            chunks.append(chunk)
+    return b"".join(chunks)
+
+
 @app.post("/api/voice/transcribe", response_model=VoiceTranscribeResponse)
 async def transcribe_voice(request: VoiceTranscribeRequest):
     """
@@ -1916,55 +2537,42 @@ async def transcribe_voice(request: VoiceTranscribeRequest):
         raise HTTPException(status_code=501, detail="Whisper not available - install faster-whisper")
     
     try:
-        import time
         import base64
-        from pathlib import Path
-        from faster_whisper import WhisperModel
         
-        # Load Whisper model (small, fast, good quality)
-        model = WhisperModel("small", device="cpu", compute_type="int8")
-        
-        # Handle audio input
+        # Handle audio input - kept in memory, never written to disk
         if request.audio_base64:
-            # Decode base64 audio
             audio_data = base64.b64decode(request.audio_base64)
-            # Save to temp file
-            temp_file = Path("workspace/temp_audio.wav")
-            temp_file.write_bytes(audio_data)
-            audio_path = str(temp_file)
         elif request.audio_url:
-            # Download from URL
-            import requests
-            response = requests.get(request.audio_url)
-            temp_file = Path("workspace/temp_audio_from_url.wav")
-            temp_file.write_bytes(response.content)
-            audio_path = str(temp_file)
+            # Download from URL without blocking the event loop, capped like an upload
+            audio_data = await download_audio(request.audio_url, audio_decoder.max_bytes)
         else:
             raise HTTPException(status_code=400, detail="No audio provided")
         
-        # Transcribe
-        start_time = time.time()
-        segments, info = model.transcribe(
-            audio_path,
+        try:
+            # WAV is a NumPy conversion; compressed formats decode in PyAV - off the loop too
+            audio = await asyncio.to_thread(audio_decoder.decode, audio_data)
+        except AudioTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except AudioDecodeError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        # Transcribe on a warm pooled model, off the event loop; the pool
+        # returns the sample buffer to the decoder when it is done with it
+        result = await whisper_pool.transcribe(
+            audio,
             language=request.language,
             beam_size=5,
             vad_filter=True,  # Voice Activity Detection
         )
         
-        # Combine all segments
-        text = " ".join([segment.text for segment in segments])
-        duration = time.time() - start_time
-        
-        # Cleanup
-        if temp_file.exists():
-            temp_file.unlink()
-        
         return VoiceTranscribeResponse(
-            text=text,
-            language=info.language,
-            duration=duration
+            text=result.text,
+            language=result.language,
+            duration=result.seconds
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
 
@@ -1989,10 +2597,11 @@ def initialize_computer_control():
     global computer_control_agent
     if COMPUTER_CONTROL_AVAILABLE and not computer_control_agent:
         try:
-            computer_control_agent = ComputerControlAgent(
+            # Drives the desktop, so it runs in the owner worker only
+            computer_control_agent = coordinator.share("computer_control", lambda: ComputerControlAgent(
                 llm=zero.llm,
                 orchestrator=zero.agent_orchestrator
-            )
+            ))
             
             # Add computer control to orchestrator tools
             if zero.agent_orchestrator:
@@ -2220,12 +2829,14 @@ async def chat_stream(request: Request):
     """
     Streaming chat endpoint - returns response word by word in real-time
     
-    Real-time streaming response
+    Runs the same pipeline as /api/chat (search, memory, RAG, routing);
+    context stages run first, then tokens are sent as the LLM produces them.
     """
     import json
     import logging
     
     logger = logging.getLogger(__name__)
+    protocol = PROTOCOL_V1
     
     try:
         # Parse request
@@ -2236,128 +2847,128 @@ async def chat_stream(request: Request):
         # DEBUG: Log the incoming request
         logger.info(f"[DEBUG] Received request data: {data}")
         logger.info(f"[DEBUG] Message: '{message}'")
-        logger.info(f"[DEBUG] Conversation history type: {type(conversation_history)}")
-        logger.info(f"[DEBUG] Conversation history value: {conversation_history}")
+        
+        # Stream protocol: v1 (full text per token) unless the client asks for v2 deltas
+        protocol = negotiate_protocol(request.headers, request.query_params, data)
+        stream_headers = {PROTOCOL_HEADER: str(protocol)}
         
         if not message:
             async def error_gen():
-                yield f"data: {json.dumps({'error': 'No message provided'})}\n\n"
-            return StreamingResponse(error_gen(), media_type="text/event-stream")
+                yield make_encoder(protocol).error('No message provided')
+            return StreamingResponse(error_gen(), media_type="text/event-stream", headers=stream_headers)
+        
+        if not zero.initialized:
+            raise HTTPException(status_code=503, detail="Agent not initialized")
         
         # Log context
         logger.info(f"[CONTEXT] History length: {len(conversation_history)} messages")
         
-        # Define computer control keywords
-        computer_control_keywords = [
-            # Open commands
-            'פתח ', 'תפתח ', 'הפעל ', 'תפעיל ', 'הרץ ', 'תריץ ',
-            'open ', 'launch ', 'start ', 'run ',
-            # Click commands
-            'לחץ ', 'תלחץ ', 'קליק ', 'click ',
-            # Type commands
-            'הקלד ', 'תקליד ', 'type ',
-            # Other
-            'צלם מסך', 'screenshot', 'סגור', 'close'
-        ]
-        
-        # Check if it's a computer control command (these don't stream)
-        if any(kw in message.lower() for kw in computer_control_keywords):
-            logger.info(f"[STREAM] Computer Control command detected: {message}")
+        chat_request = ChatRequest(
+            message=message,
+            model=data.get("model"),
+            use_memory=data.get("use_memory", True),
+            stream=True,
+            conversation_history=conversation_history or None,
+            session_id=data.get("session_id") or request.headers.get('X-Session-ID'),
+            latency_slo=data.get("latency_slo")
+        )
+        start_time = time.time()
+        session_id = chat_request.session_id or request.client.host  # scheduler fairness key
+        
+        # Shared pipeline: context stages feed in before the first token
+        prepared = await prepare_chat(chat_request, start_time, chat_request.session_id)
+        
+        # A stage answered directly (search, memory, computer control) - one frame
+        if prepared.reply is not None:
+            reply = prepared.reply
+            await record_session_turn(chat_request, reply.response)
             
-            async def computer_control_gen():
-                result = computer_control_agent.execute_from_text(message)
-                response_text = result.get('result', 'פעולה בוצעה')
-                yield f"data: {json.dumps({'chunk': response_text, 'full': response_text, 'done': True})}\n\n"
+            async def reply_gen():
+                encoder = make_encoder(protocol)
+                yield encoder.start(model=reply.model_used)
+                yield encoder.reply(reply.response, model=reply.model_used)
             
-            return StreamingResponse(computer_control_gen(), media_type="text/event-stream")
+            return StreamingResponse(reply_gen(), media_type="text/event-stream", headers=stream_headers)
+        
+        # Reject up front while we can still send a real 429/503 status
+        model = prepared.model
+        if zero.scheduler:
+            zero.scheduler.check_admission(zero.llm.model_name(model), Priority.INTERACTIVE, session_id)
         
         # Regular LLM streaming
-        logger.info(f"[STREAM] Starting streaming response for: {message[:50]}...")
+        logger.info(f"[STREAM] Starting streaming response for: {message[:50]}... (model: {model}, protocol: v{protocol})")
+        
+        # Lets a disconnect abort the upstream Ollama generation
+        request_id = zero.llm.new_request_id()
         
         async def generate():
+            encoder = make_encoder(protocol)
+            llm_stats = {}
+            think_filter = ThinkTagFilter() if model == "smart" else None
+            watcher = asyncio.create_task(
+                watch_disconnect(request.receive, lambda: zero.llm.cancel(request_id))
+            )
+            
+            async def tokens():
+                async for chunk in stream_chat(prepared, model, session_id, llm_stats, request_id):
+                    yield think_filter.feed(chunk) if think_filter else chunk
+                if think_filter:
+                    yield think_filter.flush()
+            
             try:
-                full_response = ""
-                chunk_count = 0
+                start_frame = encoder.start(model=model)
+                if start_frame:
+                    yield start_frame
                 
-                # Get streaming LLM
-                llm = zero.llm if hasattr(zero, 'llm') else StreamingMultiModelLLM()
-                
-                # Build prompt with context (Phase 2: Context-Aware!)
-                # Use enhanced system prompt for better responses
-                try:
-                    from enhanced_system_prompt import get_system_prompt
-                    prompt_parts = [get_system_prompt(detailed=True)]
-                except Exception as e:
-                    print(f"[API] Warning: Could not load enhanced_system_prompt: {e}")
-                    prompt_parts = ["You are Zero Agent - a helpful AI assistant powered by Mixtral 8x7B. Be direct, accurate, and clear. Match the user's language."]
+                # Frames are sent as soon as the encoder releases them (v2 coalesces by size/time)
+                frame_count = 0
+                async for frame in encoder.encode(tokens()):
+                    frame_count += 1
+                    yield frame
                 
-                # Add conversation history if available
-                if conversation_history:
-                    prompt_parts.append("\nהקשר השיחה:")
-                    for msg in conversation_history[-6:]:  # Last 3 turns
-                        role = "ש" if msg.get("role") == "user" else "ת"
-                        content = msg.get("content", "")
-                        prompt_parts.append(f"{role}: {content}")
+                full_response = encoder.text
+                observe_generation(prepared, model, llm_stats)
                 
-                # Language matching is handled by the system prompt
-                
-                # Add current question
-                prompt_parts.append(f"ש: {message}")
-                prompt_parts.append("ת: ")
-                
-                prompt = "\n".join(prompt_parts)
-                
-                # Stream chunks
-                for chunk in llm.stream_generate(prompt):
-                    full_response += chunk
-                    chunk_count += 1
-                    
-                    yield f"data: {json.dumps({'chunk': chunk, 'full': full_response, 'done': False})}\n\n"
-                    
-                    # Small delay to avoid overwhelming the client
-                    await asyncio.sleep(0.01)
+                # Dialogue state, options and background bookkeeping (the text is already sent)
+                response_options = None
+                if full_response:
+                    post_processing_start = time.time()
+                    _, response_options, _ = await finalize_chat(
+                        chat_request, prepared, full_response, start_time,
+                        dialogue_session_id=request.headers.get('X-Session-ID'), optimize=False
+                    )
+                    CHAT_STAGE_DURATION.observe(time.time() - post_processing_start, stage="post_processing")
                 
                 # Send final done signal
-                yield f"data: {json.dumps({'chunk': '', 'full': full_response, 'done': True})}\n\n"
-                
-                logger.info(f"[STREAM] Completed: {chunk_count} chunks sent")
-                
-                # Save to memory (Phase 3: Memory System)
-                if zero.memory and full_response:
-                    try:
-                        zero.memory.remember(
-                            user_message=message,
-                            assistant_message=full_response,
-                            model_used="fast"  # Streaming typically uses fast model
-                        )
-                        logger.info(f"[STREAM] Saved to memory")
-                    except Exception as mem_err:
-                        logger.warning(f"[STREAM] Failed to save to memory: {mem_err}")
+                yield encoder.done(model=model, options=response_options)
                 
-                # Save to RAG for long-term memory (Phase 3)
-                if zero.rag and full_response:
-                    try:
-                        import time as time_module
-                        zero.rag.store_conversation(
-                            task=message,
-                            response=full_response,
-                            metadata={"model": "fast", "timestamp": time_module.time()}
-                        )
-                        logger.info(f"[STREAM] Saved to RAG")
-                    except Exception as rag_err:
-                        logger.warning(f"[STREAM] Failed to save to RAG: {rag_err}")
+                logger.info(f"[STREAM] Completed: {frame_count} frames sent")
                 
+            except GenerationCancelled:
+                logger.info(f"[STREAM] Client disconnected - generation cancelled after {len(encoder.text)} chars")
             except Exception as e:
                 logger.error(f"[STREAM] Error during generation: {e}")
-                yield f"data: {json.dumps({'error': str(e), 'done': True})}\n\n"
+                yield encoder.error(str(e))
+            finally:
+                watcher.cancel()
+                # Still running if the server cancelled us (client gone) - stop Ollama too
+                zero.llm.cancel(request_id)
         
-        return StreamingResponse(generate(), media_type="text/event-stream")
+        return StreamingResponse(generate(), media_type="text/event-stream", headers=stream_headers)
         
+    except SchedulerRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"[STREAM] Request error: {e}")
         error_msg = str(e)  # Capture error message in outer scope
         async def error_gen():
-            yield f"data: {json.dumps({'error': error_msg})}\n\n"
+            yield make_encoder(protocol).error(error_msg)
         return StreamingResponse(error_gen(), media_type="text/event-stream")
 
 
@@ -2380,9 +2991,29 @@ if __name__ == "__main__":
     print("Health: http://localhost:8080/health")
     print("="*70 + "\n")
     
-    uvicorn.run(
-        app,
-        host="0.0.0.0",
-        port=8080,
-        log_level="info"
-    )
+    import argparse
+    import secrets
+    parser = argparse.ArgumentParser(description="Zero Agent API Server")
+    parser.add_argument("--workers", type=int, default=configured_workers(),
+                        help="Worker processes (default: ZERO_WORKERS or 1)")
+    args = parser.parse_args()
+    
+    if args.workers > 1:
+        # Workers inherit these: the worker count and the owner connection key
+        os.environ["ZERO_WORKERS"] = str(args.workers)
+        os.environ.setdefault("ZERO_WORKER_AUTHKEY", secrets.token_hex(32))
+        print(f"Workers: {args.workers} (one owner holds Chroma / cache / preloading)")
+        uvicorn.run(
+            "api_server:app",
+            host="0.0.0.0",
+            port=8080,
+            workers=args.workers,
+            log_level="info"
+        )
+    else:
+        uvicorn.run(
+            app,
+            host="0.0.0.0",
+            port=8080,
+            log_level="info"
+        )
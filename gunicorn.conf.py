@@ -0,0 +1,24 @@
+"""
+Gunicorn config for running api_server with several worker processes
+
+    gunicorn -c gunicorn.conf.py api_server:app
+    ZERO_WORKERS=8 gunicorn -c gunicorn.conf.py api_server:app
+
+Workers are uvicorn workers; the first one to bind the owner port holds
+Chroma, the response cache and model preloading (zero_agent/core/workers.py).
+Plain uvicorn works too: `python api_server.py --workers 4`.
+"""
+
+import os
+import secrets
+
+workers = int(os.environ.get("ZERO_WORKERS", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.environ.get("ZERO_BIND", "0.0.0.0:8080")
+# Chat requests stream for minutes on slow models
+timeout = 300
+graceful_timeout = 30
+
+# Inherited by every worker: the worker count and the owner connection key
+os.environ["ZERO_WORKERS"] = str(workers)
+os.environ.setdefault("ZERO_WORKER_AUTHKEY", secrets.token_hex(32))
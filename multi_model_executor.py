@@ -122,12 +122,16 @@ class MultiModelExecutor:
         
         # Execute
         start = time.time()
-        output = self.llm.generate(prompt, model=model, max_tokens=4096)
+        llm_stats = {}
+        output = self.llm.generate(prompt, model=model, max_tokens=4096, stats=llm_stats)
         elapsed = time.time() - start
         
-        # Calculate speed
-        tokens = len(output.split())
-        tokens_per_sec = tokens / elapsed if elapsed > 0 else 0
+        # Calculate speed - Ollama's decode rate (word count only if it reported none)
+        if llm_stats.get("eval_count") and llm_stats.get("eval_duration"):
+            tokens_per_sec = llm_stats["eval_count"] / (llm_stats["eval_duration"] / 1e9)
+        else:
+            tokens = len(output.split())
+            tokens_per_sec = tokens / elapsed if elapsed > 0 else 0
         
         if verbose:
             print(f"   ✓ Completed in {elapsed:.1f}s ({tokens_per_sec:.0f} tokens/s)")
@@ -2,10 +2,59 @@
 Context-Aware Model Router v2
 ==============================
 Enhanced router that understands task depth, not just keywords
+With a ModelResidency attached, close calls go to an already-loaded model
+
+All keyword lists are matched in one pass by an IntentEngine (Aho-Corasick,
+see zero_agent/core/intent_engine.py). The API builds one engine for its
+own intents plus intent_table() and hands each request's IntentMatch to the
+router, so a message is scanned once per request.
+
+An optional LearnedRouter (zero_agent/models/learned_router.py, trained from
+logged outcomes) is consulted first; its prediction is used when it is
+confident, otherwise routing falls back to the heuristics below.
+
+Cost-based mode (cost_routing = True) keeps the quality preference but
+checks it against live signals before committing: scheduler queue depth,
+observed p95 latency per model (LLM telemetry) and cold-load time for
+models that are not resident. When the preferred model would miss the
+request's latency SLO, routing steps down a fixed quality ladder
+(e.g. smart -> expert -> fast) to the first model that fits. Only a
+request's own `latency_slo` is checked against the full estimate; without
+one, DEFAULT_LATENCY_SLO applies to measured costs only (queue wait and
+telemetry p95 - not priors or cold-load time), so an idle server keeps
+the quality choice and every model keeps collecting samples. Every
+decision is logged with its inputs and kept in `decisions`.
 """
 
-import re
-from typing import Dict, Any, Optional, List
+import time
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Any, Optional, List, Tuple, Callable
+
+from zero_agent.core.intent_engine import IntentEngine, IntentMatch
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RouteDecision:
+    """One routing decision and the inputs it was made from"""
+    task: str
+    preferred: str  # quality choice from keyword / context scores
+    chosen: str
+    reason: str  # quality | resident | degraded | overloaded
+    alternatives: List[str] = field(default_factory=list)
+    latency_slo: Optional[float] = None
+    # model type -> {"queue_wait", "service", "load", "total"} estimates (seconds)
+    estimates: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    source: str = "heuristic"  # heuristic | learned
+    confidence: Optional[float] = None  # learned router probability
+    timestamp: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
 
 
 class ContextAwareRouter:
@@ -74,132 +123,380 @@ class ContextAwareRouter:
         "refactor code", "add feature to existing"
     ]
     
-    def __init__(self, llm):
+    # Obviously simple requests (short messages only)
+    SIMPLE_PATTERNS = [
+        "what is", "calculate", "convert", "define", "tell me about", "explain",
+        "+", "-", "*", "/", "=", "hello", "hi", "who", "when", "where", "how does", "what are"
+    ]
+    REASONING_QUESTIONS = ["why", "how to best"]
+    COMPARATIVE_WORDS = ["compare", "evaluate", "assess", "vs", "versus",
+                         "better", "best", "optimal", "trade-off"]
+    STRATEGIC_CONTEXT = ["strategy", "approach", "plan", "financial",
+                         "trading", "investment", "risk", "reward"]
+    CODE_INDICATORS = [
+        "write", "create", "implement", "code", "function",
+        "class", "script", "program", "def ", "import"
+    ]
+    # route_with_reasoning / suggest_multi_model
+    EXPERT_LEVEL_WORDS = ["advanced", "expert", "professional", "sophisticated"]
+    STRATEGIC_DOMAIN = ["strategy", "financial", "trading"]
+    MULTI_PLAN_WORDS = ["strategy", "plan", "approach", "design"]
+    MULTI_ANALYSIS_WORDS = ["analyze", "evaluate", "optimize"]
+    MULTI_EXPLAIN_WORDS = ["explain", "document", "why"]
+    
+    # Scores this close to the winner make a "close call" that may go to an
+    # already-loaded model instead (see _prefer_resident)
+    CLOSE_KEYWORD_MARGIN = 1
+    CLOSE_CONTEXT_MARGIN = 0.1
+    
+    # Cost-based routing
+    DEFAULT_LATENCY_SLO = 20.0  # seconds, when the request sets none (measured costs only)
+    # Quality ladder: what each model degrades to under load, best first
+    DEGRADE_LADDER = {
+        "smart": ["expert", "fast"],
+        "coder": ["expert", "fast"],
+        "expert": ["fast"],
+        "balanced": ["fast"],
+        "fast": [],
+    }
+    # p95 latency (seconds) assumed until telemetry has MIN_LATENCY_SAMPLES calls
+    PRIOR_LATENCY = {"fast": 4.0, "expert": 15.0, "coder": 15.0, "smart": 25.0, "balanced": 10.0}
+    MIN_LATENCY_SAMPLES = 5
+    
+    @classmethod
+    def intent_table(cls) -> Dict[str, List[str]]:
+        """The router's keyword lists as IntentEngine intents ("router.*")"""
+        table = {
+            "router.web_search": cls.WEB_SEARCH_KEYWORDS,
+            "router.logic": cls.LOGIC_KEYWORDS,
+            "router.simple": cls.SIMPLE_PATTERNS,
+            "router.technical": cls.TECHNICAL_ONLY,
+            "router.depth": cls.DEPTH_INDICATORS,
+            "router.reasoning_question": cls.REASONING_QUESTIONS,
+            "router.comparative": cls.COMPARATIVE_WORDS,
+            "router.strategic": cls.STRATEGIC_CONTEXT,
+            "router.code_intent": cls.CODE_INDICATORS,
+            "router.expert_level": cls.EXPERT_LEVEL_WORDS,
+            "router.strategic_domain": cls.STRATEGIC_DOMAIN,
+            "router.multi_plan": cls.MULTI_PLAN_WORDS,
+            "router.multi_analysis": cls.MULTI_ANALYSIS_WORDS,
+            "router.multi_explain": cls.MULTI_EXPLAIN_WORDS,
+        }
+        for model_type, keywords in cls.KEYWORDS.items():
+            table[f"router.kw.{model_type}"] = keywords
+        return table
+    
+    def __init__(self, llm, intents: Optional[IntentEngine] = None):
         self.llm = llm
+        # Shared engine (must include intent_table()) or a router-only one
+        self.intents = intents or IntentEngine(self.intent_table())
         self.use_smart_routing = True
         self.use_context_analysis = True
         self.route_cache = {}  # Cache for routing decisions
+        self._cache_lock = threading.Lock()  # decide() runs on concurrent worker threads
         self.cache_max_size = 100
         self.prefer_fast_for_websearch = True  # NEW: Speed optimization flag  # Max cache entries
-        
-    def route(self, task: str, force_model: Optional[str] = None) -> str:
+        self.residency = None  # Optional ModelResidency - prefer loaded models on close calls
+        self.learned = None  # Optional LearnedRouter - used when confident
+        self.learned_stats = {"used": 0, "fallback": 0}
+        self.resident_swaps = 0
+        self.scheduler = None  # Optional LLMScheduler - queue depth for cost-based routing
+        self.cost_routing = False
+        self.decisions = deque(maxlen=200)  # recent RouteDecisions
+        self._listeners: List[Callable[[RouteDecision], None]] = []
+        
+    def add_listener(self, listener: Callable[[RouteDecision], None]):
+        """Register fn(decision) called for every routing decision (metrics hook)"""
+        self._listeners.append(listener)
+        
+    def analyze(self, task: str) -> IntentMatch:
+        """Normalize and match all router keywords in one pass"""
+        return self.intents.analyze(task)
+    
+    def route(self, task: str, force_model: Optional[str] = None,
+              latency_slo: Optional[float] = None, match: Optional[IntentMatch] = None) -> str:
         """
         Analyze task with context awareness
         
+        Args:
+            task: User request
+            force_model: Skip routing and use this model type
+            latency_slo: Latency target in seconds (cost-based mode only,
+                         DEFAULT_LATENCY_SLO when not set)
+            match: The task's IntentMatch if the caller already has one
+        
         Returns:
             Model type: "fast", "coder", "smart", or "balanced"
         """
+        return self.decide(task, force_model, latency_slo, match).chosen
+    
+    def decide(self, task: str, force_model: Optional[str] = None,
+               latency_slo: Optional[float] = None, match: Optional[IntentMatch] = None) -> RouteDecision:
+        """route() with the full decision (preferred model, reason, latency estimates)"""
         if force_model:
-            return force_model
+            return RouteDecision(task[:80], force_model, force_model, "forced")
         
         if not self.use_smart_routing:
-            return "expert"
-        
-        task_lower = task.lower()
+            return RouteDecision(task[:80], "expert", "expert", "quality")
+        
+        match = match or self.analyze(task)
+        
+        prediction = self._learned_prediction(match)
+        if prediction is not None:
+            model, alternatives = prediction.model, prediction.alternatives
+        else:
+            # Check cache first (for speed optimization)
+            with self._cache_lock:
+                cached = self.route_cache.get(match.text)
+            if cached is None:
+                cached = self._route_candidates(match)
+                with self._cache_lock:
+                    # Cache the result (limit cache size)
+                    if match.text not in self.route_cache and len(self.route_cache) >= self.cache_max_size:
+                        # Remove oldest entry (simple FIFO)
+                        del self.route_cache[next(iter(self.route_cache))]
+                    self.route_cache[match.text] = cached
+            model, alternatives = cached
+        
+        chosen = self._prefer_resident(model, alternatives)
+        decision = RouteDecision(task[:80], model, chosen, "quality" if chosen == model else "resident",
+                                 alternatives=list(alternatives))
+        if prediction is not None:
+            decision.source, decision.confidence = "learned", prediction.confidence
+        if self.cost_routing:
+            self._apply_cost(decision, latency_slo)
+            self.decisions.append(decision)
+            for listener in self._listeners:
+                try:
+                    listener(decision)
+                except Exception as e:
+                    logger.debug(f"Route listener failed: {e}")
+        return decision
+    
+    def _learned_prediction(self, match: IntentMatch):
+        """The learned router's prediction when it is confident (None -> heuristics)"""
+        if self.learned is None:
+            return None
+        try:
+            prediction = self.learned.predict(match.text, normalized=True)
+        except Exception as e:
+            logger.debug(f"Learned router failed: {e}")
+            prediction = None
+        known = self.llm is None or prediction is None or prediction.model in self.llm.MODELS
+        if prediction is None or not prediction.confident or not known:
+            self.learned_stats["fallback"] += 1
+            return None
+        self.learned_stats["used"] += 1
+        return prediction
+    
+    def _route_candidates(self, match: IntentMatch) -> Tuple[str, List[str]]:
+        """
+        Score-based routing decision
         
-        # Check cache first (for speed optimization)
-        if task_lower in self.route_cache:
-            return self.route_cache[task_lower]
-
-        # Determine model
+        Returns:
+            (model, alternatives) - alternatives are models that scored close
+            enough to be an acceptable substitute (see _prefer_resident)
+        """
         model = None
+        alternatives: List[str] = []
         
         # PRIORITY: Web searches should use fast model for speed (5-10s vs 20+s)
-        if any(keyword in task_lower for keyword in self.WEB_SEARCH_KEYWORDS):
+        if match.has("router.web_search"):
             model = "fast"  # Fast model handles web search results just fine!
-        elif any(keyword in task_lower for keyword in self.LOGIC_KEYWORDS):
+        elif match.has("router.logic"):
             model = "expert"
         # Step 1: Quick check for obviously simple tasks
-        elif self._is_simple_task(task_lower):
+        elif self._is_simple_task(match):
             model = "fast"
         # Step 2: Check if it's pure technical (no strategy)
-        elif self._is_pure_technical(task_lower):
+        elif self._is_pure_technical(match):
             model = "coder"
         # Step 3: Context-aware analysis
         elif self.use_context_analysis:
-            context_score = self._analyze_context(task_lower)
+            context_score = self._analyze_context(match)
+            medium = "coder" if self._has_code_intent(match) else "balanced"
             
             # High context complexity = needs deep reasoning
             if context_score > 0.6:
                 model = "smart"
+                if context_score - 0.6 <= self.CLOSE_CONTEXT_MARGIN:
+                    alternatives = [medium]
             # Medium complexity with code = coder
             # Medium complexity without code = balanced
             elif context_score > 0.3:
-                has_code_intent = self._has_code_intent(task_lower)
-                model = "coder" if has_code_intent else "balanced"
+                model = medium
+                if 0.6 - context_score <= self.CLOSE_CONTEXT_MARGIN:
+                    alternatives = ["smart"]
         
         # Step 4: Fallback to keyword-based routing
         if not model:
-            model = self._keyword_routing(task_lower)
+            model, alternatives = self._keyword_routing(match)
         
-        # Cache the result (limit cache size)
-        if len(self.route_cache) >= self.cache_max_size:
-            # Remove oldest entry (simple FIFO)
-            first_key = next(iter(self.route_cache))
-            del self.route_cache[first_key]
+        return model, alternatives
+    
+    def _prefer_resident(self, model: str, alternatives: List[str]) -> str:
+        """
+        Break a close call in favour of a model Ollama already has loaded
         
-        self.route_cache[task_lower] = model
+        Only applies when the chosen model is not loaded and a close
+        alternative is - a cold load of a 32b model costs far more than the
+        small quality difference between close scores.
+        """
+        residency = self.residency
+        if residency is None or not alternatives:
+            return model
+        if residency.is_loaded(self.llm.model_name(model)):
+            return model
+        for alternative in alternatives:
+            if alternative in self.llm.MODELS and residency.is_loaded(self.llm.model_name(alternative)):
+                self.resident_swaps += 1
+                return alternative
         return model
     
-    def _is_simple_task(self, task: str) -> bool:
+    # ------------------------------------------------------------------
+    # Cost-based routing
+    # ------------------------------------------------------------------
+    
+    def _lane_stats(self) -> Dict[str, Dict[str, Any]]:
+        # Routing runs on a worker thread: read the scheduler's published snapshot, not its lanes
+        if self.scheduler is None:
+            return {}
+        return self.scheduler.lane_snapshot()
+    
+    def _measured(self, model: str) -> bool:
+        """Whether telemetry has enough calls of `model` to replace its PRIOR_LATENCY"""
+        telemetry = getattr(self.llm, "telemetry", None)
+        if telemetry is None:
+            return False
+        total = telemetry.get_stats(self.llm.model_name(model)).get("total_seconds", {})
+        return total.get("count", 0) >= self.MIN_LATENCY_SAMPLES
+    
+    def estimate_latency(self, model: str, lanes: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, float]:
+        """
+        Expected seconds until a new request for `model` completes
+        
+        queue_wait: rounds of the scheduler queue ahead of us x p50 latency
+        service:    p95 latency from telemetry (PRIOR_LATENCY until enough calls)
+        load:       cold-load time if the model is not resident
+        """
+        model_name = self.llm.model_name(model)
+        prior = self.PRIOR_LATENCY.get(model, self.DEFAULT_LATENCY_SLO)
+        p50 = p95 = prior
+        telemetry = getattr(self.llm, "telemetry", None)
+        if telemetry is not None:
+            total = telemetry.get_stats(model_name).get("total_seconds", {})
+            if total.get("count", 0) >= self.MIN_LATENCY_SAMPLES:
+                p50, p95 = total["p50"], total["p95"]
+        
+        queue_wait = 0.0
+        lane = (lanes if lanes is not None else self._lane_stats()).get(model_name)
+        if lane:
+            slots = max(1, lane["max_concurrent"])
+            ahead = lane["queued"] + lane["active"] - slots + 1
+            if ahead > 0:
+                queue_wait = -(-ahead // slots) * p50  # ceil(ahead / slots) rounds
+        
+        load = self.residency.cold_load_seconds(model_name) if self.residency is not None else 0.0
+        return {"queue_wait": queue_wait, "service": p95, "load": load,
+                "total": queue_wait + p95 + load}
+    
+    def _apply_cost(self, decision: RouteDecision, latency_slo: Optional[float]):
+        """
+        Walk the quality ladder until a model's estimate fits the SLO
+        
+        Ladder: the resident / preferred choice, its close alternatives, then
+        DEGRADE_LADDER of the preferred model. If nothing fits, the fastest
+        model on the ladder is used ("overloaded").
+        
+        With the request's own `latency_slo` the full estimate counts. Without
+        one, only measured costs count against DEFAULT_LATENCY_SLO: queue wait
+        plus p95 where telemetry has it. Priors and cold-load estimates alone
+        never degrade a request - otherwise a model that starts over the SLO
+        would never be picked, never measured, and never recover.
+        """
+        ladder = []
+        for model in [decision.chosen, decision.preferred, *decision.alternatives,
+                      *self.DEGRADE_LADDER.get(decision.preferred, [])]:
+            if model in self.llm.MODELS and model not in ladder:
+                ladder.append(model)
+        
+        lanes = self._lane_stats()
+        explicit = latency_slo is not None
+        latency_slo = latency_slo if explicit else self.DEFAULT_LATENCY_SLO
+        decision.latency_slo = latency_slo
+        decision.estimates = {model: self.estimate_latency(model, lanes) for model in ladder}
+        
+        def cost(model: str) -> float:
+            estimate = decision.estimates[model]
+            if explicit:
+                return estimate["total"]
+            return estimate["queue_wait"] + (estimate["service"] if self._measured(model) else 0.0)
+        
+        fits = [model for model in ladder if cost(model) <= latency_slo]
+        if fits:
+            if fits[0] != decision.chosen:
+                decision.reason = "quality" if fits[0] == decision.preferred else "degraded"
+                decision.chosen = fits[0]
+        else:
+            decision.chosen = min(ladder, key=cost)
+            decision.reason = "overloaded"
+        
+        summary = ", ".join(
+            f"{m}={e['total']:.1f}s (queue {e['queue_wait']:.1f} + p95 {e['service']:.1f} + load {e['load']:.1f})"
+            for m, e in decision.estimates.items()
+        )
+        logger.info(f"Route {decision.preferred} -> {decision.chosen} [{decision.reason}] "
+                    f"slo={latency_slo:.1f}s{'' if explicit else ' (default, measured only)'}: {summary}")
+    
+    def _is_simple_task(self, match: IntentMatch) -> bool:
         """Check if task is obviously simple"""
-        if len(task.split()) < 12:
-            simple_patterns = ["what is", "calculate", "convert", "define", "tell me about", "explain", "+", "-", "*", "/", "=", "hello", "hi", "who", "when", "where", "how does", "what are"]
-            if any(pattern in task for pattern in simple_patterns):
-                return True
-        return False
+        return len(match.text.split()) < 12 and match.has("router.simple")
     
-    def _is_pure_technical(self, task: str) -> bool:
+    def _is_pure_technical(self, match: IntentMatch) -> bool:
         """Check if task is purely technical (code only, no strategy)"""
-        return any(indicator in task for indicator in self.TECHNICAL_ONLY)
+        return match.has("router.technical")
     
-    def _analyze_context(self, task: str) -> float:
+    def _analyze_context(self, match: IntentMatch) -> float:
         """
         Analyze context depth
         Returns score 0.0-1.0 (higher = needs more reasoning)
         """
+        if "context_score" in match.memo:
+            return match.memo["context_score"]
         score = 0.0
         
         # Check for depth indicators
-        depth_count = sum(1 for indicator in self.DEPTH_INDICATORS 
-                         if indicator in task)
+        depth_count = match.count("router.depth")
         
         # Normalize depth score
         if depth_count > 0:
             score += min(depth_count * 0.2, 0.6)
         
         # Check for questions requiring reasoning
-        if "why" in task or "how to best" in task:
+        if match.has("router.reasoning_question"):
             score += 0.3
         
         # Check for comparative/evaluative language
-        comparative_words = ["compare", "evaluate", "assess", "vs", "versus", 
-                            "better", "best", "optimal", "trade-off"]
-        if any(word in task for word in comparative_words):
+        if match.has("router.comparative"):
             score += 0.2
         
         # Check for strategic/financial context
-        strategic_context = ["strategy", "approach", "plan", "financial", 
-                            "trading", "investment", "risk", "reward"]
-        if any(word in task for word in strategic_context):
+        if match.has("router.strategic"):
             score += 0.3
         
         # Multiple questions = complex
-        if task.count("?") > 1:
+        if match.text.count("?") > 1:
             score += 0.2
         
-        return min(score, 1.0)
+        match.memo["context_score"] = min(score, 1.0)
+        return match.memo["context_score"]
     
-    def _has_code_intent(self, task: str) -> bool:
+    def _has_code_intent(self, match: IntentMatch) -> bool:
         """Check if task intends to produce code"""
-        code_indicators = [
-            "write", "create", "implement", "code", "function",
-            "class", "script", "program", "def ", "import"
-        ]
-        return any(indicator in task for indicator in code_indicators)
+        return match.has("router.code_intent")
     
-    def _keyword_routing(self, task: str) -> str:
-        """Fallback keyword-based routing"""
+    def _keyword_routing(self, match: IntentMatch) -> Tuple[str, List[str]]:
+        """Fallback keyword-based routing -> (model, close alternatives)"""
         scores = {
             "fast": 0,
             "expert": 0,
@@ -208,24 +505,29 @@ class ContextAwareRouter:
             "balanced": 0
         }
         
-        for model_type, keywords in self.KEYWORDS.items():
-            for keyword in keywords:
-                if keyword in task:
-                    scores[model_type] += 1
+        for model_type in self.KEYWORDS:
+            scores[model_type] = match.count(f"router.kw.{model_type}")
         
         # Get highest scoring model
         best_model = max(scores.items(), key=lambda x: x[1])
         
         if best_model[1] == 0:
-            return "expert"
+            return "expert", []
         
         # For simple questions, prefer expert model for better quality
         if best_model[0] == "fast" and best_model[1] <= 1:
-            return "expert"
+            return "expert", []
         
-        return best_model[0]
+        # Models within one keyword of the winner are close calls
+        alternatives = [
+            model_type for model_type, score in sorted(scores.items(), key=lambda x: -x[1])
+            if model_type != best_model[0] and model_type != "fast"
+            and score > 0 and best_model[1] - score <= self.CLOSE_KEYWORD_MARGIN
+        ]
+        return best_model[0], alternatives
     
-    def route_with_reasoning(self, task: str) -> Dict[str, Any]:
+    def route_with_reasoning(self, task: str, latency_slo: Optional[float] = None,
+                             match: Optional[IntentMatch] = None) -> Dict[str, Any]:
         """
         Route with detailed explanation
         
@@ -235,19 +537,29 @@ class ContextAwareRouter:
                 "reasoning": str,
                 "confidence": float,
                 "context_score": float,
-                "requires_multi_model": bool
+                "requires_multi_model": bool,
+                "decision": RouteDecision as a dict
             }
         """
-        model = self.route(task)
-        task_lower = task.lower()
+        match = match or self.analyze(task)
+        decision = self.decide(task, latency_slo=latency_slo, match=match)
+        model = decision.chosen
         
         reasons = []
-        context_score = self._analyze_context(task_lower)
+        if decision.source == "learned":
+            reasons.append(f"Learned router (p={decision.confidence:.2f})")
+        if decision.reason == "resident":
+            reasons.append(f"Close call - {model} already loaded (avoids cold load of {decision.preferred})")
+        elif decision.reason in ("degraded", "overloaded"):
+            estimate = decision.estimates[decision.preferred]["total"]
+            reasons.append(f"Degraded from {decision.preferred} ({decision.reason}: "
+                           f"est. {estimate:.1f}s vs SLO {decision.latency_slo:.1f}s)")
+        context_score = self._analyze_context(match)
         requires_multi = False
         
         # Determine reasoning
         if model == "expert":
-            if any(word in task_lower for word in ["advanced", "expert", "professional", "sophisticated"]):
+            if match.has("router.expert_level"):
                 reasons.append("Advanced/expert level task")
             if context_score > 0.7:
                 reasons.append("Very high complexity requiring expert reasoning")
@@ -256,16 +568,16 @@ class ContextAwareRouter:
         elif model == "smart":
             if context_score > 0.6:
                 reasons.append("High complexity requiring deep reasoning")
-            if any(word in task_lower for word in ["strategy", "financial", "trading"]):
+            if match.has("router.strategic_domain"):
                 reasons.append("Strategic/financial domain")
                 # Check if also needs code
-                if self._has_code_intent(task_lower):
+                if self._has_code_intent(match):
                     requires_multi = True
                     reasons.append("⚠️ Also needs code implementation - Multi-model recommended")
             confidence = 0.9
             
         elif model == "coder":
-            if self._is_pure_technical(task_lower):
+            if self._is_pure_technical(match):
                 reasons.append("Pure technical implementation")
                 confidence = 0.95
             else:
@@ -291,7 +603,8 @@ class ContextAwareRouter:
             "reasoning": reasoning,
             "confidence": confidence,
             "context_score": context_score,
-            "requires_multi_model": requires_multi
+            "requires_multi_model": requires_multi,
+            "decision": decision.to_dict()
         }
     
     def suggest_multi_model(self, task: str) -> Optional[List[str]]:
@@ -301,26 +614,22 @@ class ContextAwareRouter:
         Returns:
             List of models in execution order, or None
         """
-        result = self.route_with_reasoning(task)
+        match = self.analyze(task)
+        result = self.route_with_reasoning(task, match=match)
         
         if not result["requires_multi_model"]:
             return None
         
-        task_lower = task.lower()
-        
         # Strategy + Code tasks
-        if (any(word in task_lower for word in ["strategy", "plan", "approach", "design"]) 
-            and self._has_code_intent(task_lower)):
+        if match.has("router.multi_plan") and self._has_code_intent(match):
             return ["smart", "coder"]  # Think first, then implement
         
         # Analysis + Code tasks
-        if (any(word in task_lower for word in ["analyze", "evaluate", "optimize"]) 
-            and self._has_code_intent(task_lower)):
+        if match.has("router.multi_analysis") and self._has_code_intent(match):
             return ["smart", "coder"]
         
         # Code + Explanation tasks
-        if (self._has_code_intent(task_lower) 
-            and any(word in task_lower for word in ["explain", "document", "why"])):
+        if self._has_code_intent(match) and match.has("router.multi_explain"):
             return ["coder", "smart"]  # Code first, then explain
         
         return None
@@ -0,0 +1,70 @@
+"""
+Micro-benchmark: IntentEngine vs. per-list keyword scans
+
+Compares the old per-request work - one `any(kw in message.lower() ...)`
+scan per keyword list of the chat handler and the router - with a single
+IntentEngine.analyze() pass over the same lists.
+
+    python scripts/bench_intent_engine.py [iterations]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from router_context_aware import ContextAwareRouter  # noqa: E402
+from zero_agent.core.intent_engine import IntentEngine, CHAT_INTENTS  # noqa: E402
+
+MESSAGES = [
+    "hi",
+    "מה המחיר של SPY היום?",
+    "Design a trading strategy that balances risk and reward and implement it in Python",
+    "תזכור: השם של המנהל שלי הוא אלכס",
+    "Write a Python function to sort a list of dictionaries by two keys, then explain the complexity",
+    "כתוב לי מכתב התפטרות רשמי ומנומס למנהל שלי, שלב אחר שלב, עם הסבר על כל פסקה " * 3,
+    "what do you remember about our conversation yesterday regarding the database migration plan?",
+]
+
+
+def scan_lists(message, tables):
+    """Old approach: one lowercase + one any() scan per keyword list"""
+    return {name: any(kw in message.lower() for kw in keywords) for name, keywords in tables.items()}
+
+
+def bench(label, fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for message in MESSAGES:
+            fn(message)
+    elapsed = time.perf_counter() - start
+    per_call = elapsed / (iterations * len(MESSAGES)) * 1e6
+    print(f"{label:<28} {per_call:8.1f} us/message")
+    return per_call
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    tables = {**CHAT_INTENTS, **ContextAwareRouter.intent_table()}
+
+    start = time.perf_counter()
+    engine = IntentEngine(tables)
+    build_ms = (time.perf_counter() - start) * 1000
+    stats = engine.get_stats()
+    print(f"Engine: {stats['intents']} intents, {stats['keywords']} keywords, "
+          f"{stats['states']} states, built in {build_ms:.1f} ms")
+
+    # Same answers before timing anything
+    for message in MESSAGES:
+        match = engine.analyze(message)
+        expected = scan_lists(message, tables)
+        assert {name for name, hit in expected.items() if hit} == set(match.intents()), message
+
+    old = bench("per-list any() scans", lambda m: scan_lists(m, tables), iterations)
+    new = bench("IntentEngine.analyze()", engine.analyze, iterations)
+    print(f"speedup: {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,193 @@ Streaming Multi-Model LLM
 ==========================
 Real-time streaming responses for instant feedback
 Makes everything feel 3x faster!
+
+Async methods (agenerate / astream / achat) share one keep-alive connection
+pool per process, so an async server never blocks its event loop on Ollama.
+Calls given a request_id can be aborted with cancel(request_id).
+Identical concurrent async calls (same model, prompt and options) share one
+Ollama generation ("single-flight"); streams are fanned out to every caller.
+Every call's Ollama timings (load, prefill, decode) feed per-model rolling
+percentiles in `telemetry` (see get_stats()).
+With a ModelResidency attached (`residency`), every call reports demand and
+carries its model's keep_alive; aloaded_models() / apreload() are the
+/api/ps and warm-up calls it polls with.
+Multi-turn chat goes through achat_session() / astream_session(): sessions
+are pinned to one model and num_ctx, and keep_alive holds the runner, so
+Ollama reuses the KV cache of the unchanged prompt prefix between turns.
 """
 
+import asyncio
 import requests
+import httpx
 import json
-from typing import Dict, Any, List, Optional, Generator, Callable
+from requests.adapters import HTTPAdapter
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import Dict, Any, List, Optional, Generator, AsyncGenerator, Callable
+import hashlib
+import threading
 import time
 import sys
+import uuid
+
+from zero_agent.core.llm_telemetry import LLMTelemetry
+
+
+# ============================================================================
+# Shared HTTP clients (one keep-alive pool per process)
+# ============================================================================
+
+# Ollama serves every model from one host, so a single pool covers all calls
+HTTP_TIMEOUT = httpx.Timeout(180.0, connect=5.0)
+HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=16, keepalive_expiry=120.0)
+
+# Timing fields Ollama returns with the final response (durations in nanoseconds)
+OLLAMA_STAT_FIELDS = ("total_duration", "load_duration", "prompt_eval_count",
+                      "prompt_eval_duration", "eval_count", "eval_duration")
+
+_async_client: Optional[httpx.AsyncClient] = None
+_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_sync_session: Optional[requests.Session] = None
+_sync_session_lock = threading.Lock()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Process-wide pooled AsyncClient
+    
+    httpx connections belong to the event loop that opened them, so a new
+    client is created if we are called from a different loop (e.g. a script
+    that runs asyncio.run() twice).
+    """
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client.is_closed or _async_client_loop is not loop:
+        _async_client = httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
+        _async_client_loop = loop
+    return _async_client
+
+
+def get_sync_session() -> requests.Session:
+    """Process-wide pooled requests.Session for the sync wrappers"""
+    global _sync_session
+    if _sync_session is None:
+        with _sync_session_lock:
+            if _sync_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _sync_session = session
+    return _sync_session
+
+
+class GenerationCancelled(Exception):
+    """An async call was aborted with StreamingMultiModelLLM.cancel(request_id)"""
+    
+    def __init__(self, request_id: str):
+        super().__init__(f"Generation {request_id} was cancelled")
+        self.request_id = request_id
+
+
+# Markers passed from the astream() producer task to subscriber queues
+_STREAM_END = object()
+_STREAM_CANCELLED = object()
+
+
+def _flight_key(payload: Dict[str, Any]) -> str:
+    """Single-flight key: identical payload (model, prompt, options, stream flag)"""
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    """
+    One in-progress Ollama call shared by identical concurrent requests
+    
+    For streams the producer publishes every chunk to all subscriber queues
+    and keeps the chunks so far, so a late subscriber is replayed from the
+    start. The upstream call is cancelled when its last subscriber leaves.
+    """
+    
+    def __init__(self, key: str):
+        self.key = key
+        self.task: Optional[asyncio.Task] = None
+        self.stats: Dict[str, Any] = {}
+        self.subscribers = 0
+        self.chunks: List[Any] = []
+        self.queues: List[asyncio.Queue] = []
+        self.finished = False
+    
+    def publish(self, item):
+        if item is _STREAM_END:
+            self.finished = True
+        else:
+            self.chunks.append(item)
+        for queue in self.queues:
+            queue.put_nowait(item)
+    
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in self.chunks:
+            queue.put_nowait(item)
+        if self.finished:
+            queue.put_nowait(_STREAM_END)
+        self.queues.append(queue)
+        self.subscribers += 1
+        return queue
+    
+    def leave(self, queue: Optional[asyncio.Queue] = None):
+        """Drop one subscriber; cancel the upstream call if nobody is left"""
+        if queue is not None and queue in self.queues:
+            self.queues.remove(queue)
+        self.subscribers -= 1
+        if self.subscribers <= 0 and self.task is not None and not self.task.done():
+            self.finished = True  # nobody may join a call that is being torn down
+            self.task.cancel()
+
+
+class _StreamSubscription:
+    """cancel(request_id) handle for one astream() consumer"""
+    
+    def __init__(self, queue: asyncio.Queue):
+        self.queue = queue
+        self.loop = asyncio.get_running_loop()
+        self._done = False
+    
+    def get_loop(self) -> asyncio.AbstractEventLoop:
+        return self.loop
+    
+    def done(self) -> bool:
+        return self._done
+    
+    def cancel(self):
+        if not self._done:
+            self._done = True
+            self.queue.put_nowait(_STREAM_CANCELLED)
+
+
+class _ChatSession:
+    """Per-session state of the prefix-stable chat mode"""
+    
+    def __init__(self, model: str):
+        self.model = model  # model type the session is pinned to
+        self.num_ctx: Optional[int] = None
+        self.turns = 0
+        self.prefill_tokens = 0  # tokens Ollama actually evaluated
+        self.reused_tokens = 0   # tokens served from the runner's prompt cache (estimated)
+        self.last_used = time.time()
+
+
+async def close_http_clients():
+    """Close the shared pools (call on server shutdown)"""
+    global _async_client, _async_client_loop, _sync_session
+    if _async_client is not None and not _async_client.is_closed:
+        await _async_client.aclose()
+    _async_client = None
+    _async_client_loop = None
+    if _sync_session is not None:
+        _sync_session.close()
+        _sync_session = None
 
 
 class StreamingMultiModelLLM:
@@ -57,6 +237,61 @@ class StreamingMultiModelLLM:
         }
     }
     
+    # Sampling presets per call style (payload "options" sent to Ollama)
+    # OPTIMIZED SETTINGS for Mixtral 8x7B - MAXIMUM QUALITY (research-based)
+    # Based on extensive research from best-results-mixtral.md
+    GENERATE_OPTIONS = {
+        "num_predict": 8192,  # Even higher limit for detailed responses
+        "num_ctx": 32768,  # Even larger context window for better context understanding
+        "temperature": 0.3,  # ✓ Balanced creativity and consistency
+        "top_p": 0.95,  # ✓ Slightly higher for more creative responses
+        "top_k": 50,  # ✓ Slightly higher for more diverse responses
+        "repeat_penalty": 1.1,  # ✓ Slightly reduced to allow more natural flow
+        "frequency_penalty": 0.1,  # ✓ Reduced penalty for more natural flow
+        "presence_penalty": 0.05,  # ✓ Reduced penalty for more natural flow
+        "stop": ["</s>", "[INST]", "[/INST]"]  # ✓ Mixtral-specific stop tokens (removed Human/Assistant to allow longer responses)
+    }
+    
+    # Console streaming (generate_stream)
+    STREAM_OPTIONS = {
+        "num_ctx": 16384,  # Large context window for detailed responses
+        "temperature": 0.3,  # ✓ Balanced creativity and consistency
+        "top_p": 0.95,  # ✓ Slightly higher for more creative responses
+        "top_k": 50,  # ✓ Slightly higher for more diverse responses (research-based)
+        "repeat_penalty": 1.15,  # ✓ Higher penalty to prevent repetition
+        "frequency_penalty": 0.1,  # ✓ Reduced penalty for more natural flow
+        "presence_penalty": 0.05,  # ✓ Reduced penalty for more natural flow
+        "stop": ["</s>", "[INST]", "[/INST]"]  # ✓ Mixtral-specific stop tokens
+    }
+    
+    # Word-by-word streaming for the web UI (stream_generate / astream)
+    LIVE_STREAM_OPTIONS = {
+        "num_ctx": 16384,  # Larger context window for better understanding
+        "temperature": 0.35,  # High דייקנות ונאמנות לעובדות
+        "top_p": 0.85,  # מיקוד גבוה תוך שמירה על טבעיות
+        "top_k": 40,  # Focused but not too restrictive
+        "repeat_penalty": 1.18,  # Higher penalty to avoid looping
+        "frequency_penalty": 0.1,  # Additional penalty for repetitive tokens
+        "presence_penalty": 0.1,  # Encourage diverse vocabulary
+        "stop": ["\n\n\n\n", "**999.**", "[INST]", "[/INST]", "<|im_end|>"]  # Stop at boundaries and instruction markers
+    }
+    
+    # OPTIMIZED for Mixtral 8x7B - Expert Level Performance
+    CHAT_OPTIONS = {
+        "num_ctx": 16384,  # Large context window
+        "temperature": 0.35,  # Optimal for Mixtral 8x7B reasoning tasks
+        "top_p": 0.85,  # Nucleus sampling - more ממוקד
+        "top_k": 40,  # Focused responses for Mixtral 8x7B
+        "repeat_penalty": 1.18,  # Higher penalty to avoid looping
+        "frequency_penalty": 0.1,  # Additional penalty for repetitive tokens
+        "presence_penalty": 0.1  # Encourage diverse vocabulary
+    }
+    
+    # Prefix-stable session mode (achat_session / astream_session)
+    KEEP_ALIVE = "30m"  # keep the runner - and its prompt cache - loaded between turns
+    SESSION_TTL = 30 * 60  # forget idle session pins after this many seconds
+    MAX_SESSIONS = 1024
+    
     def __init__(self, 
                  default_model: str = "expert",
                  base_url: str = "http://localhost:11434"):
@@ -64,6 +299,126 @@ class StreamingMultiModelLLM:
         self.base_url = base_url
         self.current_model = self.MODELS[default_model]["name"]
         self.stats = {model: 0 for model in self.MODELS.keys()}
+        self.telemetry = LLMTelemetry()  # per-model TTFT / prefill / decode / load percentiles
+        self.scheduler = None  # Optional LLMScheduler (per-model admission control)
+        self.residency = None  # Optional ModelResidency (demand tracking, per-model keep_alive)
+        self._inflight: Dict[str, Any] = {}  # request_id -> task / stream subscription
+        self._cancelled_ids = set()
+        self._flights: Dict[str, _Flight] = {}  # single-flight key -> in-progress call
+        self.flight_stats = {"started": 0, "coalesced": 0, "abandoned": 0}
+        self._sessions: "OrderedDict[str, _ChatSession]" = OrderedDict()
+    
+    # ------------------------------------------------------------------
+    # Request helpers (shared by the sync and async paths)
+    # ------------------------------------------------------------------
+    
+    def model_name(self, model: Optional[str]) -> str:
+        """Ollama name for a model type ("fast", "expert", ...) - default model if unknown"""
+        if model and model in self.MODELS:
+            return self.MODELS[model]["name"]
+        return self.current_model
+    
+    def _resolve_model(self, model: Optional[str]) -> str:
+        """Map a model type to its Ollama name and count usage"""
+        self.stats[model if model and model in self.MODELS else self.default_model] += 1
+        model_name = self.model_name(model)
+        if self.residency is not None:
+            self.residency.note_demand(model_name)
+        return model_name
+    
+    def _slot(self, model_name: str, priority=None, session_id: Optional[str] = None):
+        """Async scheduler slot for one call (no-op without a scheduler)"""
+        if self.scheduler is None:
+            return nullcontext()
+        if priority is None:
+            return self.scheduler.slot(model_name, session_id=session_id)
+        return self.scheduler.slot(model_name, priority, session_id)
+    
+    def _slot_blocking(self, model_name: str):
+        """Scheduler slot for the sync wrappers (background priority)"""
+        if self.scheduler is None:
+            return nullcontext()
+        return self.scheduler.slot_blocking(model_name)
+    
+    def _keep_alive(self, model_name: str) -> Optional[str]:
+        """Per-model keep_alive from the residency manager (None: Ollama's default)"""
+        if self.residency is None:
+            return None
+        return self.residency.keep_alive_for(model_name)
+    
+    def _generate_payload(self, model_name: str, prompt: str, stream: bool,
+                          options: Dict[str, Any], max_tokens: Optional[int] = None) -> Dict[str, Any]:
+        """Build an /api/generate payload"""
+        opts = dict(options)
+        if max_tokens is not None:
+            opts["num_predict"] = max_tokens
+        payload = {
+            "model": model_name,
+            "prompt": prompt,
+            "stream": stream,
+            "options": opts
+        }
+        keep_alive = self._keep_alive(model_name)
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        return payload
+    
+    def _chat_payload(self, model_name: str, messages: List[Dict[str, str]],
+                      options: Dict[str, Any], max_tokens: int,
+                      stream: bool = False, keep_alive: Optional[str] = None) -> Dict[str, Any]:
+        """Build an /api/chat payload"""
+        opts = dict(options)
+        opts["num_predict"] = max_tokens
+        payload = {
+            "model": model_name,
+            "messages": messages,
+            "stream": stream,
+            "options": opts
+        }
+        keep_alive = keep_alive or self._keep_alive(model_name)
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        return payload
+    
+    @staticmethod
+    def _parse_stream_line(line) -> Optional[Dict[str, Any]]:
+        """Decode one NDJSON line of an Ollama stream (None for blank/broken lines)"""
+        if not line:
+            return None
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError:
+            return None
+    
+    def _capture_stats(self, model_name: str, stats: Optional[Dict[str, Any]], data: Dict[str, Any],
+                       elapsed: float, ttft: Optional[float] = None):
+        """Record Ollama's timings in the telemetry and copy them into a caller-supplied stats dict"""
+        self.telemetry.record(model_name, data, elapsed, ttft)
+        if stats is None:
+            return
+        for field in OLLAMA_STAT_FIELDS:
+            if field in data:
+                stats[field] = data[field]
+        stats["elapsed"] = elapsed
+        if ttft is not None:
+            stats["ttft"] = ttft
+    
+    def _log_generation(self, model: Optional[str], model_name: str, generated: str, elapsed: float,
+                        data: Optional[Dict[str, Any]] = None):
+        """Print the per-call speed line used by generate() (Ollama's decode rate when reported)"""
+        if data and data.get("eval_count") and data.get("eval_duration"):
+            speed = data["eval_count"] / (data["eval_duration"] / 1e9)
+        else:
+            tokens = len(generated.split())
+            speed = tokens / elapsed if elapsed > 0 else 0
+        if model:
+            print(f"   [Model: {model_name} | {elapsed:.1f}s | {speed:.0f} tokens/s]")
+    
+    # ------------------------------------------------------------------
+    # Sync API (thin wrappers over the pooled session)
+    # ------------------------------------------------------------------
         
     def generate_stream(self,
                        prompt: str,
@@ -82,62 +437,42 @@ class StreamingMultiModelLLM:
         Yields:
             Text chunks as they arrive
         """
-        # Select model
-        if model and model in self.MODELS:
-            model_name = self.MODELS[model]["name"]
-            self.stats[model] += 1
-        else:
-            model_name = self.current_model
-            self.stats[self.default_model] += 1
+        model_name = self._resolve_model(model)
         
         try:
             url = f"{self.base_url}/api/generate"
-            # OPTIMIZED SETTINGS for Mixtral 8x7B - MAXIMUM QUALITY (based on research)
-            payload = {
-                "model": model_name,
-                "prompt": prompt,
-                "stream": True,  # Enable streaming!
-                "options": {
-                    "num_predict": max_tokens,
-                    "num_ctx": 16384,  # Large context window for detailed responses
-                    "temperature": 0.3,  # ✓ Balanced creativity and consistency
-                    "top_p": 0.95,  # ✓ Slightly higher for more creative responses
-                    "top_k": 50,  # ✓ Slightly higher for more diverse responses (research-based)
-                    "repeat_penalty": 1.15,  # ✓ Higher penalty to prevent repetition
-                    "frequency_penalty": 0.1,  # ✓ Reduced penalty for more natural flow
-                    "presence_penalty": 0.05,  # ✓ Reduced penalty for more natural flow
-                    "stop": ["</s>", "[INST]", "[/INST]"]  # ✓ Mixtral-specific stop tokens (removed Human/Assistant to allow longer responses)
-                }
-            }
-            
-            response = requests.post(url, json=payload, stream=True, timeout=180)
-            response.raise_for_status()
+            payload = self._generate_payload(model_name, prompt, True, self.STREAM_OPTIONS, max_tokens)
             
-            # Stream response
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        chunk_data = line.decode('utf-8')
-                        import json
-                        chunk_json = json.loads(chunk_data)
-                        
-                        if "response" in chunk_json:
-                            chunk_text = chunk_json["response"]
-                            
-                            # Call callback if provided
-                            if callback:
-                                callback(chunk_text)
-                            
-                            yield chunk_text
-                            
-                        # Check if done
-                        if chunk_json.get("done", False):
-                            break
-                            
-                    except json.JSONDecodeError:
+            with self._slot_blocking(model_name), \
+                    get_sync_session().post(url, json=payload, stream=True, timeout=180) as response:
+                response.raise_for_status()
+                start_time = time.time()
+                ttft = None
+                
+                # Stream response
+                for line in response.iter_lines():
+                    chunk_json = self._parse_stream_line(line)
+                    if chunk_json is None:
                         continue
+                    
+                    if "response" in chunk_json:
+                        chunk_text = chunk_json["response"]
+                        if ttft is None and chunk_text:
+                            ttft = time.time() - start_time
+                        
+                        # Call callback if provided
+                        if callback:
+                            callback(chunk_text)
+                        
+                        yield chunk_text
+                        
+                    # Check if done
+                    if chunk_json.get("done", False):
+                        self._capture_stats(model_name, None, chunk_json, time.time() - start_time, ttft)
+                        break
                         
         except Exception as e:
+            self.telemetry.record_error(model_name)
             error_msg = f"Error: {str(e)}"
             if callback:
                 callback(error_msg)
@@ -185,7 +520,8 @@ class StreamingMultiModelLLM:
                  prompt: str, 
                  model: Optional[str] = None,
                  max_tokens: int = 4096,
-                 stream_to_console: bool = False) -> str:
+                 stream_to_console: bool = False,
+                 stats: Optional[Dict[str, Any]] = None) -> str:
         """
         Generate response (with optional streaming)
         
@@ -194,6 +530,7 @@ class StreamingMultiModelLLM:
             model: Model type
             max_tokens: Max tokens
             stream_to_console: If True, stream to console in real-time
+            stats: Optional dict filled with Ollama timings (non-streaming only)
             
         Returns:
             Complete generated text
@@ -202,37 +539,15 @@ class StreamingMultiModelLLM:
             return self.generate_stream_to_console(prompt, model, max_tokens)
         
         # Non-streaming (backwards compatible)
-        if model and model in self.MODELS:
-            model_name = self.MODELS[model]["name"]
-            self.stats[model] += 1
-        else:
-            model_name = self.current_model
-            self.stats[self.default_model] += 1
+        model_name = self._resolve_model(model)
         
         try:
             url = f"{self.base_url}/api/generate"
-            # OPTIMIZED SETTINGS for Mixtral 8x7B - MAXIMUM QUALITY (research-based)
-            # Based on extensive research from best-results-mixtral.md
-            
-            payload = {
-                "model": model_name,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "num_predict": 8192,  # Even higher limit for detailed responses
-                    "num_ctx": 32768,  # Even larger context window for better context understanding
-                    "temperature": 0.3,  # ✓ Balanced creativity and consistency
-                    "top_p": 0.95,  # ✓ Slightly higher for more creative responses
-                    "top_k": 50,  # ✓ Slightly higher for more diverse responses
-                    "repeat_penalty": 1.1,  # ✓ Slightly reduced to allow more natural flow
-                    "frequency_penalty": 0.1,  # ✓ Reduced penalty for more natural flow
-                    "presence_penalty": 0.05,  # ✓ Reduced penalty for more natural flow
-                    "stop": ["</s>", "[INST]", "[/INST]"]  # ✓ Mixtral-specific stop tokens (removed Human/Assistant to allow longer responses)
-                }
-            }
+            payload = self._generate_payload(model_name, prompt, False, self.GENERATE_OPTIONS)
             
             start_time = time.time()
-            response = requests.post(url, json=payload, timeout=180)
+            with self._slot_blocking(model_name):
+                response = get_sync_session().post(url, json=payload, timeout=180)
             response.raise_for_status()
             elapsed = time.time() - start_time
             
@@ -240,99 +555,511 @@ class StreamingMultiModelLLM:
             generated = result.get("response", "").strip()
             
             # Log performance
-            tokens = len(generated.split())
-            speed = tokens / elapsed if elapsed > 0 else 0
-            
-            if model:
-                print(f"   [Model: {model_name} | {elapsed:.1f}s | {speed:.0f} tokens/s]")
+            self._capture_stats(model_name, stats, result, elapsed)
+            self._log_generation(model, model_name, generated, elapsed, result)
             
             return generated
             
         except Exception as e:
+            self.telemetry.record_error(model_name)
             return f"Error: {str(e)}"
     
     def stream_generate(self, prompt: str, model: Optional[str] = None, max_tokens: int = 4096):
         """
         Stream generate text word by word
         """
-        model_name = self.MODELS.get(model or self.default_model, {}).get("name", "mistral:latest")
+        model_name = self._resolve_model(model)
         
         try:
             url = f"{self.base_url}/api/generate"
-            payload = {
-                "model": model_name,
-                "prompt": prompt,
-                "stream": True,
-                "options": {
-                    "num_predict": max_tokens,
-                    "num_ctx": 16384,  # Larger context window for better understanding
-                    "temperature": 0.35,  # High דייקנות ונאמנות לעובדות
-                    "top_p": 0.85,  # מיקוד גבוה תוך שמירה על טבעיות
-                    "top_k": 40,  # Focused but not too restrictive
-                    "repeat_penalty": 1.18,  # Higher penalty to avoid looping
-                    "frequency_penalty": 0.1,  # Additional penalty for repetitive tokens
-                    "presence_penalty": 0.1,  # Encourage diverse vocabulary
-                    "stop": ["\n\n\n\n", "**999.**", "[INST]", "[/INST]", "<|im_end|>"]  # Stop at boundaries and instruction markers
-                }
-            }
-            
-            response = requests.post(url, json=payload, stream=True, timeout=180)
-            response.raise_for_status()
+            payload = self._generate_payload(model_name, prompt, True, self.LIVE_STREAM_OPTIONS, max_tokens)
             
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        data = json.loads(line.decode('utf-8'))
-                        if 'response' in data:
-                            yield data['response']
-                        if data.get('done', False):
-                            break
-                    except json.JSONDecodeError:
+            with self._slot_blocking(model_name), \
+                    get_sync_session().post(url, json=payload, stream=True, timeout=180) as response:
+                response.raise_for_status()
+                start_time = time.time()
+                ttft = None
+                
+                for line in response.iter_lines():
+                    data = self._parse_stream_line(line)
+                    if data is None:
                         continue
+                    if 'response' in data:
+                        if ttft is None and data['response']:
+                            ttft = time.time() - start_time
+                        yield data['response']
+                    if data.get('done', False):
+                        self._capture_stats(model_name, None, data, time.time() - start_time, ttft)
+                        break
                         
         except Exception as e:
+            self.telemetry.record_error(model_name)
             yield f"Error: {str(e)}"
     
     # Keep all other methods from MultiModelLLM
     def chat(self, messages: List[Dict[str, str]], model: Optional[str] = None, 
              max_tokens: int = 4096) -> str:
         """Chat with conversation history"""
-        if model and model in self.MODELS:
-            model_name = self.MODELS[model]["name"]
-            self.stats[model] += 1
-        else:
-            model_name = self.current_model
-            self.stats[self.default_model] += 1
+        model_name = self._resolve_model(model)
         
         try:
             url = f"{self.base_url}/api/chat"
-            # OPTIMIZED for Mixtral 8x7B - Expert Level Performance
-            payload = {
-                "model": model_name,
-                "messages": messages,
-                "stream": False,
-                "options": {
-                    "num_predict": max_tokens,
-                    "num_ctx": 16384,  # Large context window
-                    "temperature": 0.35,  # Optimal for Mixtral 8x7B reasoning tasks
-                    "top_p": 0.85,  # Nucleus sampling - more ממוקד
-                    "top_k": 40,  # Focused responses for Mixtral 8x7B
-                    "repeat_penalty": 1.18,  # Higher penalty to avoid looping
-                    "frequency_penalty": 0.1,  # Additional penalty for repetitive tokens
-                    "presence_penalty": 0.1  # Encourage diverse vocabulary
-                }
-            }
+            payload = self._chat_payload(model_name, messages, self.CHAT_OPTIONS, max_tokens)
             
-            response = requests.post(url, json=payload, timeout=180)
+            start_time = time.time()
+            with self._slot_blocking(model_name):
+                response = get_sync_session().post(url, json=payload, timeout=180)
             response.raise_for_status()
             
             result = response.json()
+            self._capture_stats(model_name, None, result, time.time() - start_time)
             message = result.get("message", {})
             return message.get("content", "").strip()
             
         except Exception as e:
+            self.telemetry.record_error(model_name)
             return f"Error: {str(e)}"
     
+    # ------------------------------------------------------------------
+    # Async API (shared keep-alive pool, never blocks the event loop)
+    # ------------------------------------------------------------------
+    
+    @staticmethod
+    def new_request_id() -> str:
+        """Fresh id for the request_id argument of the async API"""
+        return uuid.uuid4().hex
+    
+    def cancel(self, request_id: str) -> bool:
+        """
+        Abort an in-flight async call started with `request_id`
+        
+        The task doing the Ollama request is cancelled, which closes the
+        upstream HTTP connection (Ollama stops generating) and frees the
+        scheduler slot. The caller sees GenerationCancelled. Safe to call
+        from any thread.
+        
+        Returns:
+            False if no call with that id is running
+        """
+        task = self._inflight.get(request_id)
+        if task is None or task.done():
+            return False
+        self._cancelled_ids.add(request_id)
+        loop = task.get_loop()
+        try:
+            on_loop = asyncio.get_running_loop() is loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            task.cancel()
+        else:
+            loop.call_soon_threadsafe(task.cancel)
+        return True
+    
+    def _track(self, request_id: Optional[str], task: asyncio.Task):
+        if request_id:
+            self._inflight[request_id] = task
+    
+    def _untrack(self, request_id: Optional[str]) -> bool:
+        """Forget a finished call; returns True if it was cancelled via cancel()"""
+        if not request_id:
+            return False
+        self._inflight.pop(request_id, None)
+        was_cancelled = request_id in self._cancelled_ids
+        self._cancelled_ids.discard(request_id)
+        return was_cancelled
+    
+    async def _run_cancellable(self, request_id: Optional[str], coro):
+        """Run `coro` as its own task so cancel(request_id) can abort it"""
+        if not request_id:
+            return await coro
+        task = asyncio.ensure_future(coro)
+        self._track(request_id, task)
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if self._untrack(request_id) and task.cancelled():
+                raise GenerationCancelled(request_id)
+            raise
+        finally:
+            self._untrack(request_id)
+    
+    def _start_flight(self, payload: Dict[str, Any], start: Callable[["_Flight"], Any]) -> "_Flight":
+        """Join the in-progress call for `payload` or start one with start(flight)"""
+        key = _flight_key(payload)
+        flight = self._flights.get(key)
+        if flight is not None and not flight.finished and not flight.task.done():
+            self.flight_stats["coalesced"] += 1
+            return flight
+        flight = _Flight(key)
+        flight.task = asyncio.ensure_future(start(flight))
+        self._flights[key] = flight
+        self.flight_stats["started"] += 1
+        
+        def forget(_task, flight=flight):
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+            if _task.cancelled():
+                self.flight_stats["abandoned"] += 1
+        flight.task.add_done_callback(forget)
+        return flight
+    
+    def get_flight_stats(self) -> Dict[str, int]:
+        """Single-flight counters: calls started, requests coalesced, calls abandoned by every caller"""
+        return {**self.flight_stats, "in_flight": len(self._flights)}
+    
+    async def agenerate(self,
+                        prompt: str,
+                        model: Optional[str] = None,
+                        max_tokens: int = 4096,
+                        priority=None,
+                        session_id: Optional[str] = None,
+                        stats: Optional[Dict[str, Any]] = None,
+                        request_id: Optional[str] = None,
+                        options: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Async counterpart of generate() - same payload, pooled connection
+        
+        Identical concurrent calls wait on one shared generation.
+        
+        Args:
+            priority / session_id: Scheduler hints (ignored without a scheduler)
+            stats: Optional dict filled with Ollama timings (OLLAMA_STAT_FIELDS + "elapsed")
+            request_id: Makes the call abortable with cancel(request_id)
+            options: Ollama option overrides on top of the preset (e.g. the
+                     prompt packer's {"num_ctx": ...})
+        
+        Returns:
+            Complete generated text (or "Error: ..." like generate())
+        
+        Raises:
+            SchedulerRejected: The model queue is full (never turned into "Error: ...")
+            GenerationCancelled: cancel(request_id) was called
+        """
+        model_name = self._resolve_model(model)
+        payload = self._generate_payload(model_name, prompt, False, {**self.GENERATE_OPTIONS, **(options or {})})
+        flight = self._start_flight(
+            payload, lambda f: self._agenerate(model, model_name, payload, priority, session_id, f.stats)
+        )
+        return await self._run_cancellable(request_id, self._await_flight(flight, stats))
+    
+    async def _await_flight(self, flight: "_Flight", stats: Optional[Dict[str, Any]]):
+        """Wait for a shared non-streaming call (leaving never cancels it for the others)"""
+        flight.subscribers += 1
+        try:
+            result = await asyncio.shield(flight.task)
+            if stats is not None:
+                stats.update(flight.stats)
+            return result
+        finally:
+            flight.leave()
+    
+    async def _agenerate(self, model, model_name, payload, priority, session_id, stats) -> str:
+        url = f"{self.base_url}/api/generate"
+        async with self._slot(model_name, priority, session_id):
+            try:
+                start_time = time.time()
+                response = await get_async_client().post(url, json=payload)
+                response.raise_for_status()
+                elapsed = time.time() - start_time
+                
+                result = response.json()
+                generated = result.get("response", "").strip()
+                
+                self._capture_stats(model_name, stats, result, elapsed)
+                self._log_generation(model, model_name, generated, elapsed, result)
+                
+                return generated
+                
+            except Exception as e:
+                self.telemetry.record_error(model_name)
+                return f"Error: {str(e)}"
+    
+    async def astream(self,
+                      prompt: str,
+                      model: Optional[str] = None,
+                      max_tokens: int = 4096,
+                      priority=None,
+                      session_id: Optional[str] = None,
+                      stats: Optional[Dict[str, Any]] = None,
+                      request_id: Optional[str] = None,
+                      options: Optional[Dict[str, Any]] = None) -> AsyncGenerator[str, None]:
+        """
+        Async counterpart of stream_generate() - yields text chunks as they arrive
+        
+        The Ollama stream is read by a producer task that holds the scheduler
+        slot and fans chunks out to every identical concurrent stream (late
+        joiners get the chunks so far replayed). cancel(request_id) or closing
+        this generator detaches this caller; when the last one leaves the
+        upstream HTTP stream is closed and the slot freed right away. `stats`
+        is filled like agenerate() plus the measured "ttft"; `options` as in
+        agenerate().
+        
+        Raises:
+            SchedulerRejected: The model queue is full
+            GenerationCancelled: cancel(request_id) was called
+        """
+        model_name = self._resolve_model(model)
+        payload = self._generate_payload(model_name, prompt, True,
+                                         {**self.LIVE_STREAM_OPTIONS, **(options or {})}, max_tokens)
+        flight = self._start_flight(
+            payload, lambda f: self._stream_producer(model_name, payload, priority, session_id, f)
+        )
+        async for chunk in self._consume_stream(flight, stats, request_id):
+            yield chunk
+    
+    async def _consume_stream(self, flight: "_Flight", stats: Optional[Dict[str, Any]],
+                              request_id: Optional[str]) -> AsyncGenerator[str, None]:
+        """Yield one subscriber's share of a streaming flight"""
+        queue = flight.subscribe()
+        self._track(request_id, _StreamSubscription(queue))
+        
+        try:
+            while True:
+                item = await queue.get()
+                if item is _STREAM_END:
+                    break
+                if item is _STREAM_CANCELLED:
+                    raise GenerationCancelled(request_id)
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+            if stats is not None:
+                stats.update(flight.stats)
+        finally:
+            # Consumer went away (done, closed generator, client disconnect)
+            flight.leave(queue)
+            self._untrack(request_id)
+    
+    async def _stream_producer(self, model_name: str, payload: Dict[str, Any], priority,
+                               session_id: Optional[str], flight: "_Flight"):
+        """Read the Ollama stream into the flight (chunks, "Error: ..." text or a scheduler exception)"""
+        chat = "messages" in payload
+        url = f"{self.base_url}/api/chat" if chat else f"{self.base_url}/api/generate"
+        try:
+            async with self._slot(model_name, priority, session_id):
+                try:
+                    start_time = time.time()
+                    ttft = None
+                    async with get_async_client().stream("POST", url, json=payload) as response:
+                        response.raise_for_status()
+                        
+                        async for line in response.aiter_lines():
+                            data = self._parse_stream_line(line)
+                            if data is None:
+                                continue
+                            text = (data.get('message') or {}).get('content') if chat else data.get('response')
+                            if text:
+                                if ttft is None:
+                                    ttft = time.time() - start_time
+                                flight.publish(text)
+                            if data.get('done', False):
+                                self._capture_stats(model_name, flight.stats, data, time.time() - start_time, ttft)
+                                break
+                                
+                except Exception as e:
+                    self.telemetry.record_error(model_name)
+                    flight.publish(f"Error: {str(e)}")
+        except Exception as e:
+            # Not admitted by the scheduler - re-raised in every consumer
+            flight.publish(e)
+        finally:
+            flight.publish(_STREAM_END)
+    
+    async def achat(self, messages: List[Dict[str, str]], model: Optional[str] = None,
+                    max_tokens: int = 4096, priority=None,
+                    session_id: Optional[str] = None,
+                    stats: Optional[Dict[str, Any]] = None,
+                    request_id: Optional[str] = None,
+                    options: Optional[Dict[str, Any]] = None) -> str:
+        """Async counterpart of chat() (`stats` / `request_id` / `options` / single-flight as in agenerate())"""
+        model_name = self._resolve_model(model)
+        payload = self._chat_payload(model_name, messages, {**self.CHAT_OPTIONS, **(options or {})}, max_tokens)
+        flight = self._start_flight(
+            payload, lambda f: self._achat(model_name, payload, priority, session_id, f.stats)
+        )
+        return await self._run_cancellable(request_id, self._await_flight(flight, stats))
+    
+    async def _achat(self, model_name, payload, priority, session_id, stats) -> str:
+        url = f"{self.base_url}/api/chat"
+        async with self._slot(model_name, priority, session_id):
+            try:
+                start_time = time.time()
+                response = await get_async_client().post(url, json=payload)
+                response.raise_for_status()
+                
+                result = response.json()
+                self._capture_stats(model_name, stats, result, time.time() - start_time)
+                message = result.get("message", {})
+                return message.get("content", "").strip()
+                
+            except Exception as e:
+                self.telemetry.record_error(model_name)
+                return f"Error: {str(e)}"
+    
+    # ------------------------------------------------------------------
+    # Prefix-stable session mode (multi-turn chat with KV-cache reuse)
+    # ------------------------------------------------------------------
+    
+    def session_model(self, session_id: Optional[str]) -> Optional[str]:
+        """Model type a live session is pinned to (None for new or expired sessions)"""
+        session = self._sessions.get(session_id) if session_id else None
+        if session is None or time.time() - session.last_used > self.SESSION_TTL:
+            return None
+        return session.model
+    
+    def _session(self, session_id: str, model: str) -> _ChatSession:
+        """Get or (re)pin a session - switching model starts over with a cold cache"""
+        now = time.time()
+        session = self._sessions.get(session_id)
+        if session is None or session.model != model or now - session.last_used > self.SESSION_TTL:
+            session = _ChatSession(model)
+            self._sessions[session_id] = session
+        session.last_used = now
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.MAX_SESSIONS:
+            self._sessions.popitem(last=False)
+        return session
+    
+    def _session_payload(self, session_id: str, messages: List[Dict[str, str]],
+                         model: Optional[str], max_tokens: int, options: Optional[Dict[str, Any]],
+                         stream: bool):
+        """Pin the session and build its /api/chat payload -> (session, model_name, payload)"""
+        model = model or self.session_model(session_id) or self.default_model
+        session = self._session(session_id, model)
+        model_name = self._resolve_model(model)
+        opts = {**self.CHAT_OPTIONS, **(options or {})}
+        # num_ctx never shrinks inside a session - a change reloads the model
+        # and throws the cached prefix away
+        if session.num_ctx and opts.get("num_ctx", 0) < session.num_ctx:
+            opts["num_ctx"] = session.num_ctx
+        session.num_ctx = opts.get("num_ctx")
+        payload = self._chat_payload(model_name, messages, opts, max_tokens,
+                                     stream=stream, keep_alive=self.KEEP_ALIVE)
+        return session, model_name, payload
+    
+    @staticmethod
+    def _record_prefill(session: _ChatSession, call_stats: Dict[str, Any],
+                        prompt_tokens: Optional[int], stats: Optional[Dict[str, Any]]):
+        """
+        Prefill accounting for one session turn
+        
+        Ollama's prompt_eval_count only counts tokens it had to evaluate; the
+        rest of the prompt (`prompt_tokens`, the caller's estimate) came from
+        the runner's prompt cache.
+        """
+        evaluated = call_stats.get("prompt_eval_count")
+        if evaluated is None:
+            return
+        reused = max(0, (prompt_tokens or 0) - evaluated)
+        session.turns += 1
+        session.prefill_tokens += evaluated
+        session.reused_tokens += reused
+        if stats is not None:
+            stats["prefill_reused"] = reused
+            stats["session_turn"] = session.turns
+    
+    async def achat_session(self, session_id: str, messages: List[Dict[str, str]],
+                            model: Optional[str] = None, prompt_tokens: Optional[int] = None,
+                            max_tokens: int = 4096, priority=None,
+                            stats: Optional[Dict[str, Any]] = None,
+                            request_id: Optional[str] = None,
+                            options: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Multi-turn chat that reuses Ollama's KV cache between turns
+        
+        Send the messages in a stable order - system prompt first and
+        unchanged, earlier turns verbatim, per-turn context only in the last
+        user message (PromptPacker.pack_messages builds that layout). The
+        session stays on one model (`model` re-pins it; default: the model it
+        is pinned to) and one num_ctx, and keep_alive holds the runner.
+        
+        Args:
+            prompt_tokens: Estimated prompt size, used to report reused prefill
+            stats: Filled like agenerate() plus "prefill_reused" (tokens served
+                   from cache) and "session_turn"
+        """
+        session, model_name, payload = self._session_payload(
+            session_id, messages, model, max_tokens, options, stream=False
+        )
+        call_stats: Dict[str, Any] = {}
+        flight = self._start_flight(
+            payload, lambda f: self._achat(model_name, payload, priority, session_id, f.stats)
+        )
+        result = await self._run_cancellable(request_id, self._await_flight(flight, call_stats))
+        if stats is not None:
+            stats.update(call_stats)
+        self._record_prefill(session, call_stats, prompt_tokens, stats)
+        return result
+    
+    async def astream_session(self, session_id: str, messages: List[Dict[str, str]],
+                              model: Optional[str] = None, prompt_tokens: Optional[int] = None,
+                              max_tokens: int = 4096, priority=None,
+                              stats: Optional[Dict[str, Any]] = None,
+                              request_id: Optional[str] = None,
+                              options: Optional[Dict[str, Any]] = None) -> AsyncGenerator[str, None]:
+        """Streaming achat_session() - yields text chunks like astream()"""
+        session, model_name, payload = self._session_payload(
+            session_id, messages, model, max_tokens, options, stream=True
+        )
+        call_stats: Dict[str, Any] = {}
+        flight = self._start_flight(
+            payload, lambda f: self._stream_producer(model_name, payload, priority, session_id, f)
+        )
+        async for chunk in self._consume_stream(flight, call_stats, request_id):
+            yield chunk
+        if stats is not None:
+            stats.update(call_stats)
+        self._record_prefill(session, call_stats, prompt_tokens, stats)
+    
+    def get_session_stats(self) -> Dict[str, Any]:
+        """Pinned sessions and prefill tokens evaluated vs. reused from the prompt cache"""
+        now = time.time()
+        live = {sid: s for sid, s in self._sessions.items() if now - s.last_used <= self.SESSION_TTL}
+        evaluated = sum(s.prefill_tokens for s in live.values())
+        reused = sum(s.reused_tokens for s in live.values())
+        by_model: Dict[str, int] = {}
+        for s in live.values():
+            by_model[s.model] = by_model.get(s.model, 0) + 1
+        return {
+            "sessions": len(live),
+            "sessions_by_model": by_model,
+            "turns": sum(s.turns for s in live.values()),
+            "prefill_evaluated_tokens": evaluated,
+            "prefill_reused_tokens": reused,
+            "prefill_reuse_ratio": reused / (evaluated + reused) if evaluated + reused else 0.0,
+            "keep_alive": self.KEEP_ALIVE,
+        }
+
+    # ------------------------------------------------------------------
+    # Residency (used by ModelResidency)
+    # ------------------------------------------------------------------
+
+    async def aloaded_models(self) -> List[Dict[str, Any]]:
+        """Models Ollama currently holds in memory (/api/ps entries)"""
+        response = await get_async_client().get(f"{self.base_url}/api/ps", timeout=5.0)
+        response.raise_for_status()
+        return response.json().get("models", [])
+
+    async def apreload(self, model_name: str, keep_alive: Optional[str] = None) -> bool:
+        """
+        Load a model without generating (empty prompt) so the next request finds it warm
+
+        Returns:
+            True if Ollama loaded (or already held) the model
+        """
+        payload = {"model": model_name, "prompt": "", "stream": False}
+        keep_alive = keep_alive or self._keep_alive(model_name)
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        try:
+            response = await get_async_client().post(f"{self.base_url}/api/generate", json=payload)
+            response.raise_for_status()
+            return True
+        except Exception as e:
+            print(f"[RESIDENCY] Preload of {model_name} failed: {e}")
+            return False
+
     def set_default_model(self, model_type: str):
         """Change default model"""
         if model_type in self.MODELS:
@@ -344,14 +1071,21 @@ class StreamingMultiModelLLM:
         """Get list of available models"""
         return self.MODELS
     
-    def get_stats(self) -> Dict[str, int]:
-        """Get usage statistics"""
-        return self.stats
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Usage and performance statistics
+        
+        Returns:
+            {"calls": {model type: calls}, "models": {ollama model: telemetry
+            percentiles (ttft, prefill_tps, decode_tps, load_seconds,
+            total_seconds), cold_loads, errors, token totals}}
+        """
+        return {"calls": dict(self.stats), "models": self.telemetry.get_stats()}
     
     def test_connection(self, verbose: bool = False) -> bool:
         """Test connection to Ollama"""
         try:
-            response = requests.get(self.base_url, timeout=5)
+            response = get_sync_session().get(self.base_url, timeout=5)
             if response.status_code == 200:
                 if verbose:
                     print("✓ Connected to Ollama")
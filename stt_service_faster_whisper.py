@@ -4,13 +4,18 @@ Fast, reliable Speech-to-Text using Faster-Whisper
 Port: 9034
 """
 
-from fastapi import FastAPI, HTTPException, UploadFile, File
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi.responses import JSONResponse, StreamingResponse
 from faster_whisper import WhisperModel
+from typing import List, Optional
+import asyncio
 import logging
-import tempfile
+import json
 import os
 
+from zero_agent.core.audio_io import AudioDecoder, AudioDecodeError, AudioTooLarge
+from zero_agent.core.batch_stt import BatchItem, BatchTranscriber, collect_directory
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -30,6 +35,31 @@ except Exception as e:
     model = WhisperModel("base", device="cpu", compute_type="int8")
     logger.info("✓ Faster-Whisper model loaded (base, CPU, int8)")
 
+# Uploads are decoded in memory into reusable sample buffers (no temp files)
+decoder = AudioDecoder()
+
+# Offline batch jobs (/stt/batch): a pool of batched pipelines, loaded on first use,
+# trying CUDA float16 first and falling back to CPU int8 like the model above
+batch = BatchTranscriber(
+    model_size=os.getenv("STT_BATCH_MODEL", "base"),
+    device="cuda",
+    compute_type="float16",
+    workers=int(os.getenv("STT_BATCH_WORKERS", "2")),
+    batch_size=int(os.getenv("STT_BATCH_SIZE", "8")),
+)
+# Directory jobs read only below this root (unset = uploads only)
+BATCH_ROOT = os.getenv("STT_BATCH_ROOT")
+
+
+def decode_upload(audio_data: bytes):
+    """Decoded samples for an upload, or an HTTP 400/413"""
+    try:
+        return decoder.decode(audio_data)
+    except AudioTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except AudioDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 
 @app.get("/health")
 def health_check():
@@ -58,18 +88,13 @@ async def speech_to_text(audio_file: UploadFile = File(...)):
     try:
         logger.info(f"Processing audio file: {audio_file.filename}")
         
-        # Read audio file
+        # Read and decode audio in memory
         audio_data = await audio_file.read()
         
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_file:
-            temp_file.write(audio_data)
-            temp_file_path = temp_file.name
-        
-        try:
+        with decode_upload(audio_data) as audio:
             # Transcribe with Faster-Whisper
             segments, info = model.transcribe(
-                temp_file_path,
+                audio.samples,
                 language="he",  # Hebrew by default, can be auto-detected
                 beam_size=5,
                 best_of=5,
@@ -94,9 +119,6 @@ async def speech_to_text(audio_file: UploadFile = File(...)):
                     "words": [{"word": word.word, "start": word.start, "end": word.end} for word in segment.words] if hasattr(segment, 'words') else []
                 })
             
-            # Clean up
-            os.unlink(temp_file_path)
-            
             result = {
                 "text": full_text.strip(),
                 "language": info.language,
@@ -108,12 +130,8 @@ async def speech_to_text(audio_file: UploadFile = File(...)):
             logger.info(f"✓ Transcription completed: {len(full_text)} chars, {info.language} ({info.language_probability:.2f})")
             return JSONResponse(content=result)
             
-        except Exception as e:
-            # Clean up on error
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
-            raise e
-            
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"✗ STT failed: {e}")
         raise HTTPException(status_code=500, detail=f"STT failed: {str(e)}")
@@ -123,25 +141,28 @@ async def speech_to_text(audio_file: UploadFile = File(...)):
 async def speech_to_text_stream(audio_file: UploadFile = File(...)):
     """
     Convert speech to text with streaming results
+    
+    Returns: NDJSON, one line per segment as soon as it is decoded
+    ({"type": "segment", "text", "start", "end", "is_final"}), then
+    {"type": "done", "language", "duration"}. For live microphone audio use
+    the WebSocket service (stt_service_web.py), which emits partials while
+    the user is still speaking.
     """
     if not audio_file:
         raise HTTPException(status_code=400, detail="No audio file provided")
     
-    try:
-        logger.info(f"Streaming transcription: {audio_file.filename}")
-        
-        # Read audio file
-        audio_data = await audio_file.read()
-        
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_file:
-            temp_file.write(audio_data)
-            temp_file_path = temp_file.name
-        
+    logger.info(f"Streaming transcription: {audio_file.filename}")
+    
+    # Read and decode audio in memory
+    audio_data = await audio_file.read()
+    audio = decode_upload(audio_data)
+    
+    def results():
+        # Sync generator: Starlette iterates it in a worker thread, and
+        # faster-whisper decodes each segment as it is pulled
         try:
-            # Transcribe with streaming
             segments, info = model.transcribe(
-                temp_file_path,
+                audio.samples,
                 language="he",
                 beam_size=1,  # Faster for streaming
                 temperature=0.0,
@@ -149,34 +170,75 @@ async def speech_to_text_stream(audio_file: UploadFile = File(...)):
                 word_timestamps=True,
                 vad_filter=True
             )
-            
-            # Stream results
-            results = []
             for segment in segments:
-                results.append({
+                yield json.dumps({
+                    "type": "segment",
                     "text": segment.text,
                     "start": segment.start,
                     "end": segment.end,
                     "is_final": True
-                })
-            
-            # Clean up
-            os.unlink(temp_file_path)
-            
-            return JSONResponse(content={
-                "segments": results,
-                "language": info.language,
-                "duration": info.duration
-            })
-            
+                }, ensure_ascii=False) + "\n"
+            yield json.dumps({"type": "done", "language": info.language, "duration": info.duration}) + "\n"
         except Exception as e:
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
-            raise e
-            
-    except Exception as e:
-        logger.error(f"✗ Streaming STT failed: {e}")
-        raise HTTPException(status_code=500, detail=f"Streaming STT failed: {str(e)}")
+            logger.error(f"✗ Streaming STT failed: {e}")
+            yield json.dumps({"type": "error", "message": str(e)}) + "\n"
+        finally:
+            audio.release()
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@app.post("/stt/batch")
+async def speech_to_text_batch(
+    files: Optional[List[UploadFile]] = File(None),
+    directory: Optional[str] = Form(None),
+    language: Optional[str] = Form("he"),
+):
+    """
+    Transcribe many audio files in one job
+    
+    Parameters:
+    - files: audio uploads (any number)
+    - directory: and/or a directory under STT_BATCH_ROOT on this host (a
+      path relative to it) - every audio file under it; 400 when the
+      service has no STT_BATCH_ROOT or the path leads outside it
+    - language: language code (default Hebrew)
+    
+    Returns: NDJSON streamed as jobs finish - {"type": "result", "file",
+    "text", "duration", "segments"} (or {"type": "error", "file",
+    "message"}) per file, then {"type": "summary", "files",
+    "audio_seconds", "wall_seconds", "throughput"} where throughput is
+    audio seconds per wall-clock second.
+    """
+    items = []
+    if directory:
+        if not BATCH_ROOT:
+            raise HTTPException(status_code=400, detail="Directory jobs are disabled (STT_BATCH_ROOT is not set)")
+        try:
+            items += await asyncio.to_thread(collect_directory, directory, root=BATCH_ROOT)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    for index, upload in enumerate(files or []):
+        items.append(BatchItem(upload.filename or f"file-{index}", await upload.read()))
+    if not items:
+        raise HTTPException(status_code=400, detail="No audio files provided")
+    
+    logger.info(f"Batch transcription: {len(items)} files")
+    
+    async def results():
+        async for event in batch.run(items, language=language):
+            if event["type"] == "summary":
+                logger.info(f"✓ Batch done: {event['files']} files, {event['audio_seconds']}s audio "
+                            f"in {event['wall_seconds']}s ({event['throughput']}x real time)")
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@app.get("/stt/batch/stats")
+def batch_stats():
+    """Batch totals (files, audio seconds, throughput) and worker pool state"""
+    return batch.get_stats()
 
 
 if __name__ == "__main__":
@@ -188,6 +250,7 @@ if __name__ == "__main__":
     logger.info("Starting server...")
     logger.info("STT Endpoint: http://localhost:9034/stt")
     logger.info("Streaming STT: http://localhost:9034/stt-stream")
+    logger.info("Batch STT: http://localhost:9034/stt/batch")
     logger.info("Health Check: http://localhost:9034/health")
     logger.info("Supports: Hebrew (he) & English (en)")
     logger.info("=" * 70)
@@ -1,18 +1,23 @@
 """
 🎤 Zero Agent Web STT Service
-WebSocket-based Speech-to-Text for real-time transcription
+WebSocket-based Speech-to-Text for real-time transcription:
+raw PCM streamed in, partial and final transcripts streamed out
 Port: 9035
 """
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.responses import HTMLResponse
 from faster_whisper import WhisperModel
+import asyncio
 import logging
 import base64
-import tempfile
-import os
 import json
 
+from zero_agent.core.audio_io import (
+    AudioDecoder, SAMPLE_RATE, FRAME_HEADER, FRAME_CLIP, FRAME_CODES, unpack_frame
+)
+from zero_agent.core.streaming_stt import StreamingRecognizer, whisper_transcriber
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -31,6 +36,9 @@ except Exception as e:
     model = WhisperModel("base", device="cpu", compute_type="int8")
     logger.info("✓ Faster-Whisper model loaded (base, CPU, int8)")
 
+# Clips are decoded in memory into reusable sample buffers (no temp files)
+decoder = AudioDecoder()
+
 
 @app.get("/")
 async def get():
@@ -48,56 +56,133 @@ async def get():
         <div id="result"></div>
         
         <script>
-            let mediaRecorder;
+            // Streams 16 kHz mono PCM as it is recorded; partials replace each
+            // other until the utterance's final transcript arrives
+            let audioContext;
+            let processor;
+            let source;
+            let stream;
             let websocket;
-            let audioChunks = [];
+            let partial;
+            let binary = false;
+            let seq = 0;
             
             const startBtn = document.getElementById('startBtn');
             const stopBtn = document.getElementById('stopBtn');
             const result = document.getElementById('result');
             
+            function toBase64(int16) {
+                let text = '';
+                const bytes = new Uint8Array(int16.buffer);
+                for (let i = 0; i < bytes.length; i++) {
+                    text += String.fromCharCode(bytes[i]);
+                }
+                return btoa(text);
+            }
+            
+            // Binary frame: version u8, format u8 (1 = s16le), channels u16,
+            // sample_rate u32, seq u32 (little-endian), then the samples
+            function frame(int16, sampleRate) {
+                const buffer = new ArrayBuffer(12 + int16.byteLength);
+                const header = new DataView(buffer);
+                header.setUint8(0, 2);
+                header.setUint8(1, 1);
+                header.setUint16(2, 1, true);
+                header.setUint32(4, sampleRate, true);
+                header.setUint32(8, seq++, true);
+                new Int16Array(buffer, 12).set(int16);
+                return buffer;
+            }
+            
             startBtn.onclick = async () => {
                 try {
-                    const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
-                    mediaRecorder = new MediaRecorder(stream);
+                    stream = await navigator.mediaDevices.getUserMedia({ audio: true });
+                    audioContext = new AudioContext({ sampleRate: 16000 });
+                    source = audioContext.createMediaStreamSource(stream);
+                    processor = audioContext.createScriptProcessor(4096, 1, 1);
                     
                     websocket = new WebSocket('ws://localhost:9035/ws');
                     
                     websocket.onmessage = (event) => {
                         const data = JSON.parse(event.data);
-                        result.innerHTML += `<p><strong>${data.type}:</strong> ${data.text}</p>`;
+                        if (data.type === 'partial') {
+                            if (!partial) {
+                                partial = document.createElement('p');
+                                result.appendChild(partial);
+                            }
+                            partial.innerHTML = `<em>${data.text}</em>`;
+                        } else if (data.type === 'final') {
+                            if (!partial) {
+                                partial = document.createElement('p');
+                                result.appendChild(partial);
+                            }
+                            partial.innerHTML = `<strong>${data.text}</strong>`;
+                            partial = null;
+                        } else if (data.type === 'error') {
+                            result.innerHTML += `<p><strong>error:</strong> ${data.message}</p>`;
+                            partial = null;
+                        }
                     };
                     
                     websocket.onopen = () => {
-                        mediaRecorder.ondataavailable = (event) => {
-                            if (event.data.size > 0) {
-                                const reader = new FileReader();
-                                reader.onload = () => {
-                                    const base64 = reader.result.split(',')[1];
-                                    websocket.send(JSON.stringify({
-                                        type: 'audio',
-                                        data: base64
-                                    }));
-                                };
-                                reader.readAsDataURL(event.data);
+                        // Version 2 = binary PCM frames; an older server answers version 1
+                        websocket.send(JSON.stringify({ type: 'hello', versions: [1, 2] }));
+                    };
+                    
+                    websocket.addEventListener('message', (event) => {
+                        const data = JSON.parse(event.data);
+                        if (data.type !== 'hello') {
+                            return;
+                        }
+                        binary = data.version >= 2;
+                        seq = 0;
+                        websocket.send(JSON.stringify({
+                            type: 'start',
+                            sample_rate: audioContext.sampleRate,
+                            format: 's16le',
+                            language: 'he'
+                        }));
+                        processor.onaudioprocess = (event) => {
+                            const input = event.inputBuffer.getChannelData(0);
+                            const pcm = new Int16Array(input.length);
+                            for (let i = 0; i < input.length; i++) {
+                                pcm[i] = Math.max(-1, Math.min(1, input[i])) * 0x7fff;
+                            }
+                            if (websocket.readyState !== WebSocket.OPEN) {
+                                return;
+                            }
+                            if (binary) {
+                                websocket.send(frame(pcm, audioContext.sampleRate));
+                            } else {
+                                websocket.send(JSON.stringify({ type: 'pcm', data: toBase64(pcm) }));
                             }
                         };
-                        
-                        mediaRecorder.start(1000); // Send data every second
+                        source.connect(processor);
+                        processor.connect(audioContext.destination);
                         startBtn.disabled = true;
                         stopBtn.disabled = false;
-                        result.innerHTML = '<p>Recording started...</p>';
-                    };
+                        result.innerHTML = `<p>Recording started (protocol v${data.version})...</p>`;
+                    });
                 } catch (err) {
                     alert('Error accessing microphone: ' + err);
                 }
             };
             
             stopBtn.onclick = () => {
-                if (mediaRecorder && mediaRecorder.state === 'recording') {
-                    mediaRecorder.stop();
+                if (processor) {
+                    processor.disconnect();
+                    source.disconnect();
+                    stream.getTracks().forEach(track => track.stop());
+                    audioContext.close();
+                    processor = null;
                     if (websocket) {
-                        websocket.close();
+                        // The server finalizes open speech, answers "done", then we close
+                        websocket.send(JSON.stringify({ type: 'stop' }));
+                        websocket.addEventListener('message', (event) => {
+                            if (JSON.parse(event.data).type === 'done') {
+                                websocket.close();
+                            }
+                        });
                     }
                     startBtn.disabled = false;
                     stopBtn.disabled = true;
@@ -110,67 +195,142 @@ async def get():
     """)
 
 
+# Protocol versions of /ws: 1 = JSON text frames with base64 audio,
+# 2 = adds binary audio frames (header format in zero_agent/core/audio_io.py)
+PROTOCOL_VERSIONS = (1, 2)
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
+    """
+    Speech-to-text over WebSocket
+    
+    Version negotiation (optional - clients that skip it speak version 1):
+        -> {"type": "hello", "versions": [1, 2]}
+        <- {"type": "hello", "version": 2, "frame_header": "<BBHII", "formats": {...}}
+    
+    Streaming - raw PCM pushed as it is recorded:
+        -> {"type": "start", "sample_rate": 16000, "format": "s16le", "language": "he"}
+        <- {"type": "ready"}
+        -> {"type": "pcm", "data": <base64 PCM frames>}  (any chunk size)
+        -> or, with version 2, binary frames: 12-byte header + raw PCM
+           (a binary frame starts a stream by itself; its header carries the format)
+        <- {"type": "partial", "utterance", "text", "start", "end"}  while speaking (beam 1)
+        <- {"type": "final", "utterance", "text", "start", "end"}    per utterance (beam 5)
+           or {"type": "error", "utterance", "message", "start", "end"} if its final pass failed
+        -> {"type": "stop"}  finalizes open speech
+        <- {"type": "done", "stats": {...}}
+    
+    Whole clips (original protocol):
+        -> {"type": "audio", "data": <base64 WAV / webm / ...>}
+           (version 2: a binary frame with format 0)
+        <- {"type": "transcription", "text", "start", "end", "is_final"} per segment
+    """
     await websocket.accept()
     logger.info("WebSocket connection established")
+    version = 1
+    language = "he"
+    stream = None  # StreamingRecognizer of the current "start" ... "stop" stream
+    stream_format = {}
+    next_seq = None  # expected sequence number of the next binary frame
+    frames = {"binary": 0, "json": 0, "lost": 0}
+    
+    async def send(payload):
+        await websocket.send_text(json.dumps(payload, ensure_ascii=False))
+    
+    async def feed(audio):
+        # Frames are copied into the recognizer's ring buffer; decoding
+        # runs in a worker thread so other connections keep flowing
+        with audio:
+            events = await asyncio.to_thread(stream.feed, audio.samples)
+        for event in events:
+            await send(event)
+    
+    async def transcribe(audio):
+        with audio:
+            segments = await asyncio.to_thread(transcribe_clip, audio.samples)
+        for segment in segments:
+            await send({
+                "type": "transcription",
+                "text": segment.text,
+                "start": segment.start,
+                "end": segment.end,
+                "is_final": True
+            })
     
     try:
         while True:
-            # Receive message
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            # Receive message (text or binary)
+            received = await websocket.receive()
+            if received["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(received.get("code", 1000))
             
-            if message["type"] == "audio":
-                try:
-                    # Decode base64 audio
-                    audio_data = base64.b64decode(message["data"])
-                    
-                    # Create temporary file
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_file:
-                        temp_file.write(audio_data)
-                        temp_file_path = temp_file.name
-                    
-                    try:
-                        # Transcribe
-                        segments, info = model.transcribe(
-                            temp_file_path,
-                            language="he",  # Hebrew by default
-                            beam_size=1,
-                            temperature=0.0,
-                            condition_on_previous_text=False,
-                            word_timestamps=True,
-                            vad_filter=True
-                        )
-                        
-                        # Send results
-                        for segment in segments:
-                            await websocket.send_text(json.dumps({
-                                "type": "transcription",
-                                "text": segment.text,
-                                "start": segment.start,
-                                "end": segment.end,
-                                "is_final": True
-                            }))
-                        
-                        # Clean up
-                        os.unlink(temp_file_path)
-                        
-                    except Exception as e:
-                        if os.path.exists(temp_file_path):
-                            os.unlink(temp_file_path)
-                        logger.error(f"Transcription error: {e}")
-                        await websocket.send_text(json.dumps({
-                            "type": "error",
-                            "message": str(e)
-                        }))
-                        
-                except Exception as e:
-                    logger.error(f"Audio processing error: {e}")
-                    await websocket.send_text(json.dumps({
-                        "type": "error",
-                        "message": str(e)
-                    }))
+            try:
+                if received.get("bytes") is not None:
+                    if version < 2:
+                        raise ValueError("Binary frames need protocol version 2 (send a 'hello' first)")
+                    header, payload = unpack_frame(received["bytes"])
+                    frames["binary"] += 1
+                    if next_seq is not None and header.seq != next_seq:
+                        frames["lost"] += (header.seq - next_seq) & 0xFFFFFFFF
+                    next_seq = (header.seq + 1) & 0xFFFFFFFF
+                    if header.fmt is None:
+                        await transcribe(decoder.decode(bytes(payload)))
+                    else:
+                        if stream is None:
+                            stream = StreamingRecognizer(whisper_transcriber(model, language))
+                        await feed(decoder.decode_frame(header, payload))
+                    continue
+                
+                message = json.loads(received["text"])
+                frames["json"] += 1
+                
+                if message["type"] == "hello":
+                    offered = message.get("versions") or [message.get("version", 1)]
+                    common = [v for v in offered if v in PROTOCOL_VERSIONS]
+                    version = max(common) if common else 1
+                    await send({
+                        "type": "hello",
+                        "version": version,
+                        "versions": list(PROTOCOL_VERSIONS),
+                        "frame_header": FRAME_HEADER.format,
+                        "formats": {"clip": FRAME_CLIP, **FRAME_CODES},
+                    })
+                
+                elif message["type"] == "start":
+                    language = message.get("language", "he")
+                    stream = StreamingRecognizer(whisper_transcriber(model, language))
+                    stream_format = {
+                        "sample_rate": int(message.get("sample_rate", SAMPLE_RATE)),
+                        "channels": int(message.get("channels", 1)),
+                        "fmt": message.get("format", "s16le"),
+                    }
+                    next_seq = None
+                    await send({"type": "ready"})
+                
+                elif message["type"] == "pcm":
+                    if stream is None:
+                        raise ValueError("Send a 'start' message before PCM frames")
+                    await feed(decoder.decode_pcm(base64.b64decode(message["data"]), **stream_format))
+                
+                elif message["type"] == "stop":
+                    if stream is not None:
+                        for event in await asyncio.to_thread(stream.flush):
+                            await send(event)
+                        await send({"type": "done", "stats": {**stream.get_stats(), "frames": dict(frames)}})
+                    stream = None
+                    next_seq = None
+                
+                elif message["type"] == "audio":
+                    # Decode base64 audio, then in memory (no temp file)
+                    await transcribe(decoder.decode(base64.b64decode(message["data"])))
+                
+            except Exception as e:
+                logger.error(f"Audio processing error: {e}")
+                await send({
+                    "type": "error",
+                    "message": str(e)
+                })
                     
     except WebSocketDisconnect:
         logger.info("WebSocket connection closed")
@@ -178,6 +338,20 @@ async def websocket_endpoint(websocket: WebSocket):
         logger.error(f"WebSocket error: {e}")
 
 
+def transcribe_clip(samples):
+    """Transcribe a whole clip (segments decoded here, in the worker thread)"""
+    segments, info = model.transcribe(
+        samples,
+        language="he",  # Hebrew by default
+        beam_size=1,
+        temperature=0.0,
+        condition_on_previous_text=False,
+        word_timestamps=True,
+        vad_filter=True
+    )
+    return list(segments)
+
+
 @app.get("/health")
 def health_check():
     """Health check endpoint"""
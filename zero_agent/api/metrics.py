@@ -0,0 +1,478 @@
+"""
+Prometheus metrics for the Zero Agent API
+==========================================
+Dependency-free counters / gauges / histograms rendered in the Prometheus
+text format, plus an ASGI middleware that records per-route request counts
+and latency.
+
+Metric names match monitoring/grafana-dashboard-zero.json:
+    requests_total{method, path, status}
+    request_duration_seconds_bucket{method, path, le}
+"""
+
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from contextlib import contextmanager
+import bisect
+import threading
+import time
+
+# Latency buckets (seconds) - chat requests live in the 1-30s range
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+# Decode speed buckets (tokens / second)
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 40, 60, 80, 100, 150, 200)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class: a named family of time series keyed by label values"""
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> Iterable[str]:
+        return []
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """
+    Value that can go up and down
+
+    `aggregate` says how merge_expositions() combines the workers' values:
+    "sum" for per-worker quantities (queue depth), "max" for values every
+    worker reports the same way (shared cache size, model residency).
+    """
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 aggregate: str = "sum"):
+        super().__init__(name, documentation, labelnames)
+        self.aggregate = aggregate
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram (Prometheus semantics)"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._series[key] = series
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a `with` block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def _samples(self):
+        with self._lock:
+            items = [(key, (list(s[0]), s[1], s[2])) for key, s in self._series.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class MetricsRegistry:
+    """Holds metric families and renders the /metrics payload"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              aggregate: str = "sum") -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, aggregate))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]):
+        """Register fn() run before each render (used to refresh gauges)"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"[Metrics] Collector failed: {e}")
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def render_merged(self, peer_texts: Iterable[str]) -> str:
+        """This process's metrics merged with other workers' rendered snapshots"""
+        own = self.render()
+        modes = {name: metric.aggregate for name, metric in self._metrics.items() if isinstance(metric, Gauge)}
+        return merge_expositions([own, *peer_texts], modes)
+
+
+def merge_expositions(texts: Sequence[str], gauge_modes: Optional[Dict[str, str]] = None) -> str:
+    """
+    Merge Prometheus text expositions from several worker processes
+
+    Identical series are summed (counters, histogram buckets / sums /
+    counts, and gauges unless gauge_modes maps the family to "max").
+    Families and series keep their first-seen order.
+    """
+    gauge_modes = gauge_modes or {}
+    families: Dict[str, Dict] = {}
+    for text in texts:
+        family = None
+        for line in text.splitlines():
+            if line.startswith("# HELP "):
+                name = line.split(" ", 3)[2]
+                family = families.setdefault(name, {"help": line, "type": None, "samples": {}})
+            elif line.startswith("# TYPE "):
+                name, type_name = line.split(" ")[2:4]
+                family = families.setdefault(name, {"help": None, "type": None, "samples": {}})
+                family["type"] = family["type"] or line
+                family["kind"] = type_name
+            elif line and not line.startswith("#") and family is not None:
+                series, _, raw = line.rpartition(" ")
+                value = float("inf") if raw == "+Inf" else float(raw)
+                samples = family["samples"]
+                if series not in samples:
+                    samples[series] = value
+                elif family.get("kind") == "gauge" and gauge_modes.get(series.split("{")[0]) == "max":
+                    samples[series] = max(samples[series], value)
+                else:
+                    samples[series] += value
+    lines = []
+    for family in families.values():
+        lines.extend(line for line in (family["help"], family["type"]) if line)
+        lines.extend(f"{series} {_format_value(value)}" for series, value in family["samples"].items())
+    return "\n".join(lines) + "\n"
+
+
+# ============================================================================
+# Global registry and the metrics the API records
+# ============================================================================
+
+REGISTRY = MetricsRegistry()
+
+REQUESTS_TOTAL = REGISTRY.counter(
+    "requests_total", "HTTP requests by route and status", ["method", "path", "status"]
+)
+REQUEST_DURATION = REGISTRY.histogram(
+    "request_duration_seconds", "HTTP request latency by route", ["method", "path"]
+)
+CHAT_STAGE_DURATION = REGISTRY.histogram(
+    "chat_stage_duration_seconds", "Time spent in each /api/chat pipeline stage", ["stage"]
+)
+CHAT_TOKENS_PER_SECOND = REGISTRY.histogram(
+    "chat_llm_tokens_per_second", "LLM decode speed for /api/chat", ["model"],
+    buckets=TOKENS_PER_SECOND_BUCKETS
+)
+LLM_QUEUE_WAIT = REGISTRY.histogram(
+    "llm_queue_wait_seconds", "Time spent waiting for an LLM scheduler slot", ["model", "priority"]
+)
+LLM_TTFT = REGISTRY.histogram(
+    "llm_ttft_seconds", "Time to first token per Ollama call (measured when streaming)", ["model"]
+)
+LLM_LOAD_SECONDS = REGISTRY.histogram(
+    "llm_load_seconds", "Model load time reported by Ollama (cold starts show up here)", ["model"]
+)
+LLM_PREFILL_TPS = REGISTRY.histogram(
+    "llm_prefill_tokens_per_second", "Prompt evaluation speed reported by Ollama", ["model"],
+    buckets=(10, 50, 100, 250, 500, 1000, 2000, 4000, 8000)
+)
+LLM_DECODE_TPS = REGISTRY.histogram(
+    "llm_decode_tokens_per_second", "Generation speed reported by Ollama", ["model"],
+    buckets=TOKENS_PER_SECOND_BUCKETS
+)
+LLM_QUEUE_DEPTH = REGISTRY.gauge(
+    "llm_queue_depth", "Requests waiting for an LLM scheduler slot", ["model"]
+)
+LLM_ACTIVE = REGISTRY.gauge(
+    "llm_active_requests", "Requests currently holding an LLM scheduler slot", ["model"]
+)
+LLM_MODEL_RESIDENT = REGISTRY.gauge(
+    "llm_model_resident", "1 if Ollama has the model loaded (last /api/ps poll)", ["model"], aggregate="max"
+)
+
+STT_QUEUE_WAIT = REGISTRY.histogram(
+    "stt_queue_wait_seconds", "Time a transcription waited for a free Whisper instance"
+)
+STT_TRANSCRIBE_SECONDS = REGISTRY.histogram(
+    "stt_transcribe_seconds", "Time spent transcribing one request on a Whisper instance"
+)
+STT_AUDIO_SECONDS = REGISTRY.counter(
+    "stt_audio_seconds_total", "Seconds of audio transcribed"
+)
+STT_QUEUE_DEPTH = REGISTRY.gauge(
+    "stt_queue_depth", "Transcriptions waiting for a Whisper instance"
+)
+STT_ACTIVE = REGISTRY.gauge(
+    "stt_active_transcriptions", "Transcriptions currently running"
+)
+
+CHAT_CONTEXT_DROPPED = REGISTRY.counter(
+    "chat_context_dropped_total", "Context providers dropped from a prompt (timeout or error)",
+    ["provider", "reason"]
+)
+
+CHAT_PROMPT_TOKENS = REGISTRY.histogram(
+    "chat_prompt_tokens", "Estimated prompt tokens after packing", ["num_ctx"],
+    buckets=(256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+)
+CHAT_PROMPT_SECTIONS_TRIMMED = REGISTRY.counter(
+    "chat_prompt_sections_trimmed_total", "Prompt sections cut to fit the token budget",
+    ["section", "action"]
+)
+
+LLM_PREFILL_TOKENS = REGISTRY.counter(
+    "llm_prefill_tokens_total", "Prompt tokens of session chat turns by source (evaluated / reused from cache)",
+    ["model", "source"]
+)
+
+ROUTER_DECISIONS = REGISTRY.counter(
+    "router_decisions_total", "Cost-based routing decisions (preferred vs. chosen model)",
+    ["preferred", "chosen", "reason"]
+)
+
+RESPONSE_CACHE_LOOKUPS = REGISTRY.counter(
+    "response_cache_lookups_total", "/api/chat response cache lookups by result", ["result"]
+)
+RESPONSE_CACHE_SAVED_SECONDS = REGISTRY.counter(
+    "response_cache_saved_generation_seconds_total", "LLM generation time saved by response cache hits"
+)
+RESPONSE_CACHE_ENTRIES = REGISTRY.gauge(
+    "response_cache_entries", "Answers currently held in the response cache", aggregate="max"
+)
+RESPONSE_CACHE_HIT_RATIO = REGISTRY.gauge(
+    "response_cache_hit_ratio", "Response cache hits / lookups since start", aggregate="max"
+)
+
+BACKGROUND_QUEUE_DEPTH = REGISTRY.gauge(
+    "background_queue_depth", "Items waiting in a background writer queue", ["writer"]
+)
+BACKGROUND_DROPPED = REGISTRY.gauge(
+    "background_dropped_items", "Items dropped because a background writer queue was full", ["writer"]
+)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Time one /api/chat stage: `with stage_timer("web_search"): ...`"""
+    with CHAT_STAGE_DURATION.time(stage=stage):
+        yield
+
+
+def observe_llm_stats(stats: Dict[str, float], model: str):
+    """
+    Record LLM stage metrics from an Ollama stats dict (see StreamingMultiModelLLM)
+
+    Uses the measured time-to-first-token when streaming, otherwise the
+    load + prefill durations Ollama reports for the call.
+    """
+    if not stats:
+        return
+    ttft = stats.get("ttft")
+    if ttft is None and stats.get("prompt_eval_duration") is not None:
+        ttft = (stats.get("load_duration", 0) + stats.get("prompt_eval_duration", 0)) / 1e9
+    if ttft is not None:
+        CHAT_STAGE_DURATION.observe(ttft, stage="llm_ttft")
+    if stats.get("elapsed") is not None:
+        CHAT_STAGE_DURATION.observe(stats["elapsed"], stage="llm_total")
+    eval_count = stats.get("eval_count")
+    eval_duration = stats.get("eval_duration")
+    if eval_count and eval_duration:
+        CHAT_TOKENS_PER_SECOND.observe(eval_count / (eval_duration / 1e9), model=model)
+
+
+def observe_context_result(result):
+    """gather_context() result hook: stage latency plus dropped providers"""
+    if result.status == "timeout":
+        CHAT_CONTEXT_DROPPED.inc(provider=result.name, reason="timeout")
+        return
+    CHAT_STAGE_DURATION.observe(result.duration, stage=result.stage)
+    if result.status != "ok":
+        CHAT_CONTEXT_DROPPED.inc(provider=result.name, reason=result.status)
+
+
+def observe_packed_prompt(packed):
+    """Record prompt size and trimmed sections of a PackedPrompt"""
+    CHAT_PROMPT_TOKENS.observe(packed.tokens, num_ctx=str(packed.num_ctx))
+    for section in packed.truncated:
+        CHAT_PROMPT_SECTIONS_TRIMMED.inc(section=section, action="truncated")
+    for section in packed.dropped:
+        CHAT_PROMPT_SECTIONS_TRIMMED.inc(section=section, action="dropped")
+
+
+def observe_prefill(stats: Dict[str, float], model: str):
+    """Record prefill tokens evaluated vs. reused for a session chat turn"""
+    if stats.get("prompt_eval_count") is not None:
+        LLM_PREFILL_TOKENS.inc(stats["prompt_eval_count"], model=model, source="evaluated")
+    if stats.get("prefill_reused"):
+        LLM_PREFILL_TOKENS.inc(stats["prefill_reused"], model=model, source="reused")
+
+
+def observe_llm_call(model: str, sample: Dict[str, float]):
+    """LLMTelemetry listener: per-model TTFT, load, prefill and decode histograms"""
+    if "ttft" in sample:
+        LLM_TTFT.observe(sample["ttft"], model=model)
+    if "load_seconds" in sample:
+        LLM_LOAD_SECONDS.observe(sample["load_seconds"], model=model)
+    if "prefill_tps" in sample:
+        LLM_PREFILL_TPS.observe(sample["prefill_tps"], model=model)
+    if "decode_tps" in sample:
+        LLM_DECODE_TPS.observe(sample["decode_tps"], model=model)
+
+
+def observe_transcription(sample: Dict[str, float]):
+    """WhisperPool listener: queue wait, transcription time and audio seconds"""
+    STT_QUEUE_WAIT.observe(sample["wait"])
+    STT_TRANSCRIBE_SECONDS.observe(sample["seconds"])
+    STT_AUDIO_SECONDS.inc(sample["audio_seconds"])
+
+
+def observe_route_decision(decision):
+    """ContextAwareRouter listener: preferred -> chosen model counts by reason"""
+    ROUTER_DECISIONS.inc(preferred=decision.preferred, chosen=decision.chosen, reason=decision.reason)
+
+
+def observe_queue_wait(model: str, priority, waited: float):
+    """Scheduler wait listener (LLMScheduler.add_wait_listener)"""
+    LLM_QUEUE_WAIT.observe(waited, model=model, priority=getattr(priority, "name", str(priority)).lower())
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording requests_total / request_duration_seconds
+
+    The path label is the matched route template (e.g. /zero_logo/{filename})
+    so label cardinality stays bounded; unmatched requests use "unmatched".
+    Streaming responses are timed until the last body chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_holder = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "GET")
+            REQUESTS_TOTAL.inc(method=method, path=path, status=str(status_holder["status"]))
+            REQUEST_DURATION.observe(time.perf_counter() - start, method=method, path=path)
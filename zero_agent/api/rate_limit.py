@@ -0,0 +1,335 @@
+"""
+Rate Limiting - sliding-window counters with per-route costs
+=============================================================
+Each client key (the client IP) gets a budget of `limit` cost units per
+`window_seconds`. A request spends the cost of its route: an LLM call costs
+far more than a stats read, and health checks / metrics scrapes / static
+files are free. Usage is a sliding-window counter - the current window's
+count plus the previous window's count weighted by how much of it still
+overlaps the sliding window - so every update is O(1) and each key holds
+two integers instead of a timestamp per request.
+
+    limiter = RateLimiter(limit=120, window_seconds=60, costs=DEFAULT_ROUTE_COSTS)
+    decision = limiter.check("10.0.0.7", "/api/chat")
+    decision.allowed, decision.remaining, decision.retry_after
+
+Backends:
+    InMemoryBackend - per process; monotonic clock, idle keys evicted
+                      periodically and the key count capped (LRU)
+    SQLiteBackend   - a shared database file, so the limits hold across
+                      several uvicorn worker processes (wall clock, since
+                      monotonic clocks are not comparable between processes);
+                      a short busy timeout, and the middleware runs it in a
+                      worker thread so a contended lock never stalls the loop
+
+RateLimitMiddleware applies the limiter to every HTTP request and answers
+429 with Retry-After / X-RateLimit-* headers.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import json
+import logging
+import math
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Cost units per request, by path prefix (longest prefix wins).
+# Budget 120 units/min keeps the guide's 10 chat requests per minute per IP.
+DEFAULT_ROUTE_COSTS: Dict[str, int] = {
+    "/api/chat": 12,
+    "/api/agent/direct": 12,
+    "/api/tools/project-review": 12,
+    "/api/computer-control/analyze-screen": 8,
+    "/api/voice/transcribe": 6,
+    "/api/tts": 4,
+    "/api/tools": 2,
+    "/api/computer-control": 2,
+    "/api/": 1,
+    # Free: probes, scrapes, UI and static assets
+    "/health": 0,
+    "/metrics": 0,
+    "/": 0,
+}
+
+
+@dataclass
+class RateDecision:
+    """Outcome of one RateLimiter.check()"""
+    allowed: bool
+    cost: int
+    limit: int
+    remaining: int
+    retry_after: int  # seconds until the request would fit (0 when allowed)
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(self.retry_after)
+        return headers
+
+
+def _weighted_usage(current: int, previous: int, elapsed_fraction: float) -> float:
+    """Sliding-window estimate: previous window counted for the part still inside the window"""
+    return current + previous * (1.0 - elapsed_fraction)
+
+
+def _retry_after(current: int, previous: int, cost: int, limit: int,
+                 window: float, into_window: float) -> int:
+    """
+    Seconds until `cost` more units fit
+
+    Within this window the previous window's weight keeps decaying; if that
+    is not enough the caller has to wait for the next window, where the
+    current count becomes the decaying one.
+    """
+    room = limit - cost - current
+    if previous and room >= 0:
+        # previous * (1 - t / window) <= room  ->  t >= window * (1 - room / previous)
+        wait = window * (1.0 - room / previous) - into_window
+        return max(1, math.ceil(wait))
+    wait = window - into_window
+    room = limit - cost
+    if current and room < current:
+        wait += window * (1.0 - max(room, 0) / current)
+    return max(1, math.ceil(wait))
+
+
+class InMemoryBackend:
+    """
+    Per-process sliding-window counters
+
+    State per key: (window index, current count, previous count, last seen).
+    Keys idle for two windows carry no weight and are evicted every
+    `evict_interval` seconds; beyond `max_keys` the least recently seen key
+    is dropped, so memory stays bounded under a flood of distinct IPs.
+    """
+
+    shared = False
+
+    def __init__(self, max_keys: int = 100_000, evict_interval: float = 30.0, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.evict_interval = evict_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._keys: "OrderedDict[str, list]" = OrderedDict()
+        self._next_evict = clock() + evict_interval
+        self.evicted = 0
+
+    def hit(self, key: str, cost: int, limit: int, window: float) -> Tuple[bool, int, int]:
+        """Spend `cost` units if they fit; returns (allowed, remaining, retry_after)"""
+        now = self._clock()
+        index = int(now // window)
+        into_window = now - index * window
+        with self._lock:
+            if now >= self._next_evict:
+                self._evict(now, window)
+            state = self._keys.get(key)
+            if state is None:
+                state = self._keys[key] = [index, 0, 0, now]
+                if len(self._keys) > self.max_keys:
+                    self._keys.popitem(last=False)
+                    self.evicted += 1
+            else:
+                self._keys.move_to_end(key)
+                if state[0] != index:
+                    # Roll over: the old current becomes previous only if it was the last window
+                    state[2] = state[1] if state[0] == index - 1 else 0
+                    state[1] = 0
+                    state[0] = index
+                state[3] = now
+            used = _weighted_usage(state[1], state[2], into_window / window)
+            if used + cost <= limit:
+                state[1] += cost
+                return True, int(limit - used - cost), 0
+            return False, max(0, int(limit - used)), _retry_after(
+                state[1], state[2], cost, limit, window, into_window)
+
+    def _evict(self, now: float, window: float):
+        cutoff = now - 2 * window
+        while self._keys:
+            key, state = next(iter(self._keys.items()))
+            if state[3] > cutoff:
+                break  # LRU order: everything after this was seen more recently
+            del self._keys[key]
+            self.evicted += 1
+        self._next_evict = now + self.evict_interval
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class SQLiteBackend:
+    """
+    Sliding-window counters in a shared SQLite file
+
+    Every worker process opens the same file; one short IMMEDIATE
+    transaction per request reads and updates the key's row, so the
+    processes see one budget per key. Rows idle for two windows are
+    deleted every `evict_interval` seconds. A lock held longer than
+    `busy_timeout` raises sqlite3.OperationalError, and RateLimiter lets
+    the request through rather than queue it.
+    """
+
+    shared = True
+
+    def __init__(self, path, evict_interval: float = 30.0, clock=time.time, busy_timeout: float = 0.25):
+        self.path = Path(path)
+        self.busy_timeout = busy_timeout
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.evict_interval = evict_interval
+        self._clock = clock
+        self._local = threading.local()
+        self._next_evict = 0.0
+        self.evicted = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits ("
+                " key TEXT PRIMARY KEY, window_index INTEGER, current INTEGER,"
+                " previous INTEGER, last_seen REAL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key: str, cost: int, limit: int, window: float) -> Tuple[bool, int, int]:
+        now = self._clock()
+        index = int(now // window)
+        into_window = now - index * window
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if now >= self._next_evict:
+                self.evicted += conn.execute(
+                    "DELETE FROM rate_limits WHERE last_seen < ?", (now - 2 * window,)).rowcount
+                self._next_evict = now + self.evict_interval
+            row = conn.execute(
+                "SELECT window_index, current, previous FROM rate_limits WHERE key = ?", (key,)).fetchone()
+            current = previous = 0
+            if row is not None:
+                if row[0] == index:
+                    current, previous = row[1], row[2]
+                elif row[0] == index - 1:
+                    previous = row[1]
+            used = _weighted_usage(current, previous, into_window / window)
+            allowed = used + cost <= limit
+            if allowed:
+                current += cost
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limits (key, window_index, current, previous, last_seen)"
+                " VALUES (?, ?, ?, ?, ?)", (key, index, current, previous, now))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if allowed:
+            return True, int(limit - used - cost), 0
+        return False, max(0, int(limit - used)), _retry_after(
+            current, previous, cost, limit, window, into_window)
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM rate_limits").fetchone()[0]
+
+
+class RateLimiter:
+    """Per-key budget of cost units per window, spent by route cost"""
+
+    def __init__(self, limit: int = 120, window_seconds: float = 60.0,
+                 costs: Optional[Dict[str, int]] = None, backend=None, default_cost: int = 1):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.default_cost = default_cost
+        # Longest prefix first
+        self.costs = sorted((costs if costs is not None else DEFAULT_ROUTE_COSTS).items(),
+                            key=lambda item: len(item[0]), reverse=True)
+        self.backend = backend if backend is not None else InMemoryBackend()
+        self.allowed = 0
+        self.rejected = 0
+
+    def cost_of(self, path: str) -> int:
+        for prefix, cost in self.costs:
+            if path.startswith(prefix):
+                return cost
+        return self.default_cost
+
+    def check(self, key: str, path: str, cost: Optional[int] = None) -> RateDecision:
+        """Spend the route's cost for `key`; free routes are always allowed"""
+        cost = self.cost_of(path) if cost is None else cost
+        if cost <= 0:
+            return RateDecision(True, 0, self.limit, self.limit, 0)
+        try:
+            allowed, remaining, retry_after = self.backend.hit(key, cost, self.limit, self.window_seconds)
+        except sqlite3.Error as e:
+            # Fail open: a locked / broken shared store must not take the API down
+            logger.warning(f"Rate limit backend error, allowing request: {e}")
+            return RateDecision(True, cost, self.limit, self.limit, 0)
+        if allowed:
+            self.allowed += 1
+        else:
+            self.rejected += 1
+        return RateDecision(allowed, cost, self.limit, remaining, retry_after)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "window_seconds": self.window_seconds,
+            "backend": type(self.backend).__name__,
+            "shared": self.backend.shared,
+            "keys": len(self.backend),
+            "evicted": self.backend.evicted,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "costs": dict(self.costs),
+        }
+
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI middleware enforcing a RateLimiter per client IP
+
+    Runs before routing, so costs are matched on the raw path. WebSocket
+    connections are not limited here. Shared (SQLite) backends are checked
+    in a worker thread: their write transaction must not block the loop.
+    """
+
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        client = scope.get("client")
+        key = client[0] if client else "unknown"
+        path = scope.get("path", "/")
+        if self.limiter.backend.shared and self.limiter.cost_of(path) > 0:
+            decision = await asyncio.to_thread(self.limiter.check, key, path)
+        else:
+            decision = self.limiter.check(key, path)
+        if decision.allowed:
+            await self.app(scope, receive, send)
+            return
+
+        body = json.dumps({
+            "detail": f"Rate limit exceeded. Try again in {decision.retry_after}s."
+        }).encode()
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        headers += [(name.lower().encode(), value.encode()) for name, value in decision.headers().items()]
+        await send({"type": "http.response.start", "status": 429, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,243 @@
+"""
+Server-Sent Events protocol for /api/chat/stream
+=================================================
+Version 1 (default, what the current web UI parses):
+
+    data: {"chunk": "...", "full": "<everything so far>", "done": false}
+
+  One event per token and the whole text every time, so an N-token answer
+  costs O(N^2) bytes.
+
+Version 2 (opt in with `X-Stream-Protocol: 2`, `?protocol=2` or
+`"protocol": 2` in the body):
+
+    event: start       data: {"v": 2, "type": "start", "model": ...}
+    event: delta       data: {"type": "delta", "seq": 3, "d": "<new text only>"}
+    event: checkpoint  data: {"type": "checkpoint", "seq": 9, "full": "..."}
+    event: done        data: {"type": "done", "seq": 12, "full": "...", ...}
+    event: error       data: {"type": "error", "error": "..."}
+
+  Tokens are coalesced into frames bounded by size and by time. The first
+  token always goes out at once, so time-to-first-token is unchanged.
+  The full text is sent only in periodic checkpoints (for clients that
+  lost frames) and in the final frame. Every v2 event carries `id: <seq>`.
+  JSON is written with ensure_ascii=False, so Hebrew takes 2 UTF-8 bytes per
+  character instead of a 6-byte \\uXXXX escape.
+"""
+
+from typing import Any, AsyncIterator, Awaitable, Callable, Mapping, Optional
+import asyncio
+import json
+import time
+
+PROTOCOL_V1 = 1
+PROTOCOL_V2 = 2
+SUPPORTED_PROTOCOLS = (PROTOCOL_V1, PROTOCOL_V2)
+PROTOCOL_HEADER = "X-Stream-Protocol"
+
+
+def negotiate_protocol(headers: Optional[Mapping[str, str]] = None,
+                       query: Optional[Mapping[str, str]] = None,
+                       body: Optional[Mapping[str, Any]] = None) -> int:
+    """
+    Pick the stream protocol version for a request
+
+    Header wins over the query string, which wins over the body. Unknown or
+    invalid versions fall back to the highest supported version below them
+    (so old clients always get v1).
+    """
+    requested = None
+    for source, key in ((headers, PROTOCOL_HEADER), (query, "protocol"), (body, "protocol")):
+        if source is not None and source.get(key) not in (None, ""):
+            requested = source.get(key)
+            break
+    try:
+        version = int(requested) if requested is not None else PROTOCOL_V1
+    except (TypeError, ValueError):
+        return PROTOCOL_V1
+    supported = [v for v in SUPPORTED_PROTOCOLS if v <= version]
+    return max(supported) if supported else PROTOCOL_V1
+
+
+def sse_event(payload: Mapping[str, Any], event: Optional[str] = None,
+              event_id: Optional[int] = None, ensure_ascii: bool = True) -> str:
+    """Format one SSE event"""
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(payload, ensure_ascii=ensure_ascii)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class FullTextEncoder:
+    """Protocol v1 - one frame per chunk carrying the accumulated text"""
+    version = PROTOCOL_V1
+
+    def __init__(self):
+        self.text = ""
+
+    def start(self, **meta) -> str:
+        return ""
+
+    def add(self, chunk: str) -> str:
+        if not chunk:
+            return ""
+        self.text += chunk
+        return sse_event({"chunk": chunk, "full": self.text, "done": False})
+
+    def flush_in(self) -> Optional[float]:
+        return None
+
+    def flush(self) -> str:
+        return ""
+
+    def done(self, **extra) -> str:
+        return sse_event({"chunk": "", "full": self.text, "done": True, **extra})
+
+    def reply(self, text: str, **extra) -> str:
+        """Whole answer at once (stages that answer without the LLM)"""
+        self.text = text
+        return sse_event({"chunk": text, "full": text, "done": True, **extra})
+
+    def error(self, message: str) -> str:
+        return sse_event({"error": message, "done": True})
+
+    async def encode(self, chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+        """Turn an async chunk stream into SSE frames"""
+        async for frame in _encode(self, chunks):
+            yield frame
+
+
+class DeltaEncoder(FullTextEncoder):
+    """
+    Protocol v2 - coalesced deltas with periodic checkpoints
+
+    Args:
+        max_chars: Flush once this many characters are buffered
+        max_delay: Flush buffered text at most this many seconds after it arrived
+        checkpoint_chars: Send the full text after this many new characters
+    """
+    version = PROTOCOL_V2
+
+    def __init__(self, max_chars: int = 64, max_delay: float = 0.05, checkpoint_chars: int = 4000):
+        super().__init__()
+        self.max_chars = max_chars
+        self.max_delay = max_delay
+        self.checkpoint_chars = checkpoint_chars
+        self.seq = 0
+        self._buffer = []
+        self._buffered = 0
+        self._buffered_since: Optional[float] = None
+        self._since_checkpoint = 0
+
+    def _event(self, payload: dict) -> str:
+        self.seq += 1
+        return sse_event({**payload, "seq": self.seq}, event=payload["type"],
+                         event_id=self.seq, ensure_ascii=False)
+
+    def start(self, **meta) -> str:
+        self.seq += 1
+        return sse_event({"v": self.version, "type": "start", **meta}, event="start",
+                         event_id=self.seq, ensure_ascii=False)
+
+    def add(self, chunk: str) -> str:
+        if not chunk:
+            return ""
+        self.text += chunk
+        self._buffer.append(chunk)
+        self._buffered += len(chunk)
+        if self._buffered_since is None:
+            self._buffered_since = time.monotonic()
+        # First token goes out immediately; after that coalesce
+        if self.seq <= 1 or self._buffered >= self.max_chars:
+            return self.flush()
+        return ""
+
+    def flush_in(self) -> Optional[float]:
+        """Seconds until buffered text must be flushed (None = nothing buffered)"""
+        if self._buffered_since is None:
+            return None
+        return max(0.0, self._buffered_since + self.max_delay - time.monotonic())
+
+    def flush(self) -> str:
+        if not self._buffer:
+            return ""
+        delta = "".join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        self._buffered_since = None
+        frames = self._event({"type": "delta", "d": delta})
+        self._since_checkpoint += len(delta)
+        if self._since_checkpoint >= self.checkpoint_chars:
+            self._since_checkpoint = 0
+            frames += self._event({"type": "checkpoint", "full": self.text})
+        return frames
+
+    def done(self, **extra) -> str:
+        return self.flush() + self._event({"type": "done", "full": self.text, **extra})
+
+    def reply(self, text: str, **extra) -> str:
+        self.text = text
+        return self._event({"type": "done", "full": text, **extra})
+
+    def error(self, message: str) -> str:
+        return self.flush() + self._event({"type": "error", "error": message})
+
+
+async def watch_disconnect(receive: Callable[[], Awaitable[dict]], on_disconnect: Callable[[], Any]):
+    """
+    Call `on_disconnect()` as soon as the client goes away
+
+    Run as a task next to a streaming response (after the request body has
+    been read). Servers on ASGI spec >= 2.4 only report a disconnect when a
+    write fails, which can be a long time during prefill or between
+    coalesced frames - this notices it right away.
+    """
+    while True:
+        message = await receive()
+        if message.get("type") == "http.disconnect":
+            on_disconnect()
+            return
+
+
+def make_encoder(version: int) -> FullTextEncoder:
+    """Encoder for a negotiated protocol version"""
+    return DeltaEncoder() if version >= PROTOCOL_V2 else FullTextEncoder()
+
+
+async def _encode(encoder: FullTextEncoder, chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    Drive an encoder from an async chunk stream
+
+    Waiting for the next chunk is bounded by the encoder's flush deadline, so
+    buffered text is sent on time even when the model pauses between tokens.
+    The pending read is never cancelled on timeout - we keep waiting on it.
+    """
+    iterator = chunks.__aiter__()
+    pending = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=encoder.flush_in())
+            if not done:
+                frame = encoder.flush()
+                if frame:
+                    yield frame
+                continue
+            task, pending = pending, None
+            try:
+                chunk = task.result()
+            except StopAsyncIteration:
+                break
+            frame = encoder.add(chunk)
+            if frame:
+                yield frame
+        frame = encoder.flush()
+        if frame:
+            yield frame
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
@@ -0,0 +1,339 @@
+"""
+Audio I/O - decode uploaded audio into reusable float32 buffers
+================================================================
+The voice endpoints used to write every upload to disk (a fixed
+workspace/temp_audio.wav in the API, a NamedTemporaryFile in the STT
+services) and hand the path to faster-whisper, which read it back. Besides
+two file-system round trips per utterance, concurrent requests to the API
+overwrote each other's fixed temp file. The decoder works on the bytes in
+memory instead:
+
+    - WAV (8/16/32-bit PCM) and raw PCM frames are converted with NumPy
+      directly - downmixed to mono and resampled to 16 kHz
+    - anything else (webm/opus, ogg, mp3, ...) goes through faster-whisper's
+      in-process PyAV decoder on a BytesIO
+    - the float32 sample buffers of the WAV/PCM path come from a small pool
+      and are reused, and uploads are capped (`max_bytes` encoded,
+      `max_seconds` decoded)
+
+    decoder = AudioDecoder()
+    with decoder.decode(data) as audio:
+        segments, info = model.transcribe(audio.samples, language="he")
+
+WhisperPool.transcribe() also accepts a PooledAudio and releases it once
+the model is done with it (see zero_agent/core/whisper_pool.py).
+
+Binary audio frames (WebSocket protocol v2 of stt_service_web.py) carry
+raw samples behind a 12-byte little-endian header instead of base64 in
+JSON:
+
+    version u8 | format u8 | channels u16 | sample_rate u32 | seq u32 | payload
+
+    frame = pack_frame(pcm_bytes, seq=7)            # s16le, 16 kHz mono
+    header, payload = unpack_frame(frame)
+    decoder.decode_frame(header, payload)
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+import io
+import logging
+import struct
+import threading
+import wave
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000           # what Whisper expects
+DEFAULT_MAX_SECONDS = 600.0   # decoded audio per request
+DEFAULT_MAX_BYTES = 25 * 1024 * 1024
+DEFAULT_KEEP = 4              # idle buffers kept for reuse
+BUFFER_STEP = 30 * SAMPLE_RATE  # buffers grow in 30 s steps (one Whisper window)
+
+# Raw PCM sample formats: dtype and scale to [-1, 1]
+PCM_FORMATS = {
+    "s16le": ("<i2", 1.0 / 32768.0),
+    "s32le": ("<i4", 1.0 / 2147483648.0),
+    "f32le": ("<f4", 1.0),
+}
+# WAV sample width (bytes) -> PCM format; 8-bit WAV is unsigned and handled separately
+WAV_WIDTHS = {2: "s16le", 4: "s32le"}
+
+
+# Binary frame header (see the module docstring)
+FRAME_VERSION = 2
+FRAME_HEADER = struct.Struct("<BBHII")
+# Frame format codes: 0 = an encoded clip (WAV, webm, ...), else raw PCM
+FRAME_CLIP = 0
+FRAME_FORMATS = {1: "s16le", 2: "f32le", 3: "s32le"}
+FRAME_CODES = {name: code for code, name in FRAME_FORMATS.items()}
+
+
+class AudioTooLarge(ValueError):
+    """Upload longer / bigger than the decoder's caps"""
+
+
+class AudioDecodeError(ValueError):
+    """Bytes that are not decodable audio"""
+
+
+def is_wav(data: bytes) -> bool:
+    return len(data) >= 12 and data[:4] == b"RIFF" and data[8:12] == b"WAVE"
+
+
+def probe_duration(source) -> Optional[float]:
+    """
+    Length in seconds of encoded audio (bytes or a file path) read from the
+    WAV header or the container metadata, without decoding the samples;
+    None when it is not known up front
+    """
+    def open_source():
+        return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else str(source)
+
+    try:
+        with wave.open(open_source(), "rb") as wav:
+            return wav.getnframes() / wav.getframerate()
+    except (wave.Error, EOFError):
+        pass
+    try:
+        import av
+        with av.open(open_source()) as container:
+            stream = container.streams.audio[0]
+            if stream.duration is not None and stream.time_base is not None:
+                return float(stream.duration * stream.time_base)
+            if container.duration is not None:
+                return container.duration / av.time_base
+    except Exception as e:
+        logger.debug(f"Could not probe audio duration: {e}")
+    return None
+
+
+class FrameHeader(NamedTuple):
+    version: int
+    fmt: Optional[str]  # PCM format name, None for an encoded clip
+    channels: int
+    sample_rate: int
+    seq: int
+
+
+def pack_frame(payload: bytes, seq: int, fmt: Optional[str] = "s16le",
+               sample_rate: int = SAMPLE_RATE, channels: int = 1) -> bytes:
+    """Header + payload of one binary audio frame (`fmt` None = encoded clip)"""
+    code = FRAME_CLIP if fmt is None else FRAME_CODES[fmt]
+    return FRAME_HEADER.pack(FRAME_VERSION, code, channels, sample_rate, seq & 0xFFFFFFFF) + payload
+
+
+def unpack_frame(frame: bytes) -> Tuple[FrameHeader, memoryview]:
+    """Parse a binary audio frame; the payload is a zero-copy view"""
+    if len(frame) < FRAME_HEADER.size:
+        raise AudioDecodeError(f"Frame shorter than its {FRAME_HEADER.size}-byte header")
+    version, code, channels, sample_rate, seq = FRAME_HEADER.unpack_from(frame)
+    if version != FRAME_VERSION:
+        raise AudioDecodeError(f"Unsupported frame version {version}")
+    if code != FRAME_CLIP and code not in FRAME_FORMATS:
+        raise AudioDecodeError(f"Unknown frame format {code}")
+    if not channels or not sample_rate:
+        raise AudioDecodeError("Frame header needs channels and sample_rate")
+    header = FrameHeader(version, FRAME_FORMATS.get(code), channels, sample_rate, seq)
+    return header, memoryview(frame)[FRAME_HEADER.size:]
+
+
+@dataclass
+class PooledAudio:
+    """Decoded 16 kHz mono samples, backed by a pooled buffer until released"""
+    samples: Any              # float32 NumPy array (a view into the buffer)
+    sample_rate: int = SAMPLE_RATE
+    _release: Optional[Callable[[], None]] = field(default=None, repr=False)
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.sample_rate
+
+    def release(self):
+        """Return the buffer to the pool (idempotent); `samples` must not be used afterwards"""
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+    def __enter__(self) -> "PooledAudio":
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class AudioDecoder:
+    """
+    Bytes -> 16 kHz mono float32, into a pool of reusable buffers
+
+    Thread-safe. A buffer is lent out per decoded clip and comes back on
+    release(); up to `keep` idle buffers are kept (largest dropped first
+    beyond that), so steady traffic allocates nothing.
+    """
+
+    def __init__(self, max_seconds: float = DEFAULT_MAX_SECONDS, max_bytes: int = DEFAULT_MAX_BYTES,
+                 keep: int = DEFAULT_KEEP):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("AudioDecoder needs numpy (pip install numpy)")
+        self.max_seconds = max_seconds
+        self.max_samples = int(max_seconds * SAMPLE_RATE)
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self._idle: List[Any] = []
+        self._lock = threading.Lock()
+        self.stats = {"decoded": 0, "wav": 0, "pcm": 0, "container": 0, "rejected": 0,
+                      "allocated": 0, "reused": 0, "audio_seconds": 0.0}
+
+    # ------------------------------------------------------------------
+    # Buffers
+    # ------------------------------------------------------------------
+
+    def _check_length(self, samples: int, sample_rate: int = SAMPLE_RATE):
+        seconds = samples / sample_rate
+        if seconds > self.max_seconds:
+            self.stats["rejected"] += 1
+            raise AudioTooLarge(f"Audio is {seconds:.0f}s long (limit {self.max_seconds:.0f}s)")
+
+    def _lease(self, samples: int) -> PooledAudio:
+        """A PooledAudio whose `samples` is an uninitialised view of `samples` floats"""
+        with self._lock:
+            # Smallest idle buffer that fits (by index: arrays do not compare with ==)
+            fits = [i for i, b in enumerate(self._idle) if len(b) >= samples]
+            if fits:
+                buffer = self._idle.pop(min(fits, key=lambda i: len(self._idle[i])))
+                self.stats["reused"] += 1
+            else:
+                buffer = None
+        if buffer is None:
+            capacity = min(max(BUFFER_STEP, -(-samples // BUFFER_STEP) * BUFFER_STEP),
+                           max(self.max_samples, samples))
+            buffer = np.empty(capacity, dtype=np.float32)
+            self.stats["allocated"] += 1
+        return PooledAudio(buffer[:samples], SAMPLE_RATE, lambda: self._give_back(buffer))
+
+    def _give_back(self, buffer):
+        with self._lock:
+            self._idle.append(buffer)
+            if len(self._idle) > self.keep:
+                self._idle.pop(max(range(len(self._idle)), key=lambda i: len(self._idle[i])))
+
+    # ------------------------------------------------------------------
+    # Decoding
+    # ------------------------------------------------------------------
+
+    def decode(self, data: bytes) -> PooledAudio:
+        """Decode a WAV file or any container/codec PyAV understands"""
+        if len(data) > self.max_bytes:
+            self.stats["rejected"] += 1
+            raise AudioTooLarge(f"Audio upload is {len(data) // 1024} KB (limit {self.max_bytes // 1024} KB)")
+        if not data:
+            raise AudioDecodeError("Empty audio")
+        if is_wav(data):
+            try:
+                audio = self._decode_wav(data)
+                self.stats["wav"] += 1
+                return self._done(audio)
+            except (wave.Error, EOFError) as e:
+                # Float / compressed WAV variants: let the container decoder handle them
+                logger.debug(f"WAV fast path not applicable ({e}), using the container decoder")
+        audio = self._decode_container(data)
+        self.stats["container"] += 1
+        return self._done(audio)
+
+    def decode_pcm(self, data: bytes, sample_rate: int = SAMPLE_RATE, channels: int = 1,
+                   fmt: str = "s16le") -> PooledAudio:
+        """Decode raw interleaved PCM frames (`fmt` is one of PCM_FORMATS)"""
+        if fmt not in PCM_FORMATS:
+            raise AudioDecodeError(f"Unsupported PCM format: {fmt}")
+        dtype, scale = PCM_FORMATS[fmt]
+        frame = np.dtype(dtype).itemsize * channels
+        frames = np.frombuffer(data, dtype=dtype, count=len(data) // frame * channels)
+        self.stats["pcm"] += 1
+        return self._done(self._convert(frames, scale, sample_rate, channels))
+
+    def decode_frame(self, header: FrameHeader, payload) -> PooledAudio:
+        """Decode the payload of a binary frame (see unpack_frame)"""
+        if header.fmt is None:
+            return self.decode(bytes(payload))
+        return self.decode_pcm(payload, header.sample_rate, header.channels, header.fmt)
+
+    def _decode_wav(self, data: bytes) -> PooledAudio:
+        with wave.open(io.BytesIO(data), "rb") as wav:
+            channels = wav.getnchannels()
+            width = wav.getsampwidth()
+            rate = wav.getframerate()
+            self._check_length(wav.getnframes(), rate)
+            raw = wav.readframes(wav.getnframes())
+        if width == 1:
+            # 8-bit WAV is unsigned: centre it on zero
+            frames = np.frombuffer(raw, dtype=np.uint8).astype(np.int16) - 128
+            return self._convert(frames, 1.0 / 128.0, rate, channels)
+        if width not in WAV_WIDTHS:
+            raise wave.Error(f"{width * 8}-bit samples")
+        dtype, scale = PCM_FORMATS[WAV_WIDTHS[width]]
+        return self._convert(np.frombuffer(raw, dtype=dtype), scale, rate, channels)
+
+    def _convert(self, frames, scale: float, sample_rate: int, channels: int) -> PooledAudio:
+        """Interleaved samples -> pooled 16 kHz mono float32"""
+        count = len(frames) // channels
+        self._check_length(count, sample_rate)
+        mono = self._lease(count)
+        try:
+            if channels == 1:
+                np.multiply(frames, scale, out=mono.samples, dtype=np.float32)
+            else:
+                np.mean(frames[:count * channels].reshape(count, channels), axis=1,
+                        dtype=np.float32, out=mono.samples)
+                mono.samples *= scale
+        except BaseException:
+            mono.release()
+            raise
+        if sample_rate == SAMPLE_RATE:
+            return mono
+        with mono:
+            return self._resample(mono.samples, sample_rate)
+
+    def _resample(self, samples, sample_rate: int) -> PooledAudio:
+        """Linear interpolation to 16 kHz (speech-grade; containers are resampled by PyAV)"""
+        count = int(round(len(samples) * SAMPLE_RATE / sample_rate))
+        out = self._lease(count)
+        positions = np.arange(count, dtype=np.float64) * (sample_rate / SAMPLE_RATE)
+        out.samples[:] = np.interp(positions, np.arange(len(samples)), samples)
+        return out
+
+    def _decode_container(self, data: bytes) -> PooledAudio:
+        try:
+            from faster_whisper.audio import decode_audio
+        except ImportError as e:
+            raise AudioDecodeError(f"Only WAV/PCM audio is supported without faster-whisper: {e}")
+        try:
+            decoded = decode_audio(io.BytesIO(data), sampling_rate=SAMPLE_RATE)
+        except Exception as e:
+            raise AudioDecodeError(f"Could not decode audio: {e}")
+        self._check_length(len(decoded))
+        # PyAV already produced a fresh array - wrapping it beats copying it into a pooled one
+        return PooledAudio(decoded)
+
+    def _done(self, audio: PooledAudio) -> PooledAudio:
+        self.stats["decoded"] += 1
+        self.stats["audio_seconds"] += audio.duration
+        return audio
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            idle = len(self._idle)
+            idle_bytes = sum(b.nbytes for b in self._idle)
+        return {
+            **self.stats,
+            "idle_buffers": idle,
+            "idle_buffer_bytes": idle_bytes,
+            "max_seconds": self.max_seconds,
+            "max_bytes": self.max_bytes,
+        }
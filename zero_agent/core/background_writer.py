@@ -0,0 +1,143 @@
+"""
+Background Writer - batched post-response bookkeeping
+======================================================
+Work that does not change the reply (memory, RAG inserts, behavior learning,
+quality scoring) is queued here instead of running before the response is
+sent. A single worker task drains the queue, groups items into batches
+(flushed when `batch_size` items are waiting or `flush_interval` seconds
+have passed) and hands each batch to a sync flush function in a worker
+thread, so Chroma/JSON I/O never blocks the event loop.
+
+The queue is bounded: when it is full new items are dropped and counted
+rather than growing memory without limit.
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundWriter:
+    """
+    Bounded, batching work queue
+
+    Usage:
+        writer = BackgroundWriter(flush_fn=save_batch)
+        await writer.start()          # in lifespan startup
+        writer.submit(item)           # from request handlers (never blocks)
+        await writer.stop()           # in lifespan shutdown - drains the queue
+    """
+
+    def __init__(self,
+                 flush_fn: Callable[[List[Any]], None],
+                 max_queue: int = 1000,
+                 batch_size: int = 16,
+                 flush_interval: float = 2.0,
+                 name: str = "background-writer"):
+        self.flush_fn = flush_fn
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.name = name
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.stats = {
+            "submitted": 0,
+            "dropped": 0,
+            "flushed_items": 0,
+            "flushed_batches": 0,
+            "flush_errors": 0,
+            "last_flush_seconds": 0.0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Start the worker task on the current event loop"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(), name=self.name)
+        logger.info(f"{self.name} started (batch={self.batch_size}, interval={self.flush_interval}s)")
+
+    def submit(self, item: Any) -> bool:
+        """
+        Queue one item without blocking
+
+        Returns:
+            False if the item was dropped (writer stopped or queue full)
+        """
+        if self._queue is None or self._stopping:
+            self.stats["dropped"] += 1
+            return False
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            logger.warning(f"{self.name} queue full ({self.max_queue}) - dropped item")
+            return False
+        self.stats["submitted"] += 1
+        return True
+
+    async def stop(self, timeout: float = 30.0):
+        """Stop accepting work, flush everything still queued, then stop the worker"""
+        if not self.running:
+            return
+        self._stopping = True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{self.name} drain timed out with {self._queue.qsize()} items left")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        logger.info(f"{self.name} stopped ({self.stats['flushed_items']} items written)")
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stopping and self._queue.empty():
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Any]):
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(self.flush_fn, batch)
+            self.stats["flushed_items"] += len(batch)
+            self.stats["flushed_batches"] += 1
+        except Exception as e:
+            self.stats["flush_errors"] += 1
+            logger.error(f"{self.name} flush of {len(batch)} items failed: {e}")
+        finally:
+            self.stats["last_flush_seconds"] = time.perf_counter() - start
+            for _ in batch:
+                self._queue.task_done()
+
+    def depth(self) -> int:
+        """Items waiting to be flushed"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "depth": self.depth(),
+            "max_queue": self.max_queue,
+            "running": self.running,
+        }
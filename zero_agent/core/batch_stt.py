@@ -0,0 +1,332 @@
+"""
+Batch STT - offline transcription of many audio files
+======================================================
+For backlogs of voice notes: a job is a list of files (uploads or every
+audio file under a directory) that is transcribed on a pool of workers,
+each a faster-whisper BatchedInferencePipeline, and reported file by file
+as results come in.
+
+    - durations are probed from headers / container metadata first, and
+      files are grouped by length: clips up to 30 s (one Whisper window)
+      are packed `batch_size` at a time - similar lengths together - into
+      one buffer whose clip_timestamps make every file one row of a batched
+      decode; longer files run alone with VAD chunks batched
+    - jobs are queued longest first on a WhisperPool of `workers`
+      pipelines (cpu_threads split between them), so the long tail does not
+      start last
+    - audio is read and decoded inside the worker, so memory holds the jobs
+      in flight rather than the whole backlog; files of a packed job are
+      decoded one by one, so a corrupt file is reported alone and a file
+      that decodes longer than a clip (wrong header) is re-queued unpacked
+      instead of being cut at 30 s
+    - directories are only read under an allowed root (`root`); the HTTP
+      service takes it from STT_BATCH_ROOT
+    - without a usable GPU the pipelines load with the CPU int8 fallback
+
+    batch = BatchTranscriber(workers=2, batch_size=8)
+    async for event in batch.run(collect_directory("voice_notes/", root="/srv/audio")):
+        event["type"]  # "result" / "error" per file, then one "summary"
+
+The summary reports throughput as audio seconds per wall-clock second.
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Union
+import asyncio
+import bisect
+import logging
+import os
+import time
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from zero_agent.core.audio_io import SAMPLE_RATE, AudioDecoder, probe_duration
+from zero_agent.core.whisper_pool import WhisperPool
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = {".wav", ".mp3", ".m4a", ".ogg", ".oga", ".opus", ".webm", ".flac", ".aac", ".mp4"}
+CLIP_SECONDS = 30.0       # longest file packed as a single clip
+DEFAULT_WORKERS = 2
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_MAX_FILES = 1000
+MIN_SECONDS = 0.1         # shorter files are reported empty without decoding
+
+
+@dataclass
+class BatchItem:
+    """One input file: a name for the results and its bytes or path"""
+    name: str
+    source: Union[bytes, Path]
+    duration: Optional[float] = None  # probed; None = unknown
+
+    def read(self) -> bytes:
+        return self.source if isinstance(self.source, (bytes, bytearray)) else Path(self.source).read_bytes()
+
+
+@dataclass
+class BatchJob:
+    """Files transcribed in one pipeline call"""
+    items: List[BatchItem]
+    packed: bool  # short files concatenated, one clip each
+    offsets: List[float] = field(default_factory=list)  # start of each file in the packed audio
+    # Set while a packed job is decoded (in the worker):
+    clipped: List[BatchItem] = field(default_factory=list)    # files in the packed audio, in order
+    errors: Dict[str, str] = field(default_factory=dict)      # file -> decode error
+    oversized: List[BatchItem] = field(default_factory=list)  # decoded longer than one clip
+
+    @property
+    def audio_seconds(self) -> float:
+        return sum(item.duration or 0.0 for item in self.items)
+
+
+def _inside(path: Path, root: Path) -> bool:
+    return path == root or root in path.parents
+
+
+def collect_directory(path: Union[str, Path], extensions=AUDIO_EXTENSIONS,
+                      limit: int = DEFAULT_MAX_FILES,
+                      root: Optional[Union[str, Path]] = None) -> List[BatchItem]:
+    """
+    Every audio file under `path` (recursive, sorted), as path-backed items
+    
+    With `root`, `path` is resolved relative to it and must stay inside it
+    (no "..", absolute paths or symlinks leading out). The walk stops as soon
+    as more than `limit` audio files are found.
+    """
+    if root is not None:
+        base = Path(root).resolve()
+        directory = (base / path).resolve()
+        if not _inside(directory, base):
+            raise ValueError(f"{path} is outside the batch root")
+    else:
+        base = directory = Path(path).resolve()
+    if not directory.is_dir():
+        raise ValueError(f"Not a directory: {path}")
+    
+    files = []
+    for folder, _, names in os.walk(directory):
+        for name in names:
+            file = Path(folder, name)
+            if file.suffix.lower() not in extensions or not file.is_file():
+                continue
+            if root is not None and not _inside(file.resolve(), base):
+                continue  # symlink out of the root
+            files.append(file)
+            if len(files) > limit:
+                raise ValueError(f"More than {limit} audio files under {path}")
+    return [BatchItem(p.relative_to(directory).as_posix(), p) for p in sorted(files)]
+
+
+def plan_jobs(items: List[BatchItem], batch_size: int = DEFAULT_BATCH_SIZE,
+              clip_seconds: float = CLIP_SECONDS) -> List[BatchJob]:
+    """
+    Group items by length: short ones packed `batch_size` per job (sorted, so
+    a job's clips are similar in length), long / unknown ones alone; jobs
+    ordered longest first
+    """
+    short = sorted((i for i in items if i.duration is not None and i.duration <= clip_seconds),
+                   key=lambda i: i.duration)
+    long = [i for i in items if i.duration is None or i.duration > clip_seconds]
+    jobs = [BatchJob([item], packed=False) for item in long]
+    for start in range(0, len(short), max(1, batch_size)):
+        jobs.append(BatchJob(short[start:start + batch_size], packed=True))
+    # Unknown durations count as long: decoding will tell
+    jobs.sort(key=lambda job: clip_seconds * 2 if job.items[0].duration is None else job.audio_seconds,
+              reverse=True)
+    return jobs
+
+
+class BatchedWhisper:
+    """
+    The pooled "model" of a BatchTranscriber: decodes a BatchJob in the
+    worker thread and runs it through a BatchedInferencePipeline
+    """
+
+    def __init__(self, pipeline, decoder: AudioDecoder):
+        self.pipeline = pipeline
+        self.decoder = decoder
+
+    def _samples(self, item: BatchItem):
+        with self.decoder.decode(item.read()) as audio:
+            return audio.samples.copy()  # the pooled buffer goes back right away
+
+    def transcribe(self, job: BatchJob, **options):
+        if not job.packed:
+            return self.pipeline.transcribe(self._samples(job.items[0]), vad_filter=True, **options)
+        clips, parts, offset = [], [], 0
+        job.offsets, job.clipped, job.errors, job.oversized = [], [], {}, []
+        for item in job.items:
+            try:
+                samples = self._samples(item)
+            except Exception as e:
+                job.errors[item.name] = str(e)
+                continue
+            if len(samples) > CLIP_SECONDS * SAMPLE_RATE:
+                item.duration = len(samples) / SAMPLE_RATE  # the probe was wrong
+                job.oversized.append(item)
+                continue
+            job.clipped.append(item)
+            job.offsets.append(offset / SAMPLE_RATE)
+            clips.append({"start": offset / SAMPLE_RATE, "end": (offset + len(samples)) / SAMPLE_RATE})
+            parts.append(samples)
+            offset += len(samples)
+        if not parts:
+            return iter([]), SimpleNamespace(language="", language_probability=0.0, duration=0.0)
+        return self.pipeline.transcribe(np.concatenate(parts), clip_timestamps=clips, **options)
+
+
+class BatchTranscriber:
+    """Runs batch jobs on a pool of `workers` batched pipelines"""
+
+    def __init__(self, model_size: str = "base", device: str = "cpu", compute_type: str = "int8",
+                 workers: int = DEFAULT_WORKERS, batch_size: int = DEFAULT_BATCH_SIZE, cpu_threads: int = 0,
+                 factory: Optional[Callable[[], Any]] = None):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("BatchTranscriber needs numpy (pip install numpy)")
+        self.batch_size = batch_size
+        self.decoder = AudioDecoder(max_seconds=4 * 3600)
+        pipeline_factory = factory or self._load_pipeline
+        self.pool = WhisperPool(model_size, device, compute_type, size=workers, cpu_threads=cpu_threads,
+                                preload=0, factory=lambda: BatchedWhisper(pipeline_factory(), self.decoder))
+        self.stats = {"jobs": 0, "files": 0, "errors": 0, "audio_seconds": 0.0, "wall_seconds": 0.0}
+
+    def _load_pipeline(self):
+        from faster_whisper import BatchedInferencePipeline, WhisperModel
+        pool = self.pool
+        try:
+            model = WhisperModel(pool.model_size, device=pool.device, compute_type=pool.compute_type,
+                                 cpu_threads=pool.cpu_threads)
+        except Exception as e:
+            if (pool.device, pool.compute_type) == ("cpu", "int8"):
+                raise
+            logger.warning(f"{pool.device}/{pool.compute_type} not available, using CPU int8: {e}")
+            model = WhisperModel(pool.model_size, device="cpu", compute_type="int8",
+                                 cpu_threads=pool.cpu_threads)
+        return BatchedInferencePipeline(model=model)
+
+    def _probe(self, items: List[BatchItem]):
+        for item in items:
+            if item.duration is None:
+                item.duration = probe_duration(item.source)
+
+    async def run(self, items: List[BatchItem], **options) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Transcribe `items`, yielding {"type": "result" | "error", "file", ...}
+        per file as its job finishes, then {"type": "summary", ...}
+
+        `options` go to BatchedInferencePipeline.transcribe (language, beam_size, ...).
+        """
+        started = time.perf_counter()
+        options.setdefault("batch_size", self.batch_size)
+        await asyncio.to_thread(self._probe, items)
+        empty = [i for i in items if i.duration is not None and i.duration < MIN_SECONDS]
+        jobs = plan_jobs([i for i in items if i.duration is None or i.duration >= MIN_SECONDS],
+                         self.batch_size)
+        files = errors = 0
+        audio_seconds = 0.0
+
+        for item in empty:
+            files += 1
+            yield {"type": "result", "file": item.name, "text": "", "duration": item.duration, "segments": []}
+
+        async def run_job(job: BatchJob):
+            try:
+                return job, await self.pool.transcribe(job, **options), None
+            except Exception as e:
+                return job, None, e
+
+        job_count = len(jobs)
+        pending = {asyncio.ensure_future(run_job(job)) for job in jobs}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    job, result, error = task.result()
+                    self.stats["jobs"] += 1
+                    if error is not None:
+                        logger.warning(f"Batch job of {len(job.items)} file(s) failed: {error}")
+                        for item in job.items:
+                            files += 1
+                            errors += 1
+                            yield {"type": "error", "file": item.name, "message": str(error)}
+                        continue
+                    for name, message in job.errors.items():
+                        files += 1
+                        errors += 1
+                        yield {"type": "error", "file": name, "message": message}
+                    for item in job.oversized:
+                        # Decoded longer than its header said - transcribe it alone, VAD-chunked
+                        job_count += 1
+                        pending.add(asyncio.ensure_future(run_job(BatchJob([item], packed=False))))
+                    for event in self._split(job, result):
+                        files += 1
+                        audio_seconds += event["duration"]
+                        yield event
+        finally:
+            for task in pending:
+                task.cancel()
+
+        wall = time.perf_counter() - started
+        self.stats["files"] += files
+        self.stats["errors"] += errors
+        self.stats["audio_seconds"] += audio_seconds
+        self.stats["wall_seconds"] += wall
+        yield {
+            "type": "summary",
+            "files": files,
+            "errors": errors,
+            "jobs": job_count,
+            "audio_seconds": round(audio_seconds, 2),
+            "wall_seconds": round(wall, 2),
+            # audio seconds transcribed per wall-clock second
+            "throughput": round(audio_seconds / wall, 2) if wall else None,
+            "workers": self.pool.size,
+            "batch_size": self.batch_size,
+        }
+
+    def _split(self, job: BatchJob, result) -> List[Dict[str, Any]]:
+        """Per-file results of a job (packed segments mapped back by their start time)"""
+        if not job.packed:
+            item = job.items[0]
+            return [self._result(item, result.segments, result.audio_seconds, result)]
+        if not job.clipped:
+            return []
+        per_file: List[list] = [[] for _ in job.clipped]
+        for start, end, text in result.segments:
+            # The pipeline rounds times to milliseconds: a clip's first segment may start just before its offset
+            index = max(0, bisect.bisect_right(job.offsets, start + 0.001) - 1)
+            offset = job.offsets[index]
+            per_file[index].append((start - offset, end - offset, text))
+        return [self._result(item, segments, item.duration, result)
+                for item, segments in zip(job.clipped, per_file)]
+
+    @staticmethod
+    def _result(item: BatchItem, segments, duration: float, result) -> Dict[str, Any]:
+        return {
+            "type": "result",
+            "file": item.name,
+            "text": " ".join(text.strip() for _, _, text in segments).strip(),
+            "language": result.language,
+            "duration": round(duration or 0.0, 3),
+            "segments": [{"start": round(s, 2), "end": round(e, 2), "text": t.strip()} for s, e, t in segments],
+            "seconds": round(result.seconds, 3),  # the whole job's transcription time
+        }
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+    def get_stats(self) -> Dict[str, Any]:
+        wall = self.stats["wall_seconds"]
+        return {
+            **self.stats,
+            "throughput": self.stats["audio_seconds"] / wall if wall else None,
+            "pool": self.pool.get_stats(),
+        }
@@ -0,0 +1,106 @@
+"""
+Context Providers - concurrent pre-LLM context gathering
+=========================================================
+Web search, personal-fact recall, long-term RAG retrieval and routing are
+independent of each other, so the chat pipeline runs them side by side
+instead of one after another. Pre-generation latency becomes the slowest
+provider instead of the sum of all of them.
+
+All providers share one per-request deadline. A provider that has not
+finished by then is dropped - the prompt is built without it. Providers are
+sync callables run in worker threads; a dropped provider's thread is left to
+finish on its own and its result is discarded.
+"""
+
+from typing import Any, Callable, Dict, Iterable, Optional
+from dataclasses import dataclass
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEADLINE = 8.0  # seconds for all providers of one request
+
+
+@dataclass
+class ContextProvider:
+    """One independent source of prompt context"""
+    name: str
+    fn: Callable[[], Any]
+    stage: Optional[str] = None  # metrics stage label (defaults to name)
+
+    @property
+    def stage_name(self) -> str:
+        return self.stage or self.name
+
+
+@dataclass
+class ProviderResult:
+    """Outcome of one provider"""
+    name: str
+    stage: str
+    status: str  # "ok", "error" or "timeout"
+    value: Any = None
+    error: Optional[str] = None
+    duration: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+
+async def _run_provider(provider: ContextProvider) -> ProviderResult:
+    start = time.perf_counter()
+    try:
+        value = await asyncio.to_thread(provider.fn)
+        return ProviderResult(provider.name, provider.stage_name, "ok", value=value,
+                              duration=time.perf_counter() - start)
+    except Exception as e:
+        logger.warning(f"Context provider {provider.name} failed: {e}")
+        return ProviderResult(provider.name, provider.stage_name, "error", error=str(e),
+                              duration=time.perf_counter() - start)
+
+
+async def gather_context(providers: Iterable[ContextProvider],
+                         deadline: float = DEFAULT_DEADLINE,
+                         on_result: Optional[Callable[[ProviderResult], None]] = None
+                         ) -> Dict[str, ProviderResult]:
+    """
+    Run providers concurrently and collect what finished before the deadline
+
+    Args:
+        providers: Providers to run (names must be unique)
+        deadline: Seconds to wait for all of them together
+        on_result: Optional fn(result) called for every provider (metrics hook)
+
+    Returns:
+        {provider name: ProviderResult} - late providers have status "timeout"
+    """
+    start = time.perf_counter()
+    tasks = {asyncio.create_task(_run_provider(p)): p for p in providers}
+    if not tasks:
+        return {}
+
+    done, pending = await asyncio.wait(tasks, timeout=deadline)
+
+    results: Dict[str, ProviderResult] = {}
+    for task in done:
+        result = task.result()
+        results[result.name] = result
+    for task in pending:
+        task.cancel()
+        provider = tasks[task]
+        logger.warning(f"Context provider {provider.name} missed the {deadline}s deadline - dropped")
+        results[provider.name] = ProviderResult(
+            provider.name, provider.stage_name, "timeout",
+            error=f"deadline {deadline}s exceeded", duration=time.perf_counter() - start
+        )
+
+    if on_result:
+        for result in results.values():
+            try:
+                on_result(result)
+            except Exception as e:
+                logger.debug(f"Context result hook failed: {e}")
+    return results
@@ -0,0 +1,277 @@
+"""
+Intent Engine - single-pass multi-pattern keyword matching
+===========================================================
+The chat handler and the router used to run one `any(kw in text ...)` scan
+per keyword list - over a dozen passes over the same message, each
+re-lowercasing it. The intent engine compiles every keyword list into one
+Aho-Corasick automaton at startup; analyze() normalizes the message once and
+walks it once, returning every matched intent with its keywords and
+positions.
+
+    engine = IntentEngine({"search": ["search", "חפש"], "greeting": ["hello"]})
+    match = engine.analyze("Hello, search the news")
+    match.has("search"), match.count("search"), match.starts_with("greeting")
+
+Matching keeps the semantics of the scans it replaces: a keyword matches as
+a plain substring of the lowercased text (overlaps included), and
+count(intent) is the number of distinct keywords of that intent present.
+Keywords are not lowercased (as before, one with capitals never matches).
+"""
+
+from typing import Any, Dict, Iterable, List, Set, Tuple
+import re
+import unicodedata
+
+# Hebrew points and cantillation marks - "שָׁלוֹם" matches "שלום"
+_HEBREW_MARKS = re.compile(r"[\u0591-\u05BD\u05BF\u05C1\u05C2\u05C4\u05C5\u05C7]")
+
+
+def normalize(text: str) -> str:
+    """NFC, lowercase and strip Hebrew vowel points (positions refer to this text)"""
+    return _HEBREW_MARKS.sub("", unicodedata.normalize("NFC", text or "").lower())
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton over a fixed set of strings
+
+    States are dict-based tries; `fail` links point to the longest proper
+    suffix that is also a trie path, and each state's `out` holds the ids of
+    every pattern ending there (its own plus those reachable through fail
+    links), so one left-to-right walk reports all matches.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        for pattern in patterns:
+            self._add(pattern)
+        self._link()
+
+    def _add(self, pattern: str):
+        state = 0
+        for char in pattern:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] = self._out[state] + (len(self.patterns),)
+        self.patterns.append(pattern)
+
+    def _link(self):
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text: str):
+        """Yield (start, pattern_id) for every occurrence, in order of end position"""
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self.patterns
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for pattern_id in out[state]:
+                yield end - len(patterns[pattern_id]), pattern_id
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+
+class IntentMatch:
+    """Result of IntentEngine.analyze() for one message"""
+
+    __slots__ = ("text", "_hits", "memo")
+
+    def __init__(self, text: str, hits: Dict[str, Dict[str, int]]):
+        self.text = text  # normalized message
+        self._hits = hits  # intent -> {keyword: first start position}
+        self.memo: Dict[str, Any] = {}  # derived scores cached by consumers (e.g. the router)
+
+    def has(self, intent: str) -> bool:
+        return intent in self._hits
+
+    def count(self, intent: str) -> int:
+        """Distinct keywords of the intent found in the text"""
+        return len(self._hits.get(intent, ()))
+
+    def keywords(self, intent: str) -> Set[str]:
+        return set(self._hits.get(intent, ()))
+
+    def starts_with(self, intent: str) -> bool:
+        """True if a keyword of the intent begins the text"""
+        return any(start == 0 for start in self._hits.get(intent, {}).values())
+
+    def within(self, intent: str, chars: int) -> bool:
+        """True if a keyword of the intent lies entirely within the first `chars` characters"""
+        return any(start + len(keyword) <= chars for keyword, start in self._hits.get(intent, {}).items())
+
+    def intents(self) -> List[str]:
+        return sorted(self._hits)
+
+    def features(self) -> Dict[str, int]:
+        """Feature vector: distinct matched keywords per intent"""
+        return {intent: len(keywords) for intent, keywords in self._hits.items()}
+
+    def __repr__(self) -> str:
+        return f"IntentMatch({self.features()})"
+
+
+class IntentEngine:
+    """
+    All keyword intents compiled into one automaton
+
+    A keyword may belong to several intents; it is stored once and reported
+    for each.
+    """
+
+    def __init__(self, intents: Dict[str, Iterable[str]]):
+        self.intents = {name: tuple(keywords) for name, keywords in intents.items()}
+        owners: Dict[str, List[str]] = {}
+        for name, keywords in self.intents.items():
+            for keyword in keywords:
+                keyword = _HEBREW_MARKS.sub("", unicodedata.normalize("NFC", keyword))
+                if keyword and name not in owners.setdefault(keyword, []):
+                    owners[keyword].append(name)
+        self._automaton = AhoCorasick(owners)
+        self._owners = [tuple(owners[pattern]) for pattern in self._automaton.patterns]
+
+    def extend(self, intents: Dict[str, Iterable[str]]) -> "IntentEngine":
+        """New engine with additional / replaced intents"""
+        return IntentEngine({**self.intents, **intents})
+
+    def analyze(self, text: str, normalized: bool = False) -> IntentMatch:
+        """Normalize `text` once (unless already normalized) and match every intent in one pass"""
+        if not normalized:
+            text = normalize(text)
+        hits: Dict[str, Dict[str, int]] = {}
+        patterns, owners = self._automaton.patterns, self._owners
+        for start, pattern_id in self._automaton.iter_matches(text):
+            keyword = patterns[pattern_id]
+            for intent in owners[pattern_id]:
+                found = hits.setdefault(intent, {})
+                if keyword not in found:
+                    found[keyword] = start
+        return IntentMatch(text, hits)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "intents": len(self.intents),
+            "keywords": len(self._automaton.patterns),
+            "states": len(self._automaton),
+        }
+
+
+# ----------------------------------------------------------------------
+# Chat handler intents (api_server.prepare_chat)
+# ----------------------------------------------------------------------
+
+CHAT_INTENTS: Dict[str, Tuple[str, ...]] = {
+    # Web search requests
+    "search": (
+        'חפש ברשת', 'חפש', 'חיפוש', 'חיפוש על',
+        'search', 'google', 'search for', 'look up', 'find information',
+        'מה המחיר', 'מחיר של', 'מחיר מניית', 'price of', 'price', 'stock price',
+        'spy', 'qqq', 'aapl', 'tsla', 'msft', 'amzn', 'googl',  # Popular stocks
+        'מה חדש', 'מה השעה', 'מה התאריך', 'what time', 'what date',
+        'איך לבנות', 'how to build', 'tutorial',
+        'latest', 'current', 'recent', 'news', 'today', 'update',
+        'weather', 'temperature', 'forecast',
+        'who is', 'what is the latest', 'tell me about recent'
+    ),
+    # Memory questions (recall of personal facts)
+    "recall": (
+        'מה שמו', 'מה השם', 'what is the name', 'what was', 'what did',
+        'מה אמרתי', 'מה דיברנו', 'מה זוכר', 'מה יודע',
+        'recall', 'remember what', 'what is'
+    ),
+    # Long-term RAG lookups
+    "rag": (
+        'זוכר', 'אמרתי', 'דיברנו', 'לפני', 'אתמול', 'שבוע',
+        'remember', 'said', 'talked', 'before', 'yesterday', 'ago',
+        'מה אתה יודע', 'מה למדנו', 'what do you know'
+    ),
+    # Computer control commands (must start the message)
+    "computer_control": (
+        # Open commands
+        'פתח ', 'תפתח ', 'הפעל ', 'תפעיל ', 'הרץ ', 'תריץ ',
+        'open ', 'launch ', 'start ', 'run ',
+        # Click commands
+        'לחץ ', 'תלחץ ', 'לחיצה ',
+        'click ', 'press ',
+        # Type commands
+        'הקלד ', 'תקליד ',
+        'type ', 'enter ',
+        # Scroll commands
+        'גלול ', 'תגלול ',
+        'scroll ',
+        # Screenshot commands
+        'צלם מסך', 'תצלם מסך', 'צילום מסך',
+        'screenshot', 'take screenshot', 'capture screen',
+        # Image generation commands
+        'צור תמונה', 'תצור תמונה', 'צייר', 'תצייר', 'הפק תמונה',
+        'generate image', 'create image', 'draw', 'make image',
+        # Video generation commands
+        'צור סרטון', 'תצור סרטון', 'הפק סרטון', 'צור וידאו',
+        'generate video', 'create video', 'make video', 'render video',
+        # TTS commands
+        'הקרא בקול', 'תקרא בקול', 'דבר', 'תדבר', 'הגה', 'תהגה',
+        'speak', 'say', 'read out', 'read aloud', 'voice',
+    ),
+    # Keyboard shortcut modifiers (with a '+' in the message)
+    "hotkey_modifier": ('ctrl', 'alt', 'shift', 'win', 'קונטרול', 'אלט', 'שיפט'),
+    # Multi-step tasks for the Agent Orchestrator
+    "complex_task": (
+        'צור פרויקט', 'create project', 'צור אפליקציה', 'create app',
+        'צור תיקייה', 'create folder', 'עשה תיקייה', 'צר תיקיה', 'תיצור תיקייה',
+        'צור קובץ', 'create file', 'עשה קובץ',
+        'רשום הודעה', 'write message',
+        'הרץ פקודה', 'run command'
+    ),
+    # Simple local actions
+    "action": (
+        'צור תיקייה', 'create folder', 'עשה תיקייה', 'צר תיקיה', 'תיצור תיקייה',
+        'פתח דפדפן', 'open browser', 'open chrome', 'פתח כרום',
+        'צור קובץ', 'create file', 'עשה קובץ',
+        'רשום הודעה', 'write message',
+        'הרץ פקודה', 'run command'
+    ),
+    "action_create_folder": ('צור תיקייה', 'create folder', 'עשה תיקייה'),
+    "action_open_browser": ('פתח דפדפן', 'open browser', 'open chrome', 'פתח כרום'),
+    "action_create_file": ('צור קובץ', 'create file', 'עשה קובץ'),
+    # "Remember: ..." - store a personal fact (within the first 30 chars)
+    "remember": (
+        'remember:', 'remember that', 'remember this', 'remember to',
+        'זכור:', 'תזכור:', 'תזכור ש', 'זכור ש', 'תזכור את'
+    ),
+    # Memory commands
+    "memory_command": (
+        'מה אתה זוכר', 'מה אתה יודע עליי', 'מה למדת', 'מה יודע',
+        'what do you remember', 'what do you know about me',
+        'שכח', 'תשכח', 'forget',
+        'רשום', 'זכור', 'תזכור', 'remember this', 'save this'
+    ),
+    "memory_query": ('מה אתה זוכר', 'מה אתה יודע', 'מה למדת', 'what do you remember', 'what do you know'),
+    # Reasoning questions that get a chain-of-thought hint on the smart model
+    "cot_complex": (
+        'למה', 'איך', 'בצע', 'פתור', 'תכנן', 'מיישם',
+        'why', 'how', 'solve', 'implement', 'plan',
+        'analyz', 'explain', 'compare', 'evalu'
+    ),
+}
@@ -0,0 +1,373 @@
+"""
+LLM Scheduler - per-model admission control in front of Ollama
+================================================================
+Enforces `max_concurrent` / `batch_size` from config/models.yaml:
+
+    - every Ollama model gets its own lane with `max_concurrent` slots
+    - waiting requests sit in a bounded queue (max_concurrent * batch_size * queue_factor)
+    - interactive chat is always served before background (orchestrator / eval) work
+    - inside a priority class, sessions are served round-robin so one busy
+      session cannot starve the others
+    - full queue -> QueueFullError (503), one session hogging the queue ->
+      SessionLimitError (429)
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from enum import IntEnum
+from pathlib import Path
+import asyncio
+import logging
+import threading
+import time
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+MODELS_YAML = Path(__file__).parent.parent / "config" / "models.yaml"
+
+
+class Priority(IntEnum):
+    """Priority classes (lower value = served first)"""
+    INTERACTIVE = 0  # user-facing chat
+    BACKGROUND = 1   # orchestrator steps, evals, warmups
+
+
+class SchedulerRejected(Exception):
+    """Request was not admitted - carries the HTTP status to surface"""
+    status_code = 503
+
+    def __init__(self, message: str, model: str, retry_after: int = 5):
+        super().__init__(message)
+        self.model = model
+        self.retry_after = retry_after
+
+
+class QueueFullError(SchedulerRejected):
+    """Model queue is at capacity (server overloaded)"""
+    status_code = 503
+
+
+class SessionLimitError(SchedulerRejected):
+    """A single session already has too many requests waiting"""
+    status_code = 429
+
+
+@dataclass
+class ModelLimits:
+    """Concurrency limits for one Ollama model"""
+    max_concurrent: int = 2
+    batch_size: int = 4
+    queue_factor: int = 2
+
+    @property
+    def max_queue(self) -> int:
+        return max(1, self.max_concurrent * self.batch_size * self.queue_factor)
+
+
+def load_model_limits(path: Path = MODELS_YAML) -> Dict[str, ModelLimits]:
+    """
+    Read per-model limits from models.yaml
+
+    Returns:
+        {ollama_model_name: ModelLimits} for local models with an `optimization` block
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f) or {}
+    except Exception as e:
+        logger.warning(f"Could not load model limits from {path}: {e}")
+        return {}
+
+    limits = {}
+    for model_config in data.get("models", {}).get("local", {}).values():
+        optimization = model_config.get("optimization")
+        model_name = model_config.get("model_name")
+        if not optimization or not model_name:
+            continue
+        limits[model_name] = ModelLimits(
+            max_concurrent=int(optimization.get("max_concurrent", 2)),
+            batch_size=int(optimization.get("batch_size", 4))
+        )
+    return limits
+
+
+class _ModelLane:
+    """Slots + fair queue for a single model (event-loop confined)"""
+
+    def __init__(self, model: str, limits: ModelLimits):
+        self.model = model
+        self.limits = limits
+        self.active = 0
+        self.queued = 0
+        # priority -> session_id -> FIFO of futures (OrderedDict order = round-robin order)
+        self.waiters: Dict[Priority, "OrderedDict[str, deque]"] = {p: OrderedDict() for p in Priority}
+        self.session_pending: Dict[str, int] = {}
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_times: deque = deque(maxlen=500)
+
+    def depth(self, priority: Optional[Priority] = None) -> int:
+        if priority is None:
+            return self.queued
+        return sum(len(q) for q in self.waiters[priority].values())
+
+    def enqueue(self, priority: Priority, session_id: str, future: asyncio.Future):
+        self.waiters[priority].setdefault(session_id, deque()).append(future)
+        self.session_pending[session_id] = self.session_pending.get(session_id, 0) + 1
+        self.queued += 1
+
+    def remove(self, priority: Priority, session_id: str, future: asyncio.Future) -> bool:
+        """Drop a cancelled waiter; returns False if it was already dispatched"""
+        sessions = self.waiters[priority]
+        queue = sessions.get(session_id)
+        if not queue or future not in queue:
+            return False
+        queue.remove(future)
+        if not queue:
+            del sessions[session_id]
+        self._forget(session_id)
+        return True
+
+    def _forget(self, session_id: str):
+        self.queued -= 1
+        remaining = self.session_pending.get(session_id, 1) - 1
+        if remaining > 0:
+            self.session_pending[session_id] = remaining
+        else:
+            self.session_pending.pop(session_id, None)
+
+    def dispatch(self):
+        """Hand free slots to waiters: highest priority first, sessions round-robin"""
+        while self.active < self.limits.max_concurrent and self.queued:
+            for priority in Priority:
+                sessions = self.waiters[priority]
+                if not sessions:
+                    continue
+                session_id, queue = next(iter(sessions.items()))
+                future = queue.popleft()
+                if queue:
+                    sessions.move_to_end(session_id)
+                else:
+                    del sessions[session_id]
+                self._forget(session_id)
+                if future.done():  # cancelled while we were looking
+                    break
+                self.active += 1
+                future.set_result(True)
+                break
+            else:
+                break  # counters out of sync - nothing left to hand out
+
+
+class LLMScheduler:
+    """
+    Per-model bounded queues with priorities and session fairness
+
+    Usage:
+        scheduler = LLMScheduler.from_config()
+        async with scheduler.slot("mixtral:8x7b", Priority.INTERACTIVE, session_id):
+            ... call Ollama ...
+    """
+
+    def __init__(self,
+                 limits: Optional[Dict[str, ModelLimits]] = None,
+                 default_limits: Optional[ModelLimits] = None,
+                 per_session_limit: int = 4):
+        self.limits = limits or {}
+        self.default_limits = default_limits or ModelLimits()
+        self.per_session_limit = per_session_limit
+        self._lanes: Dict[str, _ModelLane] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wait_listeners: List[Callable[[str, Priority, float], None]] = []
+        # Slot / queue counters per model for readers on other threads (see lane_snapshot)
+        self._snapshot: Dict[str, Dict[str, int]] = {}
+        self._snapshot_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, path: Path = MODELS_YAML, **kwargs) -> "LLMScheduler":
+        """Build a scheduler from models.yaml"""
+        return cls(limits=load_model_limits(path), **kwargs)
+
+    def _lane(self, model: str) -> _ModelLane:
+        lane = self._lanes.get(model)
+        if lane is None:
+            lane = _ModelLane(model, self.limits.get(model, self.default_limits))
+            self._lanes[model] = lane
+        return lane
+
+    def _publish(self, lane: _ModelLane):
+        """Copy a lane's counters into the snapshot (copy-on-write: published dicts never change)"""
+        with self._snapshot_lock:
+            snapshot = dict(self._snapshot)
+            snapshot[lane.model] = {"active": lane.active, "max_concurrent": lane.limits.max_concurrent,
+                                    "queued": lane.queued}
+            self._snapshot = snapshot
+
+    def lane_snapshot(self) -> Dict[str, Dict[str, int]]:
+        """
+        Per-model {"active", "max_concurrent", "queued"} - safe to call from
+        any thread (the lanes themselves belong to the event loop)
+        """
+        with self._snapshot_lock:
+            return self._snapshot
+
+    def add_wait_listener(self, listener: Callable[[str, Priority, float], None]):
+        """Register fn(model, priority, wait_seconds) called on every admission"""
+        self._wait_listeners.append(listener)
+
+    def _record_wait(self, lane: _ModelLane, priority: Priority, waited: float):
+        lane.admitted += 1
+        lane.wait_times.append(waited)
+        for listener in self._wait_listeners:
+            try:
+                listener(lane.model, priority, waited)
+            except Exception as e:
+                logger.debug(f"Wait listener failed: {e}")
+
+    def _retry_after(self, lane: _ModelLane) -> int:
+        """Rough seconds until a queue position frees up"""
+        recent = list(lane.wait_times)[-20:]
+        avg_wait = sum(recent) / len(recent) if recent else 5.0
+        return max(1, int(avg_wait) + 1)
+
+    def check_admission(self, model: str, priority: Priority = Priority.INTERACTIVE,
+                        session_id: Optional[str] = None):
+        """
+        Raise now if a request would be rejected (used before opening a stream,
+        so the client still gets a real 429/503 status code)
+        """
+        lane = self._lane(model)
+        if lane.active < lane.limits.max_concurrent and not lane.queued:
+            return
+        if lane.queued >= lane.limits.max_queue:
+            lane.rejected += 1
+            raise QueueFullError(
+                f"Model {model} is overloaded ({lane.queued} requests waiting)",
+                model, self._retry_after(lane)
+            )
+        session_id = session_id or "anonymous"
+        if lane.session_pending.get(session_id, 0) >= self.per_session_limit:
+            lane.rejected += 1
+            raise SessionLimitError(
+                f"Too many pending requests for this session on {model}",
+                model, self._retry_after(lane)
+            )
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """
+        Bind the scheduler to the server event loop (call at startup) - until
+        then slot_blocking() has no loop to queue on and admits everything
+        """
+        self._loop = loop
+
+    async def acquire(self, model: str, priority: Priority = Priority.INTERACTIVE,
+                      session_id: Optional[str] = None) -> float:
+        """
+        Wait for a slot on `model`
+
+        Returns:
+            Seconds spent queued
+        """
+        self._loop = asyncio.get_running_loop()
+        lane = self._lane(model)
+        start = time.monotonic()
+
+        # Fast path - free slot and nobody waiting
+        if lane.active < lane.limits.max_concurrent and not lane.queued:
+            lane.active += 1
+            self._publish(lane)
+            self._record_wait(lane, priority, 0.0)
+            return 0.0
+
+        self.check_admission(model, priority, session_id)
+        session_id = session_id or "anonymous"
+        future = self._loop.create_future()
+        lane.enqueue(priority, session_id, future)
+        self._publish(lane)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if lane.remove(priority, session_id, future):
+                self._publish(lane)
+            else:
+                # Slot was granted right as we got cancelled - give it back
+                self.release(model)
+            raise
+
+        waited = time.monotonic() - start
+        self._record_wait(lane, priority, waited)
+        return waited
+
+    def release(self, model: str):
+        """Free a slot on `model` and wake the next waiter"""
+        lane = self._lane(model)
+        lane.active = max(0, lane.active - 1)
+        lane.dispatch()
+        self._publish(lane)
+
+    @asynccontextmanager
+    async def slot(self, model: str, priority: Priority = Priority.INTERACTIVE,
+                   session_id: Optional[str] = None):
+        """Async context manager holding one slot on `model`"""
+        await self.acquire(model, priority, session_id)
+        try:
+            yield
+        finally:
+            self.release(model)
+
+    @contextmanager
+    def slot_blocking(self, model: str, priority: Priority = Priority.BACKGROUND,
+                      session_id: Optional[str] = None):
+        """
+        Sync counterpart of slot() for worker threads
+
+        The lanes live on the server event loop (see attach()), so the wait is
+        scheduled there. Calls made on the loop thread itself (or before the
+        loop is known) are not scheduled - blocking the loop to wait for a slot
+        would deadlock it.
+        """
+        loop = self._loop
+        if loop is None or not loop.is_running() or self._on_loop_thread(loop):
+            yield
+            return
+
+        asyncio.run_coroutine_threadsafe(self.acquire(model, priority, session_id), loop).result()
+        try:
+            yield
+        finally:
+            loop.call_soon_threadsafe(self.release, model)
+
+    @staticmethod
+    def _on_loop_thread(loop: asyncio.AbstractEventLoop) -> bool:
+        try:
+            return asyncio.get_running_loop() is loop
+        except RuntimeError:
+            return False
+
+    def queue_depth(self, model: str) -> int:
+        """Requests currently waiting for `model`"""
+        lane = self._lanes.get(model)
+        return lane.queued if lane else 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-model slots, queue depth and wait-time summary"""
+        stats = {}
+        for model, lane in self._lanes.items():
+            waits = sorted(lane.wait_times)
+            stats[model] = {
+                "active": lane.active,
+                "max_concurrent": lane.limits.max_concurrent,
+                "queued": lane.queued,
+                "max_queue": lane.limits.max_queue,
+                "queued_by_priority": {p.name.lower(): lane.depth(p) for p in Priority},
+                "admitted": lane.admitted,
+                "rejected": lane.rejected,
+                "wait_p50": waits[len(waits) // 2] if waits else 0.0,
+                "wait_p95": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0,
+                "wait_max": waits[-1] if waits else 0.0,
+            }
+        return stats
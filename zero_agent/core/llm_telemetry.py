@@ -0,0 +1,196 @@
+"""
+LLM Telemetry - per-model performance from Ollama's own timings
+================================================================
+Every Ollama response ends with exact counters:
+
+    load_duration          time spent loading the model (ns) - large on a cold start
+    prompt_eval_count      prompt tokens evaluated (prefill)
+    prompt_eval_duration   prefill time (ns)
+    eval_count             generated tokens
+    eval_duration          decode time (ns)
+
+StreamingMultiModelLLM records every call (sync, async and streaming) here.
+Samples are kept per model in a rolling window and summarised as
+percentiles, so a cold-load stall (high load time) can be told apart from
+slow prefill (long prompts) and slow decode (GPU / quantization bound).
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from collections import deque
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 500  # samples kept per model
+COLD_LOAD_SECONDS = 1.0  # load_duration above this counts as a cold load
+PERCENTILES = (50, 90, 95, 99)
+
+# Derived per-call metrics summarised with percentiles
+SAMPLE_FIELDS = ("ttft", "prefill_tps", "decode_tps", "load_seconds", "total_seconds")
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(values: Sequence[float], percentiles: Sequence[int] = PERCENTILES) -> Dict[str, float]:
+    """count / mean / pNN of a sample window"""
+    ordered = sorted(values)
+    summary = {"count": len(ordered), "mean": sum(ordered) / len(ordered) if ordered else 0.0}
+    for pct in percentiles:
+        summary[f"p{pct}"] = percentile(ordered, pct)
+    return summary
+
+
+def derive_sample(data: Dict[str, Any], elapsed: Optional[float] = None,
+                  ttft: Optional[float] = None) -> Dict[str, float]:
+    """
+    Per-call metrics from an Ollama response
+
+    Args:
+        data: Final Ollama response (or a stats dict holding the same fields)
+        elapsed: Wall-clock seconds of the call
+        ttft: Measured time to first token (streaming); otherwise estimated as
+              load + prefill time
+
+    Returns:
+        Any of ttft, prefill_tps, decode_tps, load_seconds, total_seconds,
+        prompt_tokens, output_tokens that the response allows
+    """
+    sample: Dict[str, float] = {}
+    load = data.get("load_duration")
+    prompt_count = data.get("prompt_eval_count")
+    prompt_duration = data.get("prompt_eval_duration")
+    eval_count = data.get("eval_count")
+    eval_duration = data.get("eval_duration")
+
+    if load is not None:
+        sample["load_seconds"] = load / 1e9
+    if prompt_count and prompt_duration:
+        sample["prefill_tps"] = prompt_count / (prompt_duration / 1e9)
+    if eval_count and eval_duration:
+        sample["decode_tps"] = eval_count / (eval_duration / 1e9)
+    if prompt_count is not None:
+        sample["prompt_tokens"] = prompt_count
+    if eval_count is not None:
+        sample["output_tokens"] = eval_count
+
+    if ttft is not None:
+        sample["ttft"] = ttft
+    elif load is not None or prompt_duration is not None:
+        sample["ttft"] = ((load or 0) + (prompt_duration or 0)) / 1e9
+
+    if elapsed is not None:
+        sample["total_seconds"] = elapsed
+    elif data.get("total_duration") is not None:
+        sample["total_seconds"] = data["total_duration"] / 1e9
+    return sample
+
+
+class _ModelSeries:
+    """Rolling samples and counters of one model"""
+
+    def __init__(self, window: int):
+        self.samples = {name: deque(maxlen=window) for name in SAMPLE_FIELDS}
+        self.calls = 0
+        self.errors = 0
+        self.cold_loads = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.last_call: Optional[float] = None
+        self.last_cold_load: Optional[float] = None
+
+
+class LLMTelemetry:
+    """
+    Thread-safe per-model performance aggregator
+
+    Usage:
+        telemetry.record("mixtral:8x7b", ollama_response, elapsed, ttft)
+        telemetry.get_stats()["mixtral:8x7b"]["decode_tps"]["p50"]
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW, cold_load_seconds: float = COLD_LOAD_SECONDS):
+        self.window = window
+        self.cold_load_seconds = cold_load_seconds
+        self._models: Dict[str, _ModelSeries] = {}
+        self._listeners: List[Callable[[str, Dict[str, float]], None]] = []
+        self._lock = threading.Lock()
+
+    def _series(self, model_name: str) -> _ModelSeries:
+        series = self._models.get(model_name)
+        if series is None:
+            series = _ModelSeries(self.window)
+            self._models[model_name] = series
+        return series
+
+    def add_listener(self, listener: Callable[[str, Dict[str, float]], None]):
+        """Register fn(model_name, sample) called for every recorded call (metrics hook)"""
+        self._listeners.append(listener)
+
+    def record(self, model_name: str, data: Dict[str, Any], elapsed: Optional[float] = None,
+               ttft: Optional[float] = None) -> Dict[str, float]:
+        """Record one finished call; returns the derived sample"""
+        sample = derive_sample(data, elapsed, ttft)
+        now = time.time()
+        with self._lock:
+            series = self._series(model_name)
+            series.calls += 1
+            series.last_call = now
+            series.prompt_tokens += int(sample.get("prompt_tokens", 0))
+            series.output_tokens += int(sample.get("output_tokens", 0))
+            if sample.get("load_seconds", 0.0) >= self.cold_load_seconds:
+                series.cold_loads += 1
+                series.last_cold_load = now
+            for name in SAMPLE_FIELDS:
+                if name in sample:
+                    series.samples[name].append(sample[name])
+        for listener in self._listeners:
+            try:
+                listener(model_name, sample)
+            except Exception as e:
+                logger.debug(f"Telemetry listener failed: {e}")
+        return sample
+
+    def record_error(self, model_name: str):
+        """Count a failed call (no timings)"""
+        with self._lock:
+            self._series(model_name).errors += 1
+
+    def get_stats(self, model_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Percentile summary per model
+
+        Returns:
+            {model: {calls, errors, cold_loads, prompt_tokens, output_tokens,
+                     last_call, last_cold_load, ttft: {count, mean, p50..p99},
+                     prefill_tps: {...}, decode_tps: {...}, load_seconds: {...},
+                     total_seconds: {...}}}
+            (only the given model's entry when model_name is set)
+        """
+        with self._lock:
+            snapshot = {
+                name: (series, {field: list(values) for field, values in series.samples.items()})
+                for name, series in self._models.items()
+                if model_name is None or name == model_name
+            }
+        stats = {}
+        for name, (series, samples) in snapshot.items():
+            stats[name] = {
+                "calls": series.calls,
+                "errors": series.errors,
+                "cold_loads": series.cold_loads,
+                "prompt_tokens": series.prompt_tokens,
+                "output_tokens": series.output_tokens,
+                "last_call": series.last_call,
+                "last_cold_load": series.last_cold_load,
+                **{field: summarize(values) for field, values in samples.items()},
+            }
+        return stats.get(model_name, {}) if model_name is not None else stats
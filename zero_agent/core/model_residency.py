@@ -0,0 +1,286 @@
+"""
+Model Residency - keep the models traffic needs loaded in Ollama
+=================================================================
+mixtral, qwen2.5-coder:32b and deepseek-r1:32b do not fit in VRAM together,
+so routing between them evicts one for another and every switch costs a
+multi-second load_duration. The residency manager:
+
+    - polls Ollama /api/ps to track which models are loaded (and their VRAM)
+    - keeps an exponentially decayed demand score per model, fed by every
+      LLM call
+    - predicts the set of models worth keeping resident: the most demanded
+      models that fit together in the VRAM budget
+    - preloads a predicted model that is not loaded (empty-prompt request,
+      one at a time) and sends a per-model keep_alive with every request
+    - tells the router which models are loaded, so close routing decisions
+      go to a model that is already warm
+
+Settings come from the `residency` block and `optimization.keep_alive` of
+config/models.yaml.
+"""
+
+from typing import Any, Dict, List, Optional, Set
+from pathlib import Path
+import asyncio
+import logging
+import math
+import re
+import threading
+import time
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+MODELS_YAML = Path(__file__).parent.parent / "config" / "models.yaml"
+
+DEFAULT_KEEP_ALIVE = "10m"
+DEFAULT_VRAM_GB = 32.0
+DEFAULT_POLL_INTERVAL = 10.0
+DEFAULT_HALF_LIFE = 300.0  # seconds for a request's demand weight to halve
+MIN_DEMAND_SHARE = 0.15    # models below this share of demand are not preloaded
+PRELOAD_COOLDOWN = 120.0   # don't retry a model Ollama evicted / failed to load sooner
+LOAD_SECONDS_PER_GB = 0.4  # cold-load estimate (disk -> VRAM) for routing costs
+
+_SIZE = re.compile(r"([\d.]+)\s*GB", re.IGNORECASE)
+
+
+def parse_size_gb(size: Any) -> Optional[float]:
+    """'26GB' -> 26.0 (None when unknown)"""
+    match = _SIZE.search(str(size or ""))
+    return float(match.group(1)) if match else None
+
+
+def load_residency_config(path: Path = MODELS_YAML) -> Dict[str, Any]:
+    """
+    Read residency settings from models.yaml
+
+    Returns:
+        {"vram_gb", "poll_interval", "demand_half_life", "keep_alive": {ollama name: value}}
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f) or {}
+    except Exception as e:
+        logger.warning(f"Could not load residency config from {path}: {e}")
+        data = {}
+
+    residency = data.get("residency") or {}
+    keep_alive = {}
+    for model_config in (data.get("models", {}).get("local") or {}).values():
+        model_name = model_config.get("model_name")
+        value = (model_config.get("optimization") or {}).get("keep_alive")
+        if model_name and value is not None:
+            keep_alive[model_name] = str(value)
+    return {
+        "vram_gb": float(residency.get("vram_gb", DEFAULT_VRAM_GB)),
+        "poll_interval": float(residency.get("poll_interval", DEFAULT_POLL_INTERVAL)),
+        "demand_half_life": float(residency.get("demand_half_life", DEFAULT_HALF_LIFE)),
+        "keep_alive": keep_alive,
+    }
+
+
+class ModelResidency:
+    """
+    Tracks and steers which Ollama models stay loaded
+
+    Usage:
+        residency = ModelResidency.from_config(llm)
+        llm.residency = residency        # demand + keep_alive per request
+        router.residency = residency     # prefer loaded models on close calls
+        await residency.start()          # lifespan startup (polls, preloads)
+        await residency.stop()           # lifespan shutdown
+    """
+
+    def __init__(self, llm,
+                 vram_gb: float = DEFAULT_VRAM_GB,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 demand_half_life: float = DEFAULT_HALF_LIFE,
+                 keep_alive: Optional[Dict[str, str]] = None,
+                 default_keep_alive: str = DEFAULT_KEEP_ALIVE):
+        self.llm = llm
+        self.vram_gb = vram_gb
+        self.poll_interval = poll_interval
+        self.demand_half_life = demand_half_life
+        self.keep_alive = dict(keep_alive or {})
+        self.default_keep_alive = default_keep_alive
+        self.loaded: Dict[str, Dict[str, Any]] = {}  # ollama name -> /api/ps entry
+        self._sizes: Dict[str, float] = {}  # measured VRAM (GB) from /api/ps
+        self._demand: Dict[str, float] = {}
+        self._demand_at: Dict[str, float] = {}
+        self._demand_lock = threading.Lock()  # noted from request threads, read by the poll loop
+        self._preloading: Set[str] = set()
+        self._last_preload: Dict[str, float] = {}
+        self.preload_enabled = True  # False in non-owner API workers: poll only, one process preloads
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "polls": 0,
+            "poll_errors": 0,
+            "preloads": 0,
+            "preload_errors": 0,
+            "last_poll": None,
+        }
+
+    @classmethod
+    def from_config(cls, llm, path: Path = MODELS_YAML, **kwargs) -> "ModelResidency":
+        """Build a manager with the settings from models.yaml"""
+        return cls(llm, **{**load_residency_config(path), **kwargs})
+
+    # ------------------------------------------------------------------
+    # Demand and prediction
+    # ------------------------------------------------------------------
+
+    def _local_models(self) -> Dict[str, float]:
+        """Ollama name -> size (GB) of the local models the LLM can route to"""
+        models = {}
+        for info in self.llm.MODELS.values():
+            name = info["name"]
+            if name.endswith("-cloud"):
+                continue  # served remotely - nothing to keep resident
+            size = self._sizes.get(name) or parse_size_gb(info.get("size"))
+            if size is not None:
+                models[name] = size
+        return models
+
+    def _decayed(self, model_name: str, now: float) -> float:
+        score = self._demand.get(model_name, 0.0)
+        if not score:
+            return 0.0
+        age = now - self._demand_at.get(model_name, now)
+        return score * math.pow(0.5, age / self.demand_half_life)
+
+    def note_demand(self, model_name: str, weight: float = 1.0):
+        """Count one request for a model (called by the LLM for every call)"""
+        now = time.time()
+        with self._demand_lock:
+            self._demand[model_name] = self._decayed(model_name, now) + weight
+            self._demand_at[model_name] = now
+
+    def demand(self) -> Dict[str, float]:
+        """Current decayed demand score per model"""
+        now = time.time()
+        with self._demand_lock:
+            return {name: self._decayed(name, now) for name in self._demand}
+
+    def predicted(self) -> List[str]:
+        """
+        Models worth keeping resident, most demanded first
+
+        Greedy by demand: each model with at least MIN_DEMAND_SHARE of the
+        demand is added while the set still fits in the VRAM budget. With
+        no traffic yet, the LLM's default model is predicted.
+        """
+        local = self._local_models()
+        demand = {name: score for name, score in self.demand().items() if name in local}
+        total = sum(demand.values())
+        if not total:
+            default = self.llm.model_name(None)
+            return [default] if default in local else []
+
+        chosen, used = [], 0.0
+        for name, score in sorted(demand.items(), key=lambda item: -item[1]):
+            if score / total < MIN_DEMAND_SHARE:
+                break
+            if used + local[name] <= self.vram_gb or not chosen:
+                chosen.append(name)
+                used += local[name]
+        return chosen
+
+    # ------------------------------------------------------------------
+    # Residency
+    # ------------------------------------------------------------------
+
+    def keep_alive_for(self, model_name: str) -> str:
+        """keep_alive to send with requests for a model"""
+        return self.keep_alive.get(model_name, self.default_keep_alive)
+
+    def is_loaded(self, model_name: str) -> bool:
+        """True if Ollama reported the model as loaded on the last poll"""
+        return model_name in self.loaded
+
+    def cold_load_seconds(self, model_name: str) -> float:
+        """Expected load delay before a request for the model can start (0 when resident or remote)"""
+        if not self.stats["polls"] or model_name in self.loaded:
+            return 0.0
+        size = self._local_models().get(model_name)
+        return size * LOAD_SECONDS_PER_GB if size else 0.0
+
+    async def poll(self):
+        """Refresh the loaded-model table from /api/ps"""
+        try:
+            models = await self.llm.aloaded_models()
+        except Exception as e:
+            self.stats["poll_errors"] += 1
+            logger.debug(f"Residency poll failed: {e}")
+            return
+        self.loaded = {m.get("name") or m.get("model"): m for m in models}
+        for name, entry in self.loaded.items():
+            if entry.get("size_vram"):
+                self._sizes[name] = entry["size_vram"] / 1e9
+        self.stats["polls"] += 1
+        self.stats["last_poll"] = time.time()
+
+    async def reconcile(self):
+        """Preload the most demanded predicted model that is not loaded (one per round)"""
+        if not self.preload_enabled:
+            return
+        now = time.time()
+        for name in self.predicted():
+            if name in self.loaded or name in self._preloading:
+                continue
+            if now - self._last_preload.get(name, 0.0) < PRELOAD_COOLDOWN:
+                continue
+            await self._preload(name)
+            return
+
+    async def _preload(self, model_name: str):
+        self._preloading.add(model_name)
+        self._last_preload[model_name] = time.time()
+        try:
+            logger.info(f"Preloading {model_name} (keep_alive={self.keep_alive_for(model_name)})")
+            ok = await self.llm.apreload(model_name, self.keep_alive_for(model_name))
+            self.stats["preloads" if ok else "preload_errors"] += 1
+            if ok:
+                await self.poll()
+        finally:
+            self._preloading.discard(model_name)
+
+    async def _run(self):
+        while True:
+            await self.poll()
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.warning(f"Residency reconcile failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def start(self):
+        """Start polling (the first round preloads the predicted / default model)"""
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run(), name="model-residency")
+        logger.info(f"Model residency started (vram={self.vram_gb}GB, poll={self.poll_interval}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "loaded": {
+                name: {"size_vram_gb": round(entry.get("size_vram", 0) / 1e9, 2),
+                       "expires_at": entry.get("expires_at")}
+                for name, entry in self.loaded.items()
+            },
+            "demand": {name: round(score, 3) for name, score in self.demand().items()},
+            "predicted": self.predicted(),
+            "vram_gb": self.vram_gb,
+            "preload_enabled": self.preload_enabled,
+            "keep_alive": {name: self.keep_alive_for(name) for name in self._local_models()},
+        }
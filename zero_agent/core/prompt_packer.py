@@ -0,0 +1,464 @@
+"""
+Prompt Packer - token-budgeted chat prompt construction
+========================================================
+The chat prompt is built from independent sections (system prompt, history,
+RAG, search results, echo-back, CoT/ReAct scaffolding, the question). The
+packer estimates the tokens of each one and fits them into the model's
+budget by priority:
+
+    system > question > action / search > recent history > reasoning > RAG > echo-back
+
+    - required sections (system prompt, question) are always kept whole
+    - lower-priority sections are truncated (search / RAG keep their head,
+      history keeps the most recent turns and shortens older ones) or
+      dropped when even a truncated version does not fit
+    - sections keep their original order in the final prompt
+
+It then picks the smallest sufficient `num_ctx` from a few fixed buckets.
+Prefill time and KV-cache allocation grow with num_ctx, so a short chat
+turn should not reserve 32K tokens. Ollama reloads a model whenever num_ctx
+changes, so sizing is sticky per model: it grows at once but only shrinks
+after several requests in a row fit in a smaller bucket.
+
+Token counts are estimated from characters (no tokenizer dependency) and
+calibrated per model against the prompt_eval_count Ollama reports.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+import logging
+import re
+import threading
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+MODELS_YAML = Path(__file__).parent.parent / "config" / "models.yaml"
+
+# Section priorities (higher = kept first)
+PRIORITY_SYSTEM = 100
+PRIORITY_QUESTION = 90
+PRIORITY_ACTION = 80
+PRIORITY_SEARCH = 70
+PRIORITY_HISTORY = 50
+PRIORITY_REASONING = 40
+PRIORITY_RAG = 30
+PRIORITY_ECHO = 20
+
+# num_ctx values we switch between (few values = few model reloads)
+NUM_CTX_BUCKETS = (4096, 8192, 16384, 32768)
+DEFAULT_CONTEXT_WINDOW = 32768
+DEFAULT_RESERVE_OUTPUT = 2048  # tokens kept free for the answer
+MESSAGE_OVERHEAD_TOKENS = 4  # chat template markers around each message
+
+# History window for multi-turn chat: at most HISTORY_MAX_MESSAGES, advanced
+# HISTORY_STEP messages at a time so the prefix stays the same between steps
+HISTORY_MAX_MESSAGES = 10
+HISTORY_STEP = 4
+
+# Characters per token by script (deliberately pessimistic - Mixtral's
+# tokenizer splits Hebrew into roughly one token per letter)
+CHARS_PER_TOKEN_LATIN = 3.5
+CHARS_PER_TOKEN_HEBREW = 1.2
+CHARS_PER_TOKEN_OTHER = 1.0
+
+_HEBREW = re.compile(r"[\u0590-\u05FF]")
+_NON_ASCII = re.compile(r"[^\x00-\x7F]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of `text` (errs on the high side)"""
+    if not text:
+        return 0
+    hebrew = len(_HEBREW.findall(text))
+    other = len(_NON_ASCII.findall(text)) - hebrew
+    latin = len(text) - hebrew - other
+    return int(latin / CHARS_PER_TOKEN_LATIN
+               + hebrew / CHARS_PER_TOKEN_HEBREW
+               + other / CHARS_PER_TOKEN_OTHER) + 1
+
+
+def load_context_windows(path: Path = MODELS_YAML) -> Dict[str, int]:
+    """
+    Read context windows from models.yaml
+
+    Returns:
+        {ollama_model_name: context_window} for local models
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f) or {}
+    except Exception as e:
+        logger.warning(f"Could not load context windows from {path}: {e}")
+        return {}
+
+    windows = {}
+    for model_config in data.get("models", {}).get("local", {}).values():
+        model_name = model_config.get("model_name")
+        if model_name and model_config.get("context_window"):
+            windows[model_name] = int(model_config["context_window"])
+    return windows
+
+
+@dataclass
+class PromptSection:
+    """
+    One piece of the prompt
+
+    `header` is kept verbatim whenever the section is kept; only `body` is
+    truncated. `strategy` is "head" (keep the start - search, RAG),
+    "recent" (keep the last lines, shorten older ones - history) or "none"
+    (never truncated - drop or keep whole).
+    """
+    name: str
+    body: str
+    priority: int
+    header: str = ""
+    footer: str = ""
+    required: bool = False
+    strategy: str = "head"
+    min_tokens: int = 32  # don't keep a stub smaller than this
+
+    @property
+    def text(self) -> str:
+        return f"{self.header}{self.body}{self.footer}" if self.body else ""
+
+
+@dataclass
+class PackedPrompt:
+    """Result of PromptPacker.pack()"""
+    text: str
+    tokens: int
+    num_ctx: int
+    budget: int
+    section_tokens: Dict[str, int] = field(default_factory=dict)
+    truncated: List[str] = field(default_factory=list)
+    dropped: List[str] = field(default_factory=list)
+    messages: Optional[List[Dict[str, str]]] = None  # set by pack_messages()
+
+    @property
+    def options(self) -> Dict[str, Any]:
+        """Ollama option overrides for this prompt"""
+        return {"num_ctx": self.num_ctx}
+
+
+def _truncate_head(body: str, max_tokens: int) -> str:
+    """Keep the start of `body` (whole lines where possible)"""
+    kept = []
+    used = 0
+    for line in body.splitlines(keepends=True):
+        cost = estimate_tokens(line)
+        if used + cost > max_tokens:
+            # Partial last line - cut by the line's own chars-per-token ratio
+            room = max_tokens - used
+            if room > 8:
+                chars = int(len(line) * room / cost)
+                kept.append(line[:chars].rstrip() + "...\n")
+            break
+        kept.append(line)
+        used += cost
+    return "".join(kept)
+
+
+def _shorten_turn(line: str, max_chars: int = 120) -> str:
+    """First sentence of an older history line, capped to max_chars"""
+    stripped = line.rstrip("\n")
+    first = _SENTENCE_END.split(stripped, 1)[0]
+    if len(first) > max_chars:
+        first = first[:max_chars].rstrip() + "..."
+    elif len(first) < len(stripped):
+        first += " ..."
+    return first + ("\n" if line.endswith("\n") else "")
+
+
+def _truncate_recent(body: str, max_tokens: int, keep_verbatim: int = 4) -> str:
+    """
+    Fit a history block into max_tokens
+
+    The last `keep_verbatim` lines stay as they are, older lines are cut to
+    their first sentence, and the oldest lines are dropped until it fits.
+    """
+    lines = body.splitlines(keepends=True)
+    if not lines:
+        return ""
+    if not lines[-1].endswith("\n"):
+        lines[-1] += "\n"
+    split = max(0, len(lines) - keep_verbatim)
+    lines = [_shorten_turn(line) for line in lines[:split]] + lines[split:]
+    costs = [estimate_tokens(line) for line in lines]
+    start = 0
+    total = sum(costs)
+    while start < len(lines) and total > max_tokens:
+        total -= costs[start]
+        start += 1
+    return "".join(lines[start:]).rstrip("\n")
+
+
+def stable_history(history: Sequence[Dict[str, str]],
+                   max_messages: int = HISTORY_MAX_MESSAGES,
+                   step: int = HISTORY_STEP) -> List[Dict[str, str]]:
+    """
+    Recent chat history as {"role", "content"} messages with a stable start
+
+    A plain "last N messages" window slides by one every turn, so the first
+    history message - and with it the whole cached prefix - changes every
+    time. Here the window start only moves in blocks of `step` (even, so the
+    window starts on the same role), which keeps the prefix identical for
+    `step` turns in a row. Empty and non user/assistant messages are skipped.
+    """
+    messages = [
+        {"role": "user" if m.get("role") == "user" else "assistant", "content": m.get("content", "")}
+        for m in history
+        if m.get("content") and m.get("role") in ("user", "assistant", "zero")
+    ]
+    overflow = len(messages) - max_messages
+    if overflow <= 0:
+        return messages
+    start = -(-overflow // step) * step
+    return messages[start:]
+
+
+class ContextSizer:
+    """
+    Sticky per-model num_ctx choice
+
+    Grows to a larger bucket immediately; shrinks only after `shrink_after`
+    consecutive requests would fit in a smaller one, so a mix of short and
+    long turns does not make Ollama reload the model back and forth.
+    """
+
+    def __init__(self, buckets: Sequence[int] = NUM_CTX_BUCKETS, shrink_after: int = 8):
+        self.buckets = tuple(sorted(buckets))
+        self.shrink_after = shrink_after
+        self._current: Dict[str, int] = {}
+        self._smaller_streak: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def fit(self, needed: int, window: int) -> int:
+        """Smallest bucket >= needed, capped at the model window"""
+        for bucket in self.buckets:
+            if bucket >= window:
+                break
+            if bucket >= needed:
+                return bucket
+        return window
+
+    def choose(self, model_name: str, needed: int, window: int) -> int:
+        target = self.fit(needed, window)
+        with self._lock:
+            current = self._current.get(model_name)
+            if current is None or target >= current or current > window:
+                self._current[model_name] = target
+                self._smaller_streak[model_name] = 0
+                return target
+            streak = self._smaller_streak.get(model_name, 0) + 1
+            if streak >= self.shrink_after:
+                self._current[model_name] = target
+                self._smaller_streak[model_name] = 0
+                return target
+            self._smaller_streak[model_name] = streak
+            return current
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._current)
+
+
+class PromptPacker:
+    """
+    Fits prompt sections into a per-model token budget
+
+    Usage:
+        packed = packer.pack(sections, "mixtral:8x7b")
+        prompt = f"<s>[INST] {packed.text} [/INST]"
+        response = await llm.agenerate(prompt, options=packed.options, stats=stats)
+        packer.observe("mixtral:8x7b", packed.tokens, stats.get("prompt_eval_count"))
+    """
+
+    def __init__(self,
+                 context_windows: Optional[Dict[str, int]] = None,
+                 default_window: int = DEFAULT_CONTEXT_WINDOW,
+                 reserve_output: int = DEFAULT_RESERVE_OUTPUT,
+                 sizer: Optional[ContextSizer] = None):
+        self.context_windows = dict(context_windows or {})
+        self.default_window = default_window
+        self.reserve_output = reserve_output
+        self.sizer = sizer or ContextSizer()
+        self._calibration: Dict[str, float] = {}  # model -> actual / estimated tokens
+        self.stats = {"packed": 0, "truncated_sections": 0, "dropped_sections": 0}
+
+    @classmethod
+    def from_config(cls, path: Path = MODELS_YAML, **kwargs) -> "PromptPacker":
+        """Build a packer with the context windows from models.yaml"""
+        return cls(context_windows=load_context_windows(path), **kwargs)
+
+    def window(self, model_name: str) -> int:
+        return min(self.context_windows.get(model_name, self.default_window), self.default_window)
+
+    def tokens(self, text: str, model_name: Optional[str] = None) -> int:
+        """Estimated tokens, scaled by the model's calibration factor"""
+        factor = self._calibration.get(model_name, 1.0) if model_name else 1.0
+        return int(estimate_tokens(text) * factor)
+
+    def observe(self, model_name: str, estimated: int, actual: Optional[int]):
+        """
+        Calibrate estimates against Ollama's prompt_eval_count
+
+        Only ever scales estimates up - a cached prompt prefix makes Ollama
+        report fewer evaluated tokens than the prompt really has.
+        """
+        if not actual or not estimated:
+            return
+        ratio = actual / estimated
+        current = self._calibration.get(model_name, 1.0)
+        updated = current * 0.8 + ratio * 0.2
+        self._calibration[model_name] = min(3.0, max(1.0, updated))
+
+    def _fit_body(self, section: PromptSection, room: int, model_name: str) -> str:
+        """Truncate a section body to at most `room` (calibrated) tokens"""
+        truncate = _truncate_recent if section.strategy == "recent" else _truncate_head
+        target = int(room / self._calibration.get(model_name, 1.0))
+        body = ""
+        # Per-line estimates round up, so the joined text can come out a little
+        # over - tighten the target until it really fits
+        for _ in range(4):
+            body = truncate(section.body, target)
+            cost = self.tokens(body, model_name)
+            if cost <= room:
+                return body
+            target -= cost - room + 1
+            if target < section.min_tokens:
+                break
+        return ""
+
+    def _fit_sections(self, sections: Sequence[PromptSection], model_name: str,
+                      budget: int, used: int = 0):
+        """Fit sections into what is left of `budget` -> (text, used, costs, truncated, dropped)"""
+        bodies = {s.name: s.body for s in sections}
+        costs: Dict[str, int] = {}
+        truncated, dropped = [], []
+
+        for section in sorted(sections, key=lambda s: (not s.required, -s.priority)):
+            if not section.body:
+                continue
+            cost = self.tokens(section.text, model_name)
+            if section.required or used + cost <= budget:
+                costs[section.name] = cost
+                used += cost
+                continue
+
+            overhead = self.tokens(section.header + section.footer, model_name)
+            room = budget - used - overhead
+            body = ""
+            if section.strategy != "none" and room >= section.min_tokens:
+                body = self._fit_body(section, room, model_name)
+            if body.strip():
+                bodies[section.name] = body
+                cost = overhead + self.tokens(body, model_name)
+                costs[section.name] = cost
+                used += cost
+                truncated.append(section.name)
+            else:
+                bodies[section.name] = ""
+                dropped.append(section.name)
+
+        text = "".join(
+            f"{s.header}{bodies[s.name]}{s.footer}" for s in sections if bodies.get(s.name)
+        )
+        return text, used, costs, truncated, dropped
+
+    def _record(self, model_name: str, used: int, budget: int, truncated: List[str], dropped: List[str]):
+        self.stats["packed"] += 1
+        self.stats["truncated_sections"] += len(truncated)
+        self.stats["dropped_sections"] += len(dropped)
+        if truncated or dropped:
+            logger.info(f"Prompt packed for {model_name}: {used}/{budget} tokens, "
+                        f"truncated={truncated} dropped={dropped}")
+
+    def pack(self, sections: Sequence[PromptSection], model_name: str,
+             reserve_output: Optional[int] = None) -> PackedPrompt:
+        """
+        Fit sections into the model budget
+
+        Args:
+            sections: Prompt sections in prompt order
+            model_name: Ollama model name (selects window and calibration)
+            reserve_output: Tokens kept free for the answer
+
+        Returns:
+            PackedPrompt with the joined text and the num_ctx to send
+        """
+        reserve = self.reserve_output if reserve_output is None else reserve_output
+        window = self.window(model_name)
+        budget = max(0, window - reserve)
+
+        text, used, costs, truncated, dropped = self._fit_sections(sections, model_name, budget)
+        num_ctx = self.sizer.choose(model_name, used + reserve, window)
+
+        self._record(model_name, used, budget, truncated, dropped)
+        return PackedPrompt(text=text, tokens=used, num_ctx=num_ctx, budget=budget,
+                            section_tokens=costs, truncated=truncated, dropped=dropped)
+
+    def pack_messages(self, system: str, history: Sequence[Dict[str, str]],
+                      sections: Sequence[PromptSection], model_name: str,
+                      reserve_output: Optional[int] = None,
+                      history_step: int = HISTORY_STEP) -> PackedPrompt:
+        """
+        Lay out a multi-turn prompt for /api/chat with a stable prefix
+
+        Messages are [system, *history, user]. The system prompt and history
+        turns are sent byte-for-byte as before, so Ollama can reuse the KV
+        cache of everything up to the new user turn. Only the last user
+        message carries per-turn context (sections). When the budget is
+        short, history is dropped from the front in whole `history_step`
+        blocks, never rewritten.
+
+        Returns:
+            PackedPrompt whose `messages` are ready for achat(); `text` is the
+            last user message
+        """
+        reserve = self.reserve_output if reserve_output is None else reserve_output
+        window = self.window(model_name)
+        budget = max(0, window - reserve)
+
+        def message_tokens(message: Dict[str, str]) -> int:
+            return self.tokens(message.get("content", ""), model_name) + MESSAGE_OVERHEAD_TOKENS
+
+        history = list(history)
+        system_tokens = self.tokens(system, model_name) + MESSAGE_OVERHEAD_TOKENS if system else 0
+        required = sum(self.tokens(s.text, model_name) for s in sections if s.required and s.body)
+        history_tokens = [message_tokens(m) for m in history]
+        dropped_turns = 0
+        while history and system_tokens + sum(history_tokens) + required > budget:
+            step = min(history_step, len(history))
+            history, history_tokens = history[step:], history_tokens[step:]
+            dropped_turns += step
+
+        fixed = system_tokens + sum(history_tokens) + MESSAGE_OVERHEAD_TOKENS
+        text, used, costs, truncated, dropped = self._fit_sections(sections, model_name, budget, fixed)
+        if history_tokens:
+            costs["history"] = sum(history_tokens)
+        if dropped_turns:
+            truncated.append("history")
+        num_ctx = self.sizer.choose(model_name, used + reserve, window)
+
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.extend(history)
+        messages.append({"role": "user", "content": text.lstrip()})
+
+        self._record(model_name, used, budget, truncated, dropped)
+        return PackedPrompt(text=text, tokens=used, num_ctx=num_ctx, budget=budget,
+                            section_tokens=costs, truncated=truncated, dropped=dropped,
+                            messages=messages)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "num_ctx": self.sizer.get_stats(),
+            "calibration": dict(self._calibration),
+            "context_windows": self.context_windows,
+            "reserve_output": self.reserve_output,
+        }
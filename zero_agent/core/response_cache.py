@@ -0,0 +1,278 @@
+"""
+Response Cache - skip LLM generation for repeated questions
+============================================================
+FAQ-style questions ("מה זה ...", "what is ...", a price lookup a few
+seconds after the last one) keep costing a full generation. The cache sits
+in front of the LLM call in /api/chat:
+
+    - exact hits on (normalized message, model, context hash)
+    - optional semantic hits: an embedding of the message within
+      `similarity_threshold` (cosine) of a cached one with the same model and
+      context hash - never for search-backed answers ("price of SPY" and
+      "price of QQQ" embed close together but need different data)
+    - TTL per query class - search-backed answers expire fast, definitional
+      answers live long
+    - LRU eviction beyond `max_entries`, plus explicit invalidation
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import hashlib
+import logging
+import math
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds an answer stays valid, by query class
+DEFAULT_TTLS = {
+    "search": 60,              # prices, news, weather - the data moves
+    "definition": 24 * 3600,   # "what is X" answers rarely change
+    "default": 30 * 60,
+}
+
+DEFINITION_PATTERNS = [
+    'מה זה', 'מהו', 'מהי', 'מה פירוש', 'הגדר', 'הסבר מה',
+    'what is', 'what are', "what's", 'define', 'definition of', 'meaning of',
+]
+
+# Query classes matched exactly only
+EXACT_ONLY_CLASSES = frozenset({"search"})
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.,;:]+$")
+
+
+@dataclass
+class CacheEntry:
+    """One cached answer"""
+    key: str
+    message: str
+    model: str
+    context_hash: str
+    response: str
+    query_class: str
+    created: float
+    expires: float
+    generation_seconds: float = 0.0
+    embedding: Optional[List[float]] = None
+    hits: int = 0
+
+
+@dataclass
+class CacheLookup:
+    """Result of ResponseCache.lookup()"""
+    entry: Optional[CacheEntry] = None
+    kind: str = "miss"  # "exact", "semantic" or "miss"
+    similarity: float = 0.0
+    embedding: Optional[List[float]] = field(default=None, repr=False)
+
+    @property
+    def hit(self) -> bool:
+        return self.entry is not None
+
+
+def normalize_message(message: str) -> str:
+    """Case/whitespace/trailing-punctuation insensitive form of a message"""
+    text = _WHITESPACE.sub(" ", message.strip().lower())
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+
+def context_hash(*parts: Optional[str]) -> str:
+    """Stable hash of everything besides the message that shapes the answer"""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update((part or "").encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()[:16]
+
+
+def classify_query(message: str, search_backed: bool = False) -> str:
+    """Query class used to pick the TTL"""
+    if search_backed:
+        return "search"
+    text = message.lower()
+    if any(pattern in text for pattern in DEFINITION_PATTERNS):
+        return "definition"
+    return "default"
+
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache of LLM answers
+
+    Usage:
+        lookup = cache.lookup(message, model, ctx)
+        if lookup.hit:
+            return lookup.entry.response
+        ... generate ...
+        cache.store(message, model, ctx, response, generation_seconds,
+                    query_class=classify_query(message), embedding=lookup.embedding)
+    """
+
+    def __init__(self,
+                 max_entries: int = 512,
+                 ttls: Optional[Dict[str, float]] = None,
+                 embed_fn: Optional[Callable[[str], Sequence[float]]] = None,
+                 similarity_threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            "lookups": 0,
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+            "saved_seconds": 0.0,
+        }
+
+    @staticmethod
+    def make_key(message: str, model: str, ctx_hash: str) -> str:
+        return f"{model}|{ctx_hash}|{normalize_message(message)}"
+
+    def _embed(self, message: str) -> Optional[List[float]]:
+        if self.embed_fn is None:
+            return None
+        try:
+            return list(self.embed_fn(normalize_message(message)))
+        except Exception as e:
+            logger.warning(f"Response cache embedding failed: {e}")
+            return None
+
+    def _drop_expired(self, now: float):
+        expired = [key for key, entry in self._entries.items() if entry.expires <= now]
+        for key in expired:
+            del self._entries[key]
+        self.stats["expirations"] += len(expired)
+
+    def lookup(self, message: str, model: str, ctx_hash: str) -> CacheLookup:
+        """Find a cached answer (exact first, then semantic when an embed_fn is set)"""
+        key = self.make_key(message, model, ctx_hash)
+        now = time.time()
+        with self._lock:
+            self.stats["lookups"] += 1
+            self._drop_expired(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                return self._hit(entry, "exact", 1.0, None)
+            has_candidates = any(self._semantic_candidate(e, model, ctx_hash, now)
+                                 for e in self._entries.values())
+
+        embedding = self._embed(message)  # outside the lock - may take a few ms
+        if embedding is not None and has_candidates:
+            with self._lock:
+                best, best_score = None, 0.0
+                for candidate in self._entries.values():
+                    if not self._semantic_candidate(candidate, model, ctx_hash, now):
+                        continue
+                    score = _cosine(embedding, candidate.embedding)
+                    if score > best_score:
+                        best, best_score = candidate, score
+                if best is not None and best_score >= self.similarity_threshold and best.key in self._entries:
+                    return self._hit(best, "semantic", best_score, embedding)
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return CacheLookup(embedding=embedding)
+
+    @staticmethod
+    def _semantic_candidate(entry: CacheEntry, model: str, ctx_hash: str, now: float) -> bool:
+        return (entry.embedding is not None and entry.model == model and entry.context_hash == ctx_hash
+                and entry.expires > now and entry.query_class not in EXACT_ONLY_CLASSES)
+
+    def _hit(self, entry: CacheEntry, kind: str, similarity: float,
+             embedding: Optional[List[float]]) -> CacheLookup:
+        """Record a hit (caller holds the lock)"""
+        self._entries.move_to_end(entry.key)
+        entry.hits += 1
+        self.stats[f"{kind}_hits"] += 1
+        self.stats["saved_seconds"] += entry.generation_seconds
+        return CacheLookup(entry=entry, kind=kind, similarity=similarity, embedding=embedding)
+
+    def store(self, message: str, model: str, ctx_hash: str, response: str,
+              generation_seconds: float = 0.0, query_class: str = "default",
+              embedding: Optional[List[float]] = None) -> Optional[CacheEntry]:
+        """Cache an answer; error replies and empty answers are never cached"""
+        if not response or response.startswith("Error:"):
+            return None
+        ttl = self.ttls.get(query_class, self.ttls["default"])
+        if ttl <= 0:
+            return None
+        if embedding is None:
+            embedding = self._embed(message)
+        now = time.time()
+        key = self.make_key(message, model, ctx_hash)
+        entry = CacheEntry(
+            key=key, message=normalize_message(message), model=model, context_hash=ctx_hash,
+            response=response, query_class=query_class, created=now, expires=now + ttl,
+            generation_seconds=generation_seconds, embedding=embedding
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self.stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+        return entry
+
+    def invalidate(self, model: Optional[str] = None, contains: Optional[str] = None,
+                   query_class: Optional[str] = None) -> int:
+        """
+        Drop matching entries (no filters = everything)
+
+        Returns:
+            Number of entries removed
+        """
+        needle = normalize_message(contains) if contains else None
+        with self._lock:
+            doomed = [
+                key for key, entry in self._entries.items()
+                if (model is None or entry.model == model)
+                and (query_class is None or entry.query_class == query_class)
+                and (needle is None or needle in entry.message)
+            ]
+            for key in doomed:
+                del self._entries[key]
+            self.stats["invalidations"] += len(doomed)
+        return len(doomed)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def hit_ratio(self) -> float:
+        lookups = self.stats["lookups"]
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        return hits / lookups if lookups else 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        by_class: Dict[str, int] = {}
+        with self._lock:
+            for entry in self._entries.values():
+                by_class[entry.query_class] = by_class.get(entry.query_class, 0) + 1
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hit_ratio": self.hit_ratio(),
+            "entries_by_class": by_class,
+            "semantic": self.embed_fn is not None,
+            "similarity_threshold": self.similarity_threshold,
+            "ttls": self.ttls,
+        }
@@ -0,0 +1,295 @@
+"""
+Session Store - server-side conversation state per session ID
+==============================================================
+Clients used to send the whole `conversation_history` with every chat
+request, and the server re-formatted its last messages into a context block
+each time. The session store keeps that state on the server:
+
+    - the recent turns (user / assistant messages, capped at `max_messages`)
+    - the pre-formatted context block of the last `context_messages`
+      messages, updated incrementally as turns are appended
+    - a rolling summary: messages pushed out of the window are shortened to
+      their first sentence and kept (oldest dropped first) under a
+      character budget
+
+so a client can send only the new message plus its session ID. Sessions
+are evicted LRU beyond `max_sessions` and after `ttl` seconds idle. With a
+`db_path` every change is written through to SQLite and sessions survive a
+restart (loaded back on first use).
+
+    store = SessionStore(ttl=3600)
+    store.append("tab-1", "מה זה docker?", "Docker הוא ...")
+    session = store.get("tab-1")
+    session.messages(), session.context_block, session.summary
+"""
+
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Sequence
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from zero_agent.core.prompt_packer import _shorten_turn
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SESSIONS = 1000
+DEFAULT_TTL = 3600.0          # seconds idle before a session is dropped
+DEFAULT_MAX_MESSAGES = 40     # turns kept verbatim (older ones go to the summary)
+DEFAULT_CONTEXT_MESSAGES = 10  # messages in the pre-formatted context block
+SUMMARY_MAX_CHARS = 1500
+SWEEP_INTERVAL = 60.0
+
+# Speaker labels of the context block (as the chat handler formatted them)
+ROLE_LABELS = {"user": "משתמש", "assistant": "Zero"}
+
+
+def _message(role: str, content: str) -> Dict[str, str]:
+    return {"role": "user" if role == "user" else "assistant", "content": content}
+
+
+def _context_line(message: Dict[str, str]) -> str:
+    return f"{ROLE_LABELS[message['role']]}: {message['content']}"
+
+
+@dataclass
+class ChatSession:
+    """Turns, context block and rolling summary of one conversation"""
+    session_id: str
+    max_messages: int = DEFAULT_MAX_MESSAGES
+    context_messages: int = DEFAULT_CONTEXT_MESSAGES
+    turns: Deque[Dict[str, str]] = field(default_factory=deque)
+    summary_lines: Deque[str] = field(default_factory=deque)
+    created: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+    _context_lines: Deque[str] = field(default_factory=deque, repr=False)
+
+    def __post_init__(self):
+        self._context_lines = deque((_context_line(m) for m in self.turns), maxlen=self.context_messages)
+
+    def add(self, role: str, content: str):
+        """Append one message - O(1): the context block and summary are updated in place"""
+        if not content:
+            return
+        message = _message(role, content)
+        self.turns.append(message)
+        self._context_lines.append(_context_line(message))
+        while len(self.turns) > self.max_messages:
+            self._summarize(self.turns.popleft())
+        self.last_used = time.time()
+
+    def _summarize(self, message: Dict[str, str]):
+        self.summary_lines.append(_shorten_turn(_context_line(message)))
+        total = sum(len(line) + 1 for line in self.summary_lines)
+        while self.summary_lines and total > SUMMARY_MAX_CHARS:
+            total -= len(self.summary_lines.popleft()) + 1
+
+    def messages(self) -> List[Dict[str, str]]:
+        """Recent turns as {"role", "content"} messages, oldest first"""
+        return list(self.turns)
+
+    @property
+    def context_block(self) -> str:
+        """The last `context_messages` messages as "משתמש: ... / Zero: ..." lines"""
+        return "\n".join(self._context_lines)
+
+    @property
+    def summary(self) -> str:
+        return "\n".join(self.summary_lines)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "turns": list(self.turns),
+            "summary": list(self.summary_lines),
+            "created": self.created,
+            "last_used": self.last_used,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], max_messages: int = DEFAULT_MAX_MESSAGES,
+                  context_messages: int = DEFAULT_CONTEXT_MESSAGES) -> "ChatSession":
+        return cls(
+            session_id=data["session_id"],
+            max_messages=max_messages,
+            context_messages=context_messages,
+            turns=deque(data.get("turns", [])),
+            summary_lines=deque(data.get("summary", [])),
+            created=data.get("created", time.time()),
+            last_used=data.get("last_used", time.time()),
+        )
+
+
+class SessionStore:
+    """
+    LRU / TTL map of session ID -> ChatSession, optionally persisted in SQLite
+
+    Thread-safe. Sessions are plain picklable objects, so the store can also
+    live in the owner worker and be used through a RemoteObject proxy (see
+    zero_agent/core/workers.py).
+    """
+
+    def __init__(self, max_sessions: int = DEFAULT_MAX_SESSIONS, ttl: float = DEFAULT_TTL,
+                 max_messages: int = DEFAULT_MAX_MESSAGES,
+                 context_messages: int = DEFAULT_CONTEXT_MESSAGES,
+                 db_path: Optional[Path] = None):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_messages = max_messages
+        self.context_messages = context_messages
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_sweep = time.time() + SWEEP_INTERVAL
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path is not None:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " session_id TEXT PRIMARY KEY, data TEXT NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.commit()
+        self.stats = {"hits": 0, "misses": 0, "loaded": 0, "evicted": 0, "expired": 0, "turns": 0}
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def _expired(self, session: ChatSession, now: float) -> bool:
+        return now - session.last_used > self.ttl
+
+    def _lookup(self, session_id: str, now: float) -> Optional[ChatSession]:
+        """Caller holds the lock"""
+        session = self._sessions.get(session_id)
+        if session is None and self._db is not None:
+            session = self._load(session_id)
+            if session is not None:
+                self.stats["loaded"] += 1
+                self._insert(session)
+        if session is None:
+            return None
+        if self._expired(session, now):
+            self._drop(session_id)
+            self.stats["expired"] += 1
+            return None
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        """The live session, or None for unknown / expired IDs"""
+        with self._lock:
+            session = self._lookup(session_id, time.time())
+            self.stats["hits" if session else "misses"] += 1
+            return session
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return self._lookup(session_id, time.time()) is not None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+
+    def _new(self, session_id: str) -> ChatSession:
+        session = ChatSession(session_id, self.max_messages, self.context_messages)
+        self._insert(session)
+        return session
+
+    def _insert(self, session: ChatSession):
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)  # still in SQLite, reloaded on next use
+            self.stats["evicted"] += 1
+
+    def append(self, session_id: str, user_message: str, response: str) -> ChatSession:
+        """Record one exchange (creating the session if needed)"""
+        now = time.time()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            session = self._lookup(session_id, now) or self._new(session_id)
+            session.add("user", user_message)
+            session.add("assistant", response)
+            self.stats["turns"] += 1
+            self._save(session)
+            return session
+
+    def replace(self, session_id: str, history: Sequence[Dict[str, str]]) -> ChatSession:
+        """
+        Reset a session to a client-provided history (clients that still send
+        conversation_history stay the source of truth)
+        """
+        with self._lock:
+            session = self._new(session_id)
+            for message in history:
+                if message.get("role") in ("user", "assistant", "zero"):
+                    session.add(message["role"], message.get("content") or "")
+            self._save(session)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            found = session_id in self._sessions
+            self._drop(session_id)
+            return found
+
+    def _drop(self, session_id: str):
+        self._sessions.pop(session_id, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._db.commit()
+
+    def _sweep(self, now: float):
+        """Drop sessions idle longer than the TTL (LRU order: stop at the first live one)"""
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if not self._expired(session, now):
+                break
+            del self._sessions[session_id]
+            self.stats["expired"] += 1
+        if self._db is not None:
+            self._db.execute("DELETE FROM sessions WHERE last_used < ?", (now - self.ttl,))
+            self._db.commit()
+        self._next_sweep = now + SWEEP_INTERVAL
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _save(self, session: ChatSession):
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, data, last_used) VALUES (?, ?, ?)",
+                (session.session_id, json.dumps(session.to_dict(), ensure_ascii=False), session.last_used)
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Session {session.session_id} not persisted: {e}")
+
+    def _load(self, session_id: str) -> Optional[ChatSession]:
+        row = self._db.execute("SELECT data FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        return ChatSession.from_dict(json.loads(row[0]), self.max_messages, self.context_messages)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            turns = sum(len(s.turns) for s in self._sessions.values())
+            return {
+                **self.stats,
+                "sessions": len(self._sessions),
+                "messages": turns,
+                "ttl_seconds": self.ttl,
+                "max_sessions": self.max_sessions,
+                "persistent": self._db is not None,
+            }
@@ -0,0 +1,277 @@
+"""
+Streaming STT - incremental recognition over a live PCM stream
+===============================================================
+The WebSocket STT service used to receive whole recorded clips and
+transcribe each one completely, so the voice UI waited for silence, then
+for the upload, then for a full transcription. The streaming recognizer is
+fed raw PCM as it is recorded instead:
+
+    - samples go into a fixed-size ring buffer (no per-chunk allocation)
+    - an energy VAD with a minimum-statistics noise floor runs over 30 ms frames and
+      finds where an utterance starts (after `min_speech_ms` of speech,
+      with a little pre-roll) and ends (after `min_silence_ms` of silence)
+    - while the user speaks, a partial hypothesis of the last
+      `partial_window` seconds is decoded every `partial_interval` seconds
+      with the fast settings (beam 1); when decoding falls behind real time
+      partials are spaced out instead of queueing up
+    - at the end of an utterance (or after `max_utterance` seconds) the
+      whole utterance gets one final, high-quality pass (beam 5)
+
+    recognizer = StreamingRecognizer(whisper_transcriber(model, language="he"))
+    for chunk in pcm_chunks:              # float32 16 kHz mono
+        for event in recognizer.feed(chunk):
+            event["type"], event["text"]  # "partial" / "final" ("error" if a final pass failed)
+    recognizer.flush()                    # end of stream: finalize open speech
+
+One recognizer per stream; feed() blocks while decoding, so async callers
+run it in a worker thread.
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+import logging
+import math
+import time
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from zero_agent.core.audio_io import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# Decode settings of the two passes (faster-whisper transcribe() options)
+PARTIAL_OPTIONS = {"beam_size": 1, "temperature": 0.0, "condition_on_previous_text": False,
+                   "without_timestamps": True}
+FINAL_OPTIONS = {"beam_size": 5, "temperature": 0.0, "condition_on_previous_text": False}
+
+
+def whisper_transcriber(model, language: Optional[str] = "he") -> Callable[[Any, bool], str]:
+    """transcribe(audio, final) for a WhisperModel: beam 1 for partials, beam 5 for finals"""
+    def transcribe(audio, final: bool) -> str:
+        options = FINAL_OPTIONS if final else PARTIAL_OPTIONS
+        segments, _ = model.transcribe(audio, language=language, **options)
+        return " ".join(segment.text.strip() for segment in segments).strip()
+    return transcribe
+
+
+class EnergyVAD:
+    """
+    Speech / non-speech per frame from its RMS energy
+
+    A frame is speech when its RMS exceeds both an absolute floor
+    (`min_rms`) and `ratio` times the noise floor. The floor is a
+    minimum-statistics estimate updated on every frame: it drops quickly
+    toward quieter frames (`fall` of the gap per frame) and climbs slowly
+    toward louder ones (at most `rise` times per second). The pauses in
+    speech keep pulling it down; steady noise above min_rms (a fan, hum)
+    does not, so it stops counting as speech after a few seconds.
+    """
+
+    def __init__(self, ratio: float = 3.0, min_rms: float = 0.01, rise: float = 1.5, fall: float = 0.3,
+                 sample_rate: int = SAMPLE_RATE):
+        self.ratio = ratio
+        self.min_rms = min_rms
+        self.rise = rise
+        self.fall = fall
+        self.sample_rate = sample_rate
+        self.noise = min_rms / ratio
+
+    def is_speech(self, frame) -> bool:
+        rms = math.sqrt(float(np.dot(frame, frame)) / max(1, len(frame)))
+        speech = rms > max(self.min_rms, self.noise * self.ratio)
+        if rms < self.noise:
+            # Never below the level min_rms already covers - the climb back up would take too long
+            self.noise = max(self.min_rms / self.ratio, self.noise + self.fall * (rms - self.noise))
+        else:
+            self.noise = min(rms, self.noise * self.rise ** (len(frame) / self.sample_rate))
+        return speech
+
+
+class RingBuffer:
+    """Fixed-capacity float32 buffer addressed by absolute sample position"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self.written = 0  # samples appended since the start of the stream
+
+    def append(self, samples):
+        count = len(samples)
+        samples = samples[-self.capacity:]
+        start = (self.written + count - len(samples)) % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        self._data[:len(samples) - first] = samples[first:]
+        self.written += count
+
+    @property
+    def oldest(self) -> int:
+        return max(0, self.written - self.capacity)
+
+    def read(self, start: int, end: int):
+        """Copy of samples [start, end) (clamped to what is still buffered)"""
+        start = max(start, self.oldest)
+        end = min(end, self.written)
+        if end <= start:
+            return np.zeros(0, dtype=np.float32)
+        a, b = start % self.capacity, end % self.capacity
+        if a < b:
+            return self._data[a:b].copy()
+        return np.concatenate((self._data[a:], self._data[:b]))
+
+
+class StreamingRecognizer:
+    """VAD-segmented utterances with sliding-window partials and a final pass each"""
+
+    def __init__(self, transcribe: Callable[[Any, bool], str], sample_rate: int = SAMPLE_RATE,
+                 frame_ms: int = 30, min_speech_ms: int = 150, min_silence_ms: int = 500,
+                 pre_roll_ms: int = 200, partial_interval: float = 0.5, partial_window: float = 8.0,
+                 max_utterance: float = 30.0, vad: Optional[EnergyVAD] = None):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("StreamingRecognizer needs numpy (pip install numpy)")
+        self.transcribe = transcribe
+        self.sample_rate = sample_rate
+        self.frame = sample_rate * frame_ms // 1000
+        self.min_speech = sample_rate * min_speech_ms // 1000
+        self.min_silence = sample_rate * min_silence_ms // 1000
+        self.pre_roll = sample_rate * pre_roll_ms // 1000
+        self.partial_interval = partial_interval
+        self.partial_window = int(partial_window * sample_rate)
+        self.max_utterance = int(max_utterance * sample_rate)
+        self.vad = vad or EnergyVAD()
+        # Room for the longest utterance plus pre-roll and the frame being classified
+        self.buffer = RingBuffer(self.max_utterance + self.pre_roll + 2 * sample_rate)
+
+        self._processed = 0        # samples already classified by the VAD
+        self._speech_run = 0       # consecutive speech samples before an utterance starts
+        self._silence_run = 0      # consecutive silence samples inside an utterance
+        self._utterance_start: Optional[int] = None
+        self._utterance_end = 0    # end of the last finalized utterance
+        self._last_partial_at = 0  # buffer position of the last partial
+        self._partial_cost = 0.0   # seconds the last partial took to decode
+        self._last_partial_text = ""
+        self.utterances = 0
+        self.stats = {"audio_seconds": 0.0, "partials": 0, "finals": 0, "errors": 0,
+                      "partial_seconds": 0.0, "final_seconds": 0.0}
+
+    @property
+    def in_speech(self) -> bool:
+        return self._utterance_start is not None
+
+    def feed(self, samples) -> List[Dict[str, Any]]:
+        """Append 16 kHz mono float32 samples; returns the partial / final events they produced"""
+        self.buffer.append(samples)
+        self.stats["audio_seconds"] += len(samples) / self.sample_rate
+        events: List[Dict[str, Any]] = []
+        while self.buffer.written - self._processed >= self.frame:
+            end = self._processed + self.frame
+            self._classify(self.buffer.read(self._processed, end), end, events)
+            self._processed = end
+        if self.in_speech and self._partial_due():
+            self._partial(events)
+        return events
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """End of stream: finalize the utterance in progress (if any)"""
+        events: List[Dict[str, Any]] = []
+        if self.in_speech:
+            self._final(self.buffer.written, events)
+        return events
+
+    # ------------------------------------------------------------------
+    # Segmentation
+    # ------------------------------------------------------------------
+
+    def _classify(self, frame, end: int, events: List[Dict[str, Any]]):
+        speech = self.vad.is_speech(frame)
+        if not self.in_speech:
+            self._speech_run = self._speech_run + self.frame if speech else 0
+            if self._speech_run >= self.min_speech:
+                start = end - self._speech_run - self.pre_roll
+                self._utterance_start = max(start, self._utterance_end, self.buffer.oldest)
+                self._silence_run = 0
+                self._last_partial_at = end
+            return
+        if speech:
+            self._silence_run = 0
+        else:
+            self._silence_run += self.frame
+            if self._silence_run >= self.min_silence:
+                # Keep a little of the trailing silence so the last word is not clipped
+                self._final(end - self._silence_run + self.pre_roll, events)
+                return
+        if end - self._utterance_start >= self.max_utterance:
+            # Too long without a pause: finalize and continue in a new utterance
+            self._final(end, events)
+            self._utterance_start = end
+            self._last_partial_at = end
+
+    def _partial_due(self) -> bool:
+        advanced = (self.buffer.written - self._last_partial_at) / self.sample_rate
+        # Falling behind real time: space partials out rather than queue them
+        return advanced >= max(self.partial_interval, 1.5 * self._partial_cost)
+
+    # ------------------------------------------------------------------
+    # Decoding
+    # ------------------------------------------------------------------
+
+    def _event(self, kind: str, text: str, start: int, end: int, seconds: float) -> Dict[str, Any]:
+        return {
+            "type": kind,
+            "utterance": self.utterances,
+            "text": text,
+            "start": round(start / self.sample_rate, 3),
+            "end": round(end / self.sample_rate, 3),
+            "seconds": round(seconds, 3),
+        }
+
+    def _partial(self, events: List[Dict[str, Any]]):
+        end = self.buffer.written
+        start = max(self._utterance_start, end - self.partial_window)
+        began = time.perf_counter()
+        try:
+            text = self.transcribe(self.buffer.read(start, end), False)
+        except Exception as e:
+            logger.warning(f"Partial transcription failed: {e}")
+            text = ""
+        self._partial_cost = time.perf_counter() - began
+        self._last_partial_at = end
+        self.stats["partials"] += 1
+        self.stats["partial_seconds"] += self._partial_cost
+        if text and text != self._last_partial_text:
+            self._last_partial_text = text
+            events.append(self._event("partial", text, self._utterance_start, end, self._partial_cost))
+
+    def _final(self, end: int, events: List[Dict[str, Any]]):
+        start = self._utterance_start
+        end = min(end, self.buffer.written)
+        self._utterance_start = None
+        self._utterance_end = end
+        self._speech_run = 0
+        self._silence_run = 0
+        self._last_partial_text = ""
+        began = time.perf_counter()
+        try:
+            text = self.transcribe(self.buffer.read(start, end), True)
+        except Exception as e:
+            # The stream goes on; the client learns this utterance has no final text
+            logger.warning(f"Final transcription failed: {e}")
+            self.stats["errors"] += 1
+            event = self._event("error", "", start, end, time.perf_counter() - began)
+            event["message"] = f"Transcription failed: {e}"
+            events.append(event)
+            self.utterances += 1
+            return
+        seconds = time.perf_counter() - began
+        self.stats["finals"] += 1
+        self.stats["final_seconds"] += seconds
+        if text:
+            events.append(self._event("final", text, start, end, seconds))
+        self.utterances += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "utterances": self.utterances, "in_speech": self.in_speech}
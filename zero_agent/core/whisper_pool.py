@@ -0,0 +1,285 @@
+"""
+Whisper Pool - warm faster-whisper instances shared by the process
+===================================================================
+/api/voice/transcribe used to construct a WhisperModel inside the handler:
+a model load from disk per utterance (often longer than the transcription)
+running on the event loop. The pool instead:
+
+    - keeps up to `size` loaded WhisperModel instances, created lazily on
+      first use (or preloaded at startup) and reused for every request
+    - splits the CPU between them (`cpu_threads` per instance, default
+      cpu_count / size) so concurrent transcriptions do not oversubscribe
+    - runs transcriptions on its own executor (one thread per instance),
+      keeping the event loop free
+    - records queue wait, transcription time and audio seconds for
+      /api/voice/stats and Prometheus
+
+    pool = WhisperPool.from_config()
+    result = await pool.transcribe(audio, language="he", beam_size=5, vad_filter=True)
+    result.text, result.language, result.seconds
+
+`audio` is anything WhisperModel.transcribe() accepts (path, file object or
+float32 NumPy array) or a PooledAudio from zero_agent/core/audio_io.py,
+whose buffer is released when the transcription has finished with it - not
+when the awaiting request goes away. Settings come from the `whisper` block
+of config/models.yaml.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import yaml
+
+from zero_agent.core.audio_io import PooledAudio
+
+logger = logging.getLogger(__name__)
+
+MODELS_YAML = Path(__file__).parent.parent / "config" / "models.yaml"
+
+DEFAULT_MODEL_SIZE = "small"
+DEFAULT_DEVICE = "cpu"
+DEFAULT_COMPUTE_TYPE = "int8"
+DEFAULT_POOL_SIZE = 2
+
+
+def load_whisper_config(path: Path = MODELS_YAML) -> Dict[str, Any]:
+    """
+    Read pool settings from the `whisper` block of models.yaml
+
+    Returns:
+        {"model_size", "device", "compute_type", "size", "cpu_threads", "preload"}
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f) or {}
+    except Exception as e:
+        logger.warning(f"Could not load whisper config from {path}: {e}")
+        data = {}
+
+    whisper = data.get("whisper") or {}
+    return {
+        "model_size": str(whisper.get("model", DEFAULT_MODEL_SIZE)),
+        "device": str(whisper.get("device", DEFAULT_DEVICE)),
+        "compute_type": str(whisper.get("compute_type", DEFAULT_COMPUTE_TYPE)),
+        "size": int(whisper.get("pool_size", DEFAULT_POOL_SIZE)),
+        "cpu_threads": int(whisper.get("cpu_threads", 0)),
+        "preload": int(whisper.get("preload", 1)),
+    }
+
+
+def _percentile(values, q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+@dataclass
+class Transcription:
+    """Result of one pooled transcription"""
+    text: str
+    language: str
+    language_probability: float
+    audio_seconds: float   # length of the audio
+    seconds: float         # time spent transcribing (model held)
+    wait_seconds: float    # time queued for a free instance
+    segments: List[Tuple[float, float, str]] = field(default_factory=list)
+
+
+class WhisperPool:
+    """Up to `size` warm WhisperModel instances, one transcription each at a time"""
+
+    def __init__(self, model_size: str = DEFAULT_MODEL_SIZE, device: str = DEFAULT_DEVICE,
+                 compute_type: str = DEFAULT_COMPUTE_TYPE, size: int = DEFAULT_POOL_SIZE,
+                 cpu_threads: int = 0, preload: int = 1,
+                 factory: Optional[Callable[[], Any]] = None):
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        self.size = max(1, size)
+        self.cpu_threads = cpu_threads or max(1, (os.cpu_count() or 2) // self.size)
+        self.preload_count = min(max(0, preload), self.size)
+        self._factory = factory or self._load_model
+        self._idle: List[Any] = []
+        self._created = 0
+        self._available = threading.Condition()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._listeners: List[Callable[[Dict[str, float]], None]] = []
+        self.queued = 0
+        self.active = 0
+        self.wait_times: deque = deque(maxlen=200)
+        self.latencies: deque = deque(maxlen=200)
+        self.stats = {"loads": 0, "load_seconds": 0.0, "transcriptions": 0, "errors": 0,
+                      "audio_seconds": 0.0, "busy_seconds": 0.0}
+
+    @classmethod
+    def from_config(cls, path: Path = MODELS_YAML, **kwargs) -> "WhisperPool":
+        """Build a pool with the settings from models.yaml"""
+        return cls(**{**load_whisper_config(path), **kwargs})
+
+    def add_listener(self, listener: Callable[[Dict[str, float]], None]):
+        """Register fn(sample) called after each transcription ({"wait", "seconds", "audio_seconds"})"""
+        self._listeners.append(listener)
+
+    # ------------------------------------------------------------------
+    # Instances
+    # ------------------------------------------------------------------
+
+    def _load_model(self):
+        from faster_whisper import WhisperModel
+        return WhisperModel(self.model_size, device=self.device, compute_type=self.compute_type,
+                            cpu_threads=self.cpu_threads, num_workers=1)
+
+    def _new_instance(self):
+        """Load one more instance (the caller reserved a slot in _created)"""
+        start = time.perf_counter()
+        try:
+            model = self._factory()
+        except Exception:
+            with self._available:
+                self._created -= 1
+                self._available.notify()
+            raise
+        elapsed = time.perf_counter() - start
+        self.stats["loads"] += 1
+        self.stats["load_seconds"] += elapsed
+        logger.info(f"Loaded whisper {self.model_size} ({self.device}/{self.compute_type}, "
+                    f"{self.cpu_threads} threads) in {elapsed:.1f}s")
+        return model
+
+    def _acquire(self):
+        with self._available:
+            while not self._idle and self._created >= self.size:
+                self._available.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+        return self._new_instance()
+
+    def _release(self, model):
+        with self._available:
+            self._idle.append(model)
+            self._available.notify()
+
+    def preload(self, count: Optional[int] = None) -> int:
+        """Load instances until `count` (default: the configured preload) exist; returns how many were loaded"""
+        target = min(self.size, self.preload_count if count is None else count)
+        loaded = 0
+        while True:
+            with self._available:
+                if self._created >= target:
+                    return loaded
+                self._created += 1
+            self._release(self._new_instance())
+            loaded += 1
+
+    async def apreload(self, count: Optional[int] = None) -> int:
+        return await asyncio.get_running_loop().run_in_executor(self._pool_executor(), self.preload, count)
+
+    # ------------------------------------------------------------------
+    # Transcription
+    # ------------------------------------------------------------------
+
+    def _pool_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="whisper")
+        return self._executor
+
+    def _transcribe(self, audio, options: Dict[str, Any], queued_at: float) -> Transcription:
+        model = self._acquire()
+        wait = time.perf_counter() - queued_at
+        with self._available:
+            self.queued -= 1
+            self.active += 1
+        start = time.perf_counter()
+        try:
+            segments, info = model.transcribe(audio, **options)
+            # segments is a generator - decoding happens while it is consumed, still on this thread
+            parts = [(segment.start, segment.end, segment.text) for segment in segments]
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        finally:
+            with self._available:
+                self.active -= 1
+            self._release(model)
+        seconds = time.perf_counter() - start
+        audio_seconds = float(getattr(info, "duration", 0.0) or 0.0)
+
+        self.stats["transcriptions"] += 1
+        self.stats["audio_seconds"] += audio_seconds
+        self.stats["busy_seconds"] += seconds
+        self.wait_times.append(wait)
+        self.latencies.append(seconds)
+        sample = {"wait": wait, "seconds": seconds, "audio_seconds": audio_seconds}
+        for listener in self._listeners:
+            try:
+                listener(sample)
+            except Exception as e:
+                logger.debug(f"Whisper listener failed: {e}")
+
+        return Transcription(
+            text=" ".join(text.strip() for _, _, text in parts).strip(),
+            language=getattr(info, "language", "") or "",
+            language_probability=float(getattr(info, "language_probability", 0.0) or 0.0),
+            audio_seconds=audio_seconds,
+            seconds=seconds,
+            wait_seconds=wait,
+            segments=parts,
+        )
+
+    async def transcribe(self, audio, **options) -> Transcription:
+        """Transcribe on a pooled instance (queued when all of them are busy)"""
+        pooled = audio if isinstance(audio, PooledAudio) else None
+        if pooled is not None:
+            audio = pooled.samples
+        with self._available:
+            self.queued += 1
+        future = self._pool_executor().submit(self._transcribe, audio, options, time.perf_counter())
+        if pooled is not None:
+            # A cancelled request must not hand the buffer back while the model still reads it
+            future.add_done_callback(lambda _: pooled.release())
+        try:
+            return await asyncio.wrap_future(future)
+        except BaseException:
+            # Cancelled (client gone) before an instance picked it up - never ran
+            if future.cancel():
+                with self._available:
+                    self.queued -= 1
+            raise
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        busy = self.stats["busy_seconds"]
+        wait = list(self.wait_times)
+        latency = list(self.latencies)
+        return {
+            **self.stats,
+            "model": self.model_size,
+            "device": self.device,
+            "compute_type": self.compute_type,
+            "size": self.size,
+            "cpu_threads": self.cpu_threads,
+            "loaded": self._created,
+            "idle": len(self._idle),
+            "queued": self.queued,
+            "active": self.active,
+            "wait_p50": _percentile(wait, 0.5),
+            "wait_p95": _percentile(wait, 0.95),
+            "latency_p50": _percentile(latency, 0.5),
+            "latency_p95": _percentile(latency, 0.95),
+            # audio seconds transcribed per second of model time (>1 = faster than real time)
+            "realtime_factor": self.stats["audio_seconds"] / busy if busy else None,
+        }
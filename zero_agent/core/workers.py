@@ -0,0 +1,393 @@
+"""
+Worker Coordination - running the API under several worker processes
+=====================================================================
+`uvicorn api_server:app --workers N` (or gunicorn with uvicorn workers)
+spreads prompt building, JSON and regex work over N cores, but some state
+must live in exactly one process:
+
+    - Chroma's PersistentClient keeps its index in memory; several
+      processes writing the same directory corrupt / miss each other's
+      writes
+    - the response cache should be shared, not N cold copies
+    - memory, the learner and the routing outcome log rewrite / rotate
+      plain files; concurrent writers lose updates
+    - model preloading should run once, not N times at startup
+
+One worker is elected the owner by binding a local
+multiprocessing.connection.Listener port - the bind succeeds in exactly one
+process. The owner builds the shared objects and serves method calls on
+them; every other worker (a follower) gets a RemoteObject proxy that
+forwards calls over a persistent, authenticated local connection. If the
+owner dies, the next follower whose call fails re-runs the election and, if
+it wins, builds the objects itself.
+
+    coordinator = WorkerCoordinator(workers=4)
+    coordinator.elect()
+    rag = coordinator.share("rag", RAGMemorySystem)   # local object or proxy
+    rag.store_conversations(turns)                     # same API either way
+
+With workers=1 (the default) there is no listener and share() just builds
+the object. Each worker also publishes its rendered metrics into the state
+directory so /metrics can merge every worker's samples (see
+zero_agent.api.metrics.merge_expositions).
+"""
+
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import logging
+import os
+import secrets
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+STATE_DIR = Path(__file__).parent.parent / "data" / "workers"
+DEFAULT_OWNER_PORT = 8791
+CALL_TIMEOUT = 60.0          # seconds to wait for the owner to answer a forwarded call
+METRICS_PUBLISH_INTERVAL = 5.0
+METRICS_MAX_AGE = 30.0       # snapshots older than this belong to dead workers
+
+# Dunder methods a follower may forward besides public ones
+_FORWARDED_DUNDERS = {"__len__", "__contains__"}
+
+
+def configured_workers() -> int:
+    """Worker count from ZERO_WORKERS (set by api_server --workers / gunicorn.conf.py) or WEB_CONCURRENCY"""
+    for var in ("ZERO_WORKERS", "WEB_CONCURRENCY"):
+        value = os.environ.get(var)
+        if value:
+            try:
+                return max(1, int(value))
+            except ValueError:
+                logger.warning(f"Ignoring non-integer {var}={value!r}")
+    return 1
+
+
+class RemoteError(RuntimeError):
+    """The owner could not be reached (and this worker did not become the owner)"""
+
+
+class RemoteObject:
+    """
+    Follower-side proxy for an object living in the owner process
+
+    Attribute access returns a function forwarding the call, so only
+    methods can be used through the proxy (arguments and results are
+    pickled).
+    """
+
+    def __init__(self, coordinator: "WorkerCoordinator", name: str):
+        self._coordinator = coordinator
+        self._name = name
+
+    def __getattr__(self, method: str):
+        if method.startswith("_"):
+            raise AttributeError(method)
+
+        def forward(*args, **kwargs):
+            return self._coordinator.call(self._name, method, *args, **kwargs)
+
+        forward.__name__ = method
+        return forward
+
+    def __bool__(self) -> bool:
+        return True  # `if zero.rag:` must not turn into a forwarded __len__ call
+
+    def __len__(self) -> int:
+        return self._coordinator.call(self._name, "__len__")
+
+    def __contains__(self, item) -> bool:
+        return self._coordinator.call(self._name, "__contains__", item)
+
+    def __repr__(self) -> str:
+        return f"RemoteObject({self._name!r})"
+
+
+class WorkerCoordinator:
+    """Owner election, call forwarding to the owner and per-worker metrics snapshots"""
+
+    def __init__(self, workers: int = 1, port: int = DEFAULT_OWNER_PORT,
+                 state_dir: Path = STATE_DIR, authkey: Optional[bytes] = None,
+                 call_timeout: float = CALL_TIMEOUT):
+        self.workers = workers
+        self.port = port
+        self.state_dir = Path(state_dir)
+        self.call_timeout = call_timeout
+        self._authkey = authkey
+        self.role = "single" if workers <= 1 else "unelected"
+        self._listener: Optional[Listener] = None
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._objects: Dict[str, Any] = {}
+        self._objects_lock = threading.Lock()
+        self._election_lock = threading.Lock()
+        self._local = threading.local()  # per-thread connection to the owner
+        self._listeners: List[Callable[[str], None]] = []
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"elections": 0, "forwarded": 0, "served": 0, "reconnects": 0, "errors": 0}
+
+    @property
+    def multi(self) -> bool:
+        return self.workers > 1
+
+    @property
+    def is_owner(self) -> bool:
+        return self.role in ("single", "owner")
+
+    def add_listener(self, listener: Callable[[str], None]):
+        """Register fn(role) called when this worker's role changes (e.g. promoted to owner)"""
+        self._listeners.append(listener)
+
+    # ------------------------------------------------------------------
+    # Election
+    # ------------------------------------------------------------------
+
+    def authkey(self) -> bytes:
+        """
+        Shared secret for owner connections
+
+        ZERO_WORKER_AUTHKEY (set by the launcher) if present, otherwise a key
+        file in the state directory created once by whichever worker gets
+        there first.
+        """
+        if self._authkey is None:
+            env_key = os.environ.get("ZERO_WORKER_AUTHKEY")
+            self._authkey = env_key.encode() if env_key else self._key_file()
+        return self._authkey
+
+    def _key_file(self) -> bytes:
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        path = self.state_dir / "authkey"
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            for _ in range(50):  # another worker may still be writing it
+                key = path.read_bytes()
+                if key:
+                    return key
+                time.sleep(0.02)
+            raise RemoteError(f"Empty worker key file {path}")
+        key = secrets.token_hex(32).encode()
+        with os.fdopen(fd, "wb") as f:
+            f.write(key)
+        return key
+
+    def elect(self) -> str:
+        """Try to become the owner; returns the role ("single", "owner" or "follower")"""
+        if not self.multi:
+            return self.role
+        with self._election_lock:
+            if self.role == "owner":
+                return self.role
+            self.stats["elections"] += 1
+            try:
+                self._listener = Listener(("127.0.0.1", self.port), authkey=self.authkey())
+            except OSError:
+                self._set_role("follower")
+                return self.role
+            threading.Thread(target=self._accept_loop, name="worker-owner", daemon=True).start()
+            self._set_role("owner")
+            logger.info(f"Worker {os.getpid()} is the owner (port {self.port})")
+            return self.role
+
+    def _set_role(self, role: str):
+        if role == self.role:
+            return
+        self.role = role
+        for listener in self._listeners:
+            try:
+                listener(role)
+            except Exception as e:
+                logger.warning(f"Role listener failed: {e}")
+
+    # ------------------------------------------------------------------
+    # Shared objects
+    # ------------------------------------------------------------------
+
+    def share(self, name: str, factory: Callable[[], Any]):
+        """
+        The shared object `name`: built locally (once) in the owner or a
+        single process, a RemoteObject proxy in followers. The factory is
+        kept so a follower promoted to owner can build it later.
+        """
+        self._factories[name] = factory
+        if self.is_owner:
+            return self._local_object(name)
+        return RemoteObject(self, name)
+
+    def _local_object(self, name: str):
+        with self._objects_lock:
+            if name not in self._objects:
+                self._objects[name] = self._factories[name]()
+            return self._objects[name]
+
+    def _invoke(self, name: str, method: str, args, kwargs):
+        if method.startswith("_") and method not in _FORWARDED_DUNDERS:
+            raise AttributeError(f"{method} is not forwarded")
+        return getattr(self._local_object(name), method)(*args, **kwargs)
+
+    def call(self, name: str, method: str, *args, **kwargs):
+        """Run obj.method(*args, **kwargs) on the shared object, wherever it lives"""
+        for attempt in range(2):
+            if self.is_owner:
+                return self._invoke(name, method, args, kwargs)
+            try:
+                conn = self._connection()
+                conn.send((name, method, args, kwargs))
+                if not conn.poll(self.call_timeout):
+                    self._drop_connection()
+                    raise TimeoutError(f"Owner did not answer {name}.{method} in {self.call_timeout}s")
+                ok, value = conn.recv()
+            except (OSError, EOFError) as e:
+                # Owner gone (or not up yet): reconnect once, electing ourselves if the port is free
+                self._drop_connection()
+                self.stats["reconnects"] += 1
+                if attempt == 0:
+                    logger.warning(f"Owner unreachable ({e}), re-running election")
+                    self.elect()
+                    continue
+                self.stats["errors"] += 1
+                raise RemoteError(f"Owner unreachable for {name}.{method}: {e}") from e
+            self.stats["forwarded"] += 1
+            if ok:
+                return value
+            raise value
+        raise RemoteError(f"Owner unreachable for {name}.{method}")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = Client(("127.0.0.1", self.port), authkey=self.authkey())
+            self._local.conn = conn
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    # ------------------------------------------------------------------
+    # Owner side
+    # ------------------------------------------------------------------
+
+    def _accept_loop(self):
+        listener = self._listener
+        while listener is not None:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                if self._listener is None:
+                    return  # closed
+                # Failed handshake (wrong key) or a transient socket error
+                logger.warning(f"Rejected worker connection: {e}")
+                continue
+            if self._listener is None:
+                conn.close()  # the wake-up connection from close()
+                return
+            threading.Thread(target=self._serve, args=(conn,), name="worker-owner-conn", daemon=True).start()
+
+    def _serve(self, conn):
+        """Answer one follower thread's calls until it disconnects"""
+        with conn:
+            while True:
+                try:
+                    name, method, args, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    return
+                if self._listener is None:
+                    return  # stepped down: drop the call so the follower re-elects
+                try:
+                    reply = (True, self._invoke(name, method, args, kwargs))
+                except Exception as e:
+                    reply = (False, e)
+                self.stats["served"] += 1
+                try:
+                    conn.send(reply)
+                except (OSError, EOFError):
+                    return
+                except Exception as e:
+                    # Result or exception not picklable
+                    conn.send((False, RemoteError(f"{name}.{method}: {type(e).__name__}: {e}")))
+
+    def close(self):
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            # A thread blocked in accept() keeps the port bound after close(); wake it first
+            try:
+                Client(("127.0.0.1", self.port), authkey=self.authkey()).close()
+            except Exception:
+                pass
+            listener.close()
+        self._drop_connection()
+        (self.state_dir / "metrics" / f"{os.getpid()}.prom").unlink(missing_ok=True)
+
+    # ------------------------------------------------------------------
+    # Metrics snapshots
+    # ------------------------------------------------------------------
+
+    def publish_metrics(self, text: str):
+        """Write this worker's rendered metrics where the other workers can read them"""
+        directory = self.state_dir / "metrics"
+        directory.mkdir(parents=True, exist_ok=True)
+        tmp = directory / f"{os.getpid()}.prom.tmp"
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, directory / f"{os.getpid()}.prom")
+
+    def peer_metrics(self, max_age: float = METRICS_MAX_AGE) -> List[str]:
+        """Recent metrics snapshots of the other workers"""
+        directory = self.state_dir / "metrics"
+        own = f"{os.getpid()}.prom"
+        texts = []
+        now = time.time()
+        for path in directory.glob("*.prom") if directory.exists() else ():
+            if path.name == own:
+                continue
+            try:
+                if now - path.stat().st_mtime > max_age:
+                    continue
+                texts.append(path.read_text(encoding="utf-8"))
+            except OSError:
+                continue  # replaced / removed while reading
+        return texts
+
+    async def _publish_loop(self, render: Callable[[], str], interval: float):
+        while True:
+            try:
+                # Rendered in the thread too: collectors may call the owner
+                await asyncio.to_thread(lambda: self.publish_metrics(render()))
+            except Exception as e:
+                logger.warning(f"Metrics publish failed: {e}")
+            await asyncio.sleep(interval)
+
+    async def start(self, render: Callable[[], str], interval: float = METRICS_PUBLISH_INTERVAL):
+        """Publish this worker's metrics every `interval` seconds (multi-worker mode only)"""
+        if not self.multi or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._publish_loop(render, interval), name="worker-metrics")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "pid": os.getpid(),
+            "role": self.role,
+            "workers": self.workers,
+            "port": self.port if self.multi else None,
+            "shared": sorted(self._factories),
+            "peers_reporting": len(self.peer_metrics()) if self.multi else 0,
+        }
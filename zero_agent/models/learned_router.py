@@ -0,0 +1,518 @@
+"""
+Learned Router - lightweight message -> model classifier
+=========================================================
+An optional in-process classifier that routes from logged outcomes instead
+of hand-tuned keyword lists:
+
+    features   hashed character 2-4-grams and words of the normalized
+               message (crc32 -> DEFAULT_DIM buckets, log counts, L2 norm)
+    model      multinomial logistic regression (one weight row per bucket),
+               trained with Adagrad in NumPy
+    inference  a sparse dot product - well under a millisecond per message
+
+Training data is the outcome log (one JSON object per line) written by the
+API for every answered chat. The log rotates at `max_bytes` and keeps
+`backups` older files (routing_outcomes.jsonl.1, .2, ...); training reads
+all of them.
+
+    {"message": ..., "model": "expert", "latency": 12.4, "quality": 0.82, "routed": true, "cached": false}
+
+Outcomes below --min-quality and answers served from the response cache
+(their latency is not the model's) are ignored. When the same message was answered
+acceptably by several models, the one with the lowest median latency is the
+target - so easy questions that were sent to the expert model and answered
+just as well by the fast model become "fast" examples.
+
+Model file format: <path>.npz holds `weights` (dim x classes, float32) and
+`bias`; <path>.json holds labels, dim, n-gram range, min_confidence and the
+offline evaluation. ContextAwareRouter uses a prediction only when its
+probability is at least min_confidence and falls back to the heuristics
+otherwise.
+
+CLI:
+    python -m zero_agent.models.learned_router train [--log F] [--out P]
+    python -m zero_agent.models.learned_router evaluate [--log F] [--model P]
+    python -m zero_agent.models.learned_router predict "message" [--model P]
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from dataclasses import dataclass, field
+from pathlib import Path
+import argparse
+import json
+import logging
+import math
+import statistics
+import sys
+import threading
+import time
+import zlib
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from zero_agent.core.intent_engine import normalize
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+DEFAULT_DIM = 1 << 16
+DEFAULT_NGRAMS = (2, 4)
+MAX_CHARS = 512  # longer messages are cut before featurizing
+DEFAULT_MIN_CONFIDENCE = 0.7
+DEFAULT_MIN_QUALITY = 0.6
+HOLDOUT_BUCKETS = 5  # 1 in 5 distinct messages is held out for evaluation
+
+DEFAULT_MODEL_PATH = Path(__file__).parent.parent / "data" / "learned_router"
+DEFAULT_OUTCOME_LOG = Path(__file__).parent.parent / "logs" / "routing_outcomes.jsonl"
+DEFAULT_OUTCOME_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_OUTCOME_BACKUPS = 3
+
+
+# ----------------------------------------------------------------------
+# Outcome log
+# ----------------------------------------------------------------------
+
+class OutcomeLog:
+    """Append-only JSONL log of (message, model, latency, quality) outcomes, size-rotated"""
+
+    def __init__(self, path: Path = DEFAULT_OUTCOME_LOG, max_bytes: int = DEFAULT_OUTCOME_MAX_BYTES,
+                 backups: int = DEFAULT_OUTCOME_BACKUPS):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+
+    def _backup(self, n: int) -> Path:
+        return self.path.with_name(f"{self.path.name}.{n}")
+
+    def _rotate(self):
+        """path -> path.1 -> ... -> path.<backups>; the oldest file is dropped"""
+        try:
+            if self.path.stat().st_size < self.max_bytes:
+                return
+            if self.backups <= 0:
+                self.path.unlink()
+                return
+            for n in range(self.backups - 1, 0, -1):
+                if self._backup(n).exists():
+                    self._backup(n).replace(self._backup(n + 1))
+            self.path.replace(self._backup(1))
+        except FileNotFoundError:
+            pass  # not written yet, or another worker rotated it first
+
+    def append(self, records: Iterable[Dict[str, Any]]):
+        lines = [json.dumps(record, ensure_ascii=False) for record in records]
+        if not lines:
+            return
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._rotate()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+
+    def read(self) -> List[Dict[str, Any]]:
+        """All well-formed records, oldest file first (broken lines are skipped)"""
+        records = []
+        for path in [self._backup(n) for n in range(self.backups, 0, -1)] + [self.path]:
+            if not path.exists():
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record.get("message") and record.get("model"):
+                        records.append(record)
+        return records
+
+
+def _accepted(record: Dict[str, Any], min_quality: float) -> bool:
+    """Unscored outcomes count as accepted (the answer was served); cache hits never do"""
+    if record.get("cached"):
+        return False
+    quality = record.get("quality")
+    return quality is None or quality >= min_quality
+
+
+def _holdout(text: str) -> bool:
+    return zlib.crc32(text.encode("utf-8")) % HOLDOUT_BUCKETS == 0
+
+
+def build_examples(records: Iterable[Dict[str, Any]],
+                   min_quality: float = DEFAULT_MIN_QUALITY) -> List[Tuple[str, str, float]]:
+    """
+    Training targets from outcomes
+
+    Returns:
+        [(normalized message, best model, weight)] - one per distinct message;
+        best = lowest median latency among acceptably answered models,
+        weight = number of accepted outcomes behind it
+    """
+    latencies: Dict[str, Dict[str, List[float]]] = {}
+    for record in records:
+        if not _accepted(record, min_quality):
+            continue
+        text = normalize(record["message"])[:MAX_CHARS]
+        latency = record.get("latency")
+        by_model = latencies.setdefault(text, {})
+        by_model.setdefault(record["model"], []).append(float(latency) if latency is not None else math.inf)
+
+    examples = []
+    for text, by_model in latencies.items():
+        best = min(by_model, key=lambda model: (statistics.median(by_model[model]), model))
+        examples.append((text, best, float(sum(len(v) for v in by_model.values()))))
+    return examples
+
+
+# ----------------------------------------------------------------------
+# Features
+# ----------------------------------------------------------------------
+
+def hashed_features(text: str, dim: int = DEFAULT_DIM, ngrams: Sequence[int] = DEFAULT_NGRAMS,
+                    normalized: bool = False):
+    """
+    Sparse feature vector of one message
+
+    Returns:
+        (indices int64 array, values float32 array) - log(1 + count) per
+        hashed bucket, L2-normalized
+    """
+    if not normalized:
+        text = normalize(text)
+    text = text[:MAX_CHARS]
+    padded = f" {text} "
+    counts: Dict[int, int] = {}
+    crc32 = zlib.crc32
+    for n in range(ngrams[0], ngrams[1] + 1):
+        for i in range(len(padded) - n + 1):
+            bucket = crc32(padded[i:i + n].encode("utf-8")) % dim
+            counts[bucket] = counts.get(bucket, 0) + 1
+    for word in text.split():
+        bucket = crc32(b"w:" + word.encode("utf-8")) % dim
+        counts[bucket] = counts.get(bucket, 0) + 1
+
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.log1p(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    norm = float(np.sqrt((values * values).sum()))
+    if norm:
+        values /= norm
+    return indices, values
+
+
+def _stack(rows):
+    """CSR-style (indptr, indices, values) of a list of sparse rows"""
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(idx) for idx, _ in rows])
+    indices = np.concatenate([idx for idx, _ in rows]) if rows else np.zeros(0, dtype=np.int64)
+    values = np.concatenate([val for _, val in rows]) if rows else np.zeros(0, dtype=np.float32)
+    return indptr, indices, values
+
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+# ----------------------------------------------------------------------
+# Model
+# ----------------------------------------------------------------------
+
+@dataclass
+class RoutePrediction:
+    model: str
+    confidence: float
+    probabilities: Dict[str, float]
+    confident: bool
+    alternatives: List[str] = field(default_factory=list)  # runners-up within 0.15 of the winner
+
+
+class LearnedRouter:
+    """
+    Hashed n-gram softmax classifier over model types
+
+    Usage:
+        router = LearnedRouter.load()               # or LearnedRouter.train(examples)
+        prediction = router.predict("מה השעה?")
+        if prediction.confident: use prediction.model
+    """
+
+    CLOSE_PROBABILITY = 0.15
+
+    def __init__(self, weights, bias, labels: Sequence[str], dim: int = DEFAULT_DIM,
+                 ngrams: Sequence[int] = DEFAULT_NGRAMS, min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+                 metadata: Optional[Dict[str, Any]] = None):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("LearnedRouter needs numpy (pip install numpy)")
+        self.weights = weights
+        self.bias = bias
+        self.labels = list(labels)
+        self.dim = dim
+        self.ngrams = tuple(ngrams)
+        self.min_confidence = min_confidence
+        self.metadata = dict(metadata or {})
+
+    # -- inference -------------------------------------------------------
+
+    def probabilities(self, text: str, normalized: bool = False):
+        indices, values = hashed_features(text, self.dim, self.ngrams, normalized)
+        return _softmax(values @ self.weights[indices] + self.bias)
+
+    def predict(self, text: str, normalized: bool = False) -> RoutePrediction:
+        probs = self.probabilities(text, normalized)
+        order = np.argsort(-probs)
+        best = int(order[0])
+        confidence = float(probs[best])
+        return RoutePrediction(
+            model=self.labels[best],
+            confidence=confidence,
+            probabilities={label: float(p) for label, p in zip(self.labels, probs)},
+            confident=confidence >= self.min_confidence,
+            alternatives=[self.labels[int(i)] for i in order[1:]
+                          if confidence - probs[int(i)] <= self.CLOSE_PROBABILITY],
+        )
+
+    # -- training --------------------------------------------------------
+
+    @classmethod
+    def train(cls, examples: Sequence[Tuple[str, str, float]], dim: int = DEFAULT_DIM,
+              ngrams: Sequence[int] = DEFAULT_NGRAMS, epochs: int = 30, learning_rate: float = 0.5,
+              l2: float = 1e-5, batch_size: int = 64, min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+              seed: int = 0) -> "LearnedRouter":
+        """
+        Fit on (normalized message, label, weight) examples (see build_examples)
+
+        Adagrad on the weighted cross-entropy with L2; rows are sparse, so a
+        batch only touches the buckets its messages hash to.
+        """
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("LearnedRouter needs numpy (pip install numpy)")
+        if not examples:
+            raise ValueError("No training examples")
+        labels = sorted({label for _, label, _ in examples})
+        label_index = {label: i for i, label in enumerate(labels)}
+        rows = [hashed_features(text, dim, ngrams, normalized=True) for text, _, _ in examples]
+        targets = np.array([label_index[label] for _, label, _ in examples], dtype=np.int64)
+        sample_weights = np.array([weight for _, _, weight in examples], dtype=np.float32)
+        sample_weights *= len(sample_weights) / sample_weights.sum()
+
+        weights = np.zeros((dim, len(labels)), dtype=np.float32)
+        bias = np.zeros(len(labels), dtype=np.float32)
+        grad_sq = np.full_like(weights, 1e-8)
+        bias_sq = np.full_like(bias, 1e-8)
+        rng = np.random.default_rng(seed)
+
+        for _ in range(epochs):
+            order = rng.permutation(len(rows))
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                indptr, indices, values = _stack([rows[i] for i in batch])
+                row_of = np.repeat(np.arange(len(batch)), np.diff(indptr))
+                logits = np.zeros((len(batch), len(labels)), dtype=np.float32)
+                np.add.at(logits, row_of, values[:, None] * weights[indices])
+                probs = _softmax(logits + bias)
+                probs[np.arange(len(batch)), targets[batch]] -= 1.0
+                delta = probs * sample_weights[batch, None] / len(batch)
+
+                grad = np.zeros((len(indices), len(labels)), dtype=np.float32)
+                grad[:] = values[:, None] * delta[row_of]
+                touched, inverse = np.unique(indices, return_inverse=True)
+                row_grad = np.zeros((len(touched), len(labels)), dtype=np.float32)
+                np.add.at(row_grad, inverse, grad)
+                row_grad += l2 * weights[touched]
+                grad_sq[touched] += row_grad * row_grad
+                weights[touched] -= learning_rate * row_grad / np.sqrt(grad_sq[touched])
+
+                bias_grad = delta.sum(axis=0)
+                bias_sq += bias_grad * bias_grad
+                bias -= learning_rate * bias_grad / np.sqrt(bias_sq)
+
+        return cls(weights, bias, labels, dim, ngrams, min_confidence,
+                   {"trained_at": time.time(), "examples": len(examples), "epochs": epochs})
+
+    # -- persistence -----------------------------------------------------
+
+    def save(self, path: Path = DEFAULT_MODEL_PATH):
+        """Write <path>.npz (weights) and <path>.json (labels, settings, evaluation)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(path.with_suffix(".npz"), weights=self.weights, bias=self.bias)
+        meta = {
+            "format_version": FORMAT_VERSION,
+            "labels": self.labels,
+            "dim": self.dim,
+            "ngrams": list(self.ngrams),
+            "min_confidence": self.min_confidence,
+            **self.metadata,
+        }
+        with open(path.with_suffix(".json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_MODEL_PATH) -> "LearnedRouter":
+        path = Path(path)
+        with open(path.with_suffix(".json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported learned router format: {meta.get('format_version')}")
+        arrays = np.load(path.with_suffix(".npz"))
+        extra = {k: v for k, v in meta.items()
+                 if k not in ("format_version", "labels", "dim", "ngrams", "min_confidence")}
+        return cls(arrays["weights"], arrays["bias"], meta["labels"], meta["dim"],
+                   meta["ngrams"], meta["min_confidence"], extra)
+
+    @classmethod
+    def load_if_available(cls, path: Path = DEFAULT_MODEL_PATH) -> Optional["LearnedRouter"]:
+        """The saved model, or None without numpy / a model file (heuristic routing only)"""
+        if not NUMPY_AVAILABLE or not Path(path).with_suffix(".json").exists():
+            return None
+        try:
+            return cls.load(path)
+        except Exception as e:
+            logger.warning(f"Could not load learned router from {path}: {e}")
+            return None
+
+
+# ----------------------------------------------------------------------
+# Offline evaluation
+# ----------------------------------------------------------------------
+
+def evaluate(router: LearnedRouter, records: Sequence[Dict[str, Any]],
+             min_quality: float = DEFAULT_MIN_QUALITY, heuristic=None) -> Dict[str, Any]:
+    """
+    Replay held-out outcomes through the learned router
+
+    Returns:
+        coverage (share of confident predictions), agreement with the best
+        known model (learned and, if given, heuristic router), and projected
+        latency: logged latency vs. the median latency of the model the
+        learned router would have picked (heuristic fallback keeps the logged
+        choice)
+    """
+    held_out = [r for r in records if _holdout(normalize(r["message"])[:MAX_CHARS])]
+    examples = build_examples(held_out, min_quality)
+    median_latency = {
+        model: statistics.median(values)
+        for model, values in _latencies_by_model(records, min_quality).items()
+    }
+
+    confident = agree = heuristic_agree = 0
+    moves: Dict[str, int] = {}
+    for text, best, _ in examples:
+        prediction = router.predict(text, normalized=True)
+        if prediction.confident:
+            confident += 1
+            agree += prediction.model == best
+        if heuristic is not None:
+            heuristic_agree += heuristic.route(text) == best
+
+    logged = projected = 0.0
+    for record in held_out:
+        latency = record.get("latency")
+        if latency is None or not _accepted(record, min_quality):
+            continue
+        prediction = router.predict(record["message"])
+        choice = prediction.model if prediction.confident else record["model"]
+        logged += latency
+        projected += median_latency.get(choice, latency) if choice != record["model"] else latency
+        if choice != record["model"]:
+            key = f"{record['model']}->{choice}"
+            moves[key] = moves.get(key, 0) + 1
+
+    total = len(examples)
+    report = {
+        "held_out_messages": total,
+        "coverage": confident / total if total else 0.0,
+        "agreement": agree / confident if confident else 0.0,
+        "logged_latency_s": round(logged, 2),
+        "projected_latency_s": round(projected, 2),
+        "projected_savings": round(1 - projected / logged, 4) if logged else 0.0,
+        "reroutes": moves,
+    }
+    if heuristic is not None:
+        report["heuristic_agreement"] = heuristic_agree / total if total else 0.0
+    return report
+
+
+def _latencies_by_model(records, min_quality) -> Dict[str, List[float]]:
+    by_model: Dict[str, List[float]] = {}
+    for record in records:
+        if record.get("latency") is not None and _accepted(record, min_quality):
+            by_model.setdefault(record["model"], []).append(float(record["latency"]))
+    return by_model
+
+
+# ----------------------------------------------------------------------
+# CLI
+# ----------------------------------------------------------------------
+
+def _heuristic_router():
+    try:
+        from router_context_aware import ContextAwareRouter
+        return ContextAwareRouter(llm=None)
+    except Exception as e:
+        logger.warning(f"Heuristic router unavailable for comparison: {e}")
+        return None
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="learned_router", description="Train / evaluate the learned router")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    train_p = sub.add_parser("train", help="Fit on the outcome log (held-out messages excluded)")
+    train_p.add_argument("--log", type=Path, default=DEFAULT_OUTCOME_LOG)
+    train_p.add_argument("--out", type=Path, default=DEFAULT_MODEL_PATH)
+    train_p.add_argument("--dim", type=int, default=DEFAULT_DIM)
+    train_p.add_argument("--epochs", type=int, default=30)
+    train_p.add_argument("--min-quality", type=float, default=DEFAULT_MIN_QUALITY)
+    train_p.add_argument("--min-confidence", type=float, default=DEFAULT_MIN_CONFIDENCE)
+
+    eval_p = sub.add_parser("evaluate", help="Agreement and projected latency on held-out messages")
+    eval_p.add_argument("--log", type=Path, default=DEFAULT_OUTCOME_LOG)
+    eval_p.add_argument("--model", type=Path, default=DEFAULT_MODEL_PATH)
+    eval_p.add_argument("--min-quality", type=float, default=DEFAULT_MIN_QUALITY)
+
+    predict_p = sub.add_parser("predict", help="Route one message")
+    predict_p.add_argument("message")
+    predict_p.add_argument("--model", type=Path, default=DEFAULT_MODEL_PATH)
+
+    args = parser.parse_args(argv)
+    if not NUMPY_AVAILABLE:
+        print("numpy is required: pip install numpy", file=sys.stderr)
+        return 1
+
+    if args.command == "train":
+        records = OutcomeLog(args.log).read()
+        train_records = [r for r in records if not _holdout(normalize(r["message"])[:MAX_CHARS])]
+        examples = build_examples(train_records, args.min_quality)
+        if not examples:
+            print(f"No usable outcomes in {args.log}", file=sys.stderr)
+            return 1
+        router = LearnedRouter.train(examples, dim=args.dim, epochs=args.epochs,
+                                     min_confidence=args.min_confidence)
+        router.metadata["evaluation"] = evaluate(router, records, args.min_quality, _heuristic_router())
+        router.save(args.out)
+        print(json.dumps({"examples": len(examples), "labels": router.labels,
+                          "evaluation": router.metadata["evaluation"]}, ensure_ascii=False, indent=2))
+    elif args.command == "evaluate":
+        router = LearnedRouter.load(args.model)
+        report = evaluate(router, OutcomeLog(args.log).read(), args.min_quality, _heuristic_router())
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        router = LearnedRouter.load(args.model)
+        start = time.perf_counter()
+        prediction = router.predict(args.message)
+        elapsed_us = (time.perf_counter() - start) * 1e6
+        print(json.dumps({**prediction.__dict__, "inference_us": round(elapsed_us, 1)},
+                         ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -30,9 +30,17 @@ class RAGMemorySystem:
         self.knowledge = self._get_or_create_collection("knowledge")
         self.preferences = self._get_or_create_collection("preferences")
         self.personal_facts = self._get_or_create_collection("personal_facts")
+        self._embedding_function = None  # created on first embed()
         
         print(f"[MEMORY] RAG Memory initialized at {db_path}")
     
+    def embed(self, text: str) -> List[float]:
+        """Embed text with Chroma's default embedding model (used by the response cache)"""
+        if self._embedding_function is None:
+            from chromadb.utils import embedding_functions
+            self._embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        return [float(x) for x in self._embedding_function([text])[0]]
+    
     def _get_or_create_collection(self, name: str):
         """Get or create a collection"""
         try:
@@ -61,6 +69,27 @@ class RAGMemorySystem:
         except Exception as e:
             print(f"[WARN]  Failed to store conversation: {e}")
     
+    def store_conversations(self, turns: List[Dict[str, Any]]):
+        """
+        Store many conversation turns with a single Chroma add (one embedding batch)
+        
+        Args:
+            turns: [{"task": str, "response": str, "metadata": dict}, ...]
+        """
+        try:
+            if not self.conversations or not turns:
+                return
+            
+            import uuid
+            
+            self.conversations.add(
+                documents=[f"Task: {t['task']}\nResponse: {t['response']}" for t in turns],
+                metadatas=[t.get("metadata") or {} for t in turns],
+                ids=[str(uuid.uuid4()) for _ in turns]
+            )
+        except Exception as e:
+            print(f"[WARN]  Failed to store {len(turns)} conversations: {e}")
+    
     def store_success(self, task: str, plan: List[str], results: Dict):
         """Store successful task execution"""
         try:
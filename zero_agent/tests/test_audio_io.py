@@ -0,0 +1,133 @@
+"""
+Tests for in-memory audio decoding
+"""
+
+import asyncio
+import io
+import threading
+import wave
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from zero_agent.core.audio_io import (
+    FRAME_HEADER, SAMPLE_RATE, AudioDecodeError, AudioDecoder, AudioTooLarge, pack_frame, unpack_frame
+)
+from zero_agent.core.whisper_pool import WhisperPool
+
+
+def _wav(samples, rate=SAMPLE_RATE, channels=1) -> bytes:
+    out = io.BytesIO()
+    with wave.open(out, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(np.asarray(samples, dtype="<i2").tobytes())
+    return out.getvalue()
+
+
+def test_wav_and_pcm_decode_to_16k_mono_in_reused_buffers():
+    decoder = AudioDecoder(max_seconds=5)
+
+    with decoder.decode(_wav([16384, -16384] * 800)) as audio:
+        assert audio.samples.dtype == np.float32
+        assert audio.duration == pytest.approx(0.1)
+        assert audio.samples[:2].tolist() == [0.5, -0.5]
+        first = audio.samples.base
+
+    # Stereo 8 kHz: channels averaged, resampled to twice the length, same buffer reused
+    stereo = np.array([[8192, 24576]] * 800).ravel()
+    with decoder.decode(_wav(stereo, rate=8000, channels=2)) as audio:
+        assert len(audio.samples) == 1600
+        assert np.allclose(audio.samples, 0.5)
+    assert decoder.stats["reused"] >= 1
+
+    with decoder.decode_pcm(np.full(320, 0.25, dtype="<f4").tobytes(), fmt="f32le") as audio:
+        assert audio.samples.base is first
+        assert np.allclose(audio.samples, 0.25)
+
+    with pytest.raises(AudioTooLarge):
+        decoder.decode(_wav(np.zeros(6 * SAMPLE_RATE)))
+    assert decoder.get_stats()["wav"] == 2
+
+
+def test_pool_releases_buffer_only_after_transcription():
+    decoder = AudioDecoder(max_seconds=5)
+    started, finish = threading.Event(), threading.Event()
+
+    class SlowWhisper:
+        def transcribe(self, audio, **options):
+            started.set()
+            finish.wait(5)
+            return iter([SimpleNamespace(start=0.0, end=1.0, text=f"{audio.max():.1f}")]), \
+                SimpleNamespace(language="he", language_probability=1.0, duration=len(audio) / SAMPLE_RATE)
+
+    pool = WhisperPool(size=1, factory=SlowWhisper)
+
+    async def run():
+        audio = decoder.decode(_wav([16384] * SAMPLE_RATE))
+        task = asyncio.ensure_future(pool.transcribe(audio))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        task.cancel()  # the client went away mid-transcription
+        await asyncio.sleep(0.05)
+        assert decoder.get_stats()["idle_buffers"] == 0  # the model still reads it
+        finish.set()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    pool.shutdown()
+    for _ in range(100):
+        if decoder.get_stats()["idle_buffers"] == 1:
+            break
+        threading.Event().wait(0.01)
+    assert decoder.get_stats()["idle_buffers"] == 1
+
+
+def test_binary_frames_roundtrip_and_decode():
+    decoder = AudioDecoder()
+    stereo = np.array([[16384, 16384]] * 160, dtype="<i2").tobytes()
+    frame = pack_frame(stereo, seq=41, sample_rate=8000, channels=2)
+    assert len(frame) == FRAME_HEADER.size + len(stereo)
+
+    header, payload = unpack_frame(frame)
+    assert (header.fmt, header.channels, header.sample_rate, header.seq) == ("s16le", 2, 8000, 41)
+    with decoder.decode_frame(header, payload) as audio:
+        assert len(audio.samples) == 320 and np.allclose(audio.samples, 0.5)
+
+    header, payload = unpack_frame(pack_frame(_wav([0] * 1600), seq=0, fmt=None))
+    assert header.fmt is None
+    assert decoder.decode_frame(header, payload).duration == pytest.approx(0.1)
+
+    with pytest.raises(AudioDecodeError):
+        unpack_frame(b"\x01" + frame[1:])  # version 1 has no binary frames
+
+
+def test_audio_url_download_stops_at_max_bytes():
+    httpx = pytest.importorskip("httpx")
+    from fastapi import HTTPException
+    import api_server
+
+    sent = []
+
+    async def body():
+        for _ in range(100):
+            sent.append(1)
+            yield b"\0" * 1024
+
+    def handler(request):
+        if request.url.path == "/small":
+            return httpx.Response(200, content=b"RIFF" * 10)
+        return httpx.Response(200, content=body())  # no content-length: must be counted
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            assert await api_server.download_audio("http://x/small", 4096, client) == b"RIFF" * 10
+            with pytest.raises(HTTPException) as error:
+                await api_server.download_audio("http://x/big", 4096, client)
+        return error.value.status_code
+
+    assert asyncio.run(main()) == 413
+    assert len(sent) < 10  # stopped reading well before the 100 KB body ended
@@ -0,0 +1,37 @@
+"""
+Tests for the batched background writer
+"""
+
+import asyncio
+
+from zero_agent.core.background_writer import BackgroundWriter
+
+
+def test_batches_and_drains_on_stop():
+    batches = []
+    writer = BackgroundWriter(flush_fn=batches.append, batch_size=4, flush_interval=0.05)
+
+    async def main():
+        await writer.start()
+        for i in range(10):
+            assert writer.submit(i)
+        await writer.stop()
+
+    asyncio.run(main())
+    assert [item for batch in batches for item in batch] == list(range(10))
+    assert max(len(batch) for batch in batches) <= 4
+    assert writer.get_stats()["flushed_items"] == 10
+
+
+def test_full_queue_drops_instead_of_blocking():
+    writer = BackgroundWriter(flush_fn=lambda batch: None, max_queue=2, flush_interval=10)
+
+    async def main():
+        await writer.start()
+        results = [writer.submit(i) for i in range(5)]
+        await writer.stop()
+        return results
+
+    results = asyncio.run(main())
+    assert results.count(False) >= 2
+    assert writer.get_stats()["dropped"] == results.count(False)
@@ -0,0 +1,116 @@
+"""
+Tests for batched offline transcription
+"""
+
+import asyncio
+import io
+import wave
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from zero_agent.core.audio_io import SAMPLE_RATE
+from zero_agent.core.batch_stt import BatchItem, BatchTranscriber, collect_directory, plan_jobs
+
+
+def _wav(seconds: float) -> bytes:
+    out = io.BytesIO()
+    with wave.open(out, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(np.zeros(int(seconds * SAMPLE_RATE), dtype="<i2").tobytes())
+    return out.getvalue()
+
+
+class FakePipeline:
+    """Stands in for BatchedInferencePipeline: one segment per clip, naming its length"""
+    calls = []
+
+    def transcribe(self, audio, clip_timestamps=None, **options):
+        FakePipeline.calls.append((len(audio) / SAMPLE_RATE, len(clip_timestamps or []), options["batch_size"]))
+        clips = clip_timestamps or [{"start": 0.0, "end": len(audio) / SAMPLE_RATE}]
+        segments = [SimpleNamespace(start=c["start"], end=c["end"], text=f" {c['end'] - c['start']:.1f}s")
+                    for c in clips]
+        info = SimpleNamespace(language=options["language"], language_probability=1.0,
+                               duration=len(audio) / SAMPLE_RATE)
+        return iter(segments), info
+
+
+def _run(batch, items, **options):
+    async def collect():
+        return [event async for event in batch.run(items, **options)]
+    return asyncio.run(collect())
+
+
+def test_directory_job_packs_short_files_and_streams_per_file_results(tmp_path):
+    for name, seconds in [("a.wav", 1.0), ("b.wav", 2.0), ("sub/c.wav", 1.5), ("long.wav", 40.0),
+                          ("tiny.wav", 0.05)]:
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        (tmp_path / name).write_bytes(_wav(seconds))
+    (tmp_path / "notes.txt").write_text("not audio")
+    (tmp_path / "broken.ogg").write_bytes(b"not audio either")
+
+    FakePipeline.calls = []
+    batch = BatchTranscriber(workers=2, batch_size=2, factory=FakePipeline)
+    events = _run(batch, collect_directory(tmp_path), language="he")
+    batch.shutdown()
+
+    results = {e["file"]: e for e in events if e["type"] == "result"}
+    # Each packed file gets its own clip's segments back, with file-relative times
+    assert results["a.wav"]["text"] == "1.0s" and results["b.wav"]["text"] == "2.0s"
+    assert results["sub/c.wav"]["segments"] == [{"start": 0.0, "end": 1.5, "text": "1.5s"}]
+    assert results["long.wav"]["text"] == "40.0s"
+    assert results["tiny.wav"]["text"] == ""
+    assert [e["file"] for e in events if e["type"] == "error"] == ["broken.ogg"]
+
+    # 1.0 + 1.5 packed together (similar lengths), 2.0 alone, 40 s unpacked
+    assert sorted(FakePipeline.calls) == [(2.0, 1, 2), (2.5, 2, 2), (40.0, 0, 2)]
+    summary = events[-1]
+    assert summary["type"] == "summary"
+    assert (summary["files"], summary["errors"]) == (6, 1)
+    assert summary["audio_seconds"] == pytest.approx(44.5)
+    assert summary["throughput"] > 0
+
+
+def test_plan_orders_jobs_longest_first():
+    items = [BatchItem("short", b"", 3.0), BatchItem("long", b"", 120.0), BatchItem("unknown", b"", None),
+             BatchItem("medium", b"", 45.0), BatchItem("short2", b"", 4.0)]
+    jobs = plan_jobs(items, batch_size=8)
+    assert [[i.name for i in job.items] for job in jobs] == [["long"], ["unknown"], ["medium"], ["short", "short2"]]
+    assert [job.packed for job in jobs] == [False, False, False, True]
+
+
+def test_packed_job_reports_corrupt_file_alone_and_requeues_oversized():
+    # Durations as a (wrong) probe would have them - all three land in one packed job
+    items = [BatchItem("good.wav", _wav(1.0), 1.0), BatchItem("bad.wav", b"RIFF garbage", 1.2),
+             BatchItem("liar.wav", _wav(40.0), 1.5)]
+    FakePipeline.calls = []
+    batch = BatchTranscriber(workers=1, batch_size=8, factory=FakePipeline)
+    events = _run(batch, items, language="he")
+    batch.shutdown()
+
+    assert {e["file"]: e["text"] for e in events if e["type"] == "result"} == {"good.wav": "1.0s",
+                                                                                "liar.wav": "40.0s"}
+    assert [e["file"] for e in events if e["type"] == "error"] == ["bad.wav"]
+    # The packed job held only the good file; the 40 s file ran alone and was not cut at 30 s
+    assert sorted(FakePipeline.calls) == [(1.0, 1, 8), (40.0, 0, 8)]
+    assert (events[-1]["files"], events[-1]["errors"], events[-1]["jobs"]) == (3, 1, 2)
+
+
+def test_directory_must_stay_under_root(tmp_path):
+    (tmp_path / "root" / "notes").mkdir(parents=True)
+    (tmp_path / "root" / "notes" / "a.wav").write_bytes(_wav(1.0))
+    (tmp_path / "secret").mkdir()
+    (tmp_path / "secret" / "b.wav").write_bytes(_wav(1.0))
+    (tmp_path / "root" / "notes" / "link.wav").symlink_to(tmp_path / "secret" / "b.wav")
+
+    root = tmp_path / "root"
+    assert [i.name for i in collect_directory("notes", root=root)] == ["a.wav"]
+    for outside in ["../secret", str(tmp_path / "secret"), "notes/../../secret"]:
+        with pytest.raises(ValueError, match="outside"):
+            collect_directory(outside, root=root)
+    with pytest.raises(ValueError, match="More than 1"):
+        collect_directory(tmp_path, limit=1)
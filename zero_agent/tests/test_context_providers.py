@@ -0,0 +1,70 @@
+"""
+Tests for concurrent context gathering
+"""
+
+import asyncio
+import time
+
+from zero_agent.core.context_providers import ContextProvider, gather_context
+
+
+def _sleepy(seconds, value):
+    def fn():
+        time.sleep(seconds)
+        return value
+    return fn
+
+
+def test_providers_run_concurrently():
+    providers = [ContextProvider("a", _sleepy(0.2, 1)), ContextProvider("b", _sleepy(0.2, 2))]
+    start = time.perf_counter()
+    results = asyncio.run(gather_context(providers, deadline=2.0))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.35
+    assert results["a"].value == 1 and results["b"].value == 2
+
+
+def test_late_and_failing_providers_are_dropped():
+    def boom():
+        raise ValueError("no index")
+
+    seen = []
+    providers = [
+        ContextProvider("fast", _sleepy(0.01, "ok")),
+        ContextProvider("slow", _sleepy(1.0, "late"), stage="web_search"),
+        ContextProvider("broken", boom),
+    ]
+    results = asyncio.run(gather_context(providers, deadline=0.2, on_result=seen.append))
+
+    assert results["fast"].ok
+    assert results["slow"].status == "timeout" and results["slow"].stage == "web_search"
+    assert results["broken"].status == "error" and "no index" in results["broken"].error
+    assert len(seen) == 3
+
+
+def test_remember_command_answers_before_any_provider_starts(monkeypatch):
+    import api_server
+
+    calls = []
+
+    class FakeRAG:
+        def store_personal_fact(self, key, value):
+            calls.append(("store", key, value))
+
+        def recall_personal_fact(self, query, n_results=3):
+            calls.append(("recall", query))
+            return []
+
+    class FakeRouter:
+        def route_with_reasoning(self, *args):
+            calls.append(("route",))
+            return {"model": "fast"}
+
+    monkeypatch.setattr(api_server.zero, "rag", FakeRAG(), raising=False)
+    monkeypatch.setattr(api_server.zero, "router", FakeRouter(), raising=False)
+    request = api_server.ChatRequest(message="remember: what is my car? it is blue")
+    prepared = asyncio.run(api_server.prepare_chat(request, time.time()))
+
+    assert prepared.reply.model_used == "memory_store"
+    assert [call[0] for call in calls] == ["store"]
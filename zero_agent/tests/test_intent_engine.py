@@ -0,0 +1,24 @@
+"""
+Tests for the single-pass intent engine
+"""
+
+from zero_agent.core.intent_engine import AhoCorasick, IntentEngine, CHAT_INTENTS
+
+
+def test_automaton_reports_overlapping_matches():
+    automaton = AhoCorasick(["he", "she", "his", "hers"])
+    found = sorted((start, automaton.patterns[i]) for start, i in automaton.iter_matches("ushers"))
+    assert found == [(1, "she"), (2, "he"), (2, "hers")]
+
+
+def test_engine_matches_like_keyword_scans():
+    engine = IntentEngine(CHAT_INTENTS)
+    message = "Remember: שָׁלוֹם - the SPY price today"
+    match = engine.analyze(message)
+
+    for intent, keywords in CHAT_INTENTS.items():
+        assert match.has(intent) == any(kw in match.text for kw in keywords), intent
+    assert match.keywords("search") == {"spy", "price", "today"}
+    assert match.within("remember", 30) and not match.starts_with("computer_control")
+    assert engine.analyze("open chrome please").starts_with("computer_control")
+    assert "שלום" in match.text  # vowel points stripped
@@ -0,0 +1,66 @@
+"""
+Tests for the learned router
+"""
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from router_context_aware import ContextAwareRouter
+from zero_agent.models.learned_router import LearnedRouter, OutcomeLog, build_examples, evaluate
+
+
+def _records():
+    records = []
+    for topic in ["docker", "מניות", "sql", "cache", "ביטוח", "json", "graphs", "קבצים"] * 4:
+        easy = f"מה זה {topic}?"
+        # The expert model answered easy questions no better than the fast one
+        records.append({"message": easy, "model": "expert", "latency": 12.0, "quality": 0.8})
+        records.append({"message": easy, "model": "fast", "latency": 2.0, "quality": 0.8})
+        code = f"write a python function that handles {topic}"
+        records.append({"message": code, "model": "coder", "latency": 8.0, "quality": 0.9})
+        records.append({"message": code, "model": "fast", "latency": 2.0, "quality": 0.2})
+    return records
+
+
+def test_examples_pick_fastest_acceptable_model_and_roundtrip(tmp_path):
+    log = OutcomeLog(tmp_path / "outcomes.jsonl")
+    log.append(_records())
+    examples = build_examples(log.read())
+    assert {label for _, label, _ in examples} == {"fast", "coder"}
+
+    router = LearnedRouter.train(examples, dim=1 << 12, epochs=20)
+    router.save(tmp_path / "router")
+    loaded = LearnedRouter.load(tmp_path / "router")
+    assert loaded.predict("מה זה kafka?").model == "fast"
+    assert loaded.predict("write a python function that parses csv").model == "coder"
+
+    report = evaluate(loaded, log.read())
+    assert report["projected_latency_s"] <= report["logged_latency_s"]
+
+
+def test_router_uses_learned_prediction_only_when_confident():
+    router = ContextAwareRouter(llm=None)
+    router.learned = LearnedRouter.train(build_examples(_records()), dim=1 << 12, epochs=20)
+
+    decision = router.decide("מה זה docker?")
+    assert (decision.chosen, decision.source) == ("fast", "learned")
+
+    router.learned.min_confidence = 1.01  # never confident -> heuristics
+    assert router.decide("מה זה docker?").source == "heuristic"
+    assert router.learned_stats["fallback"] == 1
+
+
+def test_log_rotates_and_cache_hits_are_not_training_data(tmp_path):
+    log = OutcomeLog(tmp_path / "outcomes.jsonl", max_bytes=200, backups=1)
+    for i in range(10):
+        log.append([{"message": f"question {i}", "model": "fast", "latency": 2.0}])
+    assert (tmp_path / "outcomes.jsonl.1").exists() and not (tmp_path / "outcomes.jsonl.2").exists()
+    messages = [record["message"] for record in log.read()]
+    assert messages == sorted(messages, key=lambda m: int(m.split()[1])) and "question 9" in messages
+    assert len(messages) < 10  # the oldest file was dropped
+
+    # A cache hit is fast whatever model the key names - it must not make "expert" look fast
+    records = [{"message": "מה זה docker?", "model": "fast", "latency": 2.0},
+               {"message": "מה זה docker?", "model": "expert", "latency": 0.01, "cached": True}]
+    assert build_examples(records) == [("מה זה docker?", "fast", 1.0)]
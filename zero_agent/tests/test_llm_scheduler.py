@@ -0,0 +1,140 @@
+"""
+Tests for the per-model LLM scheduler
+"""
+
+import asyncio
+
+import pytest
+
+from zero_agent.core.llm_scheduler import (
+    LLMScheduler, ModelLimits, Priority, QueueFullError, SessionLimitError, load_model_limits
+)
+
+
+def test_limits_load_from_models_yaml():
+    """max_concurrent / batch_size come from config/models.yaml"""
+    limits = load_model_limits()
+    assert limits["mixtral:8x7b"].max_concurrent == 2
+    assert limits["deepseek-r1:32b"].max_concurrent == 1
+    assert limits["deepseek-r1:32b"].max_queue == 1 * 2 * 2
+
+
+def test_concurrency_is_bounded():
+    scheduler = LLMScheduler(limits={"m": ModelLimits(max_concurrent=2, batch_size=4)})
+    running = 0
+    peak = 0
+
+    async def job(i):
+        nonlocal running, peak
+        async with scheduler.slot("m", session_id=f"s{i}"):
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    async def main():
+        await asyncio.gather(*[job(i) for i in range(6)])
+
+    asyncio.run(main())
+    assert peak == 2
+    assert scheduler.get_stats()["m"]["admitted"] == 6
+
+
+def test_interactive_before_background_and_round_robin():
+    scheduler = LLMScheduler(limits={"m": ModelLimits(max_concurrent=1, batch_size=8)})
+    order = []
+
+    async def job(name, priority, session):
+        async with scheduler.slot("m", priority, session):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    async def main():
+        await scheduler.acquire("m")  # occupy the only slot
+        tasks = [
+            asyncio.create_task(job("bg", Priority.BACKGROUND, "x")),
+            asyncio.create_task(job("a1", Priority.INTERACTIVE, "a")),
+            asyncio.create_task(job("a2", Priority.INTERACTIVE, "a")),
+            asyncio.create_task(job("b1", Priority.INTERACTIVE, "b")),
+        ]
+        await asyncio.sleep(0)
+        scheduler.release("m")
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == ["a1", "b1", "a2", "bg"]
+
+
+def test_rejections_map_to_503_and_429():
+    scheduler = LLMScheduler(
+        limits={"m": ModelLimits(max_concurrent=1, batch_size=1, queue_factor=3)},
+        per_session_limit=2
+    )
+
+    async def main():
+        await scheduler.acquire("m")
+        waiters = [asyncio.create_task(scheduler.acquire("m", session_id="hog")) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        with pytest.raises(SessionLimitError) as session_err:
+            await scheduler.acquire("m", session_id="hog")
+        assert session_err.value.status_code == 429
+
+        waiters.append(asyncio.create_task(scheduler.acquire("m", session_id="other")))
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFullError) as full_err:
+            await scheduler.acquire("m", session_id="late")
+        assert full_err.value.status_code == 503
+
+        for task in waiters:
+            task.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        assert scheduler.queue_depth("m") == 0
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_does_not_leak_slot():
+    scheduler = LLMScheduler(limits={"m": ModelLimits(max_concurrent=1)})
+
+    async def main():
+        await scheduler.acquire("m")
+        waiter = asyncio.create_task(scheduler.acquire("m"))
+        await asyncio.sleep(0)
+        assert scheduler.lane_snapshot()["m"] == {"active": 1, "max_concurrent": 1, "queued": 1}
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert scheduler.lane_snapshot()["m"]["queued"] == 0
+        scheduler.release("m")
+        # Slot must be free again
+        await asyncio.wait_for(scheduler.acquire("m"), timeout=1)
+
+    asyncio.run(main())
+
+
+def test_blocking_slots_are_bounded_once_attached():
+    import threading
+    import time
+
+    scheduler = LLMScheduler(limits={"m": ModelLimits(max_concurrent=1)})
+    running = peak = 0
+    lock = threading.Lock()
+
+    def job():
+        nonlocal running, peak
+        with scheduler.slot_blocking("m"):
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.02)
+            with lock:
+                running -= 1
+
+    async def main():
+        # No async acquire has happened yet - only attach() binds the loop
+        scheduler.attach(asyncio.get_running_loop())
+        await asyncio.gather(*[asyncio.to_thread(job) for _ in range(4)])
+
+    asyncio.run(main())
+    assert peak == 1
+    assert scheduler.get_stats()["m"]["admitted"] == 4
@@ -0,0 +1,40 @@
+"""
+Tests for per-model LLM telemetry
+"""
+
+from zero_agent.core.llm_telemetry import LLMTelemetry, derive_sample, percentile
+
+OLLAMA_DONE = {
+    "load_duration": 3_000_000_000,        # 3s cold load
+    "prompt_eval_count": 400,
+    "prompt_eval_duration": 500_000_000,   # 800 tok/s prefill
+    "eval_count": 100,
+    "eval_duration": 4_000_000_000,        # 25 tok/s decode
+}
+
+
+def test_sample_is_derived_from_ollama_timings():
+    sample = derive_sample(OLLAMA_DONE, elapsed=7.6)
+    assert sample["prefill_tps"] == 800
+    assert sample["decode_tps"] == 25
+    assert sample["load_seconds"] == 3.0
+    assert sample["ttft"] == 3.5  # load + prefill when not streaming
+    assert derive_sample(OLLAMA_DONE, ttft=0.2)["ttft"] == 0.2
+    assert percentile([1, 2, 3, 4], 50) == 2 and percentile([1, 2, 3, 4], 99) == 4
+
+
+def test_rolling_percentiles_and_cold_loads_per_model():
+    telemetry = LLMTelemetry(window=3)
+    seen = []
+    telemetry.add_listener(lambda model, sample: seen.append(model))
+    telemetry.record("m", OLLAMA_DONE, 7.6)
+    for decode_ns in (2_000_000_000, 1_000_000_000, 500_000_000):
+        telemetry.record("m", {**OLLAMA_DONE, "load_duration": 10_000_000, "eval_duration": decode_ns}, 2.0)
+    telemetry.record_error("m")
+
+    stats = telemetry.get_stats()["m"]
+    assert stats["calls"] == 4 and stats["errors"] == 1 and stats["cold_loads"] == 1
+    assert stats["decode_tps"]["count"] == 3  # window keeps the last 3
+    assert stats["decode_tps"]["p50"] == 100 and stats["decode_tps"]["p99"] == 200
+    assert stats["output_tokens"] == 400
+    assert seen == ["m"] * 4
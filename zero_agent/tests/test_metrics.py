@@ -0,0 +1,39 @@
+"""
+Tests for the Prometheus metrics registry
+"""
+
+from zero_agent.api.metrics import MetricsRegistry, observe_llm_stats, CHAT_STAGE_DURATION
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    hist = registry.histogram("request_duration_seconds", "latency", ["path"], buckets=(0.1, 1.0))
+    hist.observe(0.05, path="/api/chat")
+    hist.observe(0.5, path="/api/chat")
+    hist.observe(5.0, path="/api/chat")
+
+    text = registry.render()
+    assert 'request_duration_seconds_bucket{path="/api/chat",le="0.1"} 1' in text
+    assert 'request_duration_seconds_bucket{path="/api/chat",le="1"} 2' in text
+    assert 'request_duration_seconds_bucket{path="/api/chat",le="+Inf"} 3' in text
+    assert 'request_duration_seconds_count{path="/api/chat"} 3' in text
+
+
+def test_counter_labels_are_escaped():
+    registry = MetricsRegistry()
+    counter = registry.counter("requests_total", "requests", ["path", "status"])
+    counter.inc(path='/a"b', status="200")
+    counter.inc(path='/a"b', status="200")
+    assert 'requests_total{path="/a\\"b",status="200"} 2' in registry.render()
+
+
+def test_llm_stats_use_ollama_durations():
+    before = CHAT_STAGE_DURATION.count(stage="llm_ttft")
+    observe_llm_stats({
+        "load_duration": 100_000_000,
+        "prompt_eval_duration": 200_000_000,
+        "eval_count": 40,
+        "eval_duration": 2_000_000_000,
+        "elapsed": 2.5,
+    }, model="mixtral:8x7b")
+    assert CHAT_STAGE_DURATION.count(stage="llm_ttft") == before + 1
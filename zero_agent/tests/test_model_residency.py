@@ -0,0 +1,77 @@
+"""
+Tests for the model residency manager
+"""
+
+import asyncio
+
+from router_context_aware import ContextAwareRouter
+from zero_agent.core.model_residency import ModelResidency
+
+
+class FakeLLM:
+    MODELS = {
+        "fast": {"name": "llama3.1:8b", "size": "4.7GB"},
+        "expert": {"name": "mixtral:8x7b", "size": "26GB"},
+        "coder": {"name": "qwen2.5-coder:32b", "size": "19GB"},
+        "smart": {"name": "deepseek-r1:32b", "size": "19GB"},
+        "balanced": {"name": "gpt-oss:20b-cloud", "size": "Unknown"},
+    }
+
+    def __init__(self, loaded=()):
+        self.loaded = list(loaded)
+        self.preloaded = []
+
+    def model_name(self, model):
+        return self.MODELS.get(model, self.MODELS["expert"])["name"]
+
+    async def aloaded_models(self):
+        sizes = {info["name"]: float(info["size"][:-2]) * 1e9 for info in self.MODELS.values()
+                 if info["size"].endswith("GB")}
+        return [{"name": name, "size_vram": sizes[name]} for name in self.loaded]
+
+    async def apreload(self, model_name, keep_alive=None):
+        self.preloaded.append((model_name, keep_alive))
+        self.loaded.append(model_name)
+        return True
+
+
+def test_predicts_demanded_models_within_vram_and_preloads_one_per_round():
+    llm = FakeLLM()
+    residency = ModelResidency(llm, vram_gb=32, keep_alive={"qwen2.5-coder:32b": "15m"})
+    assert residency.predicted() == ["mixtral:8x7b"]  # no traffic yet: default model
+
+    for _ in range(6):
+        residency.note_demand("qwen2.5-coder:32b")
+    for _ in range(3):
+        residency.note_demand("deepseek-r1:32b")  # 19 + 19 GB does not fit
+    for _ in range(2):
+        residency.note_demand("llama3.1:8b")
+    residency.note_demand("gpt-oss:20b-cloud")  # remote - never resident
+    assert residency.predicted() == ["qwen2.5-coder:32b", "llama3.1:8b"]
+
+    async def rounds():
+        for _ in range(2):
+            await residency.poll()
+            await residency.reconcile()
+
+    asyncio.run(rounds())
+    assert llm.preloaded == [("qwen2.5-coder:32b", "15m"), ("llama3.1:8b", "10m")]
+    assert residency.is_loaded("qwen2.5-coder:32b")
+
+
+def test_router_prefers_loaded_model_only_on_close_calls():
+    llm = FakeLLM(loaded=["deepseek-r1:32b"])
+    router = ContextAwareRouter(llm)
+    router.residency = ModelResidency(llm)
+    asyncio.run(router.residency.poll())
+
+    # "python" + "analyze": coder and smart tie on keywords
+    close = "please go ahead and analyze the attached python module and report back the findings soon"
+    assert router._route_candidates(router.analyze(close)) == ("coder", ["smart"])
+    assert router.route(close) == "smart"
+    assert "already loaded" in router.route_with_reasoning(close)["reasoning"]
+
+    # A clear coder win is not swapped
+    assert router.route(
+        "debug the python function and fix the compile syntax problem in our deployment script before release"
+    ) == "coder"
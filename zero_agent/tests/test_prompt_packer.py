@@ -0,0 +1,52 @@
+"""
+Tests for the token-budgeted prompt packer
+"""
+
+from zero_agent.core.prompt_packer import (
+    ContextSizer, PromptPacker, PromptSection, estimate_tokens,
+    PRIORITY_SYSTEM, PRIORITY_QUESTION, PRIORITY_SEARCH, PRIORITY_HISTORY, PRIORITY_RAG
+)
+
+
+def _sections(history_turns=40, rag_chars=4000):
+    history = "\n".join(f"משתמש: שאלה מספר {i}. עם עוד פרטים ארוכים כאן" for i in range(history_turns))
+    return [
+        PromptSection("system", "You are Zero. " * 20, PRIORITY_SYSTEM, footer="\n\n", required=True),
+        PromptSection("history", history, PRIORITY_HISTORY, header="## history:\n", strategy="recent"),
+        PromptSection("rag", "x" * rag_chars, PRIORITY_RAG),
+        PromptSection("search", "SPY 512.3 USD\n", PRIORITY_SEARCH),
+        PromptSection("question", "מה המחיר?", PRIORITY_QUESTION, header="\nשאלה: ", required=True),
+    ]
+
+
+def test_small_prompt_fits_whole_and_gets_smallest_num_ctx():
+    packer = PromptPacker(context_windows={"m": 32000}, reserve_output=1024)
+    packed = packer.pack(_sections(history_turns=3, rag_chars=100), "m")
+
+    assert not packed.truncated and not packed.dropped
+    assert packed.num_ctx == 4096
+    # Original section order is kept
+    text = packed.text
+    assert text.index("You are Zero") < text.index("## history") < text.index("SPY") < text.index("מה המחיר")
+
+
+def test_budget_trims_low_priority_sections_first():
+    packer = PromptPacker(context_windows={"m": 1500}, reserve_output=500)
+    packed = packer.pack(_sections(), "m")
+
+    assert packed.tokens <= packed.budget
+    assert "history" in packed.truncated
+    assert "rag" in packed.truncated + packed.dropped
+    assert "SPY 512.3" in packed.text and "מה המחיר?" in packed.text
+    # Recent turns stay verbatim, older ones are cut to their first sentence
+    assert "שאלה מספר 39. עם עוד פרטים" in packed.text
+    assert "שאלה מספר 0. ...\n" in packed.text
+    assert packed.num_ctx == 1500
+
+
+def test_num_ctx_grows_at_once_and_shrinks_lazily():
+    sizer = ContextSizer(buckets=(4096, 8192, 16384), shrink_after=3)
+    assert sizer.choose("m", 10000, 32768) == 16384
+    assert [sizer.choose("m", 1000, 32768) for _ in range(3)] == [16384, 16384, 4096]
+    assert sizer.choose("m", 5000, 32768) == 8192
+    assert estimate_tokens("שלום") > estimate_tokens("shal")
@@ -0,0 +1,60 @@
+"""
+Tests for the sliding-window rate limiter
+"""
+
+import sqlite3
+import time
+
+from zero_agent.api.rate_limit import RateLimiter, InMemoryBackend, SQLiteBackend
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_route_costs_sliding_window_and_eviction():
+    clock = FakeClock(960.0)  # start of a window
+    backend = InMemoryBackend(evict_interval=10, clock=clock)
+    limiter = RateLimiter(limit=120, window_seconds=60, backend=backend)
+
+    assert limiter.check("ip", "/health").allowed  # free
+    for _ in range(9):
+        assert limiter.check("ip", "/api/chat").allowed
+    assert limiter.check("ip", "/api/llm/stats").allowed
+    denied = limiter.check("ip", "/api/chat")
+    assert not denied.allowed and denied.retry_after > 0
+    assert limiter.check("ip", "/api/llm/stats").allowed  # cheap reads still fit
+
+    # Halfway through the next window half of the previous usage still counts
+    clock.now = 1050.0
+    assert limiter.check("ip", "/api/chat").allowed
+    assert limiter.check("other", "/api/chat").remaining == 108
+
+    # Both keys idle for two windows -> evicted on the next periodic sweep
+    clock.now += 200
+    limiter.check("new", "/api/cache/stats")
+    assert len(backend) == 1 and backend.evicted == 2
+
+
+def test_sqlite_backend_shares_budget_between_limiters(tmp_path):
+    clock = FakeClock(6000.0)
+    path = tmp_path / "ratelimit.db"
+    worker_a = RateLimiter(limit=24, window_seconds=60, backend=SQLiteBackend(path, clock=clock))
+    worker_b = RateLimiter(limit=24, window_seconds=60, backend=SQLiteBackend(path, clock=clock))
+
+    assert worker_a.check("ip", "/api/chat").allowed
+    assert worker_b.check("ip", "/api/chat").allowed
+    decision = worker_a.check("ip", "/api/chat")
+    assert not decision.allowed and decision.headers()["Retry-After"] == str(decision.retry_after)
+
+    # Another worker holding the write lock: fail open after the short busy timeout
+    blocker = sqlite3.connect(str(path), isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    started = time.perf_counter()
+    assert worker_a.check("other", "/api/chat").allowed
+    assert time.perf_counter() - started < 1.0
+    blocker.execute("ROLLBACK")
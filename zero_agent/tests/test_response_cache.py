@@ -0,0 +1,55 @@
+"""
+Tests for the /api/chat response cache
+"""
+
+import time
+
+from zero_agent.core.response_cache import ResponseCache, classify_query, context_hash
+
+
+def test_exact_hit_is_normalized_and_keyed_by_model_and_context():
+    cache = ResponseCache()
+    ctx = context_hash("", "system prompt")
+    cache.store("What is Python?", "expert", ctx, "A language", generation_seconds=12.0)
+
+    assert cache.lookup("  what is   python ", "expert", ctx).kind == "exact"
+    assert not cache.lookup("what is python", "fast", ctx).hit
+    assert not cache.lookup("what is python", "expert", context_hash("history", "system prompt")).hit
+    assert cache.get_stats()["saved_seconds"] == 12.0
+
+
+def test_semantic_hit_above_threshold():
+    vectors = {"what is python": [1.0, 0.0], "explain python": [0.99, 0.05], "weather": [0.0, 1.0]}
+    cache = ResponseCache(embed_fn=lambda text: vectors[text], similarity_threshold=0.95)
+    cache.store("what is python", "expert", "ctx", "A language")
+
+    hit = cache.lookup("explain python", "expert", "ctx")
+    assert hit.kind == "semantic" and hit.entry.response == "A language"
+    assert not cache.lookup("weather", "expert", "ctx").hit
+
+
+def test_ttl_by_class_lru_and_invalidation():
+    cache = ResponseCache(max_entries=2, ttls={"search": 0.05})
+    assert classify_query("price of spy", search_backed=True) == "search"
+    assert classify_query("מה זה RAG") == "definition"
+
+    cache.store("price of spy", "expert", "ctx", "$500", query_class="search")
+    cache.store("what is rag", "expert", "ctx", "Retrieval", query_class="definition")
+    time.sleep(0.06)
+    assert not cache.lookup("price of spy", "expert", "ctx").hit
+
+    cache.store("a", "expert", "ctx", "1")
+    cache.store("b", "expert", "ctx", "2")
+    assert not cache.lookup("what is rag", "expert", "ctx").hit  # evicted (LRU)
+    assert cache.invalidate(contains="a") == 1
+    assert cache.store("c", "expert", "ctx", "Error: timeout") is None
+
+
+def test_search_answers_never_match_semantically():
+    vectors = {"price of spy": [1.0, 0.0], "price of qqq": [0.99, 0.05]}
+    cache = ResponseCache(embed_fn=lambda text: vectors[text], similarity_threshold=0.95)
+    cache.store("price of spy", "expert", "ctx", "$500", query_class="search",
+                embedding=vectors["price of spy"])
+
+    assert not cache.lookup("price of qqq", "expert", "ctx").hit
+    assert cache.lookup("price of spy", "expert", "ctx").kind == "exact"
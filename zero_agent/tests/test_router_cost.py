@@ -0,0 +1,89 @@
+"""
+Tests for cost-based (latency-aware) routing
+"""
+
+from router_context_aware import ContextAwareRouter
+from zero_agent.core.llm_telemetry import LLMTelemetry
+
+TASK = "please give me an advanced and sophisticated overview of the professional landscape of our field"
+COMPLEX = ("analyze the long-term strategic implications and trade-offs of our business architecture, "
+           "considering the complex relationships between market positioning, competitive dynamics "
+           "and the future of our organization")
+
+
+class FakeLLM:
+    MODELS = {
+        "fast": {"name": "llama3.1:8b"},
+        "expert": {"name": "mixtral:8x7b"},
+        "coder": {"name": "qwen2.5-coder:32b"},
+        "smart": {"name": "deepseek-r1:32b"},
+    }
+
+    def __init__(self):
+        self.telemetry = LLMTelemetry()
+
+    def model_name(self, model):
+        return self.MODELS.get(model, self.MODELS["expert"])["name"]
+
+
+class FakeScheduler:
+    def __init__(self, lanes):
+        self.lanes = lanes
+
+    def lane_snapshot(self):
+        return self.lanes
+
+
+def _router(expert_active=1, expert_queued=0):
+    llm = FakeLLM()
+    for _ in range(10):
+        llm.telemetry.record("mixtral:8x7b", {}, elapsed=6.0)
+        llm.telemetry.record("llama3.1:8b", {}, elapsed=2.0)
+    router = ContextAwareRouter(llm)
+    router.cost_routing = True
+    router.scheduler = FakeScheduler({
+        "mixtral:8x7b": {"active": expert_active, "max_concurrent": 2, "queued": expert_queued},
+    })
+    return router
+
+
+def test_expert_kept_within_slo_and_degraded_to_fast_under_queue():
+    router = _router(expert_active=1)  # a free slot
+    decision = router.decide(TASK, latency_slo=10)
+    assert (decision.preferred, decision.chosen, decision.reason) == ("expert", "expert", "quality")
+    assert decision.estimates["expert"] == {"queue_wait": 0.0, "service": 6.0, "load": 0.0, "total": 6.0}
+
+    router = _router(expert_active=2, expert_queued=8)
+    decision = router.decide(TASK, latency_slo=10)
+    assert (decision.chosen, decision.reason) == ("fast", "degraded")
+    assert decision.estimates["expert"]["queue_wait"] == 5 * 6.0  # ceil(9 / 2) p50 rounds
+    assert router.decisions[-1] is decision
+
+
+def test_nothing_fits_picks_fastest_and_reasoning_explains():
+    router = _router(expert_active=2, expert_queued=8)
+    result = router.route_with_reasoning(TASK, latency_slo=0.5)
+    assert result["model"] == "fast"
+    assert result["decision"]["reason"] == "overloaded"
+    assert "Degraded from expert" in result["reasoning"]
+
+
+def test_idle_server_keeps_smart_without_an_slo():
+    # No samples for smart yet: its prior (25 s) alone must not push it under the default SLO
+    router = _router(expert_active=0)
+    decision = router.decide(COMPLEX)
+    assert (decision.preferred, decision.chosen, decision.reason) == ("smart", "smart", "quality")
+    assert decision.estimates["smart"]["total"] > router.DEFAULT_LATENCY_SLO
+
+    # A request's own SLO still counts the prior
+    assert router.decide(COMPLEX, latency_slo=10).chosen == "expert"
+
+
+def test_route_cache_survives_concurrent_decisions():
+    from concurrent.futures import ThreadPoolExecutor
+
+    router = ContextAwareRouter(FakeLLM())
+    router.cache_max_size = 8
+    with ThreadPoolExecutor(8) as pool:
+        models = list(pool.map(lambda i: router.decide(f"{TASK} {i % 50}").chosen, range(2000)))
+    assert set(models) == {"expert"} and len(router.route_cache) <= 8
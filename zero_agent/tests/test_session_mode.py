@@ -0,0 +1,116 @@
+"""
+Tests for the prefix-stable session chat mode
+"""
+
+import asyncio
+import time
+
+from streaming_llm import StreamingMultiModelLLM
+from zero_agent.core.prompt_packer import PromptPacker, PromptSection, stable_history, PRIORITY_QUESTION
+from zero_agent.core.session_store import SessionStore
+
+
+def _history(n):
+    return [{"role": "user" if i % 2 == 0 else "zero", "content": f"turn {i}"} for i in range(n)]
+
+
+def test_history_window_and_prefix_stay_stable_between_turns():
+    # The window start only moves in blocks, so consecutive turns share a prefix
+    assert stable_history(_history(11), max_messages=10, step=4)[0]["content"] == "turn 4"
+    assert stable_history(_history(13), max_messages=10, step=4)[0]["content"] == "turn 4"
+    assert stable_history(_history(15), max_messages=10, step=4)[0]["content"] == "turn 8"
+    assert stable_history(_history(3))[1]["role"] == "assistant"
+
+    packer = PromptPacker(context_windows={"m": 8192})
+    first = packer.pack_messages("SYSTEM", stable_history(_history(4)),
+                                 [PromptSection("question", "q1", PRIORITY_QUESTION, required=True)], "m")
+    second = packer.pack_messages("SYSTEM", stable_history(_history(6)),
+                                  [PromptSection("question", "q2", PRIORITY_QUESTION, required=True)], "m")
+    assert second.messages[:len(first.messages) - 1] == first.messages[:-1]
+    assert first.messages[-1] == {"role": "user", "content": "q1"}
+
+
+def test_session_is_pinned_and_reports_reused_prefill():
+    llm = StreamingMultiModelLLM()
+    payloads = []
+
+    async def fake_chat(model_name, payload, priority, session_id, stats):
+        payloads.append(payload)
+        stats["prompt_eval_count"] = 40
+        return "ok"
+
+    llm._achat = fake_chat
+
+    async def main():
+        stats = {}
+        await llm.achat_session("s1", [{"role": "user", "content": "a"}], model="coder",
+                                prompt_tokens=1000, options={"num_ctx": 8192})
+        await llm.achat_session("s1", [{"role": "user", "content": "b"}], prompt_tokens=1200,
+                                options={"num_ctx": 4096}, stats=stats)
+        return stats
+
+    stats = asyncio.run(main())
+    assert [p["model"] for p in payloads] == ["qwen2.5-coder:32b"] * 2
+    assert payloads[1]["options"]["num_ctx"] == 8192  # never shrinks inside a session
+    assert payloads[1]["keep_alive"] == llm.KEEP_ALIVE
+    assert stats["prefill_reused"] == 1160 and stats["session_turn"] == 2
+    assert llm.session_model("s1") == "coder"
+    assert llm.get_session_stats()["prefill_reused_tokens"] == 960 + 1160
+
+
+class FakeRAG:
+    def recall_personal_fact(self, query, n_results=3):
+        return [{"document": "my supervisor is Dana", "metadata": {}, "distance": 0.1}]
+
+    def retrieve(self, query, n_results=3):
+        return []
+
+
+def test_recalled_facts_reach_the_session_payload(monkeypatch):
+    import api_server
+
+    monkeypatch.setattr(api_server.zero, "rag", FakeRAG(), raising=False)
+    monkeypatch.setattr(api_server.zero, "llm", StreamingMultiModelLLM(), raising=False)
+    monkeypatch.setattr(api_server, "dialogue_tracker", None)
+    request = api_server.ChatRequest(message="what did I say about my supervisor?", model="fast",
+                                     conversation_history=[{"role": "user", "content": "hi"},
+                                                           {"role": "assistant", "content": "hello"}])
+    prepared = asyncio.run(api_server.prepare_chat(request, time.time(), "s1"))
+
+    # Session mode: the turns are chat messages, the recalled facts ride in the last user message
+    assert [m["content"] for m in prepared.messages[1:3]] == ["hi", "hello"]
+    assert "my supervisor is Dana" in prepared.messages[-1]["content"]
+    assert "hello" not in prepared.messages[-1]["content"]
+
+
+def test_stored_session_summary_reaches_the_session_payload(monkeypatch):
+    import api_server
+
+    store = SessionStore(max_messages=2)
+    store.append("s2", "my dog is called Rex", "nice name")
+    store.append("s2", "hi", "hello")  # the first exchange moves to the summary
+    monkeypatch.setattr(api_server, "session_store", store)
+    monkeypatch.setattr(api_server.zero, "rag", None, raising=False)
+    monkeypatch.setattr(api_server.zero, "memory", None, raising=False)
+    monkeypatch.setattr(api_server.zero, "llm", StreamingMultiModelLLM(), raising=False)
+    monkeypatch.setattr(api_server, "dialogue_tracker", None)
+    request = api_server.ChatRequest(message="and the dog?", model="fast", session_id="s2")
+    prepared = asyncio.run(api_server.prepare_chat(request, time.time(), "s2"))
+
+    assert [m["content"] for m in prepared.messages[1:3]] == ["hi", "hello"]
+    assert "Rex" in prepared.messages[-1]["content"]
+
+
+def test_history_without_session_id_stays_stateless(monkeypatch):
+    import api_server
+
+    monkeypatch.setattr(api_server.zero, "rag", None, raising=False)
+    monkeypatch.setattr(api_server.zero, "memory", None, raising=False)
+    monkeypatch.setattr(api_server.zero, "llm", StreamingMultiModelLLM(), raising=False)
+    monkeypatch.setattr(api_server, "dialogue_tracker", None)
+    request = api_server.ChatRequest(message="and the dog?", model="fast",
+                                     conversation_history=[{"role": "user", "content": "my dog is Rex"}])
+    prepared = asyncio.run(api_server.prepare_chat(request, time.time(), request.session_id))
+
+    assert prepared.messages is None
+    assert "my dog is Rex" in prepared.prompt
@@ -0,0 +1,48 @@
+"""
+Tests for the server-side session store
+"""
+
+from zero_agent.core.session_store import SessionStore
+
+
+def test_turns_context_block_and_rolling_summary():
+    store = SessionStore(max_sessions=2, max_messages=4, context_messages=2)
+    store.append("a", "What is docker? Explain in detail.", "A container runtime.")
+    store.append("a", "And kubernetes?", "An orchestrator.")
+    store.append("a", "Which one first?", "Docker.")
+
+    session = store.get("a")
+    assert [m["content"] for m in session.messages()] == [
+        "And kubernetes?", "An orchestrator.", "Which one first?", "Docker."
+    ]
+    assert session.context_block == "משתמש: Which one first?\nZero: Docker."
+    # Messages pushed out of the window are kept shortened in the summary
+    assert session.summary == "משתמש: What is docker? ...\nZero: A container runtime."
+
+    # LRU: a third session evicts the least recently used one
+    store.append("b", "hi", "hello")
+    store.get("a")
+    store.append("c", "hi", "hello")
+    assert "a" in store and "b" not in store
+
+    store.ttl = -1  # everything idle too long
+    assert store.get("a") is None
+
+
+def test_sqlite_persistence_and_client_history_reset(tmp_path):
+    db = tmp_path / "sessions.db"
+    store = SessionStore(db_path=db)
+    store.append("tab", "שלום", "שלום! במה אפשר לעזור?")
+    store.replace("tab", [
+        {"role": "user", "content": "first"},
+        {"role": "zero", "content": "answer"},
+        {"role": "system", "content": "ignored"},
+    ])
+
+    restarted = SessionStore(db_path=db)
+    session = restarted.get("tab")
+    assert session.messages() == [
+        {"role": "user", "content": "first"}, {"role": "assistant", "content": "answer"}
+    ]
+    assert restarted.get_stats()["loaded"] == 1
+    assert restarted.delete("tab") and SessionStore(db_path=db).get("tab") is None
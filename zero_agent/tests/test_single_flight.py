@@ -0,0 +1,59 @@
+"""
+Tests for single-flight coalescing in StreamingMultiModelLLM
+"""
+
+import asyncio
+
+from streaming_llm import _STREAM_END, StreamingMultiModelLLM
+
+
+def test_identical_generations_share_one_call():
+    llm = StreamingMultiModelLLM()
+    calls = []
+
+    async def fake_generate(model, model_name, payload, priority, session_id, stats):
+        calls.append(payload["prompt"])
+        await asyncio.sleep(0.05)
+        stats["eval_count"] = 10
+        return f"answer to {payload['prompt']}"
+
+    llm._agenerate = fake_generate
+
+    async def main():
+        stats = {}
+        same = [llm.agenerate("q1", stats=stats) for _ in range(4)]
+        results = await asyncio.gather(*same, llm.agenerate("q2"))
+        return results, stats
+
+    results, stats = asyncio.run(main())
+    assert sorted(calls) == ["q1", "q2"]
+    assert results[:4] == ["answer to q1"] * 4
+    assert stats["eval_count"] == 10
+    assert llm.get_flight_stats()["coalesced"] == 3
+
+
+def test_stream_fan_out_replays_for_late_subscribers():
+    llm = StreamingMultiModelLLM()
+    started = []
+
+    async def fake_producer(model_name, payload, priority, session_id, flight):
+        started.append(payload["prompt"])
+        try:
+            for word in ["a ", "b ", "c "]:
+                await asyncio.sleep(0.02)
+                flight.publish(word)
+        finally:
+            flight.publish(_STREAM_END)
+
+    llm._stream_producer = fake_producer
+
+    async def consume(delay=0.0):
+        await asyncio.sleep(delay)
+        return "".join([chunk async for chunk in llm.astream("p")])
+
+    async def main():
+        return await asyncio.gather(consume(), consume(0.03))
+
+    results = asyncio.run(main())
+    assert results == ["a b c ", "a b c "]
+    assert started == ["p"]
@@ -0,0 +1,58 @@
+"""
+Tests for the /api/chat/stream SSE protocol
+"""
+
+import asyncio
+import json
+
+from zero_agent.api.sse import (
+    PROTOCOL_V1, PROTOCOL_V2, DeltaEncoder, FullTextEncoder, negotiate_protocol
+)
+
+
+def _frames(encoder, chunks, delay=0.0):
+    async def source():
+        for chunk in chunks:
+            if delay:
+                await asyncio.sleep(delay)
+            yield chunk
+
+    async def run():
+        frames = [encoder.start(model="expert")]
+        frames += [frame async for frame in encoder.encode(source())]
+        frames.append(encoder.done(model="expert"))
+        return "".join(frames)
+
+    return asyncio.run(run())
+
+
+def _payloads(stream):
+    return [json.loads(line[len("data: "):]) for line in stream.splitlines() if line.startswith("data: ")]
+
+
+def test_negotiation_defaults_to_v1():
+    assert negotiate_protocol({}, {}, {}) == PROTOCOL_V1
+    assert negotiate_protocol({"X-Stream-Protocol": "2"}) == PROTOCOL_V2
+    assert negotiate_protocol(query={"protocol": "7"}) == PROTOCOL_V2
+    assert negotiate_protocol(body={"protocol": "junk"}) == PROTOCOL_V1
+
+
+def test_delta_stream_reassembles_and_is_smaller():
+    chunks = ["שלום "] * 400
+    v1 = _frames(FullTextEncoder(), chunks)
+    v2 = _frames(DeltaEncoder(max_chars=64, checkpoint_chars=1000), chunks)
+
+    payloads = _payloads(v2)
+    deltas = "".join(p["d"] for p in payloads if p["type"] == "delta")
+    assert deltas == "".join(chunks)
+    assert payloads[-1]["type"] == "done" and payloads[-1]["full"] == deltas
+    assert any(p["type"] == "checkpoint" for p in payloads)
+    assert [p.get("seq") for p in payloads[1:]] == list(range(2, len(payloads) + 1))
+    assert len(v2.encode()) * 20 < len(v1.encode())
+
+
+def test_first_token_is_not_held_back_and_pauses_flush():
+    encoder = DeltaEncoder(max_chars=1000, max_delay=0.01)
+    payloads = _payloads(_frames(encoder, ["a", "b", "c"], delay=0.05))
+    deltas = [p["d"] for p in payloads if p["type"] == "delta"]
+    assert deltas == ["a", "b", "c"]
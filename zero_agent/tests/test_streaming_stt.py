@@ -0,0 +1,104 @@
+"""
+Tests for the streaming recognizer
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from zero_agent.core.audio_io import SAMPLE_RATE
+from zero_agent.core.streaming_stt import RingBuffer, StreamingRecognizer
+
+
+def _signal(*parts):
+    """(seconds, amplitude) parts -> a float32 signal (a 220 Hz tone when amplitude > 0)"""
+    chunks = []
+    for seconds, amplitude in parts:
+        t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+        chunks.append((amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.float32))
+    return np.concatenate(chunks)
+
+
+def _feed(recognizer, signal, chunk=0.1):
+    step = int(chunk * SAMPLE_RATE)
+    events = []
+    for i in range(0, len(signal), step):
+        events += recognizer.feed(signal[i:i + step])
+    return events
+
+
+def test_partials_while_speaking_then_one_final_per_utterance():
+    calls = []
+
+    def transcribe(audio, final):
+        calls.append((len(audio) / SAMPLE_RATE, final))
+        return f"{'final' if final else 'partial'} {len(audio) / SAMPLE_RATE:.2f}"
+
+    recognizer = StreamingRecognizer(transcribe, partial_interval=0.5)
+    events = _feed(recognizer, _signal((0.5, 0.0), (2.0, 0.3), (1.0, 0.0), (1.0, 0.3), (1.0, 0.0)))
+
+    partials = [e for e in events if e["type"] == "partial"]
+    finals = [e for e in events if e["type"] == "final"]
+    assert len(partials) >= 2 and all(e["utterance"] == 0 for e in partials[:2])
+    assert [e["utterance"] for e in finals] == [0, 1]
+    # Utterance boundaries follow the speech (with a little pre-roll / tail)
+    assert finals[0]["start"] == pytest.approx(0.5, abs=0.25)
+    assert finals[0]["end"] == pytest.approx(2.5, abs=0.25)
+    assert finals[1]["start"] == pytest.approx(3.5, abs=0.25)
+    # The final pass sees the whole utterance, partials only a growing window of it
+    assert events.index(finals[0]) > events.index(partials[0])
+    assert not recognizer.in_speech and recognizer.flush() == []
+
+
+def test_long_speech_is_split_and_flush_finalizes_open_utterance():
+    finals = []
+
+    def transcribe(audio, final):
+        if final:
+            finals.append(len(audio) / SAMPLE_RATE)
+        return "text"
+
+    recognizer = StreamingRecognizer(transcribe, partial_interval=10.0, max_utterance=2.0)
+    events = _feed(recognizer, _signal((5.0, 0.3)))
+    assert [e["type"] for e in events].count("final") == 2
+    assert all(length == pytest.approx(2.0, abs=0.03) for length in finals)
+
+    assert recognizer.in_speech
+    assert [e["type"] for e in recognizer.flush()] == ["final"]
+    assert recognizer.get_stats()["utterances"] == 3
+
+
+def test_ring_buffer_wraps_and_reads_by_absolute_position():
+    ring = RingBuffer(8)
+    ring.append(np.arange(6, dtype=np.float32))
+    ring.append(np.arange(6, 12, dtype=np.float32))
+    assert ring.written == 12 and ring.oldest == 4
+    assert ring.read(2, 10).tolist() == list(range(4, 10))
+
+
+def test_steady_noise_stops_counting_as_speech():
+    recognizer = StreamingRecognizer(lambda audio, final: "text", partial_interval=10.0)
+    # A hum well above min_rms for 10 s, then a louder utterance over it
+    events = _feed(recognizer, _signal((10.0, 0.07)))
+    assert not recognizer.in_speech
+    assert [e["type"] for e in events].count("final") <= 1
+
+    events = _feed(recognizer, _signal((1.0, 0.5), (1.0, 0.07)))
+    finals = [e for e in events if e["type"] == "final"]
+    assert len(finals) == 1 and finals[0]["start"] == pytest.approx(10.0, abs=0.25)
+    assert not recognizer.in_speech
+
+
+def test_failed_final_pass_emits_error_and_stream_continues():
+    def transcribe(audio, final):
+        if final and not calls:
+            calls.append(final)
+            raise RuntimeError("decoder crashed")
+        return "text"
+
+    calls = []
+    recognizer = StreamingRecognizer(transcribe, partial_interval=10.0)
+    events = _feed(recognizer, _signal((0.5, 0.0), (1.0, 0.3), (1.0, 0.0), (1.0, 0.3), (1.0, 0.0)))
+    assert [(e["type"], e["utterance"]) for e in events] == [("error", 0), ("final", 1)]
+    assert "decoder crashed" in events[0]["message"]
+    assert recognizer.get_stats()["errors"] == 1
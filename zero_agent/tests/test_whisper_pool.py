@@ -0,0 +1,67 @@
+"""
+Tests for the Whisper model pool
+"""
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from zero_agent.core.whisper_pool import WhisperPool
+
+
+class FakeWhisper:
+    """Stands in for faster_whisper.WhisperModel"""
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def transcribe(self, audio, **options):
+        if audio == "broken":
+            raise ValueError("cannot decode")
+
+        def segments():
+            with FakeWhisper.lock:
+                FakeWhisper.running += 1
+                FakeWhisper.peak = max(FakeWhisper.peak, FakeWhisper.running)
+            time.sleep(0.05)
+            with FakeWhisper.lock:
+                FakeWhisper.running -= 1
+            yield SimpleNamespace(start=0.0, end=1.0, text=f" {audio}")
+            yield SimpleNamespace(start=1.0, end=2.0, text=f" {options['language']}")
+
+        return segments(), SimpleNamespace(language=options["language"], language_probability=0.9, duration=2.0)
+
+
+def test_instances_are_created_lazily_reused_and_bounded():
+    pool = WhisperPool(size=2, factory=FakeWhisper)
+    samples = []
+    pool.add_listener(samples.append)
+
+    async def run():
+        return await asyncio.gather(*(pool.transcribe(f"clip{i}", language="he") for i in range(5)))
+
+    results = asyncio.run(run())
+    assert [r.text for r in results] == [f"clip{i} he" for i in range(5)]
+    assert pool.stats["loads"] == 2 and FakeWhisper.peak == 2
+    stats = pool.get_stats()
+    assert (stats["transcriptions"], stats["queued"], stats["active"], stats["idle"]) == (5, 0, 0, 2)
+    assert stats["audio_seconds"] == 10.0 and len(samples) == 5
+    pool.shutdown()
+
+
+def test_config_preload_and_errors_return_the_instance(tmp_path):
+    config = tmp_path / "models.yaml"
+    config.write_text("whisper:\n  model: base\n  pool_size: 3\n  cpu_threads: 2\n  preload: 2\n")
+    pool = WhisperPool.from_config(config, factory=FakeWhisper)
+    assert (pool.model_size, pool.size, pool.cpu_threads) == ("base", 3, 2)
+
+    assert asyncio.run(pool.apreload()) == 2
+    assert pool.get_stats()["loaded"] == 2
+
+    with pytest.raises(ValueError):
+        asyncio.run(pool.transcribe("broken", language="en"))
+    assert pool.stats["errors"] == 1 and len(pool._idle) == 2
+    pool.shutdown()
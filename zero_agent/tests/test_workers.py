@@ -0,0 +1,71 @@
+"""
+Tests for multi-worker coordination and metrics merging
+"""
+
+import socket
+
+import pytest
+
+from zero_agent.api.metrics import MetricsRegistry, merge_expositions
+from zero_agent.core.workers import RemoteObject, WorkerCoordinator
+
+
+class Store:
+    def __init__(self):
+        self.items = []
+
+    def add(self, item):
+        self.items.append(item)
+        return len(self.items)
+
+    def fail(self):
+        raise ValueError("bad item")
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_follower_forwards_to_owner_and_takes_over(tmp_path):
+    port = _free_port()
+    owner = WorkerCoordinator(workers=2, port=port, state_dir=tmp_path, authkey=b"k")
+    follower = WorkerCoordinator(workers=2, port=port, state_dir=tmp_path, authkey=b"k")
+    assert (owner.elect(), follower.elect()) == ("owner", "follower")
+
+    local = owner.share("store", Store)
+    remote = follower.share("store", Store)
+    assert isinstance(remote, RemoteObject) and remote
+    assert remote.add("a") == 1 and len(remote) == 1 and local.items == ["a"]
+    with pytest.raises(ValueError, match="bad item"):
+        remote.fail()
+    assert owner.stats["served"] == 3
+
+    # Owner exits: the follower's next call re-runs the election and serves locally
+    owner.close()
+    assert remote.add("b") == 1
+    assert follower.role == "owner"
+    follower.close()
+
+
+def test_merge_sums_counters_and_takes_max_of_shared_gauges():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ["path"])
+    queued = registry.gauge("queue_depth", "Queued")
+    entries = registry.gauge("cache_entries", "Entries", aggregate="max")
+    requests.inc(2, path="/api/chat")
+    queued.set(1)
+    entries.set(5)
+    peer = registry.render()
+
+    requests.inc(1, path="/health")
+    merged = registry.render_merged([peer])
+    assert 'requests_total{path="/api/chat"} 4' in merged
+    assert 'requests_total{path="/health"} 1' in merged
+    assert "queue_depth 2" in merged and "cache_entries 5" in merged
+    assert merged.count("# TYPE requests_total counter") == 1
+    assert merge_expositions([peer]) == peer
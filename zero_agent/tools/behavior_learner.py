@@ -92,21 +92,7 @@ class BehaviorLearner:
             action: UserAction object with action details
         """
         try:
-            # Store action
-            self.action_history.append(action)
-            
-            # Update frequencies
-            action_key = f"{action.action_type}_{action.target}"
-            self.action_frequencies[action_key] += 1
-            
-            # Update success rate
-            if action.success:
-                self.success_rates[action_key] = min(1.0, self.success_rates[action_key] + 0.1)
-            else:
-                self.success_rates[action_key] = max(0.0, self.success_rates[action_key] - 0.05)
-            
-            # Update time-based patterns
-            self._update_time_patterns(action)
+            self._update_from_action(action)
             
             # Identify new patterns
             self._identify_patterns()
@@ -119,6 +105,46 @@ class BehaviorLearner:
         except Exception as e:
             logger.error(f"Learning from action failed: {e}")
     
+    def learn_from_actions(self, actions: List[UserAction]):
+        """
+        Learn from a batch of actions - patterns are re-identified and the
+        learning data file is rewritten once per batch instead of per action
+        
+        Args:
+            actions: UserAction objects in chronological order
+        """
+        if not actions:
+            return
+        try:
+            for action in actions:
+                self._update_from_action(action)
+            
+            self._identify_patterns()
+            self._save_learning_data()
+            
+            logger.debug(f"Learned from {len(actions)} actions")
+            
+        except Exception as e:
+            logger.error(f"Learning from actions failed: {e}")
+    
+    def _update_from_action(self, action: UserAction):
+        """Update history, frequencies, success rates and time patterns for one action"""
+        # Store action
+        self.action_history.append(action)
+        
+        # Update frequencies
+        action_key = f"{action.action_type}_{action.target}"
+        self.action_frequencies[action_key] += 1
+        
+        # Update success rate
+        if action.success:
+            self.success_rates[action_key] = min(1.0, self.success_rates[action_key] + 0.1)
+        else:
+            self.success_rates[action_key] = max(0.0, self.success_rates[action_key] - 0.05)
+        
+        # Update time-based patterns
+        self._update_time_patterns(action)
+    
     def predict_next_actions(self, current_context: Dict, max_predictions: int = 5) -> List[Prediction]:
         """
         Predict likely next actions based on learned patterns